@@ -14,7 +14,6 @@ from loguru import logger
 from nonebot import get_driver
 
 from src.base.event.event_root import root
-from src.common.collections import PriorityList
 from src.services.items import register_inner_items
 
 loaded_modules: list[ModuleType] = []
@@ -67,9 +66,7 @@ def reload():
 
     for command in alconna_manager.get_commands():
         alconna_manager.delete(command)
-    for key in root.listeners.keys():
-        root.listeners[key] = PriorityList()
-        root.linked = set()
+    root.clear()
     for p in loaded_modules:
         try:
             importlib.reload(p)
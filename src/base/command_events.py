@@ -2,7 +2,9 @@ from abc import ABC, abstractmethod
 from pathlib import Path
 from typing import (
     Any,
+    Callable,
     Generic,
+    Hashable,
     Iterable,
     TypeVar,
     cast,
@@ -27,9 +29,10 @@ from src.base.onebot.onebot_basic import (
 )
 from src.base.onebot.onebot_enum import QQEmoji
 from src.base.onebot.onebot_tools import get_name_cached
-
+from src.common.threading import run_io
 
 TE = TypeVar("TE", bound="MessageEvent")
+T = TypeVar("T")
 
 
 class MessageContext(ABC):
@@ -59,16 +62,42 @@ class MessageContext(ABC):
     def sender_name(self):
         return self.get_sender_name()
 
+    def memo(self, key: Hashable, factory: Callable[[], T]) -> T:
+        """同一条消息上只计算一次的值，比如纯文本和 Alconna 的解析结果
+
+        Args:
+            key (Hashable): 值的名字
+            factory (Callable[[], T]): 第一次用到时计算这个值
+
+        Returns:
+            T: 计算出的值
+        """
+        memo: dict[Hashable, Any] = self.__dict__.setdefault("_memo", {})
+        if key not in memo:
+            memo[key] = factory()
+        return memo[key]
+
     def is_text_only(self) -> bool:
-        return self.message.only(Text)
+        return self.memo("is_text_only", lambda: self.message.only(Text))
 
     @property
     def text(self):
-        return self.message.extract_plain_text()
+        return self.memo("text", lambda: self.message.extract_plain_text())
+
+    def routing_text(self) -> str | None:
+        """
+        消息开头的文字，用于事件系统的路由，消息不以文字开头时为 None
+        """
+        message = self.message
+        if message.only(Text):
+            return message.extract_plain_text()
+        if len(message) == 0 or not isinstance(message[0], Text):
+            return None
+        return message[0].text
 
     async def send_image(self, image: Path | bytes):
         if isinstance(image, Path):
-            image = image.read_bytes()
+            image = await run_io(image.read_bytes)
         msg = UniMessage.image(raw=image)
         return await self.send(msg)
 
@@ -90,9 +119,12 @@ class OnebotContext(MessageContext, Generic[TE]):
 
     @property
     def message(self) -> UniMessage[Segment]:
-        return cast(
-            UniMessage[Segment],
-            UniMessage(BUILDER_MAPPING["OneBot V11"].generate(self.event.original_message)),  # type: ignore
+        return self.memo(
+            "message",
+            lambda: cast(
+                UniMessage[Segment],
+                UniMessage(BUILDER_MAPPING["OneBot V11"].generate(self.event.original_message)),  # type: ignore
+            ),
         )
 
     async def reply(
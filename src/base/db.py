@@ -7,11 +7,12 @@ from typing import Any
 import sqlalchemy
 import sqlalchemy.event
 from sqlalchemy import PoolProxiedConnection, text
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 
 from src.common.config import get_config
 
-__all__ = ["DatabaseManager"]
+__all__ = ["DatabaseManager", "upsert"]
 
 
 def _sqlite_optimize(dbapi_connection: PoolProxiedConnection, _: Any) -> None:
@@ -27,6 +28,21 @@ def _sqlite_optimize(dbapi_connection: PoolProxiedConnection, _: Any) -> None:
     cursor.close()
 
 
+def upsert(session: AsyncSession, table: Any) -> sqlite.Insert | postgresql.Insert:
+    """获得一个支持 ON CONFLICT 子句的插入语句，SQLite 需要 3.24 以上的版本
+
+    Args:
+        session (AsyncSession): 执行语句的数据库会话
+        table (Any): 插入的表或者模型
+
+    Returns:
+        sqlite.Insert | postgresql.Insert: 当前数据库方言的插入语句
+    """
+    if session.get_bind().dialect.name == "postgresql":
+        return postgresql.insert(table)
+    return sqlite.insert(table)
+
+
 class DatabaseManager:
     """
     管理数据库的类，包括连接数据库、创建会话等操作。
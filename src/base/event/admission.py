@@ -0,0 +1,266 @@
+"""
+收到的 OneBot 事件的准入控制。
+
+一个很热闹的群刷屏时，每条消息都会立即开始处理，渲染和数据库的工作在玩家锁后面
+越排越长，延迟没有上限。这里在事件进入事件系统之前做一次准入检查：
+
+- 一个后台任务定时测量事件循环的延迟（本该醒来的时间和实际醒来的时间的差）；
+- 记录正在处理的事件数量，全局和每个群各有上限；
+- 事件分成两种优先级：指令（路由索引能匹配上的消息）和闲聊（复读、「是」、戳一戳
+  之类只有兜底监听器会处理的事件）。负载高时先丢掉闲聊；指令在达到上限时会等待
+  一段时间，等不到空位才丢掉。
+
+丢弃和等待的数量、事件循环的延迟都记在 `AdmissionStats` 里，用于监控。
+"""
+
+import asyncio
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from enum import IntEnum
+from typing import Any, Awaitable, Callable
+
+from loguru import logger
+
+current_group: ContextVar[int | None] = ContextVar("current_group", default=None)
+"正在处理的事件来自哪个群，渲染排队时用来让各个群轮流"
+
+
+class Priority(IntEnum):
+    """
+    事件的优先级
+    """
+
+    LOW = 0
+    "闲聊、戳一戳等，负载高时最先被丢掉"
+
+    COMMAND = 1
+    "指令，达到上限时会等待"
+
+
+@dataclass
+class AdmissionStats:
+    """
+    准入控制的运行情况
+    """
+
+    lag: float = 0
+    "最近测量的事件循环延迟，单位秒，是平滑以后的值"
+
+    peak_lag: float = 0
+    "测量到的最大的事件循环延迟"
+
+    in_flight: int = 0
+    "正在处理的事件数量"
+
+    admitted: int = 0
+    "放行的事件数量"
+
+    deferred: int = 0
+    "因为达到上限而等待过的事件数量"
+
+    dropped: dict[str, int] = field(default_factory=dict[str, int])
+    "每种优先级被丢掉的事件数量"
+
+    group_in_flight: dict[int, int] = field(default_factory=dict[int, int])
+    "每个群正在处理的事件数量"
+
+
+class AdmissionController:
+    """
+    事件的准入控制器
+    """
+
+    max_in_flight: int
+    "全局最多同时处理多少个事件"
+
+    max_in_flight_per_group: int
+    "每个群最多同时处理多少个事件"
+
+    lag_threshold: float
+    "事件循环延迟超过多少秒时认为过载"
+
+    wait_timeout: float
+    "指令最多等待多少秒的空位"
+
+    lag_interval: float
+    "测量事件循环延迟的间隔"
+
+    def __init__(
+        self,
+        max_in_flight: int = 64,
+        max_in_flight_per_group: int = 8,
+        lag_threshold: float = 0.5,
+        wait_timeout: float = 5,
+        lag_interval: float = 0.25,
+    ) -> None:
+        self.max_in_flight = max_in_flight
+        self.max_in_flight_per_group = max_in_flight_per_group
+        self.lag_threshold = lag_threshold
+        self.wait_timeout = wait_timeout
+        self.lag_interval = lag_interval
+        self._reset(None)
+
+    def _reset(self, loop: asyncio.AbstractEventLoop | None):
+        self._loop = loop
+        self._monitor: asyncio.Task[None] | None = None
+        self._released = asyncio.Condition()
+        self.stats = AdmissionStats()
+
+    def _ensure_loop(self):
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            # 事件循环换了（比如在测试中），旧的任务都不能再用了
+            self._reset(loop)
+        if self.lag_interval > 0 and (self._monitor is None or self._monitor.done()):
+            self._monitor = loop.create_task(self._measure_lag())
+
+    async def _measure_lag(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.lag_interval
+            await asyncio.sleep(self.lag_interval)
+            lag = max(0, loop.time() - expected)
+            self.stats.lag = self.stats.lag * 0.7 + lag * 0.3
+            self.stats.peak_lag = max(self.stats.peak_lag, lag)
+
+    @property
+    def overloaded(self) -> bool:
+        """
+        事件循环延迟太高，或者正在处理的事件达到了全局上限
+        """
+        return (
+            self.stats.lag > self.lag_threshold
+            or self.stats.in_flight >= self.max_in_flight
+        )
+
+    def _has_room(self, group_id: int | None) -> bool:
+        if self.stats.in_flight >= self.max_in_flight:
+            return False
+        if group_id is None:
+            return True
+        return (
+            self.stats.group_in_flight.get(group_id, 0) < self.max_in_flight_per_group
+        )
+
+    def _drop(self, priority: Priority, group_id: int | None):
+        name = priority.name.lower()
+        count = self.stats.dropped.get(name, 0) + 1
+        self.stats.dropped[name] = count
+        if count == 1 or count % 100 == 0:
+            logger.warning(
+                f"负载太高，丢掉了来自群 {group_id} 的事件，"
+                f"这种优先级已经丢掉了 {count} 个"
+            )
+
+    async def _wait_for_room(self, group_id: int | None) -> bool:
+        self.stats.deferred += 1
+        try:
+            async with self._released:
+                await asyncio.wait_for(
+                    self._released.wait_for(lambda: self._has_room(group_id)),
+                    self.wait_timeout,
+                )
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    async def admit(self, priority: Priority, group_id: int | None = None) -> bool:
+        """检查一个事件能不能开始处理，能的话占用一个位置，之后必须调用 `release`
+
+        Args:
+            priority (Priority): 事件的优先级
+            group_id (int | None, optional): 事件来自哪个群，不来自群时不受每个群的上限限制
+
+        Returns:
+            bool: 是否放行
+        """
+        self._ensure_loop()
+
+        if priority == Priority.LOW:
+            if self.overloaded or not self._has_room(group_id):
+                self._drop(priority, group_id)
+                return False
+        elif not self._has_room(group_id) and not await self._wait_for_room(group_id):
+            self._drop(priority, group_id)
+            return False
+
+        self.stats.admitted += 1
+        self.stats.in_flight += 1
+        if group_id is not None:
+            self.stats.group_in_flight[group_id] = (
+                self.stats.group_in_flight.get(group_id, 0) + 1
+            )
+        return True
+
+    async def release(self, group_id: int | None = None):
+        """
+        事件处理完了，让出占用的位置
+        """
+        self.stats.in_flight -= 1
+        if group_id is not None:
+            count = self.stats.group_in_flight.get(group_id, 1) - 1
+            if count > 0:
+                self.stats.group_in_flight[group_id] = count
+            else:
+                self.stats.group_in_flight.pop(group_id, None)
+        async with self._released:
+            self._released.notify_all()
+
+    async def run(
+        self,
+        priority: Priority,
+        group_id: int | None,
+        func: Callable[[], Awaitable[Any]],
+    ) -> bool:
+        """经过准入检查以后执行一个事件的处理
+
+        Args:
+            priority (Priority): 事件的优先级
+            group_id (int | None): 事件来自哪个群
+            func (Callable[[], Awaitable[Any]]): 处理事件的函数
+
+        Returns:
+            bool: 是否放行了，没有放行时 `func` 不会被调用
+        """
+        if not await self.admit(priority, group_id):
+            return False
+        token = current_group.set(group_id)
+        try:
+            await func()
+        finally:
+            current_group.reset(token)
+            await self.release(group_id)
+        return True
+
+    def get_stats(self) -> AdmissionStats:
+        return self.stats
+
+    async def close(self):
+        """
+        停止测量事件循环延迟
+        """
+        if self._loop is not asyncio.get_running_loop():
+            return
+        if self._monitor is not None:
+            self._monitor.cancel()
+            await asyncio.gather(self._monitor, return_exceptions=True)
+            self._monitor = None
+
+
+admission_controller = AdmissionController()
+
+
+def get_admission_controller() -> AdmissionController:
+    """
+    获得当前 App 正在使用的准入控制器
+    """
+    return admission_controller
+
+
+__all__ = [
+    "AdmissionController",
+    "AdmissionStats",
+    "Priority",
+    "current_group",
+    "get_admission_controller",
+]
@@ -0,0 +1,240 @@
+"""
+`EventDispatcher.throw` 的后台执行器。
+
+被抛出的事件不需要等待处理完成，但处理函数往往要开一个工作单元（比如检查成就），
+一阵密集的抓小哥之后，如果每个处理函数都直接变成一个任务，它们会一起去抢数据库，
+把正在处理指令的工作单元挤在后面。这里把这些处理函数按照事件的类型放进有界的队列，
+由固定数量的执行槽依次执行：
+
+- 同时执行的处理函数不超过 `max_workers` 个；
+- 每种事件的队列最多积压 `max_queue` 个，满了以后 `throw` 会等待，形成背压；
+- 处理函数出错时会记录日志，并按照 `retries` 重试；
+- Bot 关闭时调用 `drain` 把队列里剩下的处理函数执行完。
+"""
+
+import asyncio
+from dataclasses import dataclass, field
+from typing import Any, Callable, Coroutine
+
+from loguru import logger
+
+from src.base.exceptions import KagamiStopIteration
+
+
+@dataclass
+class BackgroundJob:
+    """
+    一个等待在后台执行的处理函数
+    """
+
+    name: str
+    "处理函数的名字，用于日志"
+
+    func: Callable[[], Coroutine[Any, Any, Any]]
+
+
+@dataclass
+class BackgroundStats:
+    """
+    后台执行器的运行情况
+    """
+
+    running: int = 0
+    "正在执行的处理函数的数量"
+
+    completed: int = 0
+    "执行成功的处理函数的数量"
+
+    failed: int = 0
+    "重试以后仍然失败的处理函数的数量"
+
+    retried: int = 0
+    "重试的次数"
+
+    depth: dict[str, int] = field(default_factory=dict[str, int])
+    "每种事件的队列中还在排队的处理函数的数量"
+
+    peak_depth: dict[str, int] = field(default_factory=dict[str, int])
+    "每种事件的队列曾经积压过的最大数量"
+
+
+class BackgroundRunner:
+    """
+    有界的后台执行器，每种事件一个队列，所有队列共享一组执行槽
+    """
+
+    max_workers: int
+    "最多同时执行多少个处理函数"
+
+    max_queue: int
+    "每种事件的队列最多积压多少个处理函数"
+
+    retries: int
+    "处理函数出错时最多重试几次"
+
+    retry_delay: float
+    "第一次重试前等待的秒数，之后每次翻倍"
+
+    def __init__(
+        self,
+        max_workers: int = 8,
+        max_queue: int = 256,
+        retries: int = 1,
+        retry_delay: float = 1,
+    ) -> None:
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self._reset(None)
+
+    def _reset(self, loop: asyncio.AbstractEventLoop | None):
+        self._loop = loop
+        self._queues: dict[type[Any], asyncio.Queue[BackgroundJob]] = {}
+        self._workers: dict[type[Any], asyncio.Task[None]] = {}
+        self._running: set[asyncio.Task[None]] = set()
+        self._slots = asyncio.Semaphore(self.max_workers)
+        self._closing = False
+        self.stats = BackgroundStats()
+
+    def _ensure_loop(self):
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            # 事件循环换了（比如在测试中），旧的队列和任务都不能再用了
+            self._reset(loop)
+
+    @staticmethod
+    def _key_name(key: type[Any]) -> str:
+        return getattr(key, "__name__", repr(key))
+
+    async def submit(
+        self, key: type[Any], name: str, func: Callable[[], Coroutine[Any, Any, Any]]
+    ):
+        """把一个处理函数放进对应事件的队列，队列满了时会等待
+
+        Args:
+            key (type[Any]): 事件的类型，决定使用哪个队列
+            name (str): 处理函数的名字，用于日志
+            func (Callable[[], Coroutine[Any, Any, Any]]): 处理函数
+        """
+        self._ensure_loop()
+        if self._closing:
+            logger.warning(f"后台执行器正在关闭，{name} 不会被执行")
+            return
+
+        queue = self._queues.get(key)
+        if queue is None:
+            queue = self._queues[key] = asyncio.Queue(self.max_queue)
+            self._workers[key] = asyncio.create_task(self._work(queue))
+
+        await queue.put(BackgroundJob(name, func))
+
+        key_name = self._key_name(key)
+        depth = queue.qsize()
+        if depth > self.stats.peak_depth.get(key_name, 0):
+            self.stats.peak_depth[key_name] = depth
+
+    async def _work(self, queue: asyncio.Queue[BackgroundJob]):
+        while True:
+            job = await queue.get()
+            await self._slots.acquire()
+            task = asyncio.create_task(self._run(job))
+            self._running.add(task)
+            task.add_done_callback(self._running.discard)
+            task.add_done_callback(lambda _: queue.task_done())
+
+    async def _run(self, job: BackgroundJob):
+        # 执行槽在 _work 中已经拿到了
+        holding = True
+        self.stats.running += 1
+        try:
+            for attempt in range(self.retries + 1):
+                try:
+                    await job.func()
+                    self.stats.completed += 1
+                    return
+                except KagamiStopIteration:
+                    self.stats.completed += 1
+                    return
+                except Exception as e:  # pylint: disable=broad-except
+                    if attempt >= self.retries:
+                        self.stats.failed += 1
+                        logger.opt(exception=e).error(
+                            f"后台处理函数 {job.name} 执行失败，已经重试了 {attempt} 次"
+                        )
+                        return
+                    self.stats.retried += 1
+                    logger.warning(f"后台处理函数 {job.name} 执行失败，稍后重试：{e!r}")
+
+                # 等待重试时把执行槽让出来
+                self._slots.release()
+                holding = False
+                await asyncio.sleep(self.retry_delay * 2**attempt)
+                await self._slots.acquire()
+                holding = True
+        finally:
+            self.stats.running -= 1
+            if holding:
+                self._slots.release()
+
+    def get_stats(self) -> BackgroundStats:
+        """
+        获得当前的运行情况，包括每个队列的积压数量
+        """
+        self.stats.depth = {
+            self._key_name(key): queue.qsize() for key, queue in self._queues.items()
+        }
+        return self.stats
+
+    async def drain(self, timeout: float | None = None) -> bool:
+        """不再接受新的处理函数，并等待队列中剩下的处理函数执行完
+
+        Args:
+            timeout (float | None, optional): 最多等待的秒数，为 None 时一直等待
+
+        Returns:
+            bool: 是否在超时前全部执行完了
+        """
+        if self._loop is None or self._loop is not asyncio.get_running_loop():
+            return True
+        self._closing = True
+
+        async def _join():
+            for queue in list(self._queues.values()):
+                await queue.join()
+
+        finished = True
+        try:
+            await asyncio.wait_for(_join(), timeout)
+        except asyncio.TimeoutError:
+            finished = False
+            logger.warning(
+                f"后台执行器没能在 {timeout} 秒内执行完，"
+                f"剩余的队列：{self.get_stats().depth}"
+            )
+
+        for task in [*self._workers.values(), *self._running]:
+            task.cancel()
+        await asyncio.gather(
+            *self._workers.values(), *self._running, return_exceptions=True
+        )
+        self._workers.clear()
+        self._queues.clear()
+        return finished
+
+
+background_runner = BackgroundRunner()
+
+
+def get_background_runner() -> BackgroundRunner:
+    """
+    获得当前 App 正在使用的后台执行器
+    """
+    return background_runner
+
+
+__all__ = [
+    "BackgroundRunner",
+    "BackgroundStats",
+    "get_background_runner",
+]
@@ -1,9 +1,13 @@
 import asyncio
 import time
-from typing import Any, Callable, Coroutine, TypeVar
+from dataclasses import dataclass
+from functools import partial
+from typing import Any, Callable, ClassVar, Coroutine, Iterable, TypeVar
 
 from loguru import logger
 
+from src.base.event.background import get_background_runner
+from src.base.event.routing import RoutableEvent, RoutingIndex
 from src.base.exceptions import KagamiStopIteration
 from src.common.collections import PriorityList
 
@@ -21,6 +25,26 @@ def _isinstance(obj: Any, typ: type):
         return False
 
 
+@dataclass
+class ListenerTiming:
+    """
+    一个监听器的耗时统计
+    """
+
+    calls: int = 0
+    total: float = 0
+    max: float = 0
+
+    def record(self, elapsed: float):
+        self.calls += 1
+        self.total += elapsed
+        self.max = max(self.max, elapsed)
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.calls if self.calls > 0 else 0
+
+
 class EventDispatcher:
     """
     用于整个 Bot 的事件系统
@@ -42,16 +66,40 @@ class EventDispatcher:
     如果希望监听多个事件，可以使用 `event.listens(*eventTypes)` 方法，其中 `*eventTypes` 表示要监听的事件类型。
 
     如果想要触发事件而不等待处理函数执行完成，可以使用 `event.throw(event)` 方法。
+
+    如果同一优先级的处理函数互不依赖，可以使用 `event.emit(event, concurrent=True)`
+    让它们并发执行，不同优先级之间仍然按照顺序执行。
+
+    对于消息这样的可路由事件，带有路由标记的处理函数只会在消息开头的文字对得上时
+    才被调用，详见 `src.base.event.routing`。
     """
 
     listeners: dict[type[Any], PriorityList[Listener[Any]]]
     linked: set["EventDispatcher"]
     parents: set["EventDispatcher"]
+    routes: dict[type[Any], RoutingIndex]
+
+    timings: dict[Listener[Any], ListenerTiming]
+    "每个监听器的耗时统计"
+
+    _resolved: dict[type[Any], list[tuple[type[Any], bool]]]
+    """
+    事件的类型到它需要经过的监听器类型，以及这个监听器类型是否需要在触发时再用
+    isinstance 检查一次
+    """
+
+    _reach: tuple[int, list["EventDispatcher"]] | None
+    _generation: ClassVar[int] = 0
+    "事件系统之间的连接每变化一次就加一，用于让缓存的连接顺序失效"
 
     def __init__(self) -> None:
         self.listeners = {}
         self.linked = set()
         self.parents = set()
+        self.routes = {}
+        self.timings = {}
+        self._resolved = {}
+        self._reach = None
 
     def listen(self, evtType: type[TV_contra], *, priority: int = 0):
         """
@@ -61,7 +109,9 @@ class EventDispatcher:
         def decorator(func: Listener[TV_contra]):
             if evtType not in self.listeners.keys():
                 self.listeners[evtType] = PriorityList()
+                self._resolved.clear()
             self.listeners[evtType].add(priority=priority, item=func)
+            self.routes.pop(evtType, None)
 
         return decorator
 
@@ -76,51 +126,192 @@ class EventDispatcher:
 
         return decorator
 
+    def clear(self):
+        """
+        清空所有的监听器，并断开和其他事件系统的连接，在重载模块时使用
+        """
+        for node in self.linked:
+            node.linked.discard(self)
+        self.listeners = {}
+        self.linked = set()
+        self.routes = {}
+        self.timings = {}
+        self._resolved = {}
+        EventDispatcher._generation += 1
+
+    def _resolve(self, evt: Any) -> list[tuple[type[Any], bool]]:
+        """
+        根据事件的类型找出需要经过的监听器类型，结果按照事件的类型缓存
+        """
+        typ = type(evt)
+        resolved = self._resolved.get(typ)
+        if resolved is not None:
+            return resolved
+
+        resolved = []
+        mro = typ.__mro__
+        for key in self.listeners.keys():
+            if key in mro:
+                resolved.append((key, False))
+            elif not (isinstance(key, type) and type(key) is type):
+                # 抽象类和协议可能在 MRO 之外匹配上，只能在触发时逐个检查
+                resolved.append((key, True))
+        self._resolved[typ] = resolved
+        return resolved
+
+    def _select(
+        self, key: type[Any], vals: PriorityList[Listener[Any]], evt: Any
+    ) -> Iterable[Listener[Any]]:
+        """
+        选出需要处理这个事件的监听器，可路由的事件会先经过路由索引
+        """
+        if not isinstance(evt, RoutableEvent):
+            return vals
+        return self._index(key, vals).select(evt)
+
+    def _index(self, key: type[Any], vals: PriorityList[Listener[Any]]):
+        index = self.routes.get(key)
+        # 监听器列表可能在重载时被整个替换掉，这时也要重建索引
+        if index is None or index.source is not vals or len(index) != len(vals):
+            index = self.routes[key] = RoutingIndex(vals)
+        return index
+
+    def is_routed(self, evt: Any) -> bool:
+        """
+        这个事件是否会被某个标记了开头文字的监听器选中，用于区分指令和闲聊
+        """
+        if not isinstance(evt, RoutableEvent):
+            return False
+        for node in self._reachable():
+            for key, dynamic in node._resolve(evt):
+                if dynamic and not _isinstance(evt, key):
+                    continue
+                if node._index(key, node.listeners[key]).matches(evt):
+                    return True
+        return False
+
+    def _chains(self, evt: Any):
+        for key, dynamic in self._resolve(evt):
+            if dynamic and not _isinstance(evt, key):
+                continue
+            vals = self.listeners[key]
+            yield vals, self._select(key, vals, evt)
+
     def link(self, sub_dispatcher: "EventDispatcher"):
         self.linked.add(sub_dispatcher)
         sub_dispatcher.linked.add(self)
+        EventDispatcher._generation += 1
+
+    def _reachable(self) -> list["EventDispatcher"]:
+        """
+        从这个事件系统出发能到达的所有事件系统，按照深度优先的顺序排列
+        """
+        if self._reach is not None and self._reach[0] == EventDispatcher._generation:
+            return self._reach[1]
+
+        order: list[EventDispatcher] = []
+        visited: set[EventDispatcher] = set()
+        stack: list[EventDispatcher] = [self]
+        while stack:
+            node = stack.pop()
+            if node in visited:
+                continue
+            visited.add(node)
+            order.append(node)
+            stack.extend(reversed(list(node.linked)))
+
+        self._reach = (EventDispatcher._generation, order)
+        return order
 
-    async def emit(
-        self, evt: Any, proceeded_dispatcher: set["EventDispatcher"] | None = None
+    async def _call(self, listener: Listener[Any], evt: Any):
+        begin = time.perf_counter()
+        try:
+            await listener(evt)
+        finally:
+            timing = self.timings.get(listener)
+            if timing is None:
+                timing = self.timings[listener] = ListenerTiming()
+            timing.record(time.perf_counter() - begin)
+
+    async def _emit_concurrently(
+        self,
+        vals: PriorityList[Listener[Any]],
+        selected: Iterable[Listener[Any]],
+        evt: Any,
     ):
+        """
+        同一优先级的监听器并发执行，有一个监听器停止传播时，更低优先级的监听器不再执行
+        """
+        priorities = {id(l): p for p, l in vals.ls}
+        groups: list[list[Listener[Any]]] = []
+        last: int | None = None
+        for l in selected:
+            priority = priorities[id(l)]
+            if priority != last:
+                groups.append([])
+                last = priority
+            groups[-1].append(l)
+
+        stopped = False
+
+        async def run(l: Listener[Any]):
+            nonlocal stopped
+            try:
+                await self._call(l, evt)
+            except KagamiStopIteration:
+                stopped = True
+
+        for group in groups:
+            if len(group) == 1:
+                await run(group[0])
+            else:
+                try:
+                    async with asyncio.TaskGroup() as tg:
+                        for l in group:
+                            tg.create_task(run(l))
+                except BaseExceptionGroup as e:
+                    raise e.exceptions[0] from e
+            if stopped:
+                break
+
+    async def _emit_local(self, evt: Any, concurrent: bool):
+        for vals, selected in self._chains(evt):
+            if concurrent:
+                await self._emit_concurrently(vals, selected, evt)
+                continue
+            for l in selected:
+                try:
+                    await self._call(l, evt)
+                except KagamiStopIteration:
+                    break
+
+    async def emit(self, evt: Any, *, concurrent: bool = False):
         """
         触发事件，并等待事件处理函数执行完成。
+
+        `concurrent` 为 True 时，同一优先级的处理函数会并发执行。
         """
 
-        proceeded_dispatcher = proceeded_dispatcher or set()
-        if self in proceeded_dispatcher:
-            return
         begin = time.time()
-        for key, vals in self.listeners.items():
-            if _isinstance(evt, key):
-                for l in vals:
-                    try:
-                        await l(evt)
-                    except KagamiStopIteration:
-                        break
-        for node in self.linked:
-            await node.emit(evt, proceeded_dispatcher | {self})
+        for node in self._reachable():
+            await node._emit_local(evt, concurrent)
         logger.trace(f"Event {repr(evt)} emitted in {time.time() - begin}s")
 
-    async def throw(
-        self, evt: Any, proceeded_dispatcher: set["EventDispatcher"] | None = None
-    ):
+    async def throw(self, evt: Any):
         """
-        触发事件，并立即返回。
+        触发事件，并立即返回。处理函数会交给后台执行器执行，
+        后台的队列满了时会等待，详见 `src.base.event.background`。
         """
 
-        proceeded_dispatcher = proceeded_dispatcher or set()
-        if self in proceeded_dispatcher:
-            return
-        tasks: set[asyncio.Task[Any]] = set()
-        for key, vals in self.listeners.items():
-            if _isinstance(evt, key):
-                for l in vals:
-                    task = asyncio.create_task(l(evt))
-                    tasks.add(task)
-                    task.add_done_callback(tasks.discard)
-        for node in self.linked:
-            await node.throw(evt, proceeded_dispatcher | {self})
+        runner = get_background_runner()
+        for node in self._reachable():
+            for _, selected in node._chains(evt):
+                for l in selected:
+                    await runner.submit(
+                        type(evt),
+                        getattr(l, "__qualname__", repr(l)),
+                        partial(node._call, l, evt),
+                    )
 
 
-__all__ = ["EventDispatcher", "Listener"]
+__all__ = ["EventDispatcher", "Listener", "ListenerTiming"]
@@ -2,6 +2,7 @@
 和根事件监听器有关的模块
 """
 
+from functools import partial
 from typing import Any
 
 from nonebot import on_notice, on_type  # type: ignore
@@ -14,6 +15,7 @@ from nonebot.adapters.onebot.v11 import (
 )
 
 from src.base.command_events import GroupContext
+from src.base.event.admission import Priority, get_admission_controller
 from src.base.event.event_dispatcher import EventDispatcher
 from src.base.onebot.onebot_events import (
     GroupMessageEmojiLike,
@@ -47,27 +49,36 @@ def activate_root(event_root: EventDispatcher):
             return
         record_last_context(event.user_id, event.group_id)
 
-        await event_root.emit(GroupContext(event, bot))
+        ctx = GroupContext(event, bot)
+        # 路由索引能匹配上的才算指令，只有兜底监听器处理的闲聊在负载高时先丢掉
+        priority = Priority.COMMAND if event_root.is_routed(ctx) else Priority.LOW
+        await get_admission_controller().run(
+            priority, event.group_id, partial(event_root.emit, ctx)
+        )
 
     @notice_group_msg_emoji_like_handler.handle()
     async def _(bot: Bot, event: NoticeEvent):
         if event.notice_type == "group_msg_emoji_like":
-            await event_root.emit(
-                GroupStickEmojiContext(GroupMessageEmojiLike(**event.model_dump()), bot)
+            ctx = GroupStickEmojiContext(
+                GroupMessageEmojiLike(**event.model_dump()), bot
+            )
+            await get_admission_controller().run(
+                Priority.LOW, ctx.event.group_id, partial(event_root.emit, ctx)
             )
         if event.notice_type == "notify" and isinstance(event, NotifyEvent):
             if event.sub_type == "poke":
-                await event_root.emit(
-                    GroupPokeContext(
-                        GroupPoke(
-                            time=event.time,
-                            self_id=event.self_id,
-                            group_id=event.group_id,
-                            user_id=event.user_id,
-                            target_id=getattr(event, "target_id"),
-                        ),
-                        bot,
-                    )
+                ctx = GroupPokeContext(
+                    GroupPoke(
+                        time=event.time,
+                        self_id=event.self_id,
+                        group_id=event.group_id,
+                        user_id=event.user_id,
+                        target_id=getattr(event, "target_id"),
+                    ),
+                    bot,
+                )
+                await get_admission_controller().run(
+                    Priority.LOW, event.group_id, partial(event_root.emit, ctx)
                 )
 
     @onebot_startup_hander.handle()
@@ -80,8 +91,8 @@ async def throw_event(event: Any):
     await root.throw(event)
 
 
-async def emit_event(event: Any):
-    await root.emit(event)
+async def emit_event(event: Any, concurrent: bool = False):
+    await root.emit(event, concurrent=concurrent)
 
 
 root = EventDispatcher()
@@ -1,35 +1,11 @@
-import asyncio
 from typing import Any, Awaitable, Callable
 
-from src.base.event.event_root import root
-
-
-class IntervalEvent:
-    id: int
-    interval: float
-
-    def __init__(self, interval: float) -> None:
-        self.interval = interval
-        self.id = IntervalEvent.itv_id
-        self.cleared = False
-
-        IntervalEvent.itv_id += 1
-        IntervalEvent.events.append(self)
-
-    @staticmethod
-    def clear(id: int):
-        oe = [e for e in IntervalEvent.events if e.id == id]
-        for e in oe:
-            e.cleared = True
-            IntervalEvent.events.remove(e)
-
-    itv_id: int = 0
-    events: list["IntervalEvent"] = []
+from src.base.event.timer_service import TimerHandle, get_timer_service
 
 
 def addInterval(
     interval: float, func: Callable[[], Awaitable[Any]], skip_first: bool = True
-):
+) -> TimerHandle:
     """创建一个定时任务
 
     Args:
@@ -37,50 +13,17 @@ def addInterval(
         func (Callable[[], Awaitable[Any]]): 一个异步函数的引用，这个异步函数不输入任何信息
         skip_first (bool, optional): 是否跳过第一次（即 0 秒时）运行函数. Defaults to True.
     """
-    itv = IntervalEvent(interval)
-
-    async def inner(_itv: IntervalEvent):
-        if _itv.id == itv.id:
-            await func()
-            if _itv.cleared:
-                itv.cleared = True
-
-    root.listen(IntervalEvent)(inner)
+    return get_timer_service().call_every(interval, func, skip_first)
 
-    async def _cycle():
-        if not skip_first:
-            await root.throw(itv)
 
-        while not itv.cleared:
-            await asyncio.sleep(interval)
-            await root.throw(itv)
-
-    _cycle_backup: set[asyncio.Task[None]] = set()
-    eventloop = asyncio.get_event_loop()
-
-    task = eventloop.create_task(_cycle())
-    task.add_done_callback(_cycle_backup.discard)
-
-    return itv
-
-
-def addTimeout(timeout: float, func: Callable[[], Awaitable[Any]]):
+def addTimeout(timeout: float, func: Callable[[], Awaitable[Any]]) -> TimerHandle:
     """创建一个不阻塞的延时任务
 
     Args:
         timeout (float): 延时的事件
         func (Callable[[], Awaitable[Any]]): 一个异步函数的名字，这个异步函数应该不输入任何量
     """
-
-    async def _task():
-        await asyncio.sleep(timeout)
-        await func()
-
-    _task_backup: set[asyncio.Task[None]] = set()
-    eventloop = asyncio.get_event_loop()
-
-    task = eventloop.create_task(_task())
-    task.add_done_callback(_task_backup.discard)
+    return get_timer_service().call_later(timeout, func)
 
 
 def clearInterval(id: int):
@@ -89,7 +32,7 @@ def clearInterval(id: int):
     Args:
         id (int): 定时任务的 ID
     """
-    IntervalEvent.clear(id)
+    get_timer_service().cancel(id)
 
 
 __all__ = ["clearInterval", "addInterval", "addTimeout"]
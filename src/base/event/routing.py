@@ -0,0 +1,266 @@
+"""
+消息事件的路由索引。
+
+每一条群消息都会经过所有的消息监听器，而绝大多数监听器只关心以特定文字开头的
+消息。匹配器（`match_regex`、`match_literal`、`match_alconna`）会在处理函数上
+标记一个 `RouteHint`，写明消息可能以哪些文字开头。事件系统据此建立一棵前缀树，
+收到消息时只调用开头文字对得上的监听器，以及那些没有标记、什么消息都可能处理的
+监听器。
+
+路由只会多选、不会漏选：推断不出开头文字的匹配器会被当成没有标记。
+"""
+
+import re
+import re._constants as sre_constants  # type: ignore
+import re._parser as sre_parse  # type: ignore
+from dataclasses import dataclass
+from typing import (
+    Any,
+    Callable,
+    Iterable,
+    Protocol,
+    Sequence,
+    TypeVar,
+    runtime_checkable,
+)
+
+T = TypeVar("T")
+
+_ROUTE_ATTR = "__kagami_route__"
+_HEAD_LIMIT = 64
+
+
+@dataclass(frozen=True)
+class RouteHint:
+    """
+    一个监听器能够处理的消息的特征
+    """
+
+    heads: frozenset[str]
+    "消息开头的文字（小写）可能是哪些，消息必须以其中之一开头"
+
+    text_only: bool
+    "是否只处理纯文本消息"
+
+
+@runtime_checkable
+class RoutableEvent(Protocol):
+    """
+    可以被路由的事件，目前就是消息上下文
+    """
+
+    def routing_text(self) -> str | None:
+        """
+        消息开头的文字，消息不以文字开头时为 None
+        """
+        ...
+
+    def is_text_only(self) -> bool: ...
+
+
+def set_route(func: T, hint: RouteHint | None) -> T:
+    """
+    给监听器标记路由信息，hint 为 None 时清除标记
+    """
+    setattr(func, _ROUTE_ATTR, hint)
+    return func
+
+
+def get_route(func: Any) -> RouteHint | None:
+    return getattr(func, _ROUTE_ATTR, None)
+
+
+# 从正则表达式推断开头文字
+
+
+_Prefixes = list[tuple[str, bool]]
+"推断中的前缀，以及这个前缀之后是否还能继续接上确定的文字"
+
+
+def _close(prefixes: _Prefixes) -> _Prefixes:
+    return [(p, False) for p, _ in prefixes]
+
+
+def _dedupe(prefixes: _Prefixes) -> _Prefixes:
+    return list(dict.fromkeys(prefixes))
+
+
+def _charset(items: Sequence[tuple[Any, Any]]) -> list[str] | None:
+    chars: list[str] = []
+    for op, av in items:
+        if op is sre_constants.LITERAL:
+            chars.append(chr(av))
+        elif op is sre_constants.RANGE and av[1] - av[0] < _HEAD_LIMIT:
+            chars.extend(chr(c) for c in range(av[0], av[1] + 1))
+        else:
+            return None
+    return chars
+
+
+def _walk(items: Iterable[tuple[Any, Any]], prefixes: _Prefixes) -> _Prefixes:
+    for op, av in items:
+        if not any(o for _, o in prefixes):
+            break
+
+        if op is sre_constants.LITERAL:
+            prefixes = [(p + chr(av), True) if o else (p, o) for p, o in prefixes]
+        elif op is sre_constants.IN:
+            chars = _charset(av)
+            if chars is None:
+                prefixes = _close(prefixes)
+            else:
+                prefixes = [
+                    item
+                    for p, o in prefixes
+                    for item in ([(p + c, True) for c in chars] if o else [(p, o)])
+                ]
+        elif op is sre_constants.SUBPATTERN:
+            prefixes = _walk(av[-1], prefixes)
+        elif op is sre_constants.BRANCH:
+            prefixes = _dedupe([r for alt in av[1] for r in _walk(alt, prefixes)])
+        elif op in (
+            sre_constants.MAX_REPEAT,
+            sre_constants.MIN_REPEAT,
+            sre_constants.POSSESSIVE_REPEAT,
+        ):
+            low, high, sub = av
+            taken = _walk(sub, prefixes)
+            if high != 1:
+                taken = _close(taken)
+            prefixes = _dedupe((prefixes if low == 0 else []) + taken)
+        elif op is sre_constants.AT and av in (
+            sre_constants.AT_BEGINNING,
+            sre_constants.AT_BEGINNING_STRING,
+        ):
+            continue
+        else:
+            prefixes = _close(prefixes)
+
+        if len(prefixes) > _HEAD_LIMIT:
+            # 分支太多时退化成只看第一个字
+            prefixes = _dedupe([(p[:1], False) for p, _ in prefixes])
+            if len(prefixes) > _HEAD_LIMIT:
+                return [("", False)]
+
+    return prefixes
+
+
+def regex_heads(pattern: str) -> frozenset[str] | None:
+    """推断能被正则表达式匹配的文字可能以哪些文字开头
+
+    Args:
+        pattern (str): 正则表达式，匹配时会从文字的开头开始匹配
+
+    Returns:
+        frozenset[str] | None: 开头文字（小写）的集合，推断不出来时为 None
+    """
+    try:
+        parsed = sre_parse.parse(pattern)
+    except re.error:
+        return None
+
+    heads = {p.lower() for p, _ in _walk(parsed, [("", True)])}
+    if "" in heads:
+        return None
+    # 以另一个开头文字开头的开头文字是多余的
+    return frozenset(
+        h for h in heads if not any(h != o and h.startswith(o) for o in heads)
+    )
+
+
+# 路由索引
+
+
+class _TrieNode:
+    __slots__ = ("children", "listeners")
+
+    def __init__(self) -> None:
+        self.children: dict[str, _TrieNode] = {}
+        self.listeners: list[int] = []
+
+
+class RoutingIndex:
+    """
+    一组有序的监听器的路由索引，监听器的顺序就是它们的优先级顺序
+    """
+
+    source: Iterable[Callable[..., Any]]
+    "建立索引时使用的监听器序列"
+
+    def __init__(self, listeners: Iterable[Callable[..., Any]]) -> None:
+        self.source = listeners
+        self.listeners = list(listeners)
+        self.root = _TrieNode()
+        self.residual: list[int] = []
+        self.text_only: set[int] = set()
+
+        for i, listener in enumerate(self.listeners):
+            hint = get_route(listener)
+            if hint is None:
+                self.residual.append(i)
+                continue
+            if hint.text_only:
+                self.text_only.add(i)
+            for head in hint.heads:
+                node = self.root
+                for char in head:
+                    node = node.children.setdefault(char, _TrieNode())
+                node.listeners.append(i)
+
+    def __len__(self) -> int:
+        return len(self.listeners)
+
+    def _lookup(self, text: str, found: set[int]) -> None:
+        node = self.root
+        for char in text:
+            child = node.children.get(char)
+            if child is None:
+                return
+            node = child
+            found.update(node.listeners)
+
+    def _found(self, evt: RoutableEvent, text: str) -> set[int]:
+        found: set[int] = set()
+        lowered = text.lower()
+        self._lookup(lowered, found)
+        stripped = lowered.lstrip()
+        if stripped != lowered:
+            self._lookup(stripped, found)
+        if len(self.text_only & found) > 0 and not evt.is_text_only():
+            found -= self.text_only
+        return found
+
+    def matches(self, evt: RoutableEvent) -> bool:
+        """
+        是否有标记了开头文字的监听器可能处理这个事件，也就是这条消息像不像一条指令
+        """
+        text = evt.routing_text()
+        return text is not None and len(self._found(evt, text)) > 0
+
+    def select(self, evt: RoutableEvent) -> list[Callable[..., Any]]:
+        """选出可能处理这个事件的监听器，保持原来的顺序
+
+        Args:
+            evt (RoutableEvent): 事件
+
+        Returns:
+            list[Callable[..., Any]]: 监听器
+        """
+        text = evt.routing_text()
+        if text is None:
+            return [self.listeners[i] for i in self.residual]
+
+        found = self._found(evt, text)
+        found.update(self.residual)
+
+        return [self.listeners[i] for i in sorted(found)]
+
+
+__all__ = [
+    "RouteHint",
+    "RoutableEvent",
+    "RoutingIndex",
+    "set_route",
+    "get_route",
+    "regex_heads",
+]
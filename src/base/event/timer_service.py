@@ -0,0 +1,375 @@
+"""
+定时任务服务。
+
+所有的定时任务按照下一次执行的时间放在一个最小堆里，服务只在最近的一个任务到期时
+醒来，取出到期的任务执行，再把周期性的任务按照新的时间放回堆里。
+每次执行的开销是 O(log n)，和定时任务的数量无关。
+
+支持三种任务：
+
+- 一次性的延时任务 `call_later`；
+- 周期任务 `call_every`，下一次执行的时间从上一次计划的时间算起，不会因为执行本身
+  花的时间而越来越晚，错过的周期会被跳过；
+- 按照日历执行的任务 `call_at`，由一个函数根据当前时间算出下一次执行的时间，
+  比如 `daily(4)` 表示每天凌晨四点。
+"""
+
+import asyncio
+import datetime
+import heapq
+import itertools
+import math
+from dataclasses import dataclass, field
+from functools import partial
+from typing import Any, Awaitable, Callable, Literal
+
+from loguru import logger
+
+from src.common.times import now_datetime
+
+TimerKind = Literal["once", "interval", "cron"]
+NextTime = Callable[[datetime.datetime], datetime.datetime]
+
+
+def _func_name(func: Callable[..., Any]) -> str:
+    while isinstance(func, partial):
+        func = func.func
+    return getattr(func, "__qualname__", repr(func))
+
+
+def daily(hour: int, minute: int = 0, second: int = 0) -> NextTime:
+    """每天在固定的时间执行
+
+    Args:
+        hour (int): 时
+        minute (int, optional): 分. Defaults to 0.
+        second (int, optional): 秒. Defaults to 0.
+    """
+
+    def next_time(now: datetime.datetime) -> datetime.datetime:
+        res = now.replace(hour=hour, minute=minute, second=second, microsecond=0)
+        if res <= now:
+            res += datetime.timedelta(days=1)
+        return res
+
+    return next_time
+
+
+@dataclass(eq=False)
+class TimerHandle:
+    """
+    一个定时任务，可以用来取消它
+    """
+
+    id: int
+    name: str
+    kind: TimerKind
+    func: Callable[[], Awaitable[Any]] = field(repr=False)
+
+    interval: float = 0
+    "周期任务的周期，单位秒"
+
+    next_time: NextTime | None = field(default=None, repr=False)
+    "按照日历执行的任务计算下一次执行时间的函数"
+
+    deadline: float = 0
+    "下一次执行的时间，是事件循环的时间"
+
+    runs: int = 0
+    "执行完成的次数"
+
+    running: bool = False
+    cancelled: bool = False
+
+    service: "TimerService | None" = field(default=None, repr=False)
+
+    @property
+    def cleared(self) -> bool:
+        return self.cancelled
+
+    def cancel(self):
+        """
+        取消这个定时任务，正在执行的那一次不受影响
+        """
+        if self.service is not None:
+            self.service.cancel(self.id)
+        self.cancelled = True
+
+
+@dataclass(frozen=True)
+class TimerInfo:
+    """
+    定时任务的状态，用于查看当前有哪些定时任务
+    """
+
+    id: int
+    name: str
+    kind: TimerKind
+    next_run: datetime.datetime
+    runs: int
+    running: bool
+
+
+class TimerService:
+    """
+    基于最小堆的定时任务服务
+    """
+
+    def __init__(self) -> None:
+        self._ids = itertools.count()
+        self._reset(None)
+
+    def _reset(self, loop: asyncio.AbstractEventLoop | None):
+        self._loop = loop
+        self._heap: list[tuple[float, int, TimerHandle]] = []
+        self._handles: dict[int, TimerHandle] = {}
+        self._seq = itertools.count()
+        self._wakeup = asyncio.Event()
+        self._runner: asyncio.Task[None] | None = None
+        self._running: set[asyncio.Task[None]] = set()
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            # 事件循环换了（比如在测试中），旧的任务都不能再用了
+            self._reset(loop)
+        if self._runner is None or self._runner.done():
+            self._runner = loop.create_task(self._run())
+        return loop
+
+    def __len__(self) -> int:
+        return len(self._handles)
+
+    def _push(self, handle: TimerHandle):
+        heapq.heappush(self._heap, (handle.deadline, next(self._seq), handle))
+        if self._heap[0][2] is handle:
+            # 最近的任务变了，让等待中的服务重新计算醒来的时间
+            self._wakeup.set()
+
+    def _add(
+        self,
+        kind: TimerKind,
+        func: Callable[[], Awaitable[Any]],
+        deadline: float,
+        name: str | None,
+        **kwargs: Any,
+    ) -> TimerHandle:
+        handle = TimerHandle(
+            id=next(self._ids),
+            name=name or _func_name(func),
+            kind=kind,
+            func=func,
+            deadline=deadline,
+            service=self,
+            **kwargs,
+        )
+        self._handles[handle.id] = handle
+        self._push(handle)
+        return handle
+
+    def call_later(
+        self,
+        delay: float,
+        func: Callable[[], Awaitable[Any]],
+        name: str | None = None,
+    ) -> TimerHandle:
+        """在一段时间以后执行一次
+
+        Args:
+            delay (float): 延时，单位秒
+            func (Callable[[], Awaitable[Any]]): 一个不输入任何信息的异步函数
+            name (str | None, optional): 任务的名字，默认为函数名
+        """
+        loop = self._ensure_loop()
+        return self._add("once", func, loop.time() + delay, name)
+
+    def call_every(
+        self,
+        interval: float,
+        func: Callable[[], Awaitable[Any]],
+        skip_first: bool = True,
+        name: str | None = None,
+    ) -> TimerHandle:
+        """周期性地执行
+
+        Args:
+            interval (float): 周期，单位秒
+            func (Callable[[], Awaitable[Any]]): 一个不输入任何信息的异步函数
+            skip_first (bool, optional): 是否跳过第一次（即 0 秒时）执行. Defaults to True.
+            name (str | None, optional): 任务的名字，默认为函数名
+        """
+        if interval <= 0:
+            raise ValueError(f"定时任务的周期必须是正数，而不是 {interval}")
+        loop = self._ensure_loop()
+        deadline = loop.time() + (interval if skip_first else 0)
+        return self._add("interval", func, deadline, name, interval=interval)
+
+    def call_at(
+        self,
+        next_time: NextTime,
+        func: Callable[[], Awaitable[Any]],
+        name: str | None = None,
+    ) -> TimerHandle:
+        """按照日历时间执行，每次执行完以后用 `next_time` 算出下一次执行的时间
+
+        Args:
+            next_time (NextTime): 输入当前时间，返回下一次执行的时间
+            func (Callable[[], Awaitable[Any]]): 一个不输入任何信息的异步函数
+            name (str | None, optional): 任务的名字，默认为函数名
+        """
+        loop = self._ensure_loop()
+        deadline = loop.time() + max(self._cron_delay(next_time), 0)
+        return self._add("cron", func, deadline, name, next_time=next_time)
+
+    @staticmethod
+    def _cron_delay(next_time: NextTime) -> float:
+        now = now_datetime()
+        return (next_time(now) - now).total_seconds()
+
+    def cancel(self, id: int) -> bool:
+        """取消一个定时任务
+
+        Args:
+            id (int): 定时任务的 ID
+
+        Returns:
+            bool: 这个定时任务是否存在
+        """
+        handle = self._handles.pop(id, None)
+        if handle is None:
+            return False
+        # 堆里的记录留到被取出来的时候再丢掉
+        handle.cancelled = True
+        return True
+
+    def jobs(self) -> list[TimerInfo]:
+        """
+        当前所有的定时任务，按照下一次执行的时间排列
+        """
+        if self._loop is None:
+            return []
+        now, loop_now = now_datetime(), self._loop.time()
+        return [
+            TimerInfo(
+                id=h.id,
+                name=h.name,
+                kind=h.kind,
+                next_run=now + datetime.timedelta(seconds=h.deadline - loop_now),
+                runs=h.runs,
+                running=h.running,
+            )
+            for h in sorted(self._handles.values(), key=lambda h: h.deadline)
+        ]
+
+    async def _run(self):
+        assert self._loop is not None
+        loop = self._loop
+
+        while True:
+            # 丢掉已经取消了的、或者已经重新安排过时间的记录
+            while self._heap and (
+                self._heap[0][2].cancelled
+                or self._heap[0][0] != self._heap[0][2].deadline
+            ):
+                heapq.heappop(self._heap)
+
+            self._wakeup.clear()
+            if not self._heap:
+                await self._wakeup.wait()
+                continue
+
+            now = loop.time()
+            deadline = self._heap[0][0]
+            if deadline > now:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), deadline - now)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            _, _, handle = heapq.heappop(self._heap)
+            self._fire(handle, loop)
+
+    def _fire(self, handle: TimerHandle, loop: asyncio.AbstractEventLoop):
+        if handle.running:
+            logger.debug(f"定时任务 {handle.name} 的上一次执行还没有结束，跳过这一次")
+        else:
+            task = loop.create_task(self._execute(handle))
+            self._running.add(task)
+            task.add_done_callback(self._running.discard)
+
+        now = loop.time()
+        if handle.kind == "once":
+            self._handles.pop(handle.id, None)
+            return
+        if handle.kind == "interval":
+            # 从计划的时间算起，执行得晚了也不会让之后的时间跟着推迟
+            deadline = handle.deadline + handle.interval
+            if deadline <= now:
+                skipped = math.ceil((now - deadline) / handle.interval)
+                deadline += skipped * handle.interval
+                if deadline <= now:
+                    deadline += handle.interval
+        else:
+            # 下一次执行的时间可能和这一次执行的结果有关，等执行完了再算
+            return
+
+        handle.deadline = deadline
+        self._push(handle)
+
+    async def _execute(self, handle: TimerHandle):
+        handle.running = True
+        try:
+            await handle.func()
+            handle.runs += 1
+        except Exception as e:  # pylint: disable=broad-except
+            logger.opt(exception=e).error(f"定时任务 {handle.name} 执行失败")
+        finally:
+            handle.running = False
+
+        if handle.kind == "cron" and not handle.cancelled:
+            assert handle.next_time is not None and self._loop is not None
+            delay = self._cron_delay(handle.next_time)
+            if delay <= 0:
+                logger.warning(
+                    f"定时任务 {handle.name} 算出的下一次执行时间没有往后推，已经取消了"
+                )
+                self.cancel(handle.id)
+                return
+            handle.deadline = self._loop.time() + delay
+            self._push(handle)
+
+    async def close(self):
+        """
+        停止所有的定时任务，正在执行的任务会被取消
+        """
+        if self._loop is None or self._loop is not asyncio.get_running_loop():
+            return
+        tasks = [*self._running]
+        if self._runner is not None:
+            tasks.append(self._runner)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        for handle in self._handles.values():
+            handle.cancelled = True
+        self._reset(None)
+
+
+timer_service = TimerService()
+
+
+def get_timer_service() -> TimerService:
+    """
+    获得当前 App 正在使用的定时任务服务
+    """
+    return timer_service
+
+
+__all__ = [
+    "TimerService",
+    "TimerHandle",
+    "TimerInfo",
+    "daily",
+    "get_timer_service",
+]
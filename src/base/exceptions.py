@@ -141,6 +141,14 @@ class PackNotMatchException(KagamiCoreException):
         return f"你现在并不在 {self.required} 猎场，你现在在 {self.current} 猎场"
 
 
+class LockTimeoutException(KagamiCoreException):
+    """等待玩家的锁超时了"""
+
+    @property
+    def message(self):
+        return "小镜现在有点忙，稍后再试试吧"
+
+
 class SleepToLateException(KagamiCoreException):
     """想睡太晚的时候的报错"""
 
@@ -200,6 +208,18 @@ class KagamiRenderException(KagamiCoreException):
         )
 
 
+class RenderTimeoutException(KagamiCoreException):
+    """渲染图片超过了期限"""
+
+    def __init__(self, path: str) -> None:
+        super().__init__()
+        self.path = path
+
+    @property
+    def message(self) -> str:
+        return "现在要画的图有点多，小镜没来得及画完，稍后再试试吧"
+
+
 class KagamiArgumentException(KagamiCoreException):
     """其他参数有误时的报错"""
 
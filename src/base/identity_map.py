@@ -0,0 +1,186 @@
+"""
+工作单元内的标识映射（Identity Map）。
+
+同一个工作单元里，玩家数据表的同一行、同一个小哥的库存格子会被反复读写。
+这里把它们在第一次读取时缓存下来，之后的读取都从内存中拿；写入只记录下
+被改动的字段，等到工作单元提交前再统一写入数据库。
+
+标识映射存放在数据库会话的 `info` 中，所以同一个会话上创建的所有仓库
+共用同一份数据。
+"""
+
+from typing import Any
+
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.base.db import upsert
+from src.common.times import now_datetime
+from src.models.models import Award, Inventory, User
+
+_IDENTITY_MAP_KEY = "identity_map"
+
+
+class IdentityMap:
+    """
+    一个数据库会话中的标识映射
+    """
+
+    users: dict[int, dict[str, Any]]
+    "已经读取过的玩家数据行，已经合并了还没有写入的改动"
+
+    user_dirty: dict[int, dict[str, Any]]
+    "玩家数据行中还没有写入数据库的改动"
+
+    inventory: dict[tuple[int, int], tuple[int, int]]
+    "已经读取或者改动过的小哥库存格子，值为库存和用过的数量"
+
+    inventory_dirty: set[tuple[int, int]]
+    "还没有写入数据库的小哥库存格子"
+
+    award_levels: dict[int, int]
+    "已经读取过的小哥等级"
+
+    def __init__(self) -> None:
+        self.users = {}
+        self.user_dirty = {}
+        self.inventory = {}
+        self.inventory_dirty = set()
+        self.award_levels = {}
+
+    # 玩家数据
+
+    async def get_user(self, session: AsyncSession, uid: int) -> dict[str, Any]:
+        """
+        获得玩家数据的一整行，第一次读取时会查询数据库
+        """
+        if uid not in self.users:
+            q = select(User.__table__).where(User.__table__.c.data_id == uid)
+            row = dict((await session.execute(q)).mappings().one())
+            row.update(self.user_dirty.get(uid, {}))
+            self.users[uid] = row
+        return self.users[uid]
+
+    async def get_user_field(self, session: AsyncSession, uid: int, name: str) -> Any:
+        return (await self.get_user(session, uid))[name]
+
+    def set_user_fields(self, uid: int, **values: Any) -> None:
+        """
+        改动玩家数据的一些字段，改动会在提交前统一写入数据库
+        """
+        self.user_dirty.setdefault(uid, {}).update(values)
+        if uid in self.users:
+            self.users[uid].update(values)
+
+    def forget_user(self, uid: int) -> None:
+        """
+        在绕过标识映射直接修改了玩家数据以后，丢弃缓存的玩家数据
+        """
+        self.users.pop(uid, None)
+
+    # 小哥库存
+
+    async def get_inventory(
+        self, session: AsyncSession, uid: int, aid: int
+    ) -> tuple[int, int]:
+        """
+        获得小哥库存格子，第一次读取时会查询数据库
+        """
+        if (uid, aid) not in self.inventory:
+            q = select(Inventory.storage, Inventory.used).filter(
+                Inventory.user_id == uid, Inventory.award_id == aid
+            )
+            res = (await session.execute(q)).tuples().all()
+            self.inventory[(uid, aid)] = res[0] if len(res) > 0 else (0, 0)
+        return self.inventory[(uid, aid)]
+
+    def set_inventory(self, uid: int, aid: int, storage: int, used: int) -> None:
+        self.inventory[(uid, aid)] = (storage, used)
+        self.inventory_dirty.add((uid, aid))
+
+    def remember_inventory(self, uid: int, aid: int, storage: int, used: int) -> None:
+        """
+        记住从数据库中批量读出的库存格子，不会覆盖已有的改动
+        """
+        self.inventory.setdefault((uid, aid), (storage, used))
+
+    def refresh_inventory(self, uid: int, aid: int, storage: int, used: int) -> None:
+        """
+        记住刚刚直接写入数据库的库存格子，它和数据库中的值一致
+        """
+        self.inventory[(uid, aid)] = (storage, used)
+        self.inventory_dirty.discard((uid, aid))
+
+    # 小哥等级
+
+    async def get_award_levels(
+        self, session: AsyncSession, aids: set[int]
+    ) -> dict[int, int]:
+        """
+        获得一些小哥的等级，只会查询还没有读取过的小哥
+        """
+        missing = aids - self.award_levels.keys()
+        if len(missing) > 0:
+            q = select(Award.data_id, Award.level_id).filter(Award.data_id.in_(missing))
+            for aid, lid in (await session.execute(q)).tuples().all():
+                self.award_levels[aid] = lid
+        return {aid: self.award_levels[aid] for aid in aids if aid in self.award_levels}
+
+    def forget_award(self, aid: int) -> None:
+        self.award_levels.pop(aid, None)
+
+    # 写入
+
+    async def flush(self, session: AsyncSession) -> None:
+        """
+        把所有改动写入数据库。每一个被改动的玩家数据行有一条 UPDATE，
+        所有被改动的库存格子一起用一条 upsert 写入
+        """
+        for uid, values in self.user_dirty.items():
+            await session.execute(
+                update(User.__table__)
+                .where(User.__table__.c.data_id == uid)
+                .values({**values, "updated_at": now_datetime()})
+            )
+        self.user_dirty.clear()
+
+        if len(self.inventory_dirty) > 0:
+            query = upsert(session, Inventory)
+            query = query.on_conflict_do_update(
+                index_elements=[Inventory.user_id, Inventory.award_id],
+                set_={
+                    "storage": query.excluded.storage,
+                    "used": query.excluded.used,
+                    "updated_at": query.excluded.updated_at,
+                },
+            )
+            await session.execute(
+                query,
+                [
+                    {
+                        "user_id": uid,
+                        "award_id": aid,
+                        "storage": self.inventory[(uid, aid)][0],
+                        "used": self.inventory[(uid, aid)][1],
+                    }
+                    for uid, aid in sorted(self.inventory_dirty)
+                ],
+            )
+        self.inventory_dirty.clear()
+
+
+def get_identity_map(session: AsyncSession) -> IdentityMap:
+    """
+    获得一个数据库会话的标识映射
+    """
+    return session.info.setdefault(_IDENTITY_MAP_KEY, IdentityMap())
+
+
+def pop_identity_map(session: AsyncSession) -> IdentityMap | None:
+    """
+    取出并清除一个数据库会话的标识映射
+    """
+    return session.info.pop(_IDENTITY_MAP_KEY, None)
+
+
+__all__ = ["IdentityMap", "get_identity_map", "pop_identity_map"]
@@ -8,6 +8,7 @@ from pathlib import Path
 from loguru import logger
 from pydantic import BaseModel, ValidationError
 
+from src.common.threading import run_io
 from src.common.times import now_datetime
 
 
@@ -82,6 +83,19 @@ class LocalStorageManager:
         with open(self.path, "w", encoding="utf-8") as f:
             f.write(self._data.model_dump_json())
 
+    async def aget_data(self) -> LocalStorageData:
+        """
+        在线程池中重新读取数据
+        """
+        await run_io(self.weak_load)
+        return self._data
+
+    async def asave(self):
+        """
+        在线程池中保存数据
+        """
+        await run_io(self.save)
+
     def weak_load(self):
         if not self.path.exists():
             return
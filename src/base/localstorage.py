@@ -7,6 +7,8 @@ from typing import Any, Generic, Optional, TypeVar
 from loguru import logger
 from pydantic import BaseModel, ValidationError
 
+from src.common.threading import run_io
+
 T = TypeVar("T", bound=BaseModel)
 
 
@@ -23,16 +25,18 @@ class LocalStorage:
     data: dict[str, dict[str, Any]]
     path: Path
 
-    def __init__(self, path: Path) -> None:
+    def __init__(self, path: Path, lazy: bool = False) -> None:
         """初始化本地持久储存
 
         Args:
             path (Path): 持久化存储的文件地址。建议是一个 `.json` 文件
+            lazy (bool, optional): 是否推迟到第一次读取数据时再读取文件
         """
         self.data = {}
         self.path = path
         assert path.name, "提供的地址应该有一个文件名"
-        self.load()
+        if not lazy:
+            self.load()
 
     @property
     def lock(self):
@@ -61,6 +65,14 @@ class LocalStorage:
         with open(self.path, "w") as f:
             json.dump(self.data, f)
 
+    async def aload(self):
+        """在线程池中从文件中读取数据"""
+        await run_io(self.load)
+
+    async def awrite(self):
+        """在线程池中将当前的数据写入到持久化文件中"""
+        await run_io(self.write)
+
     def get_item(
         self, key: str | None, cls: type[T], allow_overwrite: bool = False
     ) -> T:
@@ -113,6 +125,20 @@ class LocalStorage:
             self.data[key] = val
         self.write()
 
+    async def aget_item(
+        self, key: str | None, cls: type[T], allow_overwrite: bool = False
+    ) -> T:
+        """
+        和 `get_item` 一样，但是在线程池中读写文件
+        """
+        return await run_io(self.get_item, key, cls, allow_overwrite)
+
+    async def aset_item(self, key: str | None, val: BaseModel | dict[str, Any]):
+        """
+        和 `set_item` 一样，但是在线程池中写入文件
+        """
+        await run_io(self.set_item, key, val)
+
     def context(
         self, key: str | None, cls: type[T], allow_overwrite: bool = False
     ) -> "LocalStorageContext[T]":
@@ -131,12 +157,14 @@ class LocalStorage:
                 data.value = True
             ```
 
-            这样会自动将更改更新并写入文件。
+            这样会自动将更改更新并写入文件。使用 `async with` 时，
+            会在拿到锁以后在线程池中读写文件。
         """
         return LocalStorageContext(
-            data=self.get_item(key, cls, allow_overwrite),
             parent=self,
             parent_key=key,
+            cls=cls,
+            allow_overwrite=allow_overwrite,
         )
 
 
@@ -145,12 +173,25 @@ class LocalStorageContext(Generic[T]):
     持久化数据的上下文管理
     """
 
-    def __init__(self, data: T, parent: LocalStorage, parent_key: str | None) -> None:
-        self.data = data
+    data: T
+
+    def __init__(
+        self,
+        parent: LocalStorage,
+        parent_key: str | None,
+        cls: type[T],
+        allow_overwrite: bool = False,
+    ) -> None:
         self.parent = parent
         self.parent_key = parent_key
+        self.cls = cls
+        self.allow_overwrite = allow_overwrite
 
     def __enter__(self):
+        # 数据在进入上下文时才读取，这样在 `async with` 中可以先拿到锁
+        self.data = self.parent.get_item(
+            self.parent_key, self.cls, self.allow_overwrite
+        )
         return self.data
 
     def __exit__(
@@ -166,12 +207,17 @@ class LocalStorageContext(Generic[T]):
         return False
 
     async def __aenter__(self):
-        logger.trace(
-            f"尝试获取当前上下文的锁 DATA_CLASS={self.data.__class__.__name__}"
-        )
+        logger.trace(f"尝试获取当前上下文的锁 DATA_CLASS={self.cls.__name__}")
         await self.parent.lock.acquire()
-        logger.trace(f"成功获取上下文的锁 DATA_CLASS={self.data.__class__.__name__}")
-        return self.__enter__()
+        logger.trace(f"成功获取上下文的锁 DATA_CLASS={self.cls.__name__}")
+        try:
+            self.data = await self.parent.aget_item(
+                self.parent_key, self.cls, self.allow_overwrite
+            )
+        except BaseException:
+            self.parent.lock.release()
+            raise
+        return self.data
 
     async def __aexit__(
         self,
@@ -179,6 +225,12 @@ class LocalStorageContext(Generic[T]):
         exc_cal: BaseException | None,
         exc_tb: TracebackType | None,
     ):
-        self.parent.lock.release()
-        logger.trace(f"释放了上下文的锁 DATA_CLASS={self.data.__class__.__name__}")
-        return self.__exit__(exc_type, exc_cal, exc_tb)
+        try:
+            if exc_type is None and exc_cal is None and exc_tb is None:
+                await self.parent.aset_item(self.parent_key, self.data)
+        finally:
+            self.parent.lock.release()
+            logger.trace(f"释放了上下文的锁 DATA_CLASS={self.cls.__name__}")
+
+        # 代表该异常将会向外传播
+        return False
@@ -1,24 +1,195 @@
 """
-This module contains the AsyncioLockManager class, which is used to manage locks for asyncio.
----
-The module is completely writtened by CODEGEEX.
+按玩家加锁的锁管理器。
+
+- 每个键对应的锁带有引用计数，没有人持有也没有人等待时就会被删掉，
+  不会因为见过的玩家越来越多而一直占用内存；
+- 一次可以锁住多个键，键按顺序获取，两个人互相操作（比如扔粑粑）时不会死锁；
+- 可以设置等待的超时时间，超时会抛出 `LockTimeoutException`；
+- 按调用的地方记录等待锁和持有锁的时间，用于找出哪里的竞争最严重。
 """
 
 import asyncio
+import sys
+import time
+from dataclasses import dataclass
+from types import TracebackType
+from typing import Iterable
+
+from src.base.exceptions import LockTimeoutException
+
+
+@dataclass
+class LockStats:
+    """
+    一处加锁的地方的统计
+    """
+
+    acquired: int = 0
+    "成功获取锁的次数"
+
+    contended: int = 0
+    "需要等待的次数"
+
+    timeouts: int = 0
+    "等待超时的次数"
+
+    wait_total: float = 0
+    "等待锁的总时间，单位秒"
+
+    wait_max: float = 0
+    "等待锁的最长时间"
+
+    hold_total: float = 0
+    "持有锁的总时间"
+
+    hold_max: float = 0
+    "持有锁的最长时间"
+
+
+class _Entry:
+    __slots__ = ("key", "lock", "refs")
+
+    def __init__(self, key: str) -> None:
+        self.key = key
+        self.lock = asyncio.Lock()
+        self.refs = 0
+
+
+class KeyLock:
+    """
+    锁住一组键的锁，接口和 `asyncio.Lock` 一样，也可以用 `async with`
+    """
+
+    def __init__(
+        self,
+        manager: "AsyncioLockManager",
+        keys: Iterable[str],
+        timeout: float | None,
+        name: str,
+    ) -> None:
+        self.manager = manager
+        # 排序以后再获取，所有人获取的顺序都一样就不会死锁
+        self.keys = sorted(set(keys))
+        self.timeout = timeout
+        self.name = name
+        self._held: list[_Entry] = []
+        self._acquired_at = 0.0
+
+    def locked(self) -> bool:
+        return any(self.manager.is_locked(key) for key in self.keys)
+
+    async def acquire(self) -> bool:
+        entries = [self.manager._ref(key) for key in self.keys]
+        stats = self.manager.stats_of(self.name)
+        begin = time.perf_counter()
+        contended = any(entry.lock.locked() for entry in entries)
+        try:
+            async with asyncio.timeout(self.timeout):
+                for entry in entries:
+                    await entry.lock.acquire()
+                    self._held.append(entry)
+        except BaseException as e:
+            # 先记下拿到了几个，`_release_entries` 会清空 `_held`
+            acquired = len(self._held)
+            self._release_entries()
+            for entry in entries[acquired:]:
+                self.manager._unref(entry)
+            if isinstance(e, TimeoutError):
+                stats.timeouts += 1
+                raise LockTimeoutException() from e
+            raise
+
+        wait = time.perf_counter() - begin
+        stats.acquired += 1
+        stats.contended += int(contended)
+        stats.wait_total += wait
+        stats.wait_max = max(stats.wait_max, wait)
+        self._acquired_at = time.perf_counter()
+        return True
+
+    def _release_entries(self):
+        for entry in reversed(self._held):
+            entry.lock.release()
+            self.manager._unref(entry)
+        self._held.clear()
+
+    def release(self):
+        hold = time.perf_counter() - self._acquired_at
+        stats = self.manager.stats_of(self.name)
+        stats.hold_total += hold
+        stats.hold_max = max(stats.hold_max, hold)
+        self._release_entries()
+
+    async def __aenter__(self):
+        await self.acquire()
+        return self
+
+    async def __aexit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_cal: BaseException | None,
+        exc_tb: TracebackType | None,
+    ):
+        self.release()
 
 
 class AsyncioLockManager:
-    """A class that manages locks for asyncio"""
+    """管理按键加锁的锁"""
+
+    default_timeout: float | None
+    "等待锁的默认超时时间，为 None 时一直等待"
+
+    def __init__(self, default_timeout: float | None = None):
+        self.default_timeout = default_timeout
+        self._entries: dict[str, _Entry] = {}
+        self.stats: dict[str, LockStats] = {}
+
+    def _ref(self, key: str) -> _Entry:
+        entry = self._entries.get(key)
+        if entry is None:
+            entry = self._entries[key] = _Entry(key)
+        entry.refs += 1
+        return entry
 
-    locks: dict[str, asyncio.Lock]
+    def _unref(self, entry: _Entry):
+        entry.refs -= 1
+        if entry.refs <= 0 and self._entries.get(entry.key) is entry:
+            # 没有人持有也没有人在等，删掉
+            del self._entries[entry.key]
 
-    def __init__(self):
-        self.locks = {}
+    def is_locked(self, key: str) -> bool:
+        """某个键现在是否被锁住了"""
+        entry = self._entries.get(key)
+        return entry is not None and entry.lock.locked()
 
-    def get_lock(self, key: str):
-        """Get a lock for a given key"""
-        self.locks.setdefault(key, asyncio.Lock())
-        return self.locks[key]
+    def stats_of(self, name: str) -> LockStats:
+        return self.stats.setdefault(name, LockStats())
+
+    def lock(
+        self,
+        *keys: str,
+        timeout: float | None = None,
+        name: str = "",
+    ) -> KeyLock:
+        """获得锁住一组键的锁
+
+        Args:
+            keys (str): 要锁住的键
+            timeout (float | None, optional): 等待的超时时间，默认使用 `default_timeout`
+            name (str, optional): 统计时使用的名字，一般是加锁的地方
+
+        Returns:
+            KeyLock: 锁，需要 `acquire` 或者 `async with` 才会真正加锁
+        """
+        return KeyLock(
+            self,
+            keys,
+            timeout if timeout is not None else self.default_timeout,
+            name,
+        )
+
+    def __len__(self) -> int:
+        return len(self._entries)
 
     _instance: "AsyncioLockManager | None" = None
 
@@ -30,9 +201,38 @@ class AsyncioLockManager:
         return cls._instance
 
 
-def get_lock(key: str) -> asyncio.Lock:
-    """Get a lock for a given key"""
-    return AsyncioLockManager.get().get_lock(key)
+def caller_name(depth: int = 1) -> str:
+    """
+    调用者的名字，用于统计。很多指令的函数都叫 `_`，这时候用行号区分
+    """
+    frame = sys._getframe(depth + 1)  # pylint: disable=protected-access
+    module = frame.f_globals.get("__name__", "?")
+    name = frame.f_code.co_qualname
+    if name == "_" or name.endswith("._"):
+        return f"{module}:{frame.f_code.co_firstlineno}"
+    return f"{module}.{name}"
+
+
+def get_lock_manager() -> AsyncioLockManager:
+    return AsyncioLockManager.get()
+
+
+def get_lock(
+    *keys: str | int, timeout: float | None = None, name: str | None = None
+) -> KeyLock:
+    """获得锁住一个或多个键的锁"""
+    return get_lock_manager().lock(
+        *(str(key) for key in keys),
+        timeout=timeout,
+        name=name if name is not None else caller_name(),
+    )
 
 
-__all__ = ["AsyncioLockManager", "get_lock"]
+__all__ = [
+    "AsyncioLockManager",
+    "KeyLock",
+    "LockStats",
+    "caller_name",
+    "get_lock",
+    "get_lock_manager",
+]
@@ -21,6 +21,8 @@ across different repositories.
 
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from src.base.identity_map import IdentityMap, get_identity_map
+
 
 class DBRepository:
     """
@@ -30,5 +32,12 @@ class DBRepository:
     def __init__(self, session: AsyncSession) -> None:
         self.session = session
 
+    @property
+    def identity_map(self) -> IdentityMap:
+        """
+        当前会话的标识映射，同一个工作单元中的仓库共用它
+        """
+        return get_identity_map(self.session)
+
 
 __all__ = ["DBRepository"]
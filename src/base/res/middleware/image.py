@@ -1,9 +1,12 @@
 from abc import ABC, abstractmethod
+from pathlib import Path
 
 import PIL
 import PIL.Image
 import PIL.ImageFilter
 
+from src.ui.base.tools import image_to_bytes
+
 
 class BaseImageMiddleware(ABC):
     """
@@ -58,3 +61,23 @@ class BlurMiddleware(BaseImageMiddleware):
 
     def to_string(self) -> str:
         return f"BlurMiddleware({self.radius})"
+
+
+def apply_image_middlewares(
+    source: Path, task_chain: list[BaseImageMiddleware], suffix: str = ".png"
+) -> bytes:
+    """读取一张图片，依次经过中间件处理以后编码成字节
+
+    这个函数会被放进处理图片的进程池中执行，所以输入的是图片的路径，
+    中间件也必须是可以 pickle 的对象
+
+    Args:
+        source (Path): 原图片的路径
+        task_chain (list[BaseImageMiddleware]): 中间件
+        suffix (str, optional): 输出的图片格式. Defaults to ".png".
+    """
+    with PIL.Image.open(source) as image:
+        image.load()
+        for task in task_chain:
+            image = task.handle(image)
+        return image_to_bytes(image, suffix=suffix)
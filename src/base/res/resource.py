@@ -5,9 +5,17 @@ import PIL
 import PIL.Image
 from pydantic import BaseModel, computed_field
 
+from src.common.threading import run_io
+
 from .urls import resource_url_registerator
 
 
+def _open_image(path: Path) -> PIL.Image.Image:
+    image = PIL.Image.open(path)
+    image.load()
+    return image
+
+
 class IResource(ABC, BaseModel):
     @computed_field
     @property
@@ -24,6 +32,18 @@ class IResource(ABC, BaseModel):
     def load_pil_image(self) -> PIL.Image.Image:
         return PIL.Image.open(self.path)
 
+    async def aurl(self) -> str:
+        """
+        资源暴露给渲染器的相对 URL，第一次获取时在线程池中计算文件的哈希
+        """
+        return self.url
+
+    async def aload_pil_image(self) -> PIL.Image.Image:
+        """
+        在线程池中读取并解码图片
+        """
+        return await run_io(_open_image, self.path)
+
 
 class LocalResource(IResource, BaseModel):
     local_path: Path
@@ -37,3 +57,33 @@ class LocalResource(IResource, BaseModel):
     @property
     def url(self) -> str:
         return resource_url_registerator.register(self.path)
+
+    async def aurl(self) -> str:
+        return await resource_url_registerator.aregister(self.path)
+
+
+async def prefetch_resources(obj: object, _seen: set[int] | None = None):
+    """
+    在渲染之前遍历要交给前端的数据，提前在线程池中准备好其中的资源
+    （处理图片、计算哈希），这样序列化数据时就不会在事件循环里读文件了。
+    对象有 `aprefetch` 方法时调用它，是资源时调用 `aurl`
+    """
+    seen = _seen if _seen is not None else set()
+    if id(obj) in seen:
+        return
+    seen.add(id(obj))
+
+    prefetch = getattr(obj, "aprefetch", None)
+    if callable(prefetch):
+        await prefetch()
+    if isinstance(obj, IResource):
+        await obj.aurl()
+    elif isinstance(obj, BaseModel):
+        for name in type(obj).model_fields:
+            await prefetch_resources(getattr(obj, name), seen)
+    elif isinstance(obj, dict):
+        for value in obj.values():  # type: ignore
+            await prefetch_resources(value, seen)
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        for value in obj:  # type: ignore
+            await prefetch_resources(value, seen)
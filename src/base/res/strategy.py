@@ -1,3 +1,4 @@
+import asyncio
 import base64
 import tempfile
 from abc import ABC, abstractmethod
@@ -10,9 +11,20 @@ from loguru import logger
 
 from src.base.exceptions import KagamiArgumentException
 from src.base.res.middleware.filter import ITextFilter
-from src.base.res.middleware.image import BaseImageMiddleware
+from src.base.res.middleware.image import BaseImageMiddleware, apply_image_middlewares
 from src.base.res.resource import IResource, LocalResource
-from src.ui.base.tools import image_to_bytes
+from src.common.threading import run_image, run_io
+
+
+def _file_key(fp: Path) -> tuple[Path, int, int] | None:
+    """
+    用路径、修改时间和大小标识一个文件的内容，文件不存在时为 None
+    """
+    try:
+        stat = fp.stat()
+    except OSError:
+        return None
+    return (fp, stat.st_mtime_ns, stat.st_size)
 
 
 class IStorageStrategy(ABC):
@@ -37,6 +49,25 @@ class IStorageStrategy(ABC):
             raise FileNotFoundError(f"File {file_name} not found")
         return self.get(file_name)
 
+    # 异步接口。默认在文件读写的线程池中调用对应的同步方法，
+    # 有更重的工作（比如处理图片）的储存方案会覆盖它们
+
+    async def aexists(self, file_name: str) -> bool:
+        """在线程池中检查文件是否存在"""
+        return await run_io(self.exists, file_name)
+
+    async def aget(self, file_name: str) -> IResource:
+        """获取资源，和直接调用储存方案一样，文件不存在时抛出 FileNotFoundError"""
+        return await run_io(self.__call__, file_name)
+
+    async def aput(self, file_name: str, data: bytes) -> IResource:
+        """在线程池中写入文件内容"""
+        return await run_io(self.put, file_name, data)
+
+    async def aurl(self, file_name: str) -> str:
+        """获取资源暴露给渲染器的相对 URL"""
+        return await (await self.aget(file_name)).aurl()
+
 
 class IWriteableStorageStrategy(IStorageStrategy):
     def can_put(self, file_name: str) -> bool:
@@ -135,33 +166,63 @@ class ShadowStorageStrategy(IReadonlyStorageStrategy):
             task_chain = [task_chain]
         self.task_chain = task_chain or []
         self.suffix = suffix
+        self._names: dict[tuple[Path, int, int], str] = {}
+        self._pending: dict[str, asyncio.Future[bytes]] = {}
 
     def exists(self, file_name: str) -> bool:
         return self.main.exists(file_name)
 
     def get_output_file_name(self, res: IResource) -> str:
         # 先读取原图像，sha256 后添加后缀
-        data = res.path.read_bytes()
-        data += self.suffix.encode()
+        key = _file_key(res.path)
+        if key is not None and key in self._names:
+            return self._names[key]
+
+        hasher = sha256()
+        with open(res.path, "rb") as f:
+            while chunk := f.read(1 << 16):
+                hasher.update(chunk)
+        hasher.update(self.suffix.encode())
         for task in self.task_chain:
-            data += task.to_string().encode()
-        return sha256(data).hexdigest() + self.suffix
+            hasher.update(task.to_string().encode())
+        name = hasher.hexdigest() + self.suffix
+
+        if key is not None:
+            self._names[key] = name
+        return name
 
     def get(self, file_name: str) -> IResource:
         image = self.main.get(file_name)
-        if self.shadow.exists(self.get_output_file_name(image)):
+        output = self.get_output_file_name(image)
+        if self.shadow.exists(output):
             # 如果图像存在，就不重复处理了
-            return self.shadow.get(self.get_output_file_name(image))
-        image_obj = image.load_pil_image()
+            return self.shadow.get(output)
         logger.debug(
             f"Processing image {file_name} with {len(self.task_chain)} middlewares"
         )
-        for task in self.task_chain:
-            image_obj = task.handle(image_obj)
-        return self.shadow.put(
-            self.get_output_file_name(image),
-            image_to_bytes(image_obj, suffix=self.suffix),
-        )
+        data = apply_image_middlewares(image.path, self.task_chain, self.suffix)
+        return self.shadow.put(output, data)
+
+    async def aget(self, file_name: str) -> IResource:
+        image = await self.main.aget(file_name)
+        output = await run_io(self.get_output_file_name, image)
+        if await self.shadow.aexists(output):
+            return self.shadow.get(output)
+
+        # 同一张图同时被请求多次时，只处理一次
+        pending = self._pending.get(output)
+        if pending is None:
+            logger.debug(
+                f"Processing image {file_name} with {len(self.task_chain)} middlewares"
+            )
+            pending = self._pending[output] = asyncio.ensure_future(
+                run_image(
+                    apply_image_middlewares, image.path, self.task_chain, self.suffix
+                )
+            )
+            pending.add_done_callback(lambda _: self._pending.pop(output, None))
+        data = await asyncio.shield(pending)
+        return await self.shadow.aput(output, data)
 
 
 class JustFallBackStorageStrategy(IReadonlyStorageStrategy):
@@ -281,12 +342,21 @@ def is_image_data(data: bytes) -> bool:
 
 def is_image_readable(fp: Path) -> bool:
     try:
-        PIL.Image.open(fp)
-        return True
+        with PIL.Image.open(fp):
+            return True
     except PIL.UnidentifiedImageError:
         return False
 
 
+def is_image_file(fp: Path) -> bool:
+    """
+    只读文件头判断文件是不是图片，不会读入整个文件
+    """
+    with open(fp, "rb") as f:
+        header = f.read(16)
+    return is_image_data(header) and is_image_readable(fp)
+
+
 class EnsureItIsImageStorageStrategy(IStorageStrategy):
     """
     确保输出的是图片，不然就不存在
@@ -294,12 +364,20 @@ class EnsureItIsImageStorageStrategy(IStorageStrategy):
 
     def __init__(self, origin: IStorageStrategy):
         self.origin = origin
+        self._checked: dict[tuple[Path, int, int], bool] = {}
 
     def exists(self, file_name: str) -> bool:
         if not self.origin.exists(file_name):
             return False
         fp = self.origin.get(file_name).path
-        return is_image_data(fp.read_bytes()) and is_image_readable(fp)
+        # 文件没有变过就不用再解码一次了
+        key = _file_key(fp)
+        if key is None:
+            return False
+        ok = self._checked.get(key)
+        if ok is None:
+            ok = self._checked[key] = is_image_file(fp)
+        return ok
 
     def can_put(self, file_name: str) -> bool:
         return self.origin.can_put(file_name)
@@ -3,6 +3,19 @@ from pathlib import Path
 
 from loguru import logger
 
+from src.common.threading import run_io
+
+
+def hash_file(path: Path) -> str:
+    """
+    分块计算文件的 sha256，不把整个文件读进内存
+    """
+    hasher = sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(1 << 16):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
 
 class ResourceURLRegisterator:
     def __init__(self) -> None:
@@ -12,8 +25,17 @@ class ResourceURLRegisterator:
     def register(self, path: Path) -> str:
         if path in self.registered:
             return self.registered[path]
+        return self._add(path, hash_file(path))
+
+    async def aregister(self, path: Path) -> str:
+        """
+        和 `register` 一样，但是在文件读写的线程池中计算文件的哈希
+        """
+        if path in self.registered:
+            return self.registered[path]
+        return self._add(path, await run_io(hash_file, path))
 
-        hashed = sha256(path.read_bytes()).hexdigest()
+    def _add(self, path: Path, hashed: str) -> str:
         url = f"/kagami/file/registered/{hashed}"
         self.registered[path] = url
         self.registered_reverse[hashed] = path
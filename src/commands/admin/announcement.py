@@ -4,22 +4,22 @@ from nonebot_plugin_alconna import At, Emoji, Image, Text, UniMessage
 from src.base.command_events import GroupContext, MessageContext
 from src.base.event.event_root import root
 from src.base.onebot.onebot_tools import broadcast
-from src.common.command_deco import listen_message, match_literal, require_admin
+from src.common.command_deco import (
+    listen_message,
+    match_literal,
+    match_prefix,
+    require_admin,
+)
 from src.common.global_flags import global_flags
 from src.common.localize_image import localize_image
 
 
 @listen_message()
 @require_admin()
+@match_prefix("::广播")
 async def _(ctx: GroupContext):
-    if len(ctx.message) == 0:
-        return
-
     msg0 = ctx.message[0]
-    if not isinstance(msg0, Text):
-        return
-    if not msg0.text.startswith("::广播"):
-        return
+    assert isinstance(msg0, Text)
 
     msg: UniMessage[Any] = UniMessage.text(msg0.text[4:])
     if len(msg) > 0 and msg[0] in " \n":
@@ -8,7 +8,7 @@ from nonebot_plugin_alconna import Image, UniMessage
 
 from src.base.command_events import MessageContext
 from src.base.exceptions import ObjectAlreadyExistsException, ObjectNotFoundException
-from src.commands.user.inventory import build_display, calc_progress, calc_gedu
+from src.commands.user.inventory import build_display, calc_gedu
 from src.common.command_deco import (
     listen_message,
     match_alconna,
@@ -19,6 +19,7 @@ from src.common.command_deco import (
 from src.common.data.awards import download_award_image
 from src.core.unit_of_work import get_unit_of_work
 from src.models.level import level_repo
+from src.services.pack_progress import PackProgressService
 from src.services.pool import PoolService
 from src.ui.base.render import get_render_pool
 from src.ui.types.common import UserData
@@ -260,29 +261,16 @@ async def _(ctx: MessageContext, _: Arparma[Any]):
         ]
         users = await uow.users.get_all_uid()
         for uid in users:
+            counts = await PackProgressService(uow).get_counts(uid)
+            qqid = await uow.users.get_qqid(uid)
             for pid in range(0, pack_max + 1):
-                lid = None
-                aids = await uow.awards.get_aids(lid, pid if pid > 0 else None)
-                aids2 = await uow.awards.get_aids(lid, 0)
-                aids = list(set(aids) | set(aids2))
-                aids.sort()
-
-                inventory_dict = await uow.inventories.get_inventory_dict(uid, aids)
-                stats_dict = {i: v[0] + v[1] for i, v in inventory_dict.items()}
-
-                grouped_aids = await uow.awards.group_by_level(aids)
-                grouped_aids_filtered = [
-                    (
-                        uow.levels.get_by_id(i),
-                        [(v if stats_dict.get(v, 0) > 0 else None) for v in vs],
-                    )
-                    for i, vs in grouped_aids.items()
-                ]
                 if pid == 0:
-                    progress = calc_gedu(grouped_aids_filtered)
+                    levels = PackProgressService.merge(counts)
+                    progress = PackProgressService.gedu(levels)
                 else:
-                    progress = calc_progress(grouped_aids_filtered)
-                pack_progress[pid].append((await uow.users.get_qqid(uid), progress))
+                    levels = PackProgressService.merge(counts, (pid, 0))
+                    progress = PackProgressService.progress(levels)
+                pack_progress[pid].append((qqid, progress))
 
     for pid in range(0, pack_max + 1):
         pack_progress[pid].sort(key=lambda x: x[1], reverse=True)
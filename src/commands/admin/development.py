@@ -16,6 +16,9 @@ from nonebot_plugin_alconna import UniMessage
 from src.apis.render_ui import manager as backend_data_manager
 from src.base.command_events import GroupContext, MessageContext, OnebotContext
 from src.base.db import DatabaseManager
+from src.base.event.admission import get_admission_controller
+from src.base.event.background import get_background_runner
+from src.base.lock_manager import get_lock_manager
 from src.base.onebot.onebot_api import get_group_list
 from src.base.onebot.onebot_tools import update_cached_name
 from src.base.res import KagamiResourceManagers
@@ -36,6 +39,7 @@ from src.ui.base.render import (
     FirefoxBrowserWorker,
     get_render_pool,
 )
+from src.ui.base.render_scheduler import RenderPriority
 
 
 @listen_message()
@@ -46,6 +50,62 @@ async def _(ctx: MessageContext):
     await ctx.reply("ok")
 
 
+@listen_message()
+@require_admin()
+@match_regex("^::(load|负载)$")
+async def _(ctx: MessageContext, _):
+    admission = get_admission_controller().get_stats()
+    background = get_background_runner().get_stats()
+    dropped = ", ".join(f"{k}={v}" for k, v in admission.dropped.items()) or "无"
+    depth = ", ".join(f"{k}={v}" for k, v in background.depth.items()) or "无"
+    await ctx.reply(
+        f"事件循环延迟：{admission.lag * 1000:.1f}ms"
+        f"（最高 {admission.peak_lag * 1000:.1f}ms）\n"
+        f"正在处理的事件：{admission.in_flight}，"
+        f"放行 {admission.admitted}，等待过 {admission.deferred}\n"
+        f"丢掉的事件：{dropped}\n"
+        f"后台正在执行：{background.running}，队列：{depth}" + _render_cache_line()
+    )
+
+
+def _render_cache_line() -> str:
+    cache = get_render_pool().cache
+    if cache is None or not cache.enabled:
+        return ""
+    stats = cache.stats
+    return (
+        f"\n渲染缓存：命中率 {stats.hit_rate:.0%}，内存 {stats.hits}，"
+        f"硬盘 {stats.disk_hits}，合并 {stats.joined}，未命中 {stats.misses}"
+    )
+
+
+@listen_message()
+@require_admin()
+@match_regex("^::(locks|锁)$")
+async def _(ctx: MessageContext, _):
+    manager = get_lock_manager()
+    # 按等待的总时间排序，排在前面的竞争最严重
+    top = sorted(manager.stats.items(), key=lambda kv: -kv[1].wait_total)[:8]
+    lines = [
+        f"{name}：{s.acquired} 次，等待 {s.contended} 次，超时 {s.timeouts} 次，"
+        f"等待共 {s.wait_total:.2f}s（最长 {s.wait_max:.2f}s），"
+        f"持有最长 {s.hold_max:.2f}s"
+        for name, s in top
+    ]
+    await ctx.reply(f"现在有 {len(manager)} 个锁\n" + "\n".join(lines))
+
+
+@listen_message()
+@require_admin()
+@match_regex("^::(reload-config|重载配置)$")
+async def _(ctx: MessageContext, _):
+    changed = await config.reload_config()
+    if len(changed) == 0:
+        await ctx.reply("配置没有变化。")
+        return
+    await ctx.reply("重新加载了配置，改变了的字段：\n" + "\n".join(changed))
+
+
 @listen_message()
 @require_admin()
 @match_regex(
@@ -126,6 +186,7 @@ async def _(ctx: OnebotContext):
         Option("--reload-all", alias=["-a"]),
         Option("--push", Arg("browser_type", str), alias="-p"),
         Option("--kill", Arg("browser_work_id", str), alias=["-k"]),
+        Option("--stats", alias=["-s"]),
     )
 )
 async def _(ctx: GroupContext, res: Arparma[Any]):
@@ -135,7 +196,7 @@ async def _(ctx: GroupContext, res: Arparma[Any]):
         ls = "当前闲置的渲染器："
         idle, working, starting = await pool.get_worker_list()
         for worker in idle:
-            ls += "\n- " + str(worker)
+            ls += "\n- " + str(worker) + f" 已经渲染了 {worker.render_count} 次"
         ls += "\n\n当前正在工作的渲染器："
         for worker in working:
             ls += (
@@ -149,6 +210,21 @@ async def _(ctx: GroupContext, res: Arparma[Any]):
         await ctx.reply(ls)
         return
 
+    if res.exist("stats"):
+        # 按排队的总时间排序，排在前面的最拖累别人
+        top = sorted(pool.stats.items(), key=lambda kv: -kv[1].wait_total)[:8]
+        lines = [
+            f"{path}：{s.count} 次，失败 {s.failed} 次，超时 {s.timeouts} 次，"
+            f"排队 {s.waiting} 个，排队最长 {s.wait_max:.2f}s，"
+            f"渲染平均 {s.render_total / max(s.count, 1):.2f}s"
+            f"（最长 {s.render_max:.2f}s）"
+            for path, s in top
+        ]
+        await ctx.reply(
+            f"现在有 {pool.scheduler.depth} 个渲染在排队\n" + "\n".join(lines)
+        )
+        return
+
     if res.exist("reload"):
         work_id = res.query[str]("browser_work_id")
         assert work_id is not None
@@ -169,10 +245,18 @@ async def _(ctx: GroupContext, res: Arparma[Any]):
     if res.exist("push"):
         br_type = res.query[str]("browser_type") or ""
         if br_type.upper() == "CHROME":
-            await pool.put(ChromeBrowserWorker)
+            await pool.put(
+                lambda: ChromeBrowserWorker(
+                    spa_mode=config.get_config().render_spa_mode
+                )
+            )
             await ctx.reply("ok.")
         elif br_type.upper() == "FIREFOX":
-            await pool.put(FirefoxBrowserWorker)
+            await pool.put(
+                lambda: FirefoxBrowserWorker(
+                    spa_mode=config.get_config().render_spa_mode
+                )
+            )
             await ctx.reply("ok.")
         elif br_type.upper() == "RABBITMQ":
             await pool.put(
@@ -204,6 +288,7 @@ async def _(ctx: GroupContext, res: Arparma[Any]):
         "::browser-pool --reload <browser_work_id>  # 重载指定渲染器\n"
         "::browser-pool --clean  # 清理不可用的渲染器\n"
         "::browser-pool --kill <browser_work_id>  # 杀死一个渲染器\n"
+        "::browser-pool --stats  # 各个页面的排队和渲染时间\n"
         "::browser-pool --reload-all  # 重载所有渲染器"
     )
 
@@ -262,5 +347,7 @@ async def _(ctx: MessageContext, res: re.Match[str]):
     assert page_name is not None
     assert data_hex is not None
 
-    img = await get_render_pool().render(page_name, data=data_hex)
+    img = await get_render_pool().render(
+        page_name, data=data_hex, priority=RenderPriority.LOW
+    )
     await ctx.send_image(img)
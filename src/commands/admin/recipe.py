@@ -9,7 +9,7 @@ from src.common.command_deco import (
     match_literal,
     require_admin,
 )
-from src.common.data.awards import get_award_info
+from src.common.data.awards import AwardInfoAssembler
 from src.common.data.recipe import calc_possibility
 from src.core.unit_of_work import get_unit_of_work
 
@@ -42,7 +42,7 @@ async def _(ctx: MessageContext, res: Arparma):
         if re is None:
             raise ObjectNotFoundException("配方")
 
-        info = await get_award_info(uow, re[0])
+        info = await AwardInfoAssembler(uow).one(re[0])
         modified = await uow.recipes.is_modified(a1, a2, a3)
 
         await ctx.reply(
@@ -213,13 +213,14 @@ async def _(ctx: MessageContext, res: Arparma):
 async def _(ctx: MessageContext):
     async with get_unit_of_work() as uow:
         msg: list[str] = []
-        for aid1, aid2, aid3, aid, posi in await uow.recipes.get_all_special():
-            info1 = await get_award_info(uow, aid1)
-            info2 = await get_award_info(uow, aid2)
-            info3 = await get_award_info(uow, aid3)
-            info = await get_award_info(uow, aid)
+        specials = await uow.recipes.get_all_special()
+        infos = await AwardInfoAssembler(uow).for_user(
+            None, {aid for row in specials for aid in row[:4]}
+        )
+        for aid1, aid2, aid3, aid, posi in specials:
             msg.append(
-                f"{info1.name} {info2.name} {info3.name} -> {info.name}，"
+                f"{infos[aid1].name} {infos[aid2].name} {infos[aid3].name} "
+                f"-> {infos[aid].name}，"
                 f"概率为 {posi*100}%"
             )
 
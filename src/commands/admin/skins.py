@@ -29,7 +29,7 @@ from src.ui.types.inventory import BookBoxData, BoxItemList, DisplayBoxData, Sto
 async def _(ctx: MessageContext, res: Arparma):
     async with get_unit_of_work(ctx.sender_id) as uow:
         sids = await uow.skins.all_sid()
-        sinfos = {sid: await uow.skins.get_info_v2(sid) for sid in sids}
+        sinfos = await uow.skins.get_info_v2_dict(sids)
         ainfos = await uow.awards.get_info_dict(
             set(sinfo.aid for sinfo in sinfos.values())
         )
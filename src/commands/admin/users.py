@@ -57,8 +57,9 @@ async def _(ctx: MessageContext, res: re.Match[str]) -> None:
         uidto = await uow.users.get_uid(uto)
 
         award_inv = await uow.inventories.get_inventory_dict(uidfrom)
+        award_inv0 = await uow.inventories.get_inventory_dict(uidto)
         for aid, (sto, use) in award_inv.items():
-            sto0, use0 = await uow.inventories.get_inventory(uidto, aid)
+            sto0, use0 = award_inv0.get(aid, (0, 0))
             await uow.inventories.set_inventory(uidfrom, aid, 0, 0)
             await uow.inventories.set_inventory(uidto, aid, sto0 + sto, use0 + use)
 
@@ -83,14 +84,14 @@ async def _(ctx: MessageContext, res: re.Match[str]) -> None:
         await uow.user_pack.set_own(uidto, pack | pack0)
 
         items = await uow.items.get_dict(uidfrom)
+        items0 = await uow.items.get_dict(uidto)
         for iid, (sto, use) in items.items():
-            sto0, use0 = await uow.items.get(uidto, iid)
+            sto0, use0 = items0.get(iid, (0, 0))
             await uow.items.set(uidfrom, iid, 0, 0)
             await uow.items.set(uidto, iid, sto + sto0, use + use0)
 
         skin = await uow.skin_inventory.get_list(uidfrom)
         await uow.skin_inventory.remove_all(uidfrom)
-        for s in skin:
-            await uow.skin_inventory.give(uidto, s)
+        await uow.skin_inventory.give_many(uidto, skin)
 
     await ctx.reply("转移好了")
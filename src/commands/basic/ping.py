@@ -12,8 +12,15 @@ from src.base.onebot.onebot_api import (
 from src.base.onebot.onebot_basic import OnebotBotProtocol
 from src.base.onebot.onebot_enum import QQEmoji
 from src.base.onebot.onebot_events import GroupPokeContext
-from src.common.command_deco import limited, listen_message, require_awake
+from src.common.command_deco import (
+    GuardCost,
+    guard,
+    limited,
+    listen_message,
+    require_awake,
+)
 from src.common.config import get_config
+from src.common.data.user import get_user_context
 from src.common.rd import get_random
 from src.common.times import now_datetime
 from src.core.unit_of_work import get_unit_of_work
@@ -90,9 +97,17 @@ def __match_str(s: str):
     return True
 
 
+def __called_me(ctx: MessageContext):
+    message = ctx.message
+    if len(message) == 0 or not isinstance((msg0 := message[0]), Text):
+        return False
+    return msg0.text.startswith(get_config().my_name)
+
+
 @listen_message()
 @limited
 @require_awake
+@guard(__called_me, GuardCost.CONFIG)
 async def _(ctx: MessageContext):
     message = ctx.message
     if len(message) == 0:
@@ -114,9 +129,7 @@ async def _(ctx: MessageContext):
         return
 
     rep_name = "在"
-    sender = ctx.sender_id
-    async with get_unit_of_work(ctx.sender_id) as uow:
-        custom_reply = await uow.users.name(qqid=sender)
+    custom_reply = (await get_user_context(ctx)).special_name
     if custom_reply is not None:
         rep_name = custom_reply
 
@@ -224,6 +237,7 @@ async def _(ctx: GroupPokeContext):
 @listen_message()
 @limited
 @require_awake
+@guard(lambda ctx: len(ctx.message) == 1 and isinstance(ctx.message[0], At))
 async def _(ctx: GroupContext):
     if len(ctx.message) != 1:
         return
@@ -13,6 +13,7 @@ from src.common.config import get_config
 from src.common.webhook import send_webhook
 from src.core.unit_of_work import get_unit_of_work
 from src.ui.base.render import get_render_pool
+from src.ui.base.render_scheduler import RenderPriority
 from src.ui.types.zhuagx import UpdateData, get_latest_version
 
 
@@ -30,7 +31,9 @@ async def _(ctx: OnebotStartedContext):
 
     if version != lv.version:
         data = UpdateData(versions=[lv], show_pager=False)
-        msg = image(await get_render_pool().render("update", data))
+        msg = image(
+            await get_render_pool().render("update", data, priority=RenderPriority.LOW)
+        )
         await broadcast(ctx.bot, msg)
     elif get_driver().env != "dev":
         for group in get_config().admin_groups:
@@ -3,7 +3,6 @@ from pathlib import Path
 
 from src.base.command_events import GroupContext
 from src.common.command_deco import listen_message, match_regex
-from src.common.data.awards import get_award_info
 from src.core.unit_of_work import get_unit_of_work
 from src.services.stats import StatService
 
@@ -9,13 +9,14 @@ from src.base.command_events import GroupContext
 from src.base.event.event_root import throw_event
 from src.base.exceptions import KagamiRangeError
 from src.common.command_deco import (
+    guard,
     limited,
     listen_message,
     match_alconna,
     match_regex,
     require_awake,
 )
-from src.common.data.awards import get_award_info
+from src.common.data.awards import AwardInfoAssembler
 from src.common.data.user import get_user_data
 from src.common.dataclasses.game_events import UserTryCatchEvent
 from src.core.unit_of_work import UnitOfWork, get_unit_of_work
@@ -47,6 +48,9 @@ async def picks(uow: UnitOfWork, user: UserData, count: int | None = None):
     - 发布 `PicksEvent` 事件以允许对结果进行修改
     - 将数据写入数据库会话中
 
+    `UserTryCatchEvent` 由调用者在工作单元结束、释放用户的锁以后发布，
+    这样后台队列满了时不会一直占着锁。
+
     Args:
         ctx (GroupContext): 上下文
         uow (UnitOfWork): 工作单元
@@ -74,12 +78,15 @@ async def picks(uow: UnitOfWork, user: UserData, count: int | None = None):
     spent_count = 0
     catchs: list[GetAward] = []
 
+    await uow.inventories.give_many(
+        uid, {aid: pick.delta for aid, pick in pick_result.awards.items()}
+    )
+    infos = await AwardInfoAssembler(uow).for_user(uid, pick_result.awards.keys())
     for aid, pick in pick_result.awards.items():
         spent_count += pick.delta
-        await uow.inventories.give(uid, aid, pick.delta)
         catchs.append(
             GetAward(
-                info=await get_award_info(uow, aid, uid),
+                info=infos[aid],
                 count=pick.delta,
                 is_new=pick.beforeStats == 0,
             )
@@ -109,7 +116,6 @@ async def picks(uow: UnitOfWork, user: UserData, count: int | None = None):
         ),
         catchs=catchs,
     )
-    await throw_event(UserTryCatchEvent(user_data=user, data=msg))
     return msg
 
 
@@ -127,6 +133,7 @@ async def _(ctx: GroupContext, result: Arparma[Any]):
         ud = await get_user_data(ctx, uow)
         msg = await picks(uow, ud, count)
         await StatService(uow).zhua_command(ud.uid)
+    await throw_event(UserTryCatchEvent(user_data=ud, data=msg))
     await ctx.send(await render_catch_message(msg))
 
 
@@ -139,17 +146,20 @@ async def _(ctx: GroupContext, _):
         ud = await get_user_data(ctx, uow)
         msg = await picks(uow, ud)
         await StatService(uow).kz_command(ud.uid)
+    await throw_event(UserTryCatchEvent(user_data=ud, data=msg))
     await ctx.send(await render_catch_message(msg))
 
 
-@listen_message()
-async def _(ctx: GroupContext):
+def is_shi(ctx: GroupContext):
     msg = ctx.message.exclude(At).exclude(Reply)
     if not msg.only(Text):
-        return
-    msg = msg.extract_plain_text().strip()
-    if not re.match("^是[。.！!？? ]*$", msg):
-        return
+        return False
+    return re.match("^是[。.！!？? ]*$", msg.extract_plain_text().strip()) is not None
+
+
+@listen_message()
+@guard(is_shi)
+async def _(ctx: GroupContext):
     async with get_unit_of_work(ctx.sender_id) as uow:
         uid = await uow.users.get_uid(ctx.sender_id)
         flags_before = await uow.user_flag.get(uid)
@@ -158,7 +168,9 @@ async def _(ctx: GroupContext):
         await StatService(uow).shi(uid)
     if utime.slot_empty > 0:
         async with get_unit_of_work(ctx.sender_id) as uow:
-            msg = await picks(uow, await get_user_data(ctx, uow), 1)
+            ud = await get_user_data(ctx, uow)
+            msg = await picks(uow, ud, 1)
+        await throw_event(UserTryCatchEvent(user_data=ud, data=msg))
         await ctx.send(await render_catch_message(msg))
     elif "是" not in flags_before:
         await ctx.reply("收到。", ref=True)
@@ -7,7 +7,7 @@ from src.base.command_events import MessageContext
 from src.base.exceptions import DoNotHaveException, KagamiArgumentException
 from src.base.message import image, text
 from src.common.command_deco import listen_message, match_alconna
-from src.common.data.awards import get_award_info
+from src.common.data.awards import AwardInfoAssembler
 from src.core.unit_of_work import get_unit_of_work
 from src.logic.admin import is_admin
 from src.services.stats import StatService
@@ -55,7 +55,7 @@ async def _(ctx: MessageContext, res: Arparma[Any]):
             uid = None
         if do_admin:
             uid = None
-        info = await get_award_info(uow, aid, uid, sid)
+        info = await AwardInfoAssembler(uow).one(aid, uid, sid)
         if do_admin and sid is not None:
             sinfo = await uow.skins.get_info_v2(sid)
         else:
@@ -6,10 +6,11 @@ from nonebot_plugin_alconna import UniMessage
 from src.base.command_events import MessageContext
 from src.base.exceptions import KagamiRangeError
 from src.common.command_deco import listen_message, match_alconna, match_regex
-from src.common.data.awards import get_award_info
+from src.common.data.awards import AwardInfoAssembler
 from src.common.data.user import get_user_data
 from src.core.unit_of_work import get_unit_of_work
 from src.models.level import Level
+from src.services.pack_progress import LevelProgress, PackProgressService
 from src.ui.base.render import get_render_pool
 from src.ui.types.common import AwardInfo
 from src.ui.types.inventory import BookBoxData, BoxItemList, DisplayBoxData, StorageData
@@ -62,46 +63,22 @@ def build_display(
     return elements
 
 
+def _to_level_progress(
+    grouped_awards: Iterable[tuple[Level, list[int | None]]],
+) -> list[LevelProgress]:
+    return [
+        LevelProgress(level.lid, len([a for a in awards if a is not None]), len(awards))
+        for level, awards in grouped_awards
+    ]
+
+
 def calc_progress(grouped_awards: Iterable[tuple[Level, list[int | None]]]) -> float:
     "进度"
-    param: int = 10  # 榆木华定义的常数
-    denominator: float = 0
-    progress: float = 0
-    # logger.info(grouped_awards)
-
-    for level, awards in grouped_awards:
-        if level.weight == 0:
-            continue
-        numerator: float = 1 / (level.weight ** (1 / param))
-        # logger.info(
-        #     f"{level.display_name}: {level.weight} ^ {1 / param} = " f"{numerator}"
-        # )
-        denominator += numerator
-        if len(awards) != 0:
-            progress += numerator * (
-                len([a for a in awards if a is not None]) / len(awards)
-            )
-        else:
-            progress += 1 * numerator
-
-    return progress / denominator if denominator != 0 else 0
+    return PackProgressService.progress(_to_level_progress(grouped_awards))
 
 
 def calc_gedu(grouped_awards: Iterable[tuple[Level, list[int | None]]]) -> int:
-    list_gedu = [0, 29, 43, 64, 97, 220]
-    # logger.info(grouped_awards)
-    your_gedu = 0
-    total_gedu = 0
-
-    for level, awards in grouped_awards:
-        if level.weight == 0:
-            continue
-        for aid in awards:
-            total_gedu += list_gedu[level.lid]
-            if aid is not None:
-                your_gedu += list_gedu[level.lid]
-
-    return your_gedu
+    return PackProgressService.gedu(_to_level_progress(grouped_awards))
 
 
 @listen_message()
@@ -110,9 +87,7 @@ async def _(ctx: MessageContext, res: Arparma[Any]):
     async with get_unit_of_work(ctx.sender_id) as uow:
         user = await get_user_data(ctx, uow)
         aids = await uow.awards.get_aids()
-        infos = list((await uow.awards.get_info_dict(aids)).values())
-        for index, value in enumerate(infos):
-            infos[index] = await get_award_info(uow, value.aid, user.uid)
+        infos = list((await AwardInfoAssembler(uow).for_user(user.uid, aids)).values())
         inventory_dict = await uow.inventories.get_inventory_dict(user.uid, aids)
 
     storage_dict = {i: v[0] for i, v in inventory_dict.items()}
@@ -171,16 +146,12 @@ async def _(ctx: MessageContext, res: Arparma[Any]):
 
         aids1 = await uow.awards.get_aids(lid, pack_index)
         aids2 = await uow.awards.get_aids(lid, 0)
-        raw_aids = list(set(aids1) | set(aids2))
-        aids: list[int] = []
-        for aid in raw_aids:
-            # 保证列表中的小哥不是未推出的猎场里面的
-            if await uow.pack.get_main_pack(aid) <= pack_max:
-                aids.append(aid)
-
-        infos = await uow.awards.get_info_dict(aids)
-        for aid in infos:
-            infos[aid] = await get_award_info(uow, aid, user.uid)
+        infos = await AwardInfoAssembler(uow).for_user(
+            user.uid, set(aids1) | set(aids2)
+        )
+        # 保证列表中的小哥不是未推出的猎场里面的
+        infos = {aid: info for aid, info in infos.items() if info.pid <= pack_max}
+        aids = list(infos)
 
         inventory_dict = await uow.inventories.get_inventory_dict(user.uid, aids)
 
@@ -190,18 +161,9 @@ async def _(ctx: MessageContext, res: Arparma[Any]):
         groups: list[BoxItemList] = []
 
         grouped_aids = await uow.awards.group_by_level(aids)
-
-        # 将未拥有的小哥过滤为 None
-        grouped_aids_filtered = [
-            (
-                uow.levels.get_by_id(i),
-                [(v if stats_dict.get(v, 0) > 0 else None) for v in vs],
-            )
-            for i, vs in grouped_aids.items()
-        ]
-
-        progress = calc_progress(grouped_aids_filtered)
-        your_gedu = calc_gedu(grouped_aids_filtered)
+        levels = PackProgressService.count_levels(grouped_aids, stats_dict)
+        progress = PackProgressService.progress(levels)
+        your_gedu = PackProgressService.gedu(levels)
 
         calculating_groups = (5, 4, 3, 2, 1, 0)
         if lid is not None:
@@ -259,19 +221,7 @@ async def _(ctx: MessageContext, res: Arparma[Any]):
 async def _(ctx: MessageContext, _):
     async with get_unit_of_work() as uow:
         uid = await uow.users.get_uid(ctx.sender_id)
-        aids = await uow.awards.get_aids()
-        aids.sort()
-
-        inventory_dict = await uow.inventories.get_inventory_dict(uid, aids)
-        stats_dict = {i: v[0] + v[1] for i, v in inventory_dict.items()}
-        grouped_aids = await uow.awards.group_by_level(aids)
-        grouped_aids_filtered = [
-            (
-                uow.levels.get_by_id(i),
-                [(v if stats_dict.get(v, 0) > 0 else None) for v in vs],
-            )
-            for i, vs in grouped_aids.items()
-        ]
-        res = calc_gedu(grouped_aids_filtered)
+        counts = await PackProgressService(uow).get_counts(uid)
+        res = PackProgressService.gedu(PackProgressService.merge(counts))
 
     await ctx.reply(UniMessage(f"你有 {int(res)} 哥度"))
@@ -33,11 +33,11 @@ from src.ui.types.inventory import BookBoxData, BoxItemList, DisplayBoxData, Sto
 dispatcher = EventDispatcher()
 
 
-def items_to_bookbox(items: list[ItemInventoryDisplay[KagamiItem[Any]]]):
+async def items_to_bookbox(items: list[ItemInventoryDisplay[KagamiItem[Any]]]):
     return [
         BookBoxData(
             display_box=DisplayBoxData(
-                image=i.meta.image.url,
+                image=await i.meta.image.aurl(),
                 color=LEVEL_COLOR_MAP[1],
                 notation_down=str(i.count),
                 notation_up=str(i.stats),
@@ -75,7 +75,7 @@ async def _(ctx: MessageContext, res: Match[str]):
     boxes = [
         BoxItemList(
             title=group_name,
-            elements=items_to_bookbox(items),
+            elements=await items_to_bookbox(items),
         )
         for group_name, items in displays
     ]
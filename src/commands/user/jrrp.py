@@ -44,8 +44,9 @@ async def _(ctx: GroupContext, _):
     await ctx.reply(
         f"签到成功！你已经连续签到 {count} 天了。\n您的今日人品是 {moneydelta} ，获得了对应量的薯片！"
     )
-    no = LocalStorageManager.instance().data.sign(ctx.event.group_id)
-    LocalStorageManager.instance().save()
+    manager = LocalStorageManager.instance()
+    no = (await manager.aget_data()).sign(ctx.event.group_id)
+    await manager.asave()
     if no == 1:
         await ctx.stickEmoji(QQEmoji.NO)
     elif no == 2:
@@ -1,7 +1,5 @@
 from typing import Any
 
-import sqlalchemy
-import sqlalchemy.exc
 from arclet.alconna import Alconna, Arg, ArgFlag, Arparma
 
 from src.base.command_events import MessageContext
@@ -13,12 +11,14 @@ from src.common.command_deco import (
     require_admin,
     require_awake,
 )
-from src.common.data.awards import get_award_info
-from src.common.dialogue import DialogFrom, get_dialog
+from src.common.data.awards import AwardInfoAssembler
+from src.common.data.user import get_user_data
+from src.common.dialogue import DialogFrom, aget_dialog
 from src.common.global_flags import global_flags
 from src.common.rd import get_random
 from src.common.times import is_april_fool
 from src.core.unit_of_work import UnitOfWork, get_unit_of_work
+from src.services.pack_progress import PackProgressService
 from src.services.pool import PoolService
 from src.services.stats import StatService
 from src.ui.base.render import get_render_pool
@@ -31,41 +31,42 @@ async def get_pack_data(uow: UnitOfWork, user: UserData):
     bulletin_award = [0, 160, 374, 494, 648]
     uid = user.uid
 
-    for i in range(1, await uow.settings.get_pack_count() + 1):
+    pack_count = await uow.settings.get_pack_count()
+    counts = await PackProgressService(uow).get_counts(uid)
+    own_packs = await uow.user_pack.get_own(uid)
+
+    # 每个猎场的展示小哥，没有指定或者不存在时用这个猎场的任意一个小哥代替
+    fallback_aids: dict[int, int] = {}
+    for i in range(1, pack_count + 1):
         aids = await uow.pack.get_main_aids_of_pack(i)
-        grouped = await uow.awards.group_by_level(aids)
-        grouped = {d: v for d, v in grouped.items() if len(v) > 0}
+        if len(aids) > 0:
+            fallback_aids[i] = next(iter(aids))
+    featured_infos = await AwardInfoAssembler(uow).for_user(
+        uid, set(bulletin_award[1:]) | set(fallback_aids.values())
+    )
 
+    for i in range(1, pack_count + 1):
         acount = [
             LiechangCountInfo(
-                level=uow.levels.get_data_by_id(lid),
-                collected=len(
-                    [
-                        v
-                        for _, v in (
-                            await uow.inventories.get_inventory_dict(uid, list(aids))
-                        ).items()
-                        if sum(v) > 0
-                    ]
-                ),
-                sum_up=len(aids),
+                level=uow.levels.get_data_by_id(level.lid),
+                collected=level.collected,
+                sum_up=level.total,
             )
-            for lid, aids in grouped.items()
-            if lid > 0
+            for level in counts.get(i, {}).values()
+            if level.lid > 0 and level.total > 0
         ]
         acount = sorted(acount, key=lambda v: v.level.display_name, reverse=True)
 
-        try:
-            featured_award_info = await get_award_info(uow, bulletin_award[i], uid)
-        except (sqlalchemy.exc.NoResultFound, IndexError):
-            featured_award_info = await get_award_info(uow, next(iter(aids)), uid)
+        featured = bulletin_award[i] if i < len(bulletin_award) else -1
+        if featured not in featured_infos:
+            featured = fallback_aids[i]
 
         packs.append(
             SingleLiechang(
                 pack_id=i,
                 award_count=acount,
-                featured_award=featured_award_info,
-                unlocked=i in await uow.user_pack.get_own(uid),
+                featured_award=featured_infos[featured],
+                unlocked=i in own_packs,
             )
         )
 
@@ -98,7 +99,7 @@ async def get_pack_data(uow: UnitOfWork, user: UserData):
         packs=packs,
         user=user,
         selecting=await uow.user_pack.get_using(uid),
-        dialogue=random.choice(get_dialog(dialog_from, flags)),
+        dialogue=random.choice(await aget_dialog(dialog_from, flags)),
         chips=int(await uow.chips.get(uid)),
     )
 
@@ -112,9 +113,7 @@ async def _(ctx: MessageContext, _):
         uid = await uow.users.get_uid(ctx.sender_id)
         data = await get_pack_data(
             uow,
-            UserData(
-                uid=uid, qqid=str(ctx.sender_id), name=await ctx.get_sender_name()
-            ),
+            await get_user_data(ctx, uow),
         )
         await StatService(uow).check_lc_view(uid, data.selecting)
 
@@ -161,9 +160,7 @@ async def _(ctx: MessageContext, res: Arparma[Any]):
         await service.switch_pack(uid, dest)
         data = await get_pack_data(
             uow,
-            UserData(
-                uid=uid, qqid=str(ctx.sender_id), name=await ctx.get_sender_name()
-            ),
+            await get_user_data(ctx, uow),
         )
         await StatService(uow).check_lc_view(uid, data.selecting)
         await StatService(uow).qhlc_command(uid, data.selecting)
@@ -14,11 +14,15 @@ from src.common.command_deco import (
     match_alconna,
     require_awake,
 )
-from src.common.data.awards import generate_random_info, get_award_info, use_award
+from src.common.data.awards import (
+    AwardInfoAssembler,
+    generate_random_info,
+    use_award,
+)
 from src.common.data.recipe import try_merge
 from src.common.data.user import get_user_data
 from src.common.dataclasses.game_events import MergeEvent
-from src.common.dialogue import DialogFrom, get_dialog
+from src.common.dialogue import DialogFrom, aget_dialog
 from src.common.global_flags import global_flags
 from src.common.rd import get_random
 from src.common.times import is_april_fool
@@ -61,9 +65,8 @@ async def _(ctx: GroupContext, res: Arparma):
             return
 
         a1, a2, a3 = await uow.awards.get_aids_strong(n1, n2, n3)
-        info1 = await get_award_info(uow, a1)
-        info2 = await get_award_info(uow, a2)
-        info3 = await get_award_info(uow, a3)
+        inputs = await AwardInfoAssembler(uow).for_user(None, (a1, a2, a3))
+        info1, info2, info3 = inputs[a1], inputs[a2], inputs[a3]
         cost = costs[info1.level.lid] + costs[info2.level.lid] + costs[info3.level.lid]
 
         using: dict[int, int] = {}
@@ -94,7 +97,7 @@ async def _(ctx: GroupContext, res: Arparma):
                 stats = await uow.inventories.get_stats(uid, aid)
                 if stats > 0:
                     await handle_baibianxiaoge(uow, uid)
-            info = await get_award_info(uow, aid, uid)
+            info = await AwardInfoAssembler(uow).one(aid, uid)
             add = get_random().randint(1, 3)
             data = GetAward(
                 info=info,
@@ -122,7 +125,7 @@ async def _(ctx: GroupContext, res: Arparma):
                 is_strange=status == "失败？",
             ),
         )
-        bind_dialog(merge_info)
+        await bind_dialog(merge_info)
 
     await ctx.send_image(await get_render_pool().render("recipe", merge_info))
     await throw_event(MergeEvent(user_data=user, merge_view=merge_info))
@@ -138,11 +141,11 @@ def is_strange(data: MergeData) -> bool:
     )
 
 
-def bind_dialog(
+async def bind_dialog(
     data: MergeData, hua_out: bool | None = None, random: Random | None = None
 ) -> None:
     if hua_out is None:
-        with global_flags() as gf:
+        async with global_flags() as gf:
             hua_out = gf.activity_hua_out
 
     if random is None:
@@ -177,7 +180,7 @@ def bind_dialog(
         else:
             flags = set((f"outlv{data.output.info.level.lid}",))
 
-    data.dialog = random.choice(get_dialog(dialog_from, flags))
+    data.dialog = random.choice(await aget_dialog(dialog_from, flags))
 
 
 @listen_message()
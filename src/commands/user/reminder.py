@@ -0,0 +1,35 @@
+"""
+订阅抓小哥次数满了、起床时间到了的提醒
+"""
+
+import re
+
+from src.base.command_events import GroupContext
+from src.common.command_deco import limited, listen_message, match_regex
+from src.core.unit_of_work import get_unit_of_work
+
+REMINDER_NAMES = {
+    "抓小哥": "slot_full",
+    "起床": "getup",
+}
+
+
+@listen_message()
+@limited
+@match_regex("^(开启|关闭)(抓小哥|起床)提醒$")
+async def _(ctx: GroupContext, res: re.Match[str]):
+    enable = res.group(1) == "开启"
+    name = res.group(2)
+    kind = REMINDER_NAMES[name]
+
+    async with get_unit_of_work(ctx.sender_id) as uow:
+        uid = await uow.users.get_uid(ctx.sender_id)
+        if enable:
+            await uow.reminders.subscribe(uid, kind)
+        else:
+            await uow.reminders.unsubscribe(uid, kind)
+
+    if enable:
+        await ctx.reply(f"好的，{name}的时间到了我会叫你的！")
+    else:
+        await ctx.reply(f"好的，不会再提醒你{name}了。")
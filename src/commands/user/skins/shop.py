@@ -1,3 +1,4 @@
+import asyncio
 import datetime
 import re
 
@@ -14,7 +15,7 @@ from src.common.command_deco import (
     require_awake,
 )
 from src.common.data.user import get_user_data
-from src.common.dialogue import DialogFrom, get_dialog
+from src.common.dialogue import DialogFrom, aget_dialog
 from src.common.rd import get_random
 from src.common.times import (
     is_april_fool,
@@ -76,20 +77,27 @@ async def update_skin_pack_data(
 async def shop(ctx: MessageContext, result: re.Match[str]) -> None:
     async with get_unit_of_work() as uow:
         sids = await uow.skins.get_all_sids_can_be_bought()
-        infos = [await uow.skins.get_info_v2(sid) for sid in sids]
+        infos = list((await uow.skins.get_info_v2_dict(sids)).values())
         infos = sorted(infos, key=lambda info: (-info.level, -info.biscuit_price))
 
         user = await get_user_data(ctx, uow)
+        owned = set(await uow.skin_inventory.get_list(user.uid))
+        images = await asyncio.gather(
+            *(
+                KagamiResourceManagers.xiaoge_low.aurl(f"sid_{info.sid}.png")
+                for info in infos
+            )
+        )
         books = [
             SkinBook(
-                do_user_have=await uow.skin_inventory.do_user_have(user.uid, info.sid),
-                image=KagamiResourceManagers.xiaoge_low(f"sid_{info.sid}.png").url,
+                do_user_have=info.sid in owned,
+                image=image,
                 is_drawable=info.can_draw,
                 level=info.level,
                 name=info.name,
                 price=info.biscuit_price,
             )
-            for info in infos
+            for info, image in zip(infos, images)
         ]
         biscuits = await uow.biscuit.get(user.uid)
         chips = await uow.chips.get(user.uid)
@@ -103,7 +111,7 @@ async def shop(ctx: MessageContext, result: re.Match[str]) -> None:
             )
         # else:
         #     dialog_origin = DialogFrom.pifudian_april_fool
-        dialogs = get_dialog(
+        dialogs = await aget_dialog(
             dialog_origin,
             {"shop"},
         )
@@ -172,7 +180,7 @@ async def buy(ctx: MessageContext, result: re.Match[str]) -> None:
             cost=info.biscuit_price,
             current_count=None,
             from_award_name=ainfo.name,
-            image=KagamiResourceManagers.xiaoge_low(f"sid_{info.sid}.png").url,
+            image=await KagamiResourceManagers.xiaoge_low.aurl(f"sid_{info.sid}.png"),
             level=info.level,
             name=info.name,
             unit="饼干",
@@ -65,7 +65,7 @@ async def _(ctx: MessageContext, _):
         using = (await uow.skin_inventory.get_using_dict(uid)).values()
 
         sids = await uow.skins.all_sid()
-        sinfos = {sid: await uow.skins.get_info_v2(sid) for sid in sids}
+        sinfos = await uow.skins.get_info_v2_dict(sids)
         ainfos = await uow.awards.get_info_dict(
             set(sinfo.aid for sinfo in sinfos.values())
         )
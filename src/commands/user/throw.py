@@ -4,7 +4,7 @@ from nonebot.adapters.onebot.v11 import MessageSegment
 from nonebot_plugin_alconna import At, Emoji, Reply, Text, UniMessage
 
 from src.base.command_events import OnebotContext
-from src.common.command_deco import listen_message, require_awake
+from src.common.command_deco import guard, listen_message, require_awake
 from src.common.data.awards import use_award
 from src.common.rd import get_random
 from src.core.unit_of_work import get_unit_of_work
@@ -74,6 +74,19 @@ def generate_throw_message(sender_id: int, target: int, success: bool, count: in
     return msg
 
 
+THROW_WORDS = ("丢", "扔", "抛", "吃", "赤", "吔", "叱", "持")
+
+
+def may_throw(ctx: OnebotContext):
+    """
+    消息里有没有扔的动作，没有的话就不用去看玩家的状态了
+    """
+    return any(
+        isinstance(segment, Text) and any(i in segment.text for i in THROW_WORDS)
+        for segment in ctx.message
+    )
+
+
 async def analyze_throw_message(ctx: OnebotContext):
     is_throw = False
     is_poop = False
@@ -98,7 +111,7 @@ async def analyze_throw_message(ctx: OnebotContext):
             ):
                 if i in text:
                     is_poop = True
-            for i in ("丢", "扔", "抛", "吃", "赤", "吔", "叱", "持"):
+            for i in THROW_WORDS:
                 if i in text:
                     is_throw = True
             # 根据否定词的个数来判断是否表确定意义。
@@ -138,6 +151,7 @@ async def analyze_throw_message(ctx: OnebotContext):
 
 @listen_message()
 @require_awake
+@guard(may_throw)
 async def _(ctx: OnebotContext):
     FREQUENCY_LIMIT.setdefault(ctx.sender_id, 0)
     if time.time() - FREQUENCY_LIMIT[ctx.sender_id] < 10:
@@ -158,7 +172,8 @@ async def _(ctx: OnebotContext):
     # 扔粑粑
     success = get_random().random() < 0.5
 
-    async with get_unit_of_work(ctx.sender_id) as uow:
+    # 两个人的库存都会变，一起锁住
+    async with get_unit_of_work((ctx.sender_id, target_qqid)) as uow:
         fuid = await uow.users.get_uid(ctx.sender_id)
         tuid = await uow.users.get_uid(target_qqid)
 
@@ -11,6 +11,7 @@ from src.common.command_deco import (
     match_alconna,
     require_awake,
 )
+from src.common.data.user import get_user_data
 from src.common.times import is_april_fool, now_datetime
 from src.core.unit_of_work import get_unit_of_work
 from src.services.shop import ShopFreezed, ShopProductFreezed, build_xjshop
@@ -33,7 +34,7 @@ async def shop_default_message(user: UserData, shop: ShopFreezed, money: float):
                         title1=product.title,
                         title2=product.description,
                         display_box=DisplayBoxData(
-                            image=product.image.url,
+                            image=product.image_url,
                             color=product.background_color,
                             notation_down=f"{int(product.price)}薯片",
                             sold_out_overlay=product.is_sold_out,
@@ -45,7 +46,7 @@ async def shop_default_message(user: UserData, shop: ShopFreezed, money: float):
             )
             for name, products in shop.items()
         ],
-        is_april_fool=is_april_fool()
+        is_april_fool=is_april_fool(),
     )
 
     return image(await get_render_pool().render("xjshop/home", shop_data))
@@ -96,9 +97,7 @@ async def _(ctx: MessageContext, res: Arparma[Any]):
         async with get_unit_of_work(ctx.sender_id) as uow:
             uid = await uow.users.get_uid(ctx.sender_id)
             shop = await build_xjshop(uow)
-            user = UserData(
-                uid=uid, qqid=str(ctx.sender_id), name=await ctx.sender_name
-            )
+            user = await get_user_data(ctx, uow)
             freezed_shop = await shop.freeze(uow, uid)
             money = await uow.chips.get(uid)
             await StatService(uow).check_xjshop(uid)
@@ -108,9 +107,7 @@ async def _(ctx: MessageContext, res: Arparma[Any]):
         async with get_unit_of_work(ctx.sender_id) as uow:
             uid = await uow.users.get_uid(ctx.sender_id)
             shop = await build_xjshop(uow)
-            user = UserData(
-                uid=uid, qqid=str(ctx.sender_id), name=await ctx.sender_name
-            )
+            user = await get_user_data(ctx, uow)
 
             costs: float = 0
             prods: list[ShopProductFreezed] = []
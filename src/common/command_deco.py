@@ -1,26 +1,29 @@
-import asyncio
+import inspect
 import re
-from functools import partial
-from typing import Any, Callable, Coroutine, Sequence, TypeVar, TypeVarTuple, Unpack
+from dataclasses import dataclass
+from enum import IntEnum
+from functools import partial, wraps
+from typing import Any, Callable, Coroutine, Sequence, TypeVar, TypeVarTuple
 
 from arclet.alconna import Alconna, Arparma
 from arclet.alconna.exceptions import ArgumentMissing, ParamsUnmatched
 from loguru import logger
 from nonebot import get_driver
 from nonebot.exception import ActionFailed
-from nonebot_plugin_alconna import UniMessage
+from nonebot_plugin_alconna import Text, UniMessage
 from selenium.common.exceptions import WebDriverException
 
 from src.base.command_events import GroupContext, MessageContext
 from src.base.event.event_dispatcher import EventDispatcher
 from src.base.event.event_root import root
 from src.base.event.event_timer import addInterval, addTimeout
+from src.base.event.routing import RouteHint, regex_heads, set_route
 from src.base.exceptions import KagamiCoreException, KagamiStopIteration
+from src.base.lock_manager import get_lock_manager
 from src.base.onebot.onebot_events import OnebotStartedContext
 from src.common.config import get_config
-from src.common.times import now_datetime
+from src.common.data.user import get_user_context
 from src.common.webhook import send_webhook
-from src.core.unit_of_work import get_unit_of_work
 from src.logic.admin import is_admin
 
 T = TypeVar("T")
@@ -28,6 +31,127 @@ TE = TypeVar("TE", bound=MessageContext)
 TA = TypeVarTuple("TA")
 
 
+class GuardCost(IntEnum):
+    """
+    守卫的开销。一个处理函数上的守卫总是按照开销从小到大执行，与装饰器的顺序无关，
+    这样普通的聊天消息在文字匹配失败以后就不会再去查询数据库
+    """
+
+    PURE = 0
+    "只需要看消息本身"
+
+    CONFIG = 1
+    "需要读取配置等内存中的数据"
+
+    DB = 2
+    "需要查询数据库"
+
+
+@dataclass(frozen=True)
+class Guard:
+    """
+    处理函数执行前的一项检查
+    """
+
+    check: Callable[[Any], Any]
+    "检查函数，可以是异步函数"
+
+    cost: GuardCost = GuardCost.PURE
+
+    passes_value: bool = False
+    """
+    为 False 时，检查函数返回假值表示不通过；为 True 时，返回 None 表示不通过，
+    其余的返回值会作为参数传给处理函数。返回的异常会在其他守卫都通过以后抛出
+    """
+
+
+_GUARDED_ATTR = "__kagami_guarded__"
+_GUARDS_ATTR = "__kagami_guards__"
+
+
+def add_guard(func: Callable[..., Coroutine[Any, Any, T]], guard: Guard):
+    """给处理函数加上一个守卫
+
+    同一个处理函数上连续叠加的守卫会合并到同一个包装函数中，按照开销排序执行；
+    开销相同的守卫，外层的装饰器先执行
+
+    Args:
+        func (Callable[..., Coroutine[Any, Any, T]]): 处理函数
+        guard (Guard): 守卫
+    """
+
+    if getattr(func, _GUARDED_ATTR, None) is func:
+        guards: list[Guard] = getattr(func, _GUARDS_ATTR)
+        guards.insert(0, guard)
+        guards.sort(key=lambda g: g.cost)
+        return func
+
+    @wraps(func)
+    async def inner(ctx: Any, *args: Any) -> T | None:
+        values: list[Any] = []
+        deferred: BaseException | None = None
+
+        for g in guards:
+            result = g.check(ctx)
+            if inspect.isawaitable(result):
+                result = await result
+            if not g.passes_value:
+                if not result:
+                    return None
+            elif result is None:
+                return None
+            elif isinstance(result, BaseException):
+                deferred = deferred or result
+            else:
+                values.append(result)
+
+        if deferred is not None:
+            raise deferred
+        return await func(ctx, *args, *values)
+
+    guards = [guard]
+    setattr(inner, _GUARDS_ATTR, guards)
+    setattr(inner, _GUARDED_ATTR, inner)
+    return inner
+
+
+def guard(check: Callable[[TE], Any], cost: GuardCost = GuardCost.PURE):
+    """只有检查通过时才执行处理函数。
+
+    Args:
+        check (Callable[[TE], Any]): 检查函数，可以是异步函数，返回假值时不执行
+        cost (GuardCost, optional): 检查的开销. Defaults to GuardCost.PURE.
+    """
+
+    def wrapper(func: Callable[[TE, *TA], Coroutine[Any, Any, T]]):
+        return add_guard(func, Guard(check, cost))
+
+    return wrapper
+
+
+def _alconna_route(rule: Alconna[Sequence[Any]]) -> RouteHint | None:
+    """
+    根据 Alconna 规则的前缀和命令名推断消息的开头，推断不出来时为 None
+    """
+    command = rule.command
+    if not isinstance(command, str) or "{" in command:
+        return None
+    if command.startswith("re:"):
+        pattern = command[3:]
+    else:
+        pattern = re.escape(command)
+
+    prefixes = rule.prefixes or [""]
+    if not all(isinstance(p, str) for p in prefixes):
+        return None
+    heads = regex_heads(
+        "(" + "|".join(re.escape(p) for p in prefixes) + ")(" + pattern + ")"
+    )
+    if heads is None:
+        return None
+    return RouteHint(heads=heads, text_only=False)
+
+
 def match_alconna(rule: Alconna[Sequence[Any]]):
     """匹配是否符合 Alconna 规则。
 
@@ -35,25 +159,28 @@ def match_alconna(rule: Alconna[Sequence[Any]]):
         rule (Alconna[UniMessage[Any]]): 输入的 Alconna 规则。
     """
 
-    def wrapper(func: Callable[[TE, Arparma[Sequence[Any]]], Coroutine[Any, Any, T]]):
-        async def inner(ctx: TE):
-            try:
-                result = rule.parse(ctx.message)
-            except SyntaxError as e:
-                logger.warning(e)
-                return None
+    route = _alconna_route(rule)
 
-            if result.error_info is not None and isinstance(
-                result.error_info, (ArgumentMissing, ParamsUnmatched)
-            ):
-                raise result.error_info
+    def check(ctx: MessageContext):
+        try:
+            # 同一条消息的解析结果缓存在消息上，多个处理函数共用一个规则时不用重复解析
+            result = ctx.memo(("alconna", id(rule)), lambda: rule.parse(ctx.message))
+        except SyntaxError as e:
+            logger.warning(e)
+            return None
 
-            if not result.matched:
-                return None
+        if result.error_info is not None and isinstance(
+            result.error_info, (ArgumentMissing, ParamsUnmatched)
+        ):
+            return result.error_info
 
-            return await func(ctx, result)
+        if not result.matched:
+            return None
 
-        return inner
+        return result
+
+    def wrapper(func: Callable[[TE, Arparma[Sequence[Any]]], Coroutine[Any, Any, T]]):
+        return set_route(add_guard(func, Guard(check, passes_value=True)), route)
 
     return wrapper
 
@@ -65,19 +192,17 @@ def match_regex(rule: str):
         rule (str): 正则表达式规则。
     """
 
-    def wrapper(func: Callable[[TE, re.Match[str]], Coroutine[Any, Any, T]]):
-        async def inner(ctx: TE):
-            if not ctx.is_text_only():
-                return
-
-            result = re.fullmatch(rule, ctx.text)
+    pattern = re.compile(rule)
+    heads = regex_heads(rule)
+    route = None if heads is None else RouteHint(heads=heads, text_only=True)
 
-            if result is None:
-                return None
+    def check(ctx: MessageContext):
+        if not ctx.is_text_only():
+            return None
+        return pattern.fullmatch(ctx.text)
 
-            return await func(ctx, result)
-
-        return inner
+    def wrapper(func: Callable[[TE, re.Match[str]], Coroutine[Any, Any, T]]):
+        return set_route(add_guard(func, Guard(check, passes_value=True)), route)
 
     return wrapper
 
@@ -89,17 +214,40 @@ def match_literal(text: str):
         text (str): 指定文本。
     """
 
+    route = RouteHint(heads=frozenset((text.lower(),)), text_only=True)
+
+    def check(ctx: MessageContext):
+        return ctx.is_text_only() and text == ctx.text
+
     def wrapper(func: Callable[[TE], Coroutine[Any, Any, T]]):
-        async def inner(ctx: TE):
-            if not ctx.is_text_only():
-                return
+        return set_route(
+            add_guard(func, Guard(check)), route if len(text) > 0 else None
+        )
 
-            if text != ctx.text:
-                return None
+    return wrapper
 
-            return await func(ctx)
 
-        return inner
+def match_prefix(prefix: str):
+    """匹配消息是否以指定的文本开头，消息中可以有图片等其他内容。
+
+    Args:
+        prefix (str): 指定文本。
+    """
+
+    route = RouteHint(heads=frozenset((prefix.lower(),)), text_only=False)
+
+    def check(ctx: MessageContext):
+        message = ctx.message
+        return (
+            len(message) > 0
+            and isinstance(msg0 := message[0], Text)
+            and msg0.text.startswith(prefix)
+        )
+
+    def wrapper(func: Callable[[TE, *TA], Coroutine[Any, Any, T]]):
+        return set_route(
+            add_guard(func, Guard(check)), route if len(prefix) > 0 else None
+        )
 
     return wrapper
 
@@ -108,11 +256,7 @@ def require_admin():
     """限制只有管理员才能执行该命令。"""
 
     def wrapper(func: Callable[[TE, *TA], Coroutine[Any, Any, T]]):
-        async def inner(ctx: TE, *args: Unpack[TA]):
-            if is_admin(ctx):
-                return await func(ctx, *args)
-
-        return inner
+        return add_guard(func, Guard(is_admin, GuardCost.CONFIG))
 
     return wrapper
 
@@ -121,11 +265,9 @@ def debug_only():
     """限制只有 DEV 环境下才能执行该命令。"""
 
     def wrapper(func: Callable[[*TA], Coroutine[Any, Any, T]]):
-        async def inner(*args: Unpack[TA]):
-            if get_driver().env == "dev":
-                return await func(*args)
-
-        return inner
+        return add_guard(
+            func, Guard(lambda _: get_driver().env == "dev", GuardCost.CONFIG)
+        )
 
     return wrapper
 
@@ -185,6 +327,7 @@ def kagami_exception_handler():
     """
 
     def deco(func: Callable[[TE], Coroutine[None, None, T]]):
+        @wraps(func)
         async def inner(ctx: TE) -> T | None:
             try:
                 return await func(ctx)
@@ -236,16 +379,11 @@ def require_awake(func: Callable[[TE, *TA], Coroutine[Any, Any, T]]):
     需要玩家醒着才能执行的指令
     """
 
-    async def _func(ctx: TE, *args: *TA):
-        async with get_unit_of_work(ctx.sender_id) as uow:
-            n = now_datetime().timestamp()
-            uid = await uow.users.get_uid(ctx.sender_id)
-            if await uow.users.get_getup_time(uid) > n:
-                return
-
-        await func(ctx, *args)
+    async def check(ctx: MessageContext):
+        # 解析出的玩家信息会缓存在消息上下文上，处理函数可以直接拿来用
+        return (await get_user_context(ctx)).awake
 
-    return _func
+    return add_guard(func, Guard(check, GuardCost.DB))
 
 
 def limited(func: Callable[[TE, *TA], Coroutine[Any, Any, T]]):
@@ -253,17 +391,12 @@ def limited(func: Callable[[TE, *TA], Coroutine[Any, Any, T]]):
     限制了使用范围的功能
     """
 
-    async def _func(ctx: TE, *args: *TA):
-        if isinstance(ctx, GroupContext):
-            if ctx.group_id in get_config().limited_group:
-                return
-
-        await func(ctx, *args)
-
-    return _func
-
+    def check(ctx: MessageContext):
+        return not (
+            isinstance(ctx, GroupContext) and ctx.group_id in get_config().limited_group
+        )
 
-NO_SPAM_LOCKS: dict[int, asyncio.Lock] = {}
+    return add_guard(func, Guard(check, GuardCost.CONFIG))
 
 
 def limit_no_spam(func: Callable[[TE, *TA], Coroutine[Any, Any, T]]):
@@ -271,15 +404,16 @@ def limit_no_spam(func: Callable[[TE, *TA], Coroutine[Any, Any, T]]):
     限制不能够疯狂刷屏的指令
     """
 
-    async def _func(ctx: TE, *arg: *TA):
-        if ctx.sender_id not in NO_SPAM_LOCKS:
-            NO_SPAM_LOCKS[ctx.sender_id] = asyncio.Lock()
+    name = f"{func.__module__}.{func.__qualname__}"
 
-        lock = NO_SPAM_LOCKS[ctx.sender_id]
-        if lock.locked() and not is_admin(ctx):
+    @wraps(func)
+    async def _func(ctx: TE, *arg: *TA):
+        # 和工作单元的锁分开，空闲的锁会被锁管理器回收
+        key = f"no_spam:{ctx.sender_id}"
+        if get_lock_manager().is_locked(key) and not is_admin(ctx):
             return
 
-        async with lock:
+        async with get_lock_manager().lock(key, name=name):
             await func(ctx, *arg)
 
     return _func
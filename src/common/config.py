@@ -1,8 +1,14 @@
+import inspect
+import os
 from pathlib import Path
-from typing import Literal
+from typing import Awaitable, Callable, Literal
 
+import nonebot
+import nonebot.config
+from loguru import logger
 from nonebot import get_plugin_config
-from pydantic import BaseModel
+from nonebot.compat import model_dump, type_validate_python
+from pydantic import BaseModel, ConfigDict
 
 
 class Config(BaseModel):
@@ -10,13 +16,18 @@ class Config(BaseModel):
     这里定义的是小镜 Bot 的配置文件的默认值
     如果需要更改，请在项目根目录创建 `.env` 文件
     然后指定对应的字段
+
+    配置对象是只读的，群号列表在读取时就转换成了 `frozenset`，
+    需要修改配置时请修改 `.env` 文件，再调用 `reload_config`
     """
 
+    model_config = ConfigDict(frozen=True)
+
     # ==============
     # |  基本设置  |
     # ==============
 
-    my_name: list[str] = ["小镜", "柊镜"]
+    my_name: tuple[str, ...] = ("小镜", "柊镜")
     "小镜 Bot 的名字，用于呼叫 Bot"
 
     global_data_filename: str = "global_data.json"
@@ -31,6 +42,9 @@ class Config(BaseModel):
     do_check_sign_date: bool = True
     "是否检查签到连胜"
 
+    config_watch_interval: float = 5
+    "检查 `.env` 文件是否被修改的间隔，修改了就重新加载配置，单位秒，小于等于 0 则不检查"
+
     # ================
     # |  数据库设置  |
     # ================
@@ -43,6 +57,24 @@ class Config(BaseModel):
     SQLite 数据库自动保存间隔，为负数时不自动保存，单位秒
     """
 
+    stats_flush_interval: float = 10
+    "统计数据从缓冲区写入数据库的间隔，单位秒，为负数时只在关闭时写入"
+
+    stats_flush_threshold: int = 512
+    "统计数据缓冲区中积压了多少条不同的统计时，立即写入数据库"
+
+    background_workers: int = 8
+    "后台最多同时执行多少个被抛出的事件的处理函数"
+
+    background_queue_size: int = 256
+    "每种被抛出的事件最多积压多少个处理函数，满了以后抛出事件的地方会等待"
+
+    background_retries: int = 1
+    "后台的处理函数出错时最多重试几次"
+
+    background_drain_timeout: float = 30
+    "关闭时最多等待后台的处理函数执行多少秒"
+
     sqlite_dbname: str = "db.sqlite3"
     "SQLite 数据库的文件名"
 
@@ -90,28 +122,59 @@ class Config(BaseModel):
     admin_id: int = -1
     "对 Bot 拥有绝对管理权的管理员（一员）"
 
-    admin_groups: list[int] = []
+    admin_groups: frozenset[int] = frozenset()
     "小镜 Bot 的管理员群聊"
 
     enable_white_list: bool = False
     "是否启用仅在白名单群聊中才能够响应消息"
 
-    white_list_groups: list[int] = []
+    white_list_groups: frozenset[int] = frozenset()
     "白名单群聊"
 
-    limited_group: list[int] = []
+    limited_group: frozenset[int] = frozenset()
     "在哪些群，功能受到限制"
 
     reload_info_interval: int = 60
     "刷新群成员信息的间隔，单位秒，小于等于 0 则不刷新"
 
-    no_broadcast_group: list[int] = []
+    no_broadcast_group: frozenset[int] = frozenset()
     "不广播消息的群组"
 
+    reminder_coalesce_interval: float = 30
+    "提醒到期以后最多再等多少秒，把同一段时间到期的提醒合并成一条消息发送"
+
+    reminder_horizon: float = 3600
+    "内存中保存接下来多少秒内到期的提醒，更晚的提醒留在数据库里"
+
+    # ==============
+    # |  负载设置  |
+    # ==============
+
+    admission_max_in_flight: int = 64
+    "最多同时处理多少个收到的事件"
+
+    admission_max_in_flight_per_group: int = 8
+    "每个群最多同时处理多少个收到的事件"
+
+    admission_lag_threshold: float = 0.5
+    "事件循环的延迟超过多少秒时认为过载，过载时闲聊和戳一戳会被丢掉"
+
+    admission_wait_timeout: float = 5
+    "指令在达到上限时最多等待多少秒，等不到空位就丢掉"
+
+    lock_timeout: float = 30
+    "等待玩家的锁最多多少秒，超时会告诉玩家稍后再试，小于等于 0 则一直等待"
+
     # ==================
     # |  图片渲染设置  |
     # ==================
 
+    io_workers: int = 8
+    "读写资源文件的线程数，需要重启才能生效"
+
+    image_workers: int = 2
+    "处理图片（缩放、模糊等）的进程数，为 0 时在读写文件的线程中处理，需要重启才能生效"
+
     browser: Literal["chrome", "firefox"] = "chrome"
     "使用什么浏览器"
 
@@ -125,7 +188,22 @@ class Config(BaseModel):
     "前端文件的地址"
 
     browser_count: int = 1
-    "打开的浏览器数量"
+    "至少打开的浏览器数量"
+
+    browser_count_max: int = 0
+    "最多打开多少个浏览器，渲染排队太久时自动增加，不大于 `browser_count` 时数量固定"
+
+    browser_scale_up_wait: float = 2
+    "渲染排队超过多少秒时增加浏览器"
+
+    browser_idle_timeout: float = 300
+    "多出来的浏览器闲置多少秒以后关掉"
+
+    browser_max_renders: int = 500
+    "一个浏览器渲染多少次以后换一个新的，小于等于 0 时不限制"
+
+    browser_max_memory: int = 1024
+    "一个浏览器（包括它的所有进程）占用超过多少 MB 内存时换一个新的，小于等于 0 时不检查，只支持 Linux"
 
     render_host: str = "127.0.0.1"
     "渲染访问的主机，默认是指向当前启动的页面"
@@ -139,6 +217,30 @@ class Config(BaseModel):
     render_max_fail: int = 3
     "渲染器至多允许失败多少次，小于 0 则允许无限重试"
 
+    render_deadline: float = 60
+    "一次渲染最多花多少秒（包括排队），超过以后放弃并告诉玩家，小于等于 0 则不限制"
+
+    render_spa_mode: bool = False
+    "浏览器是否只打开一次前端，之后通过脚本切换页面，需要前端提供 `window.kagami_render`，前端不支持时自动退回，需要重启才能生效"
+
+    render_cache_size: int = 64
+    "内存中最多缓存多少 MB 的渲染结果，为 0 时不缓存"
+
+    render_cache_ttl: float = 3600
+    "渲染结果缓存多少秒，小于等于 0 时不过期"
+
+    render_cache_dir: str = "./data/temp/render"
+    "渲染结果在硬盘上的缓存目录，为空时只缓存在内存中"
+
+    native_render_pages: frozenset[str] = frozenset({"zhua"})
+    "哪些页面不经过浏览器，直接用 PIL 画出来"
+
+    native_render_font: str = ""
+    "原生渲染使用的字体文件，需要支持中文，为空时不使用原生渲染"
+
+    native_render_bold_font: str = ""
+    "原生渲染使用的粗体字体文件，为空时使用 `native_render_font`"
+
     # ===================
     # |  Web Hook 设置  |
     # ===================
@@ -189,8 +291,95 @@ class Config(BaseModel):
         return Path("./data") / self.global_data_filename
 
 
+ConfigListener = Callable[[Config, Config], Awaitable[None] | None]
+"配置被重新加载时调用，输入旧的配置和新的配置"
+
+_config: Config | None = None
+_listeners: dict[str, ConfigListener] = {}
+
+
 def get_config() -> Config:
-    return get_plugin_config(Config)
+    """
+    获得当前的配置。配置只在第一次调用和重新加载时读取，之后都返回同一个只读的对象
+    """
+    global _config
+    if _config is None:
+        _config = get_plugin_config(Config)
+    return _config
 
 
-__all__ = ["get_config", "Config"]
+def on_config_changed(func: ConfigListener) -> ConfigListener:
+    """
+    注册一个在配置被重新加载、并且有字段改变时调用的函数。
+    按照函数的全名登记，模块被重载以后同名的函数会替换掉旧的
+    """
+    _listeners[f"{func.__module__}.{func.__qualname__}"] = func
+    return func
+
+
+def config_files() -> list[Path]:
+    """
+    Nonebot 读取的配置文件
+    """
+    env = nonebot.get_driver().env
+    return [Path(".env"), Path(f".env.{env}")]
+
+
+def config_files_mtime() -> tuple[float, ...]:
+    """
+    配置文件的修改时间，不存在的文件记为 0，用于检查配置文件有没有被修改
+    """
+    return tuple(os.stat(p).st_mtime if p.exists() else 0 for p in config_files())
+
+
+def read_config() -> Config:
+    """
+    重新从环境变量和配置文件中读取配置，不会替换当前的配置。
+    数据库、端口之类在启动时就用掉了的配置，需要重启才会生效
+    """
+    nb_config = nonebot.config.Config(
+        _env_file=tuple(str(p) for p in config_files())  # type: ignore
+    )
+    return type_validate_python(Config, model_dump(nb_config))
+
+
+async def reload_config(config: Config | None = None) -> list[str]:
+    """重新加载配置，并通知注册了的函数
+
+    Args:
+        config (Config | None, optional): 新的配置，默认从配置文件中重新读取
+
+    Returns:
+        list[str]: 改变了的字段
+    """
+    global _config
+    old = get_config()
+    new = config if config is not None else read_config()
+    changed = [
+        name for name in Config.model_fields if getattr(old, name) != getattr(new, name)
+    ]
+    if len(changed) == 0:
+        return changed
+
+    _config = new
+    logger.info(f"配置重新加载了，改变了的字段：{', '.join(changed)}")
+    for listener in list(_listeners.values()):
+        try:
+            res = listener(old, new)
+            if inspect.isawaitable(res):
+                await res
+        except Exception as e:  # pylint: disable=broad-except
+            logger.opt(exception=e).error(f"配置改变的回调 {listener!r} 执行失败")
+    return changed
+
+
+__all__ = [
+    "get_config",
+    "Config",
+    "ConfigListener",
+    "on_config_changed",
+    "reload_config",
+    "read_config",
+    "config_files",
+    "config_files_mtime",
+]
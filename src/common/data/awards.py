@@ -3,6 +3,7 @@
 """
 
 import uuid
+from typing import Iterable
 
 from loguru import logger
 
@@ -15,7 +16,7 @@ from src.base.res import KagamiResourceManagers
 from src.base.res.resource import IResource
 from src.common.download import download
 from src.common.rd import get_random
-from src.common.threading import make_async
+from src.common.threading import run_io
 from src.core.unit_of_work import UnitOfWork
 from src.models.level import level_repo
 from src.models.models import *
@@ -23,19 +24,59 @@ from src.ui.base.strange import make_strange
 from src.ui.base.tools import image_to_bytes
 
 
-async def get_award_info(
-    uow: UnitOfWork, aid: int, uid: int | None = None, sid: int | None = None
-):
-    if uid is not None and sid is not None:
-        raise ValueError("请不要同时启用 uid 和 sid 两个参数")
-    data = await uow.awards.get_info(aid)
+class AwardInfoAssembler:
+    """
+    一次性组装多个小哥的信息。和逐个读取相比，无论有多少个小哥，
+    都只需要读取一次小哥信息、一次用户挂载的皮肤和一次皮肤信息
+    """
 
-    if uid:
-        sid = await uow.skin_inventory.get_using(uid, aid)
-    if sid:
-        sinfo = await uow.skins.get_info_v2(sid)
-        data = sinfo.link(data)
-    return data
+    def __init__(self, uow: UnitOfWork) -> None:
+        self.uow = uow
+
+    async def for_user(
+        self, uid: int | None, aids: Iterable[int]
+    ) -> dict[int, src.ui.types.common.AwardInfo]:
+        """获得多个小哥在某个用户眼中的信息，会带上用户挂载的皮肤
+
+        Args:
+            uid (int | None): 用户 ID，留空时不考虑皮肤
+            aids (Iterable[int]): 小哥 ID，不存在的小哥会被忽略
+
+        Returns:
+            dict[int, AwardInfo]: 小哥 ID 到小哥信息
+        """
+        infos = await self.uow.awards.get_info_dict(list(aids))
+        if not uid or len(infos) == 0:
+            return infos
+
+        using = await self.uow.skin_inventory.get_using_dict(uid)
+        using = {aid: sid for aid, sid in using.items() if aid in infos}
+        skins = await self.uow.skins.get_info_v2_dict(using.values())
+        for aid, sid in using.items():
+            if sid in skins:
+                infos[aid] = skins[sid].link(infos[aid])
+        return infos
+
+    async def one(
+        self, aid: int, uid: int | None = None, sid: int | None = None
+    ) -> src.ui.types.common.AwardInfo:
+        """获得一个小哥的信息，只需要一个小哥时使用
+
+        Args:
+            aid (int): 小哥 ID
+            uid (int | None, optional): 用户 ID，会带上用户挂载的皮肤
+            sid (int | None, optional): 皮肤 ID，会带上这个皮肤，不能和 `uid` 同时使用
+        """
+        if uid is not None and sid is not None:
+            raise ValueError("请不要同时启用 uid 和 sid 两个参数")
+        data = await self.uow.awards.get_info(aid)
+
+        if uid:
+            sid = await self.uow.skin_inventory.get_using(uid, aid)
+        if sid:
+            sinfo = await self.uow.skins.get_info_v2(sid)
+            data = sinfo.link(data)
+        return data
 
 
 async def generate_random_info(uow: UnitOfWork) -> src.ui.types.common.AwardInfo:
@@ -61,7 +102,7 @@ async def generate_random_info(uow: UnitOfWork) -> src.ui.types.common.AwardInfo
     rlen = get_random().randint(2, 4)
     rlen2 = get_random().randint(30, 90)
     rchar = lambda: chr(get_random().randint(0x4E00, 0x9FFF))
-    img = await make_async(make_strange)(sources)
+    img = await make_strange(sources)
     img_name = f"tmp_{uuid.uuid4().hex}.png"
 
     aif = src.ui.types.common.AwardInfo(
@@ -71,7 +112,8 @@ async def generate_random_info(uow: UnitOfWork) -> src.ui.types.common.AwardInfo
         aid=-1,
         sorting=0,
     )
-    aif._img_resource = KagamiResourceManagers.tmp.put(img_name, image_to_bytes(img))
+    data = await run_io(image_to_bytes, img)
+    aif._img_resource = await KagamiResourceManagers.tmp.aput(img_name, data)
     return aif
 
 
@@ -86,10 +128,11 @@ async def use_award(uow: UnitOfWork, uid: int, aid: int, count: int):
     """
     sto, _ = await uow.inventories.give(uid, aid, -count)
     if sto < 0:
-        raise LackException((await get_award_info(uow, aid)).name, count, sto + count)
+        info = await AwardInfoAssembler(uow).one(aid)
+        raise LackException(info.name, count, sto + count)
 
 
 async def download_award_image(aid: int, url: str):
     data = await download(url)
     logger.debug(f"将图片资源保存至：aid_{aid}.png")
-    KagamiResourceManagers.xiaoge.put(f"aid_{aid}.png", data)
+    await KagamiResourceManagers.xiaoge.aput(f"aid_{aid}.png", data)
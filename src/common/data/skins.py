@@ -4,4 +4,4 @@ from src.common.download import download
 
 async def download_skin_image(sid: int, url: str):
     data = await download(url)
-    KagamiResourceManagers.xiaoge.put(f"sid_{sid}.png", data)
+    await KagamiResourceManagers.xiaoge.aput(f"sid_{sid}.png", data)
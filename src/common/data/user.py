@@ -1,11 +1,99 @@
+"""
+一条消息的发送者的信息。
+
+很多指令都要先知道发送者是谁、醒着没有、叫什么名字。这些信息在一条消息的
+处理过程中只会解析一次，缓存在消息上下文里，再由装饰器和处理函数共用。
+"""
+
+from dataclasses import dataclass, field
+from weakref import WeakKeyDictionary
+
 from src.base.command_events import MessageContext
-from src.core.unit_of_work import UnitOfWork
+from src.common.times import now_datetime
+from src.core.unit_of_work import UnitOfWork, get_unit_of_work
 from src.ui.types.common import UserData
 
 
-async def get_user_data(ctx: MessageContext, uow: UnitOfWork):
-    return UserData(
-        uid=await uow.users.get_uid(ctx.sender_id),
-        qqid=str(ctx.sender_id),
-        name=await ctx.get_sender_name(),
+@dataclass
+class UserContext:
+    """
+    收到消息时，发送者的信息快照
+    """
+
+    qqid: int
+    uid: int
+
+    getup_time: float
+    "起床时间，在这之前玩家在睡觉"
+
+    special_name: str | None
+    "玩家设置的特殊名字"
+
+    _ctx: MessageContext = field(repr=False)
+    _display_name: str | None = field(default=None, repr=False)
+
+    @property
+    def awake(self) -> bool:
+        return self.getup_time <= now_datetime().timestamp()
+
+    async def get_display_name(self) -> str:
+        """
+        获得玩家在群里显示的名字，只会查询一次
+        """
+        if self._display_name is None:
+            self._display_name = await self._ctx.get_sender_name()
+        return self._display_name
+
+    async def to_user_data(self) -> UserData:
+        return UserData(
+            uid=self.uid, qqid=str(self.qqid), name=await self.get_display_name()
+        )
+
+
+_user_contexts: WeakKeyDictionary[MessageContext, UserContext] = WeakKeyDictionary()
+
+
+async def _load_user_context(ctx: MessageContext, uow: UnitOfWork) -> UserContext:
+    uid = await uow.users.get_uid(ctx.sender_id)
+    row = await uow.users.identity_map.get_user(uow.session, uid)
+    return UserContext(
+        qqid=ctx.sender_id,
+        uid=uid,
+        getup_time=row["get_up_time"],
+        special_name=row["special_call"] or None,
+        _ctx=ctx,
     )
+
+
+async def get_user_context(
+    ctx: MessageContext, uow: UnitOfWork | None = None
+) -> UserContext:
+    """获得一条消息的发送者的信息，同一条消息只会解析一次
+
+    Args:
+        ctx (MessageContext): 消息上下文
+        uow (UnitOfWork | None, optional): 正在使用的工作单元，不提供时会开一个
+            不加锁的工作单元
+
+    Returns:
+        UserContext: 发送者的信息
+    """
+
+    if ctx in _user_contexts:
+        return _user_contexts[ctx]
+
+    if uow is not None:
+        user = await _load_user_context(ctx, uow)
+    else:
+        async with get_unit_of_work() as _uow:
+            user = await _load_user_context(ctx, _uow)
+
+    _user_contexts[ctx] = user
+    return user
+
+
+async def get_user_data(ctx: MessageContext, uow: UnitOfWork):
+    return await (await get_user_context(ctx, uow)).to_user_data()
+
+
+__all__ = ["UserContext", "get_user_context", "get_user_data"]
@@ -5,6 +5,7 @@
 from enum import Enum
 from pathlib import Path
 
+from src.common.threading import run_io
 from src.ui.types.liechang import DialogueMessage
 
 
@@ -45,6 +46,24 @@ def handle_single_line_dialogue(text: str | DialogueMessage) -> DialogueMessage
     )
 
 
+_dialog_cache: dict[Path, tuple[int, list[DialogueMessage]]] = {}
+
+
+def read_dialog_file(path: Path) -> list[DialogueMessage]:
+    """
+    读取并解析一个对话文稿文件，文件没有被修改时使用缓存
+    """
+    mtime = path.stat().st_mtime_ns
+    cached = _dialog_cache.get(path)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+    with open(path, "r", encoding="utf-8") as f:
+        val = [handle_single_line_dialogue(i) for i in f.readlines()]
+    val = [i for i in val if i is not None]
+    _dialog_cache[path] = (mtime, val)
+    return val
+
+
 def get_dialog(
     origin: (
         DialogFrom | list[DialogueMessage | str] | list[DialogueMessage] | Path
@@ -55,14 +74,27 @@ def get_dialog(
     if isinstance(origin, DialogFrom):
         origin = origin.value
     if isinstance(origin, Path):
-        with open(origin, "r", encoding="utf-8") as f:
-            val = f.readlines()
-
-    if isinstance(origin, list):
-        val = origin
+        val = read_dialog_file(origin)
+    else:
+        val = [handle_single_line_dialogue(i) for i in origin]
+        val = [i for i in val if i is not None]
 
-    val = [handle_single_line_dialogue(i) for i in val]
-    val = [i for i in val if i is not None]
     if allowed_scene is not None:
         val = [i for i in val if i.scene is None or len(i.scene & allowed_scene) > 0]
     return val
+
+
+async def aget_dialog(
+    origin: (
+        DialogFrom | list[DialogueMessage | str] | list[DialogueMessage] | Path
+    ) = DialogFrom.liechang_normal,
+    allowed_scene: set[str] | None = None,
+) -> list[DialogueMessage]:
+    """
+    和 `get_dialog` 一样，但是在线程池中读取文件
+    """
+    if isinstance(origin, DialogFrom):
+        origin = origin.value
+    if isinstance(origin, Path):
+        origin = await run_io(read_dialog_file, origin)
+    return get_dialog(origin, allowed_scene)
@@ -7,7 +7,9 @@ from src.ui.types.common import GlobalFlags
 
 
 def global_flags():
-    return LocalStorage(get_config().global_data_path).context("flags", GlobalFlags)
+    return LocalStorage(get_config().global_data_path, lazy=True).context(
+        "flags", GlobalFlags
+    )
 
 
 def require_hua_out(func: Callable[[MessageContext], Awaitable[None]]):
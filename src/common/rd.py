@@ -1,6 +1,12 @@
 import os
 from random import Random
 
+import numpy as np
+
 
 def get_random():
     return Random(os.urandom(16))
+
+
+def get_np_random():
+    return np.random.default_rng(int.from_bytes(os.urandom(16)))
@@ -1,6 +1,20 @@
+"""
+把会阻塞的工作放到事件循环以外执行。
+
+- 文件读写放进一个有界的线程池 `run_io`，慢的硬盘不会把所有线程都占满；
+- 图片的解码、缩放、模糊这种吃 CPU 的工作放进进程池 `run_image`，
+  不会因为 GIL 拖慢事件循环。进程池开不起来时退回到线程池。
+"""
+
 import asyncio
+import multiprocessing
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
 from typing import Callable, ParamSpec, TypeVar
 
+from loguru import logger
+
 T = TypeVar("T")
 P = ParamSpec("P")
 
@@ -15,3 +29,90 @@ def make_async(func: Callable[P, T]):
         return await loop.run_in_executor(None, _roughly_run)
 
     return _func
+
+
+_io_workers = 8
+_image_workers = 2
+_io_executor: ThreadPoolExecutor | None = None
+_image_executor: Executor | None = None
+
+
+def configure_executors(io_workers: int, image_workers: int):
+    """设置线程池和进程池的大小，需要在第一次使用之前调用
+
+    Args:
+        io_workers (int): 文件读写的线程数
+        image_workers (int): 处理图片的进程数，小于等于 0 时在文件读写的线程池中处理
+    """
+    global _io_workers, _image_workers
+    _io_workers = max(io_workers, 1)
+    _image_workers = image_workers
+
+
+def get_io_executor() -> ThreadPoolExecutor:
+    global _io_executor
+    if _io_executor is None:
+        _io_executor = ThreadPoolExecutor(_io_workers, thread_name_prefix="kagami-io")
+    return _io_executor
+
+
+def get_image_executor() -> Executor:
+    global _image_executor
+    if _image_executor is None:
+        if _image_workers <= 0:
+            return get_io_executor()
+        try:
+            # 用 spawn 启动，不把事件循环和数据库连接复制到子进程里
+            _image_executor = ProcessPoolExecutor(
+                _image_workers, mp_context=multiprocessing.get_context("spawn")
+            )
+        except (OSError, NotImplementedError) as e:
+            logger.warning(f"没能开启处理图片的进程池，改用线程池：{e!r}")
+            _image_executor = get_io_executor()
+    return _image_executor
+
+
+async def run_io(func: Callable[P, T], *args: P.args, **kwargs: P.kwargs) -> T:
+    """
+    在文件读写的线程池中执行一个函数
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_io_executor(), partial(func, *args, **kwargs))
+
+
+async def run_image(func: Callable[P, T], *args: P.args, **kwargs: P.kwargs) -> T:
+    """
+    在处理图片的进程池中执行一个函数。函数和参数都会被 pickle，
+    所以函数必须定义在模块的顶层，参数最好是路径而不是图片本身
+    """
+    global _image_executor
+    loop = asyncio.get_running_loop()
+    job = partial(func, *args, **kwargs)
+    try:
+        return await loop.run_in_executor(get_image_executor(), job)
+    except BrokenProcessPool as e:
+        # 子进程被杀掉了之类，之后都在线程池里处理
+        logger.warning(f"处理图片的进程池坏掉了，改用线程池：{e!r}")
+        _image_executor = get_io_executor()
+        return await loop.run_in_executor(_image_executor, job)
+
+
+def shutdown_executors():
+    """
+    关闭线程池和进程池，关闭时调用
+    """
+    global _io_executor, _image_executor
+    if _image_executor is not None and _image_executor is not _io_executor:
+        _image_executor.shutdown(wait=False, cancel_futures=True)
+    if _io_executor is not None:
+        _io_executor.shutdown(wait=False, cancel_futures=True)
+    _io_executor = _image_executor = None
+
+
+__all__ = [
+    "make_async",
+    "configure_executors",
+    "run_io",
+    "run_image",
+    "shutdown_executors",
+]
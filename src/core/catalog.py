@@ -0,0 +1,350 @@
+"""
+图鉴数据（小哥、别名、猎场、猎场升级、皮肤）的内存快照和版本号。
+
+这些数据只有管理员会修改，却几乎在每一条指令里都要读取。启动时把它们一次性
+读进一个只读的 `CatalogSnapshot`，仓库读取这些数据时直接查字典。
+
+管理员在某个工作单元中修改了这些数据时，仓库会在数据库会话上做一个标记。
+带着这个标记的会话不会再读快照，以免读到自己改动之前的数据；工作单元提交
+成功后，会从数据库重新构建快照，并且把全局的版本号加一。依赖这些数据的缓存
+只需要把版本号作为缓存键的一部分，就能在数据变化后自动失效。
+"""
+
+import asyncio
+from dataclasses import dataclass, replace
+
+from loguru import logger
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.base.db import DatabaseManager
+from src.models.models import Award, AwardAltName, Global, Skin, SkinAltName
+from src.models.up_pool import (
+    PackAwardRelationship,
+    UpPool,
+    UpPoolAwardRelationship,
+)
+
+_CATALOG_CHANGED_KEY = "catalog_changed"
+_catalog_version = 0
+
+
+@dataclass(frozen=True)
+class AwardRow:
+    aid: int
+    name: str
+    description: str
+    level_id: int
+    sorting: int
+    main_pack_id: int
+
+
+@dataclass(frozen=True)
+class UpPoolRow:
+    upid: int
+    belong_pack: int
+    name: str
+    cost: int
+    display: int
+    enabled: bool
+
+
+@dataclass(frozen=True)
+class SkinRow:
+    sid: int
+    aid: int
+    name: str
+    description: str
+    price: float
+    biscuit: int
+    level: int
+    can_be_pulled: bool
+    can_be_bought: bool
+
+
+@dataclass(frozen=True)
+class CatalogSnapshot:
+    """
+    某一个版本的图鉴数据，创建以后不会再被修改
+    """
+
+    version: int
+
+    awards: dict[int, AwardRow]
+    award_names: dict[str, int]
+    "小哥名字（小写）到小哥 ID"
+    award_alt_names: dict[str, int]
+    "小哥别名（小写）到小哥 ID"
+
+    main_aids: dict[int, frozenset[int]]
+    "主猎场到小哥"
+    linked_aids: dict[int, frozenset[int]]
+    "关联猎场到小哥"
+    linked_packs: dict[int, frozenset[int]]
+    "小哥到关联猎场"
+
+    up_pools: dict[int, UpPoolRow]
+    up_pool_names: dict[str, int]
+    up_pool_aids: dict[int, frozenset[int]]
+
+    skins: dict[int, SkinRow]
+    skin_names: dict[str, int]
+    "皮肤名字（小写）到皮肤 ID"
+    skin_alt_names: dict[str, int]
+    "皮肤别名（小写）到皮肤 ID"
+    skins_of_award: dict[int, frozenset[int]]
+
+    pack_count: int | None
+    "开放了几个猎场，全局设置还没有初始化时为 None"
+
+    def get_aid(self, name: str) -> int | None:
+        name = name.lower()
+        return self.award_names.get(name, self.award_alt_names.get(name))
+
+    def get_sid(self, name: str) -> int | None:
+        name = name.lower()
+        return self.skin_names.get(name, self.skin_alt_names.get(name))
+
+    def get_main_aids(self, pack: int) -> frozenset[int]:
+        """
+        获得主猎场为 pack 的小哥，pack 为负数时，获得所有主猎场为负数的小哥
+        """
+        if pack >= 0:
+            return self.main_aids.get(pack, frozenset())
+        return frozenset(
+            aid for p, aids in self.main_aids.items() if p < 0 for aid in aids
+        )
+
+
+def _group(pairs: list[tuple[int, int]]) -> dict[int, frozenset[int]]:
+    result: dict[int, set[int]] = {}
+    for key, value in pairs:
+        result.setdefault(key, set()).add(value)
+    return {key: frozenset(values) for key, values in result.items()}
+
+
+async def load_catalog_snapshot(
+    session: AsyncSession, version: int = 0
+) -> CatalogSnapshot:
+    """从数据库中读取全部图鉴数据
+
+    Args:
+        session (AsyncSession): 数据库会话
+        version (int, optional): 快照的版本号. Defaults to 0.
+
+    Returns:
+        CatalogSnapshot: 图鉴数据的快照
+    """
+
+    async def _rows(*columns):
+        return (await session.execute(select(*columns))).tuples().all()
+
+    awards = {
+        aid: AwardRow(aid, name, description, lid, sorting, pid)
+        for aid, name, description, lid, sorting, pid in await _rows(
+            Award.data_id,
+            Award.name,
+            Award.description,
+            Award.level_id,
+            Award.sorting,
+            Award.main_pack_id,
+        )
+    }
+    links = [
+        (pack, aid)
+        for pack, aid in await _rows(
+            PackAwardRelationship.pack, PackAwardRelationship.aid
+        )
+        if aid is not None
+    ]
+    up_pools = {
+        upid: UpPoolRow(upid, pack, name, cost, display, enabled)
+        for upid, pack, name, cost, display, enabled in await _rows(
+            UpPool.data_id,
+            UpPool.belong_pack,
+            UpPool.name,
+            UpPool.cost,
+            UpPool.display,
+            UpPool.enabled,
+        )
+    }
+    skins = {
+        sid: SkinRow(
+            sid, aid, name, description, price, biscuit, level, pulled == 1, bought == 1
+        )
+        for sid, aid, name, description, price, biscuit, level, pulled, bought in await _rows(
+            Skin.data_id,
+            Skin.aid,
+            Skin.name,
+            Skin.description,
+            Skin.price,
+            Skin.biscuit,
+            Skin.level,
+            Skin.can_be_pulled,
+            Skin.can_be_bought,
+        )
+    }
+    pack_counts = await _rows(Global.opened_pack)
+
+    # 名字相同时，和数据库查询一样只认第一个
+    award_names: dict[str, int] = {}
+    for award in sorted(awards.values(), key=lambda a: a.aid):
+        award_names.setdefault(award.name.lower(), award.aid)
+    skin_names: dict[str, int] = {}
+    for skin in sorted(skins.values(), key=lambda s: s.sid):
+        skin_names.setdefault(skin.name.lower(), skin.sid)
+    up_pool_names: dict[str, int] = {}
+    for pool in sorted(up_pools.values(), key=lambda p: p.upid):
+        up_pool_names.setdefault(pool.name, pool.upid)
+
+    return CatalogSnapshot(
+        version=version,
+        awards=awards,
+        award_names=award_names,
+        award_alt_names={
+            name.lower(): aid
+            for name, aid in await _rows(AwardAltName.name, AwardAltName.award_id)
+        },
+        main_aids=_group(
+            [
+                (a.main_pack_id, a.aid)
+                for a in awards.values()
+                if a.main_pack_id is not None
+            ]
+        ),
+        linked_aids=_group(links),
+        linked_packs=_group([(aid, pack) for pack, aid in links]),
+        up_pools=up_pools,
+        up_pool_names=up_pool_names,
+        up_pool_aids=_group(
+            [
+                (upid, aid)
+                for upid, aid in await _rows(
+                    UpPoolAwardRelationship.pool_id, UpPoolAwardRelationship.aid
+                )
+                if upid is not None and aid is not None
+            ]
+        ),
+        skins=skins,
+        skin_names=skin_names,
+        skin_alt_names={
+            name.lower(): sid
+            for name, sid in await _rows(SkinAltName.name, SkinAltName.skin_id)
+        },
+        skins_of_award=_group(
+            [(s.aid, s.sid) for s in skins.values() if s.aid is not None]
+        ),
+        pack_count=pack_counts[0][0] if len(pack_counts) == 1 else None,
+    )
+
+
+_snapshot: CatalogSnapshot | None = None
+_refresh_lock = asyncio.Lock()
+
+
+def get_catalog_version() -> int:
+    """
+    获得当前图鉴数据的版本号
+    """
+    return _catalog_version
+
+
+def bump_catalog_version() -> int:
+    """
+    让图鉴数据的版本号加一，返回新的版本号
+    """
+    global _catalog_version
+    _catalog_version += 1
+    return _catalog_version
+
+
+def get_catalog_snapshot() -> CatalogSnapshot | None:
+    """
+    获得当前的图鉴数据快照，还没有加载时为 None
+    """
+    return _snapshot
+
+
+def get_catalog(session: AsyncSession) -> CatalogSnapshot | None:
+    """
+    获得一个数据库会话能够使用的图鉴数据快照。如果这个会话修改过图鉴数据，
+    快照就过时了，此时返回 None，调用方应该直接查询数据库
+    """
+    if session.info.get(_CATALOG_CHANGED_KEY, False):
+        return None
+    return _snapshot
+
+
+async def refresh_catalog_snapshot(db: DatabaseManager | None = None) -> None:
+    """从数据库重新构建图鉴数据快照，并且把版本号加一
+
+    Args:
+        db (DatabaseManager | None, optional): 使用的数据库，默认为全局的数据库
+    """
+    global _snapshot
+
+    async with _refresh_lock:
+        session = (db or DatabaseManager.get_single()).get_session()
+        try:
+            snapshot = await load_catalog_snapshot(session)
+        except Exception as e:
+            logger.error(f"构建图鉴数据快照时出现了错误，将直接查询数据库：{e}")
+            _snapshot = None
+            bump_catalog_version()
+            return
+        finally:
+            await session.close()
+
+        # 新快照和新版本号一起换上去，中间没有 await
+        _snapshot = replace(snapshot, version=bump_catalog_version())
+
+
+async def notify_catalog_changed(db: DatabaseManager | None = None) -> None:
+    """
+    在修改了图鉴数据的工作单元提交以后调用。已经加载了快照时重新构建快照，
+    否则只把版本号加一
+    """
+    if _snapshot is None:
+        bump_catalog_version()
+    else:
+        await refresh_catalog_snapshot(db)
+
+
+def clear_catalog_snapshot() -> None:
+    """
+    丢弃图鉴数据快照，之后的读取会直接查询数据库
+    """
+    global _snapshot
+    _snapshot = None
+
+
+def mark_catalog_changed(session: AsyncSession) -> None:
+    """
+    标记这个会话修改了图鉴数据，在提交以后需要更新快照和版本号
+    """
+    session.info[_CATALOG_CHANGED_KEY] = True
+
+
+def pop_catalog_changed(session: AsyncSession) -> bool:
+    """
+    取出并清除会话上的图鉴修改标记
+    """
+    return session.info.pop(_CATALOG_CHANGED_KEY, False)
+
+
+__all__ = [
+    "AwardRow",
+    "UpPoolRow",
+    "SkinRow",
+    "CatalogSnapshot",
+    "load_catalog_snapshot",
+    "get_catalog_version",
+    "bump_catalog_version",
+    "get_catalog_snapshot",
+    "get_catalog",
+    "refresh_catalog_snapshot",
+    "notify_catalog_changed",
+    "clear_catalog_snapshot",
+    "mark_catalog_changed",
+    "pop_catalog_changed",
+]
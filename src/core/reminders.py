@@ -0,0 +1,229 @@
+"""
+提醒的截止时间索引。
+
+玩家可以订阅两种提醒：抓小哥的次数满了（`slot_full`），以及小镜晚安时定下的起床时间
+到了（`getup`）。每条订阅下一次提醒的时间存在 `catch_reminder` 表里，这里在内存中
+维护一个最小堆，只装着接下来一段时间（`horizon` 之前）到期的提醒，
+提醒服务只需要在堆顶到期时醒来。
+
+玩家的抓小哥时间、卡槽数量、起床时间被修改时，仓库会在数据库会话上标记这名玩家，
+工作单元提交前会在同一个事务里重新计算这些玩家的提醒时间，提交后再更新内存中的索引。
+全局的抓小哥周期被修改时，所有的 `slot_full` 提醒会用一条语句一起重新计算。
+"""
+
+import heapq
+from dataclasses import dataclass, field
+from typing import Callable, Iterable
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.common.times import now_datetime
+
+_REMINDER_CHANGES_KEY = "reminder_changes"
+
+REMINDER_KINDS = ("slot_full", "getup")
+
+
+@dataclass
+class ReminderChanges:
+    """
+    一个工作单元中需要重新计算提醒时间的玩家
+    """
+
+    uids: dict[str, set[int]] = field(default_factory=dict[str, set[int]])
+    "每种提醒需要重新计算的玩家"
+
+    all_kinds: set[str] = field(default_factory=set[str])
+    "需要全部重新计算的提醒种类"
+
+    def __bool__(self) -> bool:
+        return len(self.uids) > 0 or len(self.all_kinds) > 0
+
+
+def _changes(session: AsyncSession) -> ReminderChanges:
+    return session.info.setdefault(_REMINDER_CHANGES_KEY, ReminderChanges())
+
+
+def mark_reminder_changed(session: AsyncSession, uid: int, kind: str) -> None:
+    """
+    标记一名玩家的某种提醒需要重新计算，只有订阅了这种提醒的玩家会被标记
+    """
+    if get_reminder_index().is_subscribed(uid, kind):
+        _changes(session).uids.setdefault(kind, set()).add(uid)
+
+
+def mark_subscription_changed(session: AsyncSession, uid: int, kind: str) -> None:
+    """
+    标记一名玩家订阅或取消订阅了某种提醒
+    """
+    _changes(session).uids.setdefault(kind, set()).add(uid)
+
+
+def mark_all_reminders_changed(session: AsyncSession, kind: str) -> None:
+    """
+    标记某种提醒需要全部重新计算
+    """
+    if get_reminder_index().has_subscribers(kind):
+        _changes(session).all_kinds.add(kind)
+
+
+def pop_reminder_changes(session: AsyncSession) -> ReminderChanges:
+    """
+    取出并清除会话上标记的提醒变化
+    """
+    return session.info.pop(_REMINDER_CHANGES_KEY, ReminderChanges())
+
+
+ReminderRow = tuple[int, str, float | None]
+"玩家 ID、提醒种类、下一次提醒的时间"
+
+
+class ReminderIndex:
+    """
+    内存中的提醒索引
+    """
+
+    subscribed: dict[str, set[int]]
+    "每种提醒有哪些玩家订阅了"
+
+    horizon: float
+    "截止时间在这之前的提醒都在堆里，之后的留在数据库里"
+
+    on_change: Callable[[], None] | None
+    "最早的截止时间可能变了时调用，提醒服务用它重新设定醒来的时间"
+
+    def __init__(self) -> None:
+        self.subscribed = {kind: set() for kind in REMINDER_KINDS}
+        self.horizon = 0
+        self.on_change = None
+        self._due: dict[tuple[int, str], float] = {}
+        self._heap: list[tuple[float, int, str]] = []
+
+    def is_subscribed(self, uid: int, kind: str) -> bool:
+        return uid in self.subscribed.get(kind, ())
+
+    def has_subscribers(self, kind: str) -> bool:
+        return len(self.subscribed.get(kind, ())) > 0
+
+    def __len__(self) -> int:
+        return len(self._due)
+
+    def _set(self, uid: int, kind: str, due: float | None):
+        if due is None or due > self.horizon:
+            self._due.pop((uid, kind), None)
+            return
+        self._due[(uid, kind)] = due
+        heapq.heappush(self._heap, (due, uid, kind))
+
+    def _changed(self):
+        if self.on_change is not None:
+            self.on_change()
+
+    def load(
+        self,
+        subscriptions: Iterable[tuple[int, str]],
+        rows: Iterable[ReminderRow],
+        horizon: float,
+    ):
+        """用数据库中的数据重建整个索引
+
+        Args:
+            subscriptions (Iterable[tuple[int, str]]): 所有的订阅
+            rows (Iterable[ReminderRow]): 截止时间在 `horizon` 之前的提醒
+            horizon (float): 这次读取的时间范围
+        """
+        self.subscribed = {kind: set() for kind in REMINDER_KINDS}
+        for uid, kind in subscriptions:
+            self.subscribed.setdefault(kind, set()).add(uid)
+        self.extend(rows, horizon)
+
+    def extend(self, rows: Iterable[ReminderRow], horizon: float):
+        """把时间范围延长到 `horizon`，并放入新读取的提醒
+
+        Args:
+            rows (Iterable[ReminderRow]): 截止时间在 `horizon` 之前的提醒
+            horizon (float): 新的时间范围
+        """
+        self.horizon = horizon
+        self._due.clear()
+        self._heap.clear()
+        for uid, kind, due in rows:
+            self._set(uid, kind, due)
+        self._changed()
+
+    def apply(self, changes: ReminderChanges, rows: Iterable[ReminderRow]):
+        """把一个工作单元中重新计算的提醒时间写进索引
+
+        Args:
+            changes (ReminderChanges): 这个工作单元标记的变化
+            rows (Iterable[ReminderRow]): 重新计算以后，这些玩家的提醒；
+                全部重新计算的种类只需要给出截止时间在 `horizon` 之前的提醒
+        """
+        for kind in changes.all_kinds:
+            for key in [k for k in self._due if k[1] == kind]:
+                del self._due[key]
+
+        present: set[tuple[int, str]] = set()
+        for uid, kind, due in rows:
+            present.add((uid, kind))
+            self.subscribed.setdefault(kind, set()).add(uid)
+            self._set(uid, kind, due)
+
+        # 没有读出来的就是取消了订阅
+        for kind, uids in changes.uids.items():
+            for uid in uids:
+                if (uid, kind) not in present:
+                    self.subscribed.get(kind, set()).discard(uid)
+                    self._due.pop((uid, kind), None)
+
+        self._changed()
+
+    def _clean(self):
+        while self._heap:
+            due, uid, kind = self._heap[0]
+            if self._due.get((uid, kind)) == due:
+                return
+            heapq.heappop(self._heap)
+
+    def next_due(self) -> float | None:
+        """
+        最早的截止时间，没有提醒时为 None
+        """
+        self._clean()
+        return self._heap[0][0] if self._heap else None
+
+    def pop_due(self, now: float | None = None) -> list[ReminderRow]:
+        """
+        取出所有已经到期的提醒
+        """
+        if now is None:
+            now = now_datetime().timestamp()
+        res: list[ReminderRow] = []
+        while (due := self.next_due()) is not None and due <= now:
+            _, uid, kind = heapq.heappop(self._heap)
+            del self._due[(uid, kind)]
+            res.append((uid, kind, due))
+        return res
+
+
+reminder_index = ReminderIndex()
+
+
+def get_reminder_index() -> ReminderIndex:
+    """
+    获得当前 App 正在使用的提醒索引
+    """
+    return reminder_index
+
+
+__all__ = [
+    "ReminderChanges",
+    "ReminderIndex",
+    "ReminderRow",
+    "REMINDER_KINDS",
+    "get_reminder_index",
+    "mark_reminder_changed",
+    "mark_subscription_changed",
+    "mark_all_reminders_changed",
+    "pop_reminder_changes",
+]
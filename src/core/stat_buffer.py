@@ -0,0 +1,254 @@
+"""
+统计数据的写回缓冲区。
+
+统计数据只会被加减，所以没必要在每条指令的事务里逐条读写。`StatService`
+把增量暂存在数据库会话上，工作单元提交成功后，这些增量会被合并进进程内的
+缓冲区；缓冲区按统计数据的完整键把增量聚合起来，定期、或在积压过多时、
+或在 Bot 关闭时，用一次批量写入刷进数据库，同时更新按天汇总的统计。
+按天汇总时使用增量进入缓冲区（也就是事件发生）的日期，而不是写入的日期，
+跨过零点的积压不会被算到第二天。回滚了的工作单元不会留下统计。
+
+读取统计时要把数据库中的值和缓冲区中的增量加起来。写入的事务提交到一半时，
+数据库里可能已经有了这批增量，缓冲区里也还留着它们，所以读取数据库要通过
+`StatBuffer.stable_read`：和提交重叠了的读取会重新进行，读完以后立刻
+（中间不要 await）加上 `pending_sum`，就不会重复计算。
+"""
+
+import asyncio
+import datetime
+from typing import Awaitable, Callable, Literal, TypeVar
+
+from loguru import logger
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.base.db import DatabaseManager
+from src.common.times import now_datetime
+from src.repositories.stats_repository import StatKey, StatsRepository
+from src.repositories.stats_rollup_repository import StatRollupRepository
+
+_STAGED_STATS_KEY = "staged_stats"
+
+T = TypeVar("T")
+
+
+def stage_stat(session: AsyncSession, key: StatKey, delta: int) -> None:
+    """
+    把一条统计增量暂存在会话上，等会话所在的工作单元提交以后再写入缓冲区
+    """
+    staged: dict[StatKey, int] = session.info.setdefault(_STAGED_STATS_KEY, {})
+    staged[key] = staged.get(key, 0) + delta
+
+
+def pop_staged_stats(session: AsyncSession) -> dict[StatKey, int]:
+    """
+    取出并清除会话上暂存的统计增量
+    """
+    return session.info.pop(_STAGED_STATS_KEY, {})
+
+
+def get_staged_stats(session: AsyncSession) -> dict[StatKey, int]:
+    """
+    获得会话上暂存的统计增量，不会清除它们
+    """
+    return session.info.get(_STAGED_STATS_KEY, {})
+
+
+def match_stat_key(
+    key: StatKey,
+    uid: int | None | Literal["no_limit"],
+    stat_type: str,
+    linked_uid: int | None | Literal["no_limit"] = "no_limit",
+    linked_aid: int | None | Literal["no_limit"] = "no_limit",
+    linked_sid: int | None | Literal["no_limit"] = "no_limit",
+    linked_pid: int | None | Literal["no_limit"] = "no_limit",
+    linked_rid: int | None | Literal["no_limit"] = "no_limit",
+    linked_upid: int | None | Literal["no_limit"] = "no_limit",
+) -> bool:
+    """
+    判断一个统计键是否满足筛选条件，条件的含义和 `StatsRepository.get_sum` 一致
+    """
+    if key.stat_type != stat_type:
+        return False
+    for value, cond in (
+        (key.uid, uid),
+        (key.linked_uid, linked_uid),
+        (key.linked_aid, linked_aid),
+        (key.linked_sid, linked_sid),
+        (key.linked_pid, linked_pid),
+        (key.linked_rid, linked_rid),
+        (key.linked_upid, linked_upid),
+    ):
+        if cond != "no_limit" and value != cond:
+            return False
+    return True
+
+
+class StatBuffer:
+    """
+    进程内的统计数据缓冲区，会把相同键的增量合并在一起
+    """
+
+    pending: dict[StatKey, int]
+    "还没有开始写入的增量"
+
+    flushing: dict[StatKey, int]
+    "正在写入数据库的增量"
+
+    pending_days: dict[datetime.date, dict[StatKey, int]]
+    "还没有开始写入的增量，按事件发生的日期分开，用于按天汇总"
+
+    flushing_days: dict[datetime.date, dict[StatKey, int]]
+    "正在写入数据库的按天分开的增量"
+
+    max_pending: int
+    "积压的键超过这个数量时，立即开始写入"
+
+    def __init__(self, max_pending: int = 512) -> None:
+        self.pending = {}
+        self.flushing = {}
+        self.pending_days = {}
+        self.flushing_days = {}
+        self.max_pending = max_pending
+        self._lock = asyncio.Lock()
+        self._task: asyncio.Task[None] | None = None
+        self._generation = 0
+        self._idle = asyncio.Event()
+        self._idle.set()
+
+    def add_many(
+        self, deltas: dict[StatKey, int], day: datetime.date | None = None
+    ) -> None:
+        """
+        把一批增量合并进缓冲区，`day` 是事件发生的日期，默认为今天
+        """
+        day = day or now_datetime().date()
+        by_day = self.pending_days.setdefault(day, {})
+        for key, delta in deltas.items():
+            self.pending[key] = self.pending.get(key, 0) + delta
+            by_day[key] = by_day.get(key, 0) + delta
+
+        if len(self.pending) >= self.max_pending and (
+            self._task is None or self._task.done()
+        ):
+            try:
+                self._task = asyncio.get_running_loop().create_task(self.flush())
+            except RuntimeError:
+                # 没有运行中的事件循环，留给定时写入处理
+                pass
+
+    def add(self, key: StatKey, delta: int, day: datetime.date | None = None) -> None:
+        self.add_many({key: delta}, day)
+
+    def pending_sum(
+        self,
+        uid: int | None | Literal["no_limit"],
+        stat_type: str,
+        linked_uid: int | None | Literal["no_limit"] = "no_limit",
+        linked_aid: int | None | Literal["no_limit"] = "no_limit",
+        linked_sid: int | None | Literal["no_limit"] = "no_limit",
+        linked_pid: int | None | Literal["no_limit"] = "no_limit",
+        linked_rid: int | None | Literal["no_limit"] = "no_limit",
+        linked_upid: int | None | Literal["no_limit"] = "no_limit",
+    ) -> int:
+        """
+        统计缓冲区中还没有写入数据库的增量之和
+        """
+        total = 0
+        for data in (self.pending, self.flushing):
+            for key, delta in data.items():
+                if match_stat_key(
+                    key,
+                    uid,
+                    stat_type,
+                    linked_uid,
+                    linked_aid,
+                    linked_sid,
+                    linked_pid,
+                    linked_rid,
+                    linked_upid,
+                ):
+                    total += delta
+        return total
+
+    async def stable_read(self, read: Callable[[], Awaitable[T]]) -> T:
+        """读取已经写入数据库的统计，读取的过程中不会有写入提交
+
+        读取和写入的提交重叠时重新读取。返回以后立刻调用 `pending_sum`，
+        得到的增量和读到的数据库内容正好接得上
+
+        Args:
+            read (Callable[[], Awaitable[T]]): 读取数据库的函数
+
+        Returns:
+            T: `read` 的返回值
+        """
+        while True:
+            await self._idle.wait()
+            generation = self._generation
+            result = await read()
+            if self._idle.is_set() and generation == self._generation:
+                return result
+
+    async def flush(self, db: DatabaseManager | None = None) -> int:
+        """把缓冲区中的全部增量写入数据库
+
+        Args:
+            db (DatabaseManager | None, optional): 使用的数据库，默认为全局的数据库
+
+        Returns:
+            int: 写入的统计数据的条数
+        """
+        async with self._lock:
+            if len(self.pending) == 0:
+                return 0
+            self.flushing, self.pending = self.pending, {}
+            self.flushing_days, self.pending_days = self.pending_days, {}
+            count = len(self.flushing)
+
+            session = (db or DatabaseManager.get_single()).get_session()
+            try:
+                await StatsRepository(session).bulk_add(self.flushing)
+                rollups = StatRollupRepository(session)
+                for day, deltas in self.flushing_days.items():
+                    await rollups.add(deltas, day)
+                # 提交的过程中其他会话随时可能看到这批增量
+                self._idle.clear()
+                await session.commit()
+            except Exception as e:
+                await session.rollback()
+                logger.error(f"写入统计数据时出现了错误，将在下次重试：{e}")
+                for key, delta in self.flushing.items():
+                    self.pending[key] = self.pending.get(key, 0) + delta
+                for day, deltas in self.flushing_days.items():
+                    by_day = self.pending_days.setdefault(day, {})
+                    for key, delta in deltas.items():
+                        by_day[key] = by_day.get(key, 0) + delta
+                count = 0
+            finally:
+                self.flushing = {}
+                self.flushing_days = {}
+                self._generation += 1
+                self._idle.set()
+                await session.close()
+
+            return count
+
+
+stat_buffer = StatBuffer()
+
+
+def get_stat_buffer() -> StatBuffer:
+    """
+    获得当前 App 正在使用的统计数据缓冲区
+    """
+    return stat_buffer
+
+
+__all__ = [
+    "StatBuffer",
+    "get_stat_buffer",
+    "stage_stat",
+    "pop_staged_stats",
+    "get_staged_stats",
+    "match_stat_key",
+]
@@ -19,16 +19,22 @@ database operations within a transaction are committed or rolled back together.
 
 import asyncio
 from types import TracebackType
-from typing import Self
+from typing import Iterable, Self
 
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from src.base.lock_manager import get_lock
+from src.base.identity_map import pop_identity_map
+from src.base.lock_manager import KeyLock, caller_name, get_lock_manager
+from src.core.catalog import notify_catalog_changed, pop_catalog_changed
+from src.core.reminders import get_reminder_index, pop_reminder_changes
+from src.core.stat_buffer import get_stat_buffer, pop_staged_stats
 from src.models.item import ItemInventory
 from src.models.level import level_repo
 from src.repositories.item_repository import ItemRepository
+from src.repositories.reminder_repository import ReminderRepository
 from src.repositories.skin_inventory_repository import SkinInventoryRepository
 from src.repositories.stats_repository import StatsRepository
+from src.repositories.stats_rollup_repository import StatRollupRepository
 from src.repositories.up_pool_repository import PackRepository, UpPoolRepository
 from src.repositories.user_repository import (
     BiscuitRepository,
@@ -57,10 +63,12 @@ class UnitOfWork:
 
     db_manager: DatabaseManager
     _session: AsyncSession | None
-    lock: asyncio.Lock | None
+    lock: KeyLock | asyncio.Lock | None
 
     def __init__(
-        self, db_manager: DatabaseManager, lock: asyncio.Lock | None = None
+        self,
+        db_manager: DatabaseManager,
+        lock: KeyLock | asyncio.Lock | None = None,
     ) -> None:
         self.db_manager = db_manager
         self._session = None
@@ -83,9 +91,10 @@ class UnitOfWork:
         return self._session
 
     async def __aenter__(self) -> Self:
-        self._session = self.db_manager.get_session()
+        # 先拿到锁再打开会话，等锁超时的时候就不用关闭会话了
         if self.lock:
             await self.lock.acquire()
+        self._session = self.db_manager.get_session()
         return self
 
     async def __aexit__(
@@ -94,14 +103,34 @@ class UnitOfWork:
         exc_cal: BaseException | None,
         exc_tb: TracebackType | None,
     ):
-        if exc_type is None:
-            await self.session.commit()
-        else:
-            await self.session.rollback()
-        await self.session.close()
-        self._session = None
-        if self.lock is not None:
-            self.lock.release()
+        identity_map = pop_identity_map(self.session)
+        catalog_changed = pop_catalog_changed(self.session)
+        staged_stats = pop_staged_stats(self.session)
+        reminder_changes = pop_reminder_changes(self.session)
+        try:
+            if exc_type is None:
+                # 标识映射中积攒的改动要在提交前写入
+                if identity_map is not None:
+                    await identity_map.flush(self.session)
+                # 提醒时间由刚写入的玩家数据算出来，和这些数据一起提交
+                reminder_rows = None
+                if reminder_changes:
+                    reminder_rows = await ReminderRepository(
+                        self.session
+                    ).apply_changes(reminder_changes, get_reminder_index().horizon)
+                await self.session.commit()
+                if catalog_changed:
+                    await notify_catalog_changed(self.db_manager)
+                get_stat_buffer().add_many(staged_stats)
+                if reminder_rows is not None:
+                    get_reminder_index().apply(reminder_changes, reminder_rows)
+            else:
+                await self.session.rollback()
+        finally:
+            await self.session.close()
+            self._session = None
+            if self.lock is not None:
+                self.lock.release()
 
     @property
     def users(self):
@@ -167,16 +196,36 @@ class UnitOfWork:
     def stats(self):
         return StatsRepository(self.session)
 
+    @property
+    def stat_rollups(self):
+        return StatRollupRepository(self.session)
+
     @property
     def items(self):
         return ItemRepository(self.session)
 
+    @property
+    def reminders(self):
+        return ReminderRepository(self.session)
+
 
-def get_unit_of_work(qqid: str | int | None = None):
-    """获得一个工作单元。如果提供了相应的 QQID，可以加锁"""
-    lock: asyncio.Lock | None = None
+def get_unit_of_work(
+    qqid: str | int | Iterable[str | int] | None = None,
+    timeout: float | None = None,
+):
+    """获得一个工作单元。如果提供了相应的 QQID，可以加锁
+
+    Args:
+        qqid (str | int | Iterable[str | int] | None, optional): 要锁住的玩家，
+            两个人之间的操作可以同时锁住两个人，获取的顺序是固定的，不会死锁
+        timeout (float | None, optional): 等待锁的超时时间，默认使用配置中的值
+    """
+    lock: KeyLock | None = None
     if qqid is not None:
-        lock = get_lock(str(qqid))
+        qqids = [qqid] if isinstance(qqid, (str, int)) else list(qqid)
+        lock = get_lock_manager().lock(
+            *(str(i) for i in qqids), timeout=timeout, name=caller_name()
+        )
     return UnitOfWork(DatabaseManager.get_single(), lock=lock)
 
 
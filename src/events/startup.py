@@ -4,15 +4,142 @@ import nonebot
 from loguru import logger
 
 from src.base.db import DatabaseManager
+from src.base.event.admission import get_admission_controller
+from src.base.event.background import get_background_runner
 from src.base.event.event_timer import addInterval
-from src.common.config import get_config
+from src.base.event.timer_service import get_timer_service
+from src.base.lock_manager import get_lock_manager
+from src.common.config import (
+    Config,
+    config_files_mtime,
+    get_config,
+    on_config_changed,
+    reload_config,
+)
+from src.common.threading import configure_executors, shutdown_executors
+from src.core.catalog import get_catalog_snapshot, refresh_catalog_snapshot
+from src.core.stat_buffer import get_stat_buffer
+from src.services.reminder import get_reminder_service
 
 driver = nonebot.get_driver()
 
 
 @driver.on_startup
 async def _():
+    if get_config().autosave_interval <= 0:
+        return
+
     @functools.partial(addInterval, get_config().autosave_interval, skip_first=True)
     async def _():
         await DatabaseManager.get_single().manual_checkpoint()
         logger.info("数据库自动保存指令执行完了。")
+
+
+@driver.on_startup
+async def _():
+    await refresh_catalog_snapshot()
+    snapshot = get_catalog_snapshot()
+    if snapshot is not None:
+        logger.info(
+            f"图鉴数据快照加载好了：{len(snapshot.awards)} 个小哥，"
+            f"{len(snapshot.skins)} 个皮肤，{len(snapshot.up_pools)} 个猎场升级"
+        )
+
+
+@driver.on_startup
+async def _():
+    # 执行槽和队列在第一次使用时创建，这几项配置需要重启才能生效
+    runner = get_background_runner()
+    runner.max_workers = get_config().background_workers
+    runner.max_queue = get_config().background_queue_size
+    runner.retries = get_config().background_retries
+
+    configure_executors(get_config().io_workers, get_config().image_workers)
+
+
+def apply_runtime_config(config: Config):
+    """
+    把配置写进运行中的服务，这些配置在重新加载以后可以立即生效
+    """
+    get_stat_buffer().max_pending = config.stats_flush_threshold
+    get_reminder_service().coalesce = config.reminder_coalesce_interval
+
+    admission = get_admission_controller()
+    admission.max_in_flight = config.admission_max_in_flight
+    admission.max_in_flight_per_group = config.admission_max_in_flight_per_group
+    admission.lag_threshold = config.admission_lag_threshold
+    admission.wait_timeout = config.admission_wait_timeout
+
+    get_lock_manager().default_timeout = (
+        config.lock_timeout if config.lock_timeout > 0 else None
+    )
+
+
+@on_config_changed
+def _apply_reloaded_config(old: Config, new: Config):
+    apply_runtime_config(new)
+
+
+@driver.on_startup
+async def _():
+    apply_runtime_config(get_config())
+
+
+@driver.on_startup
+async def _():
+    service = get_reminder_service()
+    service.horizon = get_config().reminder_horizon
+    await service.start()
+
+
+@driver.on_startup
+async def _():
+    if get_config().config_watch_interval <= 0:
+        return
+
+    last_mtime = config_files_mtime()
+
+    async def _():
+        nonlocal last_mtime
+        mtime = config_files_mtime()
+        if mtime == last_mtime:
+            return
+        last_mtime = mtime
+        logger.info("检测到配置文件被修改了，重新加载配置")
+        await reload_config()
+
+    get_timer_service().call_every(
+        get_config().config_watch_interval, _, name="watch_config_files"
+    )
+
+
+@driver.on_startup
+async def _():
+    if get_config().stats_flush_interval > 0:
+
+        @functools.partial(
+            addInterval, get_config().stats_flush_interval, skip_first=True
+        )
+        async def _():
+            await get_stat_buffer().flush()
+
+
+@driver.on_shutdown
+async def _():
+    # 先停下定时任务，免得关闭的过程中又有新的任务开始
+    get_reminder_service().stop()
+    await get_timer_service().close()
+    await get_admission_controller().close()
+
+    # 后台的处理函数还会产生统计数据，所以要先等它们执行完
+    await get_background_runner().drain(get_config().background_drain_timeout)
+    stats = get_background_runner().get_stats()
+    logger.info(
+        f"后台执行器关闭了，一共执行了 {stats.completed} 个处理函数，"
+        f"失败了 {stats.failed} 个"
+    )
+
+    count = await get_stat_buffer().flush()
+    logger.info(f"关闭前写入了 {count} 条统计数据")
+
+    shutdown_executors()
@@ -1,9 +1,122 @@
+from dataclasses import dataclass
+
+import numpy as np
+
 from src.base.exceptions import NoAwardException
 from src.common.dataclasses import Pick, Picks
-from src.common.rd import get_random
+from src.common.rd import get_np_random, get_random
 from src.core.unit_of_work import UnitOfWork
+from src.logic.sampler import AwardSampler, get_sampler
 from src.services.pool import PoolService
 
+BAIBIANXIAOGE_AID = 35
+
+
+@dataclass
+class CatchContext:
+    """
+    抓小哥前一次性预载的数据，抓小哥的过程只在内存中读取它，
+    从而让每次抓小哥的查询次数和抓的次数无关。
+    """
+
+    uid: int
+    pid: int
+    flags: set[str]
+    "用户当前的 Flags"
+
+    sampler: AwardSampler
+    "当前猎场和猎场升级的抽样器"
+
+    shi_aid: int | None
+    "是小哥的 ID，不存在时为 None"
+
+    award_levels: dict[int, int]
+    "所有候选小哥的等级"
+
+    stats: dict[int, int]
+    "所有候选小哥在抓之前的统计数量"
+
+    baibianxiaoge_sids: list[int]
+    "百变小哥中，用户还没有拥有的皮肤"
+
+
+async def build_catch_context(uow: UnitOfWork, uid: int) -> CatchContext:
+    """
+    用固定次数的批量查询，预载抓小哥时需要的全部数据
+
+    Args:
+        uow (UnitOfWork): 工作单元
+        uid (int): 用户在数据库中的 ID
+
+    Returns:
+        CatchContext: 抓小哥的上下文
+    """
+
+    pool_service = PoolService(uow)
+    pid = await pool_service.get_current_pack(uid)
+    upid = await uow.up_pool.get_using(uid)
+    sampler = await get_sampler(uow, pid, upid)
+    shi_aid = await uow.awards.get_aid("是小哥")
+
+    award_levels = dict(sampler.award_levels)
+    if shi_aid is not None and shi_aid not in award_levels:
+        award_levels[shi_aid] = await uow.awards.get_lid(shi_aid)
+
+    inventory = await uow.inventories.get_inventory_dict(uid, list(award_levels))
+    stats = {aid: sto + use for aid, (sto, use) in inventory.items()}
+
+    baibianxiaoge_sids: list[int] = []
+    if BAIBIANXIAOGE_AID in award_levels:
+        owned = set(await uow.skin_inventory.get_list(uid, BAIBIANXIAOGE_AID))
+        baibianxiaoge_sids = sorted(
+            await uow.skins.get_all_sids_of_one_award(BAIBIANXIAOGE_AID) - owned
+        )
+
+    return CatchContext(
+        uid=uid,
+        pid=pid,
+        flags=await uow.user_flag.get(uid),
+        sampler=sampler,
+        shi_aid=shi_aid,
+        award_levels=award_levels,
+        stats=stats,
+        baibianxiaoge_sids=baibianxiaoge_sids,
+    )
+
+
+def roll_awards(
+    ctx: CatchContext, count: int, rd: np.random.Generator
+) -> dict[int, int]:
+    """
+    只在内存中完成抓小哥的抽取过程。如果用到了「是」这个 Flag，
+    会直接从 `ctx.flags` 中移除，由调用者负责写回数据库。
+
+    Args:
+        ctx (CatchContext): 预载的抓小哥上下文
+        count (int): 抓小哥的次数
+        rd (np.random.Generator): 随机数生成器
+
+    Returns:
+        dict[int, int]: 每个小哥被抓到的次数
+    """
+
+    if ctx.sampler.empty:
+        raise NoAwardException()
+
+    picked: dict[int, int] = {}
+
+    # 对是小哥进行特判
+    if count > 0 and "是" in ctx.flags:
+        ctx.flags.remove("是")
+        if ctx.shi_aid is not None:
+            picked[ctx.shi_aid] = 1
+            count -= 1
+
+    for aid, c in ctx.sampler.sample(count, rd).items():
+        picked[aid] = picked.get(aid, 0) + c
+
+    return picked
+
 
 async def pickAwards(uow: UnitOfWork, uid: int, count: int) -> Picks:
     """
@@ -19,79 +132,52 @@ async def pickAwards(uow: UnitOfWork, uid: int, count: int) -> Picks:
         Picks: 抓小哥结果的记录
     """
 
-    up_pool_posibility = {1: 0.1, 2: 0.2, 3: 0.4, 4: 0.5, 5: 0.6}
+    assert count >= 0
 
-    pool_service = PoolService(uow)
-    picked: list[int] = []
-    aids_set = await pool_service.get_aids(uid)
-    aids = await uow.awards.group_by_level(aids_set)
+    ctx = await build_catch_context(uow, uid)
+    had_shi_flag = "是" in ctx.flags
+    picked = roll_awards(ctx, count, get_np_random())
 
-    picks = Picks(
-        awards={},
-        money=0,
-        uid=uid,
-        pid=await pool_service.get_current_pack(uid),
-    )
-    assert count >= 0
+    if had_shi_flag and "是" not in ctx.flags:
+        await uow.user_flag.set(uid, ctx.flags)
 
-    levels = [uow.levels.get_by_id(i) for i in aids]
-    weights = [level.weight for level in levels]
+    picks = Picks(awards={}, money=0, uid=uid, pid=ctx.pid)
+    baibianxiaoge_sids: list[int] = []
+    rd = get_random()
 
-    if len(levels) == 0:
-        raise NoAwardException()
+    for aid, delta in picked.items():
+        pick = Pick(
+            beforeStats=ctx.stats.get(aid, 0),
+            delta=delta,
+            level=ctx.award_levels[aid],
+        )
+        picks.awards[aid] = pick
+        picks.money += uow.levels.get_by_id(pick.level).awarding * delta
 
-    # 开始抓小哥
-    for _ in range(count):
-        # 对是小哥进行特判
-        if await uow.user_flag.have(uid, "是"):
-            await uow.user_flag.remove(uid, "是")
-            shi = await uow.awards.get_aid("是小哥")
-            if shi is None:
-                pass
-            else:
-                picked.append(shi)
-                continue
-
-        level = get_random().choices(levels, weights)[0]
-        limited_aids = aids[level.lid]
-
-        if get_random().random() < up_pool_posibility[level.lid]:
-            _aids = await pool_service.get_up_aids(uid)
-            _grouped = await uow.awards.group_by_level(_aids)
-            _limited = _grouped.get(level.lid, set())
-            if len(_limited) > 0:
-                limited_aids = _grouped[level.lid]
-
-        aid = get_random().choice(list(limited_aids))
-        picked.append(aid)
-
-    new_calculated: set[int] = set()
-
-    for aid in picked:
-        if aid not in picks.awards:
-            picks.awards[aid] = Pick(
-                beforeStats=await uow.inventories.get_stats(uid, aid),
-                delta=0,
-                level=await uow.awards.get_lid(aid),
-            )
-
-        picks.awards[aid].delta += 1
-        picks.money += uow.levels.get_by_id(picks.awards[aid].level).awarding
-
-        if picks.awards[aid].beforeStats == 0 and aid not in new_calculated:
+        repeated = delta
+        if pick.beforeStats == 0:
             picks.money += 20
-            new_calculated.add(aid)
-        elif aid == 35:
-            # 处理百变小哥
-            await handle_baibianxiaoge(uow, uid)
+            repeated -= 1
+
+        if aid == BAIBIANXIAOGE_AID:
+            # 处理百变小哥，第一次抓到以外的每一只都会尝试给一个新皮肤
+            for _ in range(min(repeated, len(ctx.baibianxiaoge_sids))):
+                sid = rd.choice(ctx.baibianxiaoge_sids)
+                ctx.baibianxiaoge_sids.remove(sid)
+                baibianxiaoge_sids.append(sid)
+
+    await uow.skin_inventory.give_many(uid, baibianxiaoge_sids)
+    if len(baibianxiaoge_sids) > 0:
+        await uow.skin_inventory.use(uid, BAIBIANXIAOGE_AID, baibianxiaoge_sids[-1])
+
     return picks
 
 
 async def handle_baibianxiaoge(uow: UnitOfWork, uid: int) -> int | None:
-    sids = await uow.skins.get_all_sids_of_one_award(35)
-    sids = [sid for sid in sids if not await uow.skin_inventory.do_user_have(uid, sid)]
+    owned = set(await uow.skin_inventory.get_list(uid, BAIBIANXIAOGE_AID))
+    sids = sorted(await uow.skins.get_all_sids_of_one_award(BAIBIANXIAOGE_AID) - owned)
     if len(sids) > 0:
         sid = get_random().choice(sids)
         await uow.skin_inventory.give(uid, sid)
-        await uow.skin_inventory.use(uid, 35, sid)
+        await uow.skin_inventory.use(uid, BAIBIANXIAOGE_AID, sid)
         return sid
@@ -0,0 +1,195 @@
+"""
+抓小哥的抽样器。
+
+同一个猎场、同一个猎场升级、同一版图鉴数据下，抓小哥的概率分布是固定的，
+所以把它预先编译成数组缓存起来。抓 n 次时，先按等级权重多项分布地分配每个
+等级的次数，再在每个等级内部一次性地分配到小哥上，耗时只和等级、小哥的数量
+有关，而和抓的次数无关。
+"""
+
+from collections import OrderedDict
+
+import numpy as np
+
+from src.core.catalog import get_catalog_version
+from src.core.unit_of_work import UnitOfWork
+from src.models.level import level_repo
+
+UP_POOL_POSIBILITY = {1: 0.1, 2: 0.2, 3: 0.4, 4: 0.5, 5: 0.6}
+
+
+class AwardSampler:
+    """
+    编译好的抓小哥概率分布，创建后只读
+    """
+
+    lids: list[int]
+    "参与抽样的等级"
+
+    level_probs: np.ndarray
+    "每个等级被抽中的概率"
+
+    normal_aids: list[np.ndarray]
+    "每个等级中，普通情况下能抓到的小哥"
+
+    up_aids: list[np.ndarray]
+    "每个等级中，概率 Up 时能抓到的小哥，可能为空"
+
+    up_probs: np.ndarray
+    "每个等级触发概率 Up 的概率，没有 Up 小哥的等级为 0"
+
+    award_levels: dict[int, int]
+    "所有候选小哥的等级"
+
+    def __init__(
+        self,
+        aids: dict[int, set[int]],
+        up_aids: dict[int, set[int]],
+        award_levels: dict[int, int],
+    ) -> None:
+        """
+        Args:
+            aids (dict[int, set[int]]): 按等级分组的、当前能抓到的小哥
+            up_aids (dict[int, set[int]]): 按等级分组的、概率 Up 的小哥
+            award_levels (dict[int, int]): 所有候选小哥的等级
+        """
+
+        self.lids = sorted(lid for lid, _aids in aids.items() if len(_aids) > 0)
+        weights = np.array(
+            [level_repo.get_by_id(lid).weight for lid in self.lids], dtype=np.float64
+        )
+        self.level_probs = weights / weights.sum() if len(weights) > 0 else weights
+        self.normal_aids = [
+            np.array(sorted(aids[lid]), dtype=np.int64) for lid in self.lids
+        ]
+        self.up_aids = [
+            np.array(sorted(up_aids.get(lid, set())), dtype=np.int64)
+            for lid in self.lids
+        ]
+        self.up_probs = np.array(
+            [
+                UP_POOL_POSIBILITY.get(lid, 0.0) if len(ups) > 0 else 0.0
+                for lid, ups in zip(self.lids, self.up_aids)
+            ],
+            dtype=np.float64,
+        )
+        self.award_levels = dict(award_levels)
+
+    @property
+    def empty(self) -> bool:
+        return len(self.lids) == 0
+
+    def sample(self, n: int, rd: np.random.Generator) -> dict[int, int]:
+        """抓 n 次小哥
+
+        Args:
+            n (int): 抓的次数
+            rd (np.random.Generator): 随机数生成器
+
+        Returns:
+            dict[int, int]: 每个小哥被抓到的次数
+        """
+
+        result: dict[int, int] = {}
+        if n <= 0 or self.empty:
+            return result
+
+        level_counts = rd.multinomial(n, self.level_probs)
+        up_counts = rd.binomial(level_counts, self.up_probs)
+
+        for i, (count, up_count) in enumerate(zip(level_counts, up_counts)):
+            for aids, k in (
+                (self.normal_aids[i], count - up_count),
+                (self.up_aids[i], up_count),
+            ):
+                if k <= 0:
+                    continue
+                counts = rd.multinomial(k, np.full(len(aids), 1 / len(aids)))
+                for aid, c in zip(aids[counts > 0], counts[counts > 0]):
+                    result[int(aid)] = result.get(int(aid), 0) + int(c)
+
+        return result
+
+
+SamplerKey = tuple[int, int | None, int]
+
+
+class SamplerCache:
+    """
+    以 (猎场, 猎场升级, 图鉴版本) 为键缓存抽样器
+    """
+
+    samplers: OrderedDict[SamplerKey, AwardSampler]
+    max_size: int
+
+    def __init__(self, max_size: int = 64) -> None:
+        self.samplers = OrderedDict()
+        self.max_size = max_size
+
+    def get(self, key: SamplerKey) -> AwardSampler | None:
+        sampler = self.samplers.get(key)
+        if sampler is not None:
+            self.samplers.move_to_end(key)
+        return sampler
+
+    def put(self, key: SamplerKey, sampler: AwardSampler) -> None:
+        # 图鉴版本变化以后，旧版本的抽样器都不会再被用到了
+        for old in [k for k in self.samplers if k[2] != key[2]]:
+            del self.samplers[old]
+        self.samplers[key] = sampler
+        self.samplers.move_to_end(key)
+        while len(self.samplers) > self.max_size:
+            self.samplers.popitem(last=False)
+
+    def clear(self) -> None:
+        self.samplers.clear()
+
+
+sampler_cache = SamplerCache()
+
+
+def get_sampler_cache() -> SamplerCache:
+    return sampler_cache
+
+
+async def get_sampler(uow: UnitOfWork, pid: int, upid: int | None) -> AwardSampler:
+    """获得一个猎场和猎场升级对应的抽样器，没有缓存时从数据库中构建
+
+    Args:
+        uow (UnitOfWork): 工作单元
+        pid (int): 猎场 ID
+        upid (int | None): 猎场升级 ID，没有挂载时为 None
+
+    Returns:
+        AwardSampler: 抽样器
+    """
+
+    # 在读取数据之前取版本号，保证构建期间数据变化时不会以新版本号缓存旧数据
+    key: SamplerKey = (pid, upid, get_catalog_version())
+    sampler = sampler_cache.get(key)
+    if sampler is not None:
+        return sampler
+
+    aids_set = (
+        await uow.pack.get_main_aids_of_pack(pid)
+        | await uow.pack.get_main_aids_of_pack(0)
+        | await uow.pack.get_linked_aids_of_pack(pid)
+    )
+    up_aids_set = set() if upid is None else await uow.up_pool.get_aids(upid)
+
+    grouped = await uow.awards.group_by_level(aids_set | up_aids_set)
+    award_levels = {aid: lid for lid, _aids in grouped.items() for aid in _aids}
+
+    def _group(aids: set[int]) -> dict[int, set[int]]:
+        result: dict[int, set[int]] = {}
+        for aid in aids:
+            if aid in award_levels:
+                result.setdefault(award_levels[aid], set()).add(aid)
+        return result
+
+    sampler = AwardSampler(_group(aids_set), _group(up_aids_set), award_levels)
+    sampler_cache.put(key, sampler)
+    return sampler
+
+
+__all__ = ["AwardSampler", "SamplerCache", "get_sampler", "get_sampler_cache"]
@@ -2,7 +2,7 @@
 物品系统
 """
 
-from sqlalchemy import Column, ForeignKey, Integer
+from sqlalchemy import Column, ForeignKey, Index, Integer
 from sqlalchemy.orm import Mapped, mapped_column
 
 from src.models.base import Base, BaseMixin
@@ -15,6 +15,8 @@ class ItemInventory(Base, BaseMixin):
 
     __tablename__ = "catch_item_inventory"
 
+    __table_args__ = (Index("item_inventory_index", "uid", "item_id", unique=True),)
+
     item_id: Mapped[str] = mapped_column()
     count: Mapped[int] = mapped_column(default=0, server_default="0")
     stats: Mapped[int] = mapped_column(default=0, server_default="0")
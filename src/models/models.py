@@ -7,7 +7,8 @@ from sqlalchemy.orm import Mapped, mapped_column
 
 from .base import *
 from .item import ItemInventory
-from .stats import StatRecord
+from .reminder import Reminder
+from .stats import StatDailyRollup, StatRecord
 from .up_pool import UpPool
 
 
@@ -110,6 +111,8 @@ class User(Base, BaseMixin):
 class SkinRecord(Base, BaseMixin):
     __tablename__ = "catch_skin_inventory"
 
+    __table_args__ = (Index("skin_inventory_index", "user_id", "skin_id", unique=True),)
+
     user_id = Column(Integer, ForeignKey("catch_user_data.data_id", ondelete="CASCADE"))
     skin_id = Column(Integer, ForeignKey("catch_skin.data_id", ondelete="CASCADE"))
     selected = Column(Integer, default=0, server_default="0")
@@ -195,5 +198,7 @@ __all__ = [
     "Recipe",
     "UpPool",
     "StatRecord",
+    "StatDailyRollup",
     "ItemInventory",
+    "Reminder",
 ]
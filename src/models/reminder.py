@@ -0,0 +1,29 @@
+from sqlalchemy import Column, ForeignKey, Index, Integer
+from sqlalchemy.orm import Mapped, mapped_column
+
+from src.models.base import Base, BaseMixin
+
+
+class Reminder(Base, BaseMixin):
+    """
+    玩家订阅的提醒，以及下一次提醒的时间
+    """
+
+    __tablename__ = "catch_reminder"
+    __table_args__ = (
+        Index("catch_reminder_index", "uid", "kind", unique=True),
+        Index("catch_reminder_due_index", "due_at"),
+    )
+
+    uid = Column(
+        Integer,
+        ForeignKey("catch_user_data.data_id", ondelete="CASCADE"),
+        nullable=False,
+    )
+    "订阅提醒的玩家"
+
+    kind: Mapped[str] = mapped_column()
+    "提醒的种类，`slot_full` 是抓小哥的次数满了，`getup` 是到了起床时间"
+
+    due_at: Mapped[float | None] = mapped_column(nullable=True)
+    "下一次提醒的时间戳，为空时没有需要提醒的事"
@@ -1,4 +1,6 @@
-from sqlalchemy import Column, ForeignKey, Integer
+import datetime
+
+from sqlalchemy import Column, ForeignKey, Index, Integer
 from sqlalchemy.orm import Mapped, mapped_column
 
 from src.models.base import Base, BaseMixin
@@ -64,3 +66,41 @@ class StatRecord(Base, BaseMixin):
         ForeignKey("catch_up_pool.data_id", ondelete="CASCADE"),
         nullable=True,
     )
+    "统计针对的猎场升级"
+
+
+class StatDailyRollup(Base, BaseMixin):
+    """
+    按天汇总的统计数据，由统计数据的写入增量维护，用于快速地查询总量和趋势
+    """
+
+    __tablename__ = "catch_stat_daily"
+    __table_args__ = (
+        Index(
+            "catch_stat_daily_index",
+            "stat_type",
+            "dimension",
+            "dim_value",
+            "uid",
+            "day",
+            unique=True,
+        ),
+    )
+
+    day: Mapped[datetime.date] = mapped_column()
+    "统计所在的日期"
+
+    stat_type: Mapped[str] = mapped_column()
+    "统计的数据的类别"
+
+    uid: Mapped[int] = mapped_column(default=0)
+    "统计的主体玩家，0 代表这是整个服务器的统计"
+
+    dimension: Mapped[str] = mapped_column(default="")
+    "汇总所按照的关联维度，例如 aid、pid，空字符串代表不区分维度的总量"
+
+    dim_value: Mapped[int] = mapped_column(default=0)
+    "关联维度的值"
+
+    count: Mapped[int] = mapped_column(default=0)
+    "这一天的统计值之和"
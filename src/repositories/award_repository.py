@@ -3,6 +3,7 @@ from typing import Iterable
 from sqlalchemy import delete, func, insert, select, update
 
 from src.base.exceptions import ObjectNotFoundException
+from src.core.catalog import AwardRow, get_catalog, mark_catalog_changed
 from src.models.level import level_repo
 from src.ui.types.common import AwardInfo
 
@@ -10,6 +11,17 @@ from ..base.repository import DBRepository
 from ..models.models import Award, AwardAltName
 
 
+def _to_award_info(award: AwardRow) -> AwardInfo:
+    return AwardInfo(
+        description=award.description,
+        name=award.name,
+        level=level_repo.get_data_by_id(award.level_id),
+        aid=award.aid,
+        sorting=award.sorting,
+        pid=award.main_pack_id,
+    )
+
+
 class AwardRepository(DBRepository):
     """
     小哥的仓库
@@ -25,6 +37,7 @@ class AwardRepository(DBRepository):
         Returns:
             int: 添加了的小哥的 ID
         """
+        mark_catalog_changed(self.session)
         await self.session.execute(
             insert(Award).values(
                 {
@@ -47,6 +60,9 @@ class AwardRepository(DBRepository):
         Returns:
             int | None: 结果。如果找不到，则返回 None
         """
+        if (catalog := get_catalog(self.session)) is not None:
+            return catalog.get_aid(name)
+
         q1 = select(Award.data_id).where(func.lower(Award.name) == name.lower())
         a = (await self.session.execute(q1)).scalar_one_or_none()
         if a is None:
@@ -73,6 +89,17 @@ class AwardRepository(DBRepository):
             list[int]: 小哥的 ID 列表
         """
 
+        if (catalog := get_catalog(self.session)) is not None:
+            packs = None if pack is None else ((pack, 0) if include_zero else (pack,))
+            awards = [
+                a
+                for a in catalog.awards.values()
+                if (lid is None or a.level_id == lid)
+                and (packs is None or a.main_pack_id in packs)
+            ]
+            awards.sort(key=lambda a: (-a.level_id, -a.sorting, a.aid))
+            return [a.aid for a in awards]
+
         q = select(Award.data_id).order_by(
             -Award.level_id, -Award.sorting, Award.data_id
         )
@@ -121,6 +148,7 @@ class AwardRepository(DBRepository):
             aid (int): 小哥的 ID
             name (str): 别名
         """
+        mark_catalog_changed(self.session)
         await self.session.execute(
             insert(AwardAltName).values(
                 {
@@ -136,6 +164,7 @@ class AwardRepository(DBRepository):
         Args:
             name (str): 别名
         """
+        mark_catalog_changed(self.session)
         await self.session.execute(
             delete(AwardAltName).where(AwardAltName.name == name)
         )
@@ -146,6 +175,8 @@ class AwardRepository(DBRepository):
         Args:
             aid (int): 小哥的 ID
         """
+        mark_catalog_changed(self.session)
+        self.identity_map.forget_award(aid)
         await self.session.execute(delete(Award).where(Award.data_id == aid))
 
     async def modify(
@@ -167,7 +198,8 @@ class AwardRepository(DBRepository):
             pack_id (int | None): 小哥所在的猎场，0 代表所有，-1 代表不出现
             sorting (int | None): 排序的优先级
         """
-
+        mark_catalog_changed(self.session)
+        self.identity_map.forget_award(aid)
         query = update(Award).where(Award.data_id == aid)
         if name is not None:
             query = query.values({Award.name: name})
@@ -188,9 +220,9 @@ class AwardRepository(DBRepository):
         """
 
         result: dict[int, set[int]] = {}
-        query = select(Award.data_id, Award.level_id).filter(Award.data_id.in_(aids))
+        levels = await self._get_levels(set(aids))
 
-        for aid, lid in (await self.session.execute(query)).tuples().all():
+        for aid, lid in levels.items():
             result.setdefault(lid, set())
             result[lid].add(aid)
 
@@ -201,16 +233,31 @@ class AwardRepository(DBRepository):
         获得一个小哥的等级 ID
         """
 
-        return (
-            await self.session.execute(
-                select(Award.level_id).filter(Award.data_id == aid)
-            )
-        ).scalar_one()
+        levels = await self._get_levels({aid})
+        if aid not in levels:
+            raise ObjectNotFoundException("小哥")
+        return levels[aid]
+
+    async def _get_levels(self, aids: set[int]) -> dict[int, int]:
+        if (catalog := get_catalog(self.session)) is not None:
+            return {
+                aid: catalog.awards[aid].level_id
+                for aid in aids
+                if aid in catalog.awards
+            }
+        return await self.identity_map.get_award_levels(self.session, aids)
 
     async def get_all_mergeable_zeros(self) -> set[int]:
         """
         获得所有可以合成的零星小哥
         """
+        if (catalog := get_catalog(self.session)) is not None:
+            return {
+                a.aid
+                for a in catalog.awards.values()
+                if a.level_id == 0 and a.main_pack_id == -1
+            }
+
         q = (
             select(Award.data_id)
             .where(Award.level_id == 0)
@@ -223,11 +270,21 @@ class AwardRepository(DBRepository):
         """
         获得很多小哥的名字
         """
+        if (catalog := get_catalog(self.session)) is not None:
+            return {
+                aid: catalog.awards[aid].name for aid in aids if aid in catalog.awards
+            }
+
         q = select(Award.data_id, Award.name).filter(Award.data_id.in_(aids))
         r = await self.session.execute(q)
         return dict(r.tuples().all())
 
     async def get_info(self, aid: int) -> AwardInfo:
+        if (catalog := get_catalog(self.session)) is not None:
+            if aid not in catalog.awards:
+                raise ObjectNotFoundException("小哥")
+            return _to_award_info(catalog.awards[aid])
+
         q = select(
             Award.description,
             Award.name,
@@ -248,6 +305,13 @@ class AwardRepository(DBRepository):
         )
 
     async def get_info_dict(self, aids: Iterable[int]) -> dict[int, AwardInfo]:
+        if (catalog := get_catalog(self.session)) is not None:
+            return {
+                aid: _to_award_info(catalog.awards[aid])
+                for aid in aids
+                if aid in catalog.awards
+            }
+
         q = select(
             Award.data_id,
             Award.description,
@@ -1,7 +1,10 @@
-from sqlalchemy import delete, insert, select, update
+from sqlalchemy import and_, func, select
 
+from src.core.catalog import get_catalog
+
+from ..base.db import upsert
 from ..base.repository import DBRepository
-from ..models.models import Inventory
+from ..models.models import Award, Inventory
 
 
 class InventoryRepository(DBRepository):
@@ -18,35 +21,7 @@ class InventoryRepository(DBRepository):
             storage (int): 库存数量
             used (int): 用过的数量
         """
-        query = (
-            update(Inventory)
-            .where(Inventory.user_id == uid, Inventory.award_id == aid)
-            .values({Inventory.storage: storage, Inventory.used: used})
-            .returning(Inventory.data_id)
-        )
-
-        result = (await self.session.execute(query)).scalars().all()
-        if len(result) > 1:
-            # 可能是奇怪的数据库问题，这个时候删掉原先的数据然后更改
-            await self.session.execute(
-                delete(Inventory).where(
-                    Inventory.user_id == uid, Inventory.award_id == aid
-                )
-            )
-            result = ()
-
-        if len(result) == 0:
-            # 这时候没有库存，很有可能是更新失败的情景，我们创建一个新的行
-            await self.session.execute(
-                insert(Inventory).values(
-                    {
-                        Inventory.storage: storage,
-                        Inventory.used: used,
-                        Inventory.user_id: uid,
-                        Inventory.award_id: aid,
-                    }
-                )
-            )
+        self.identity_map.set_inventory(uid, aid, storage, used)
 
     async def get_inventory(self, uid: int, aid: int) -> tuple[int, int]:
         """获得小哥物品栏的原始信息
@@ -59,11 +34,7 @@ class InventoryRepository(DBRepository):
             tuple[int, int]: 两项分别是库存中有多少小哥，目前用掉了多少小哥
         """
 
-        query = select(Inventory.storage, Inventory.used).filter(
-            Inventory.user_id == uid, Inventory.award_id == aid
-        )
-
-        return (await self.session.execute(query)).tuples().one_or_none() or (0, 0)
+        return await self.identity_map.get_inventory(self.session, uid, aid)
 
     async def get_storage(self, uid: int, aid: int) -> int:
         """获取玩家某个小哥的库存数量
@@ -100,12 +71,58 @@ class InventoryRepository(DBRepository):
             count (int): 获取的数量
             record_used (bool): 是否记录小哥的使用，默认开启
         """
-        sto, use = await self.get_inventory(uid, aid)
-        if count < 0 and record_used:
-            use += -count
-        sto += count
-        await self.set_inventory(uid, aid, sto, use)
-        return sto, use
+        return (await self.give_many(uid, {aid: count}, record_used))[aid]
+
+    async def give_many(
+        self, uid: int, deltas: dict[int, int], record_used: bool = True
+    ) -> dict[int, tuple[int, int]]:
+        """一次获取很多小哥，返回每个小哥更新后的库存量和使用量。
+        已经在本工作单元中读过的小哥在内存中修改，其余的小哥用一条 upsert 语句写入
+
+        Args:
+            uid (int): 玩家的id
+            deltas (dict[int, int]): 每个小哥获取的数量，负数代表失去
+            record_used (bool): 是否记录小哥的使用，默认开启
+
+        Returns:
+            dict[int, tuple[int, int]]: 每个小哥更新后的库存量和使用量
+        """
+
+        def _used(delta: int) -> int:
+            return -delta if delta < 0 and record_used else 0
+
+        result: dict[int, tuple[int, int]] = {}
+        rows: list[dict[str, int]] = []
+        for aid, delta in deltas.items():
+            if (uid, aid) in self.identity_map.inventory:
+                sto, use = self.identity_map.inventory[(uid, aid)]
+                result[aid] = (sto + delta, use + _used(delta))
+                self.identity_map.set_inventory(uid, aid, *result[aid])
+            else:
+                rows.append(
+                    {
+                        "user_id": uid,
+                        "award_id": aid,
+                        "storage": delta,
+                        "used": _used(delta),
+                    }
+                )
+
+        if len(rows) > 0:
+            query = upsert(self.session, Inventory).values(rows)
+            query = query.on_conflict_do_update(
+                index_elements=[Inventory.user_id, Inventory.award_id],
+                set_={
+                    "storage": Inventory.storage + query.excluded.storage,
+                    "used": Inventory.used + query.excluded.used,
+                    "updated_at": query.excluded.updated_at,
+                },
+            ).returning(Inventory.award_id, Inventory.storage, Inventory.used)
+            for aid, sto, use in (await self.session.execute(query)).tuples():
+                self.identity_map.refresh_inventory(uid, aid, sto, use)
+                result[aid] = (sto, use)
+
+        return result
 
     async def get_inventory_dict(
         self, uid: int, aids: list[int] | None = None
@@ -127,9 +144,64 @@ class InventoryRepository(DBRepository):
             query = query.filter(Inventory.award_id.in_(aids))
 
         result = await self.session.execute(query)
-        res = {aid: (sto, use) for aid, sto, use in result.tuples()}
+        for aid, sto, use in result.tuples():
+            self.identity_map.remember_inventory(uid, aid, sto, use)
+
+        # 同一个工作单元中已经改动过的库存以标识映射中的为准
+        res: dict[int, tuple[int, int]] = {}
+        for (_uid, aid), data in self.identity_map.inventory.items():
+            if _uid == uid and (len(aids) == 0 or aid in aids):
+                res[aid] = data
         for aid in aids:
             if aid not in res:
                 res[aid] = (0, 0)
 
         return res
+
+    async def get_collection_counts(
+        self, uid: int
+    ) -> dict[tuple[int, int], tuple[int, int]]:
+        """按主猎场和等级统计玩家收集到了多少种小哥
+
+        Args:
+            uid (int): 玩家的id
+
+        Returns:
+            dict[tuple[int, int], tuple[int, int]]: 键为主猎场和等级，值为收集到的种数和总种数
+        """
+        res: dict[tuple[int, int], tuple[int, int]] = {}
+
+        if (catalog := get_catalog(self.session)) is not None:
+            inventory = await self.get_inventory_dict(uid)
+            for award in catalog.awards.values():
+                key = (award.main_pack_id, award.level_id)
+                collected, total = res.get(key, (0, 0))
+                if sum(inventory.get(award.aid, (0, 0))) > 0:
+                    collected += 1
+                res[key] = (collected, total + 1)
+            return res
+
+        # 聚合查询看不到标识映射中的改动，先把它们写进数据库
+        if len(self.identity_map.inventory_dirty) > 0:
+            await self.identity_map.flush(self.session)
+
+        query = (
+            select(
+                Award.main_pack_id,
+                Award.level_id,
+                func.count(Inventory.award_id),
+                func.count(Award.data_id),
+            )
+            .outerjoin(
+                Inventory,
+                and_(
+                    Inventory.award_id == Award.data_id,
+                    Inventory.user_id == uid,
+                    Inventory.storage + Inventory.used > 0,
+                ),
+            )
+            .group_by(Award.main_pack_id, Award.level_id)
+        )
+        for pack, lid, collected, total in (await self.session.execute(query)).tuples():
+            res[(pack, lid)] = (collected, total)
+        return res
@@ -1,30 +1,12 @@
-from sqlalchemy import insert, select, update
+from sqlalchemy import select
 
+from src.base.db import upsert
 from src.base.exceptions import LackException
 from src.base.repository import DBRepository
 from src.models.item import ItemInventory
 
 
 class ItemRepository(DBRepository):
-    async def assure(self, uid: int, item_id: str) -> None:
-        """
-        保证数据库中存在相应字段
-        """
-        q = select(ItemInventory.data_id).filter(
-            ItemInventory.uid == uid, ItemInventory.item_id == item_id
-        )
-        r = await self.session.execute(q)
-        re = r.scalar_one_or_none()
-        if re is None:
-            q = insert(ItemInventory).values(
-                {
-                    ItemInventory.uid: uid,
-                    ItemInventory.item_id: item_id,
-                }
-            )
-            await self.session.execute(q)
-            await self.session.flush()
-
     async def set(
         self,
         uid: int,
@@ -35,36 +17,68 @@ class ItemRepository(DBRepository):
         """
         设置拥有量和统计量
         """
-        await self.assure(uid, item_id)
-        q = update(ItemInventory).where(ItemInventory.uid == uid)
+        values: dict[str, int] = {}
         if count is not None:
-            q = q.values({ItemInventory.count: count})
+            values["count"] = count
         if stats is not None:
-            q = q.values({ItemInventory.stats: stats})
+            values["stats"] = stats
+
+        q = upsert(self.session, ItemInventory).values(
+            {"uid": uid, "item_id": item_id, **values}
+        )
+        if len(values) > 0:
+            q = q.on_conflict_do_update(
+                index_elements=[ItemInventory.uid, ItemInventory.item_id],
+                set_={**values, "updated_at": q.excluded.updated_at},
+            )
+        else:
+            q = q.on_conflict_do_nothing(
+                index_elements=[ItemInventory.uid, ItemInventory.item_id]
+            )
         await self.session.execute(q)
 
     async def get(self, uid: int, item_id: str) -> tuple[int, int]:
         """
         获得拥有量和统计量
         """
-        await self.assure(uid, item_id)
         q = select(ItemInventory.count, ItemInventory.stats).where(
             ItemInventory.uid == uid,
             ItemInventory.item_id == item_id,
         )
         r = await self.session.execute(q)
-        return r.tuples().one()
+        return r.tuples().one_or_none() or (0, 0)
 
     async def give(self, uid: int, item_id: str, delta: int) -> int:
         """
         给玩家一定数量的物品，返回目前有的物品量
         """
 
-        count, stats = await self.get(uid, item_id)
-        count += delta
-        stats += delta
-        await self.set(uid, item_id, count, stats)
-        return count
+        return (await self.give_many(uid, {item_id: delta}))[item_id]
+
+    async def give_many(self, uid: int, deltas: dict[str, int]) -> dict[str, int]:
+        """
+        用一条 upsert 语句给玩家很多物品，返回每种物品目前有的数量
+        """
+
+        if len(deltas) == 0:
+            return {}
+
+        q = upsert(self.session, ItemInventory).values(
+            [
+                {"uid": uid, "item_id": item_id, "count": delta, "stats": delta}
+                for item_id, delta in deltas.items()
+            ]
+        )
+        q = q.on_conflict_do_update(
+            index_elements=[ItemInventory.uid, ItemInventory.item_id],
+            set_={
+                "count": ItemInventory.count + q.excluded.count,
+                "stats": ItemInventory.stats + q.excluded.stats,
+                "updated_at": q.excluded.updated_at,
+            },
+        ).returning(ItemInventory.item_id, ItemInventory.count)
+        r = await self.session.execute(q)
+        return dict(r.tuples().all())
 
     async def use(self, uid: int, item_id: str, delta: int) -> int:
         """
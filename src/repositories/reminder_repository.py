@@ -0,0 +1,208 @@
+from typing import Iterable
+
+from sqlalchemy import and_, bindparam, case, delete, null, or_, select, update
+
+from src.base.db import upsert
+from src.common.times import now_datetime
+from src.core.reminders import ReminderChanges, ReminderRow, mark_subscription_changed
+from src.models.models import Global, User
+from src.models.reminder import Reminder
+
+from ..base.repository import DBRepository
+
+
+class ReminderRepository(DBRepository):
+    """
+    玩家订阅的提醒的仓库
+    """
+
+    async def subscribe(self, uid: int, kind: str) -> None:
+        """订阅一种提醒，提醒时间会在工作单元提交前算好
+
+        Args:
+            uid (int): 玩家 ID
+            kind (str): 提醒的种类
+        """
+        query = upsert(self.session, Reminder).values(uid=uid, kind=kind)
+        await self.session.execute(
+            query.on_conflict_do_nothing(index_elements=[Reminder.uid, Reminder.kind])
+        )
+        mark_subscription_changed(self.session, uid, kind)
+
+    async def unsubscribe(self, uid: int, kind: str) -> None:
+        """取消订阅一种提醒
+
+        Args:
+            uid (int): 玩家 ID
+            kind (str): 提醒的种类
+        """
+        await self.session.execute(
+            delete(Reminder).where(Reminder.uid == uid, Reminder.kind == kind)
+        )
+        mark_subscription_changed(self.session, uid, kind)
+
+    async def get_kinds(self, uid: int) -> set[str]:
+        """
+        获得一名玩家订阅了哪些提醒
+        """
+        q = select(Reminder.kind).where(Reminder.uid == uid)
+        return set((await self.session.execute(q)).scalars().all())
+
+    async def get_subscriptions(self) -> list[tuple[int, str]]:
+        """
+        获得所有的订阅
+        """
+        q = select(Reminder.uid, Reminder.kind)
+        return [(uid, kind) for uid, kind in (await self.session.execute(q)).all()]
+
+    async def get_due_before(
+        self, horizon: float, kinds: Iterable[str] | None = None
+    ) -> list[ReminderRow]:
+        """获得截止时间在某个时间之前的提醒，用到了截止时间上的索引
+
+        Args:
+            horizon (float): 时间戳
+            kinds (Iterable[str] | None, optional): 只看这些种类，默认是全部种类
+        """
+        q = select(Reminder.uid, Reminder.kind, Reminder.due_at).where(
+            Reminder.due_at <= horizon
+        )
+        if kinds is not None:
+            q = q.where(Reminder.kind.in_(set(kinds)))
+        return [
+            (uid, kind, due) for uid, kind, due in (await self.session.execute(q)).all()
+        ]
+
+    async def get_user_states(
+        self, uids: Iterable[int]
+    ) -> dict[int, tuple[str, int, int, float, float]]:
+        """一次读出提醒需要的玩家数据
+
+        Args:
+            uids (Iterable[int]): 玩家 ID
+
+        Returns:
+            dict[int, tuple[str, int, int, float, float]]: 玩家 ID 到 QQ 号、
+                剩余次数、次数上限、上次计算时间、起床时间
+        """
+        q = select(
+            User.data_id,
+            User.qq_id,
+            User.slot_empty,
+            User.slot_count,
+            User.slot_last_time,
+            User.get_up_time,
+        ).where(User.data_id.in_(set(uids)))
+        return {
+            uid: (qqid, empty, count, last, getup)
+            for uid, qqid, empty, count, last, getup in (
+                await self.session.execute(q)
+            ).all()
+        }
+
+    @staticmethod
+    def _slot_full_due(now: float):
+        interval = select(Global.catch_interval).limit(1).scalar_subquery()
+        due = User.slot_last_time + (User.slot_count - User.slot_empty) * interval
+        # 已经满了的不用再提醒。数据库里的次数只在玩家用指令时才更新，
+        # 算出来的时间已经过去了，说明早就满了，很可能已经提醒过
+        return (
+            select(
+                case(
+                    (
+                        or_(
+                            interval <= 0,
+                            User.slot_empty >= User.slot_count,
+                            due <= now,
+                        ),
+                        null(),
+                    ),
+                    else_=due,
+                )
+            )
+            .where(User.data_id == Reminder.uid)
+            .scalar_subquery()
+        )
+
+    @staticmethod
+    def _getup_due(now: float):
+        return (
+            select(case((User.get_up_time > now, User.get_up_time), else_=null()))
+            .where(User.data_id == Reminder.uid)
+            .scalar_subquery()
+        )
+
+    async def refresh(self, kind: str, uids: Iterable[int] | None = None) -> None:
+        """根据玩家现在的数据重新计算提醒时间，所有玩家一起用一条语句计算
+
+        Args:
+            kind (str): 提醒的种类
+            uids (Iterable[int] | None, optional): 需要计算的玩家，默认为全部玩家
+        """
+        now = now_datetime().timestamp()
+        if kind == "slot_full":
+            due = self._slot_full_due(now)
+        elif kind == "getup":
+            due = self._getup_due(now)
+        else:
+            return
+
+        q = update(Reminder).where(Reminder.kind == kind).values({Reminder.due_at: due})
+        if uids is not None:
+            q = q.where(Reminder.uid.in_(set(uids)))
+        await self.session.execute(q)
+
+    async def apply_changes(
+        self, changes: ReminderChanges, horizon: float
+    ) -> list[ReminderRow]:
+        """重新计算一个工作单元中标记过的提醒
+
+        Args:
+            changes (ReminderChanges): 标记的变化
+            horizon (float): 全部重新计算的种类，只读出截止时间在这之前的提醒
+
+        Returns:
+            list[ReminderRow]: 重新计算以后的提醒，用于更新内存中的索引
+        """
+        rows: list[ReminderRow] = []
+        for kind in changes.all_kinds:
+            await self.refresh(kind)
+        if len(changes.all_kinds) > 0:
+            rows.extend(await self.get_due_before(horizon, changes.all_kinds))
+
+        conditions = []
+        for kind, uids in changes.uids.items():
+            await self.refresh(kind, uids)
+            conditions.append(and_(Reminder.kind == kind, Reminder.uid.in_(uids)))
+        if len(conditions) > 0:
+            q = select(Reminder.uid, Reminder.kind, Reminder.due_at).where(
+                or_(*conditions)
+            )
+            rows.extend(
+                (uid, kind, due)
+                for uid, kind, due in (await self.session.execute(q)).all()
+            )
+        return rows
+
+    async def clear_due(self, rows: Iterable[ReminderRow]) -> None:
+        """提醒过以后清除提醒时间，如果提醒时间已经被改过了就不清除
+
+        Args:
+            rows (Iterable[ReminderRow]): 已经提醒过的提醒
+        """
+        params = [
+            {"b_uid": uid, "b_kind": kind, "b_due": due} for uid, kind, due in rows
+        ]
+        if len(params) == 0:
+            return
+        table = Reminder.__table__
+        await self.session.execute(
+            update(table)
+            .where(
+                table.c.uid == bindparam("b_uid"),
+                table.c.kind == bindparam("b_kind"),
+                table.c.due_at == bindparam("b_due"),
+            )
+            .values(due_at=None),
+            params,
+        )
@@ -1,5 +1,8 @@
 from sqlalchemy import delete, func, insert, select, update
 
+from src.core.catalog import get_catalog, mark_catalog_changed
+from src.core.reminders import mark_all_reminders_changed
+
 from ..base.repository import DBRepository
 from ..models.models import Global
 
@@ -15,6 +18,7 @@ class SettingRepository(DBRepository):
         counts = (await self.session.execute(query)).scalar_one()
 
         if counts != 1:
+            mark_catalog_changed(self.session)
             await self.session.execute(delete(Global))
             await self.session.execute(insert(Global))
 
@@ -33,6 +37,7 @@ class SettingRepository(DBRepository):
         await self.session.execute(
             update(Global).values({Global.catch_interval: interval})
         )
+        mark_all_reminders_changed(self.session, "slot_full")
 
     async def get_last_version(self):
         """
@@ -56,6 +61,10 @@ class SettingRepository(DBRepository):
         """
         获得现在开放了几个猎场
         """
+        catalog = get_catalog(self.session)
+        if catalog is not None and catalog.pack_count is not None:
+            return catalog.pack_count
+
         await self.assure_one()
         res = await self.session.execute(select(Global.opened_pack).limit(1))
         return res.scalar_one()
@@ -64,6 +73,7 @@ class SettingRepository(DBRepository):
         """
         设置现在开放了几个猎场
         """
+        mark_catalog_changed(self.session)
         await self.assure_one()
         await self.session.execute(
             update(Global).values({Global.opened_pack: max(1, count)})
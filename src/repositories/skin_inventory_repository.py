@@ -1,5 +1,8 @@
-from sqlalchemy import delete, insert, select, update
+from typing import Iterable
 
+from sqlalchemy import delete, select, update
+
+from ..base.db import upsert
 from ..base.repository import DBRepository
 from ..models.models import Skin, SkinRecord
 
@@ -109,18 +112,33 @@ class SkinInventoryRepository(DBRepository):
             bool: 用户在这之前是否拥有这个皮肤
         """
 
-        if not await self.do_user_have(uid, sid):
-            await self.session.execute(
-                insert(SkinRecord).values(
-                    {
-                        SkinRecord.user_id: uid,
-                        SkinRecord.skin_id: sid,
-                    }
-                )
+        return (await self.give_many(uid, [sid]))[sid]
+
+    async def give_many(self, uid: int, sids: Iterable[int]) -> dict[int, bool]:
+        """用一条 upsert 语句给一个用户很多皮肤
+
+        Args:
+            uid (int): 用户 ID
+            sids (Iterable[int]): 皮肤 ID
+
+        Returns:
+            dict[int, bool]: 每个皮肤在这之前用户是否拥有
+        """
+
+        sids = list(dict.fromkeys(sids))
+        if len(sids) == 0:
+            return {}
+
+        query = (
+            upsert(self.session, SkinRecord)
+            .values([{"user_id": uid, "skin_id": sid} for sid in sids])
+            .on_conflict_do_nothing(
+                index_elements=[SkinRecord.user_id, SkinRecord.skin_id]
             )
-            await self.session.flush()
-            return False
-        return True
+            .returning(SkinRecord.skin_id)
+        )
+        created = set((await self.session.execute(query)).scalars())
+        return {sid: sid not in created for sid in sids}
 
     async def get_using_dict(self, uid: int) -> dict[int, int]:
         """获得一个用户正在挂载的所有皮肤
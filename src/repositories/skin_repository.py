@@ -1,9 +1,12 @@
+from typing import Iterable
+
 from pydantic import BaseModel
 from sqlalchemy import delete, func, insert, select, update
 from typing_extensions import deprecated
 
 from src.base.exceptions import ObjectNotFoundException
 from src.base.res import KagamiResourceManagers
+from src.core.catalog import SkinRow, get_catalog, mark_catalog_changed
 from src.models.models import SkinAltName
 from src.ui.types.common import AwardInfo
 
@@ -33,12 +36,27 @@ class SkinData(BaseModel):
         return info
 
 
+def _to_skin_data(skin: SkinRow) -> SkinData:
+    return SkinData(
+        sid=skin.sid,
+        aid=skin.aid,
+        name=skin.name,
+        description=skin.description,
+        deprecated_price=skin.price,
+        biscuit_price=skin.biscuit,
+        level=skin.level,
+        can_draw=skin.can_be_pulled,
+        can_buy=skin.can_be_bought,
+    )
+
+
 class SkinRepository(DBRepository):
     """
     皮肤的仓库
     """
 
     async def delete(self, data_id: int) -> None:
+        mark_catalog_changed(self.session)
         d = delete(Skin).where(Skin.data_id == data_id)
         await self.session.execute(d)
 
@@ -81,6 +99,8 @@ class SkinRepository(DBRepository):
         Returns:
             int | None: 皮肤的 ID，不存在则为 None
         """
+        if (catalog := get_catalog(self.session)) is not None:
+            return catalog.get_sid(name)
 
         q1 = select(Skin.data_id).where(func.lower(Skin.name) == name.lower())
         a = (await self.session.execute(q1)).scalar_one_or_none()
@@ -117,6 +137,7 @@ class SkinRepository(DBRepository):
             int: 皮肤的 ID
         """
 
+        mark_catalog_changed(self.session)
         q = (
             insert(Skin)
             .values({Skin.aid: aid, Skin.name: name})
@@ -131,6 +152,7 @@ class SkinRepository(DBRepository):
             sid (int): 皮肤的 ID
             name (str): 别名
         """
+        mark_catalog_changed(self.session)
         await self.session.execute(
             insert(SkinAltName).values(
                 {
@@ -147,6 +169,7 @@ class SkinRepository(DBRepository):
             name (str): 别名
         """
 
+        mark_catalog_changed(self.session)
         await self.session.execute(delete(SkinAltName).where(SkinAltName.name == name))
 
     async def get_aid(self, sid: int):
@@ -156,6 +179,9 @@ class SkinRepository(DBRepository):
             sid (int): 皮肤 ID
         """
 
+        if (catalog := get_catalog(self.session)) is not None:
+            return catalog.skins[sid].aid
+
         return (
             await self.session.execute(select(Skin.aid).filter(Skin.data_id == sid))
         ).scalar_one()
@@ -164,6 +190,8 @@ class SkinRepository(DBRepository):
         """
         获得一个小哥含有的全部小哥
         """
+        if (catalog := get_catalog(self.session)) is not None:
+            return set(catalog.skins_of_award.get(aid, ()))
 
         return set(
             (await self.session.execute(select(Skin.data_id).filter(Skin.aid == aid)))
@@ -181,6 +209,11 @@ class SkinRepository(DBRepository):
         info.sid = sid
 
     async def get_info_v2(self, sid: int) -> SkinData:
+        if (catalog := get_catalog(self.session)) is not None:
+            if sid not in catalog.skins:
+                raise ObjectNotFoundException("皮肤")
+            return _to_skin_data(catalog.skins[sid])
+
         q = select(
             Skin.aid,
             Skin.name,
@@ -206,7 +239,52 @@ class SkinRepository(DBRepository):
             can_buy=res[7] == 1,
         )
 
+    async def get_info_v2_dict(self, sids: Iterable[int]) -> dict[int, SkinData]:
+        """
+        一次性获得多个皮肤的信息，不存在的皮肤会被忽略
+        """
+        sids = set(sids)
+        if len(sids) == 0:
+            return {}
+
+        if (catalog := get_catalog(self.session)) is not None:
+            return {
+                sid: _to_skin_data(catalog.skins[sid])
+                for sid in sids
+                if sid in catalog.skins
+            }
+
+        q = select(
+            Skin.data_id,
+            Skin.aid,
+            Skin.name,
+            Skin.description,
+            Skin.price,
+            Skin.biscuit,
+            Skin.level,
+            Skin.can_be_pulled,
+            Skin.can_be_bought,
+        ).filter(Skin.data_id.in_(sids))
+
+        return {
+            sid: SkinData(
+                sid=sid,
+                aid=aid,
+                name=name,
+                description=description,
+                deprecated_price=price,
+                biscuit_price=biscuit,
+                level=level,
+                can_draw=pulled == 1,
+                can_buy=bought == 1,
+            )
+            for sid, aid, name, description, price, biscuit, level, pulled, bought in (
+                await self.session.execute(q)
+            ).tuples()
+        }
+
     async def set_info_v2(self, sid: int, info: SkinData) -> None:
+        mark_catalog_changed(self.session)
         q = (
             update(Skin)
             .where(Skin.data_id == sid)
@@ -225,12 +303,22 @@ class SkinRepository(DBRepository):
         await self.session.execute(q)
 
     async def all_sid(self) -> set[int]:
+        if (catalog := get_catalog(self.session)) is not None:
+            return set(catalog.skins.keys())
+
         q = select(Skin.data_id)
         return set((await self.session.execute(q)).scalars().all())
 
     async def get_all_sid_grouped_with_level(
         self, include_no_pickable: bool = False
     ) -> dict[int, set[int]]:
+        if (catalog := get_catalog(self.session)) is not None:
+            grouped: dict[int, set[int]] = {}
+            for skin in catalog.skins.values():
+                if include_no_pickable or skin.can_be_pulled:
+                    grouped.setdefault(skin.level, set()).add(skin.sid)
+            return grouped
+
         q = select(Skin.data_id, Skin.level)
         if not include_no_pickable:
             q = q.filter(Skin.can_be_pulled == 1)
@@ -242,6 +330,13 @@ class SkinRepository(DBRepository):
         return result
 
     async def get_all_sids_can_be_bought(self) -> set[int]:
+        if (catalog := get_catalog(self.session)) is not None:
+            return {
+                skin.sid
+                for skin in catalog.skins.values()
+                if skin.can_be_bought and skin.biscuit > 0 and skin.level > 0
+            }
+
         q = (
             select(Skin.data_id)
             .filter(Skin.can_be_bought == 1)
@@ -1,8 +1,8 @@
-from typing import Iterable, Literal
+from typing import Iterable, Literal, NamedTuple
 from datetime import datetime
 
 from pydantic import BaseModel
-from sqlalchemy import func, insert, select, update, desc
+from sqlalchemy import bindparam, func, insert, or_, select, update, desc
 
 from src.base.repository import DBRepository
 from src.models.stats import StatRecord
@@ -20,6 +20,21 @@ class StatData(BaseModel):
     linked_upid: int | None
 
 
+class StatKey(NamedTuple):
+    """
+    唯一确定一条统计数据的键
+    """
+
+    uid: int | None
+    stat_type: str
+    linked_uid: int | None = None
+    linked_aid: int | None = None
+    linked_sid: int | None = None
+    linked_pid: int | None = None
+    linked_rid: int | None = None
+    linked_upid: int | None = None
+
+
 class StatsRepository(DBRepository):
     """
     统计数据
@@ -315,6 +330,73 @@ class StatsRepository(DBRepository):
         )
         await self.session.execute(query)
 
+    async def bulk_add(self, deltas: dict[StatKey, int]) -> None:
+        """批量地给统计数据加上增量，不存在的统计数据会被创建。
+        不论有多少条数据，都只用一次查询、一次插入和一次更新完成。
+
+        Args:
+            deltas (dict[StatKey, int]): 每条统计数据的增量
+        """
+
+        deltas = {k: v for k, v in deltas.items() if v != 0}
+        if len(deltas) == 0:
+            return
+
+        uids = {k.uid for k in deltas if k.uid is not None}
+        query = select(
+            StatRecord.data_id,
+            StatRecord.stat_from,
+            StatRecord.stat_type,
+            StatRecord.linked_uid,
+            StatRecord.linked_aid,
+            StatRecord.linked_sid,
+            StatRecord.linked_pid,
+            StatRecord.linked_rid,
+            StatRecord.linked_upid,
+        ).filter(StatRecord.stat_type.in_({k.stat_type for k in deltas}))
+        if any(k.uid is None for k in deltas):
+            query = query.filter(
+                or_(StatRecord.stat_from.in_(uids), StatRecord.stat_from.is_(None))
+            )
+        else:
+            query = query.filter(StatRecord.stat_from.in_(uids))
+
+        existing: dict[StatKey, int] = {}
+        for data_id, *key in (await self.session.execute(query)).tuples():
+            existing.setdefault(StatKey(*key), data_id)
+
+        to_update = [
+            {"b_id": existing[k], "b_delta": v}
+            for k, v in deltas.items()
+            if k in existing
+        ]
+        to_insert = [
+            {
+                "stat_from": k.uid,
+                "stat_type": k.stat_type,
+                "count": v,
+                "linked_uid": k.linked_uid,
+                "linked_aid": k.linked_aid,
+                "linked_sid": k.linked_sid,
+                "linked_pid": k.linked_pid,
+                "linked_rid": k.linked_rid,
+                "linked_upid": k.linked_upid,
+            }
+            for k, v in deltas.items()
+            if k not in existing
+        ]
+
+        table = StatRecord.__table__
+        if len(to_update) > 0:
+            await self.session.execute(
+                update(table)
+                .where(table.c.data_id == bindparam("b_id"))
+                .values({table.c.count: table.c.count + bindparam("b_delta")}),
+                to_update,
+            )
+        if len(to_insert) > 0:
+            await self.session.execute(insert(table), to_insert)
+
     async def get_merge_by_product(self, aid: int) -> list[tuple[int, int, datetime]]:
         query = (
             select(StatRecord.data_id, StatRecord.linked_rid, StatRecord.updated_at)
@@ -0,0 +1,184 @@
+import datetime
+from typing import Any, Literal
+
+from sqlalchemy import Select, func, select
+
+from src.base.db import upsert
+from src.base.repository import DBRepository
+from src.common.times import now_datetime
+from src.models.stats import StatDailyRollup
+from src.repositories.stats_repository import StatKey
+
+ROLLUP_DIMENSIONS: dict[str, str] = {
+    "uid": "linked_uid",
+    "aid": "linked_aid",
+    "sid": "linked_sid",
+    "pid": "linked_pid",
+    "rid": "linked_rid",
+    "upid": "linked_upid",
+}
+"汇总表中的维度名，以及它在统计键中对应的字段"
+
+
+RollupKey = tuple[str, int, str, int]
+"(统计类别, 主体玩家, 维度, 维度的值)"
+
+
+def expand_rollup(deltas: dict[StatKey, int]) -> dict[RollupKey, int]:
+    """
+    把统计增量展开成汇总表中的增量。每条统计都会计入不区分维度的总量，
+    以及它每一个非空的关联维度。
+    """
+
+    result: dict[RollupKey, int] = {}
+    for key, delta in deltas.items():
+        if delta == 0:
+            continue
+        uid = key.uid or 0
+        rows: list[RollupKey] = [(key.stat_type, uid, "", 0)]
+        for dimension, field in ROLLUP_DIMENSIONS.items():
+            value = getattr(key, field)
+            if value is not None:
+                rows.append((key.stat_type, uid, dimension, value))
+        for row in rows:
+            result[row] = result.get(row, 0) + delta
+    return result
+
+
+class StatRollupRepository(DBRepository):
+    """
+    按天汇总的统计数据
+    """
+
+    async def add(
+        self, deltas: dict[StatKey, int], day: datetime.date | None = None
+    ) -> None:
+        """把一批统计增量计入某一天的汇总数据
+
+        Args:
+            deltas (dict[StatKey, int]): 统计增量
+            day (datetime.date | None, optional): 计入的日期，默认为今天
+        """
+
+        rows = expand_rollup(deltas)
+        if len(rows) == 0:
+            return
+        day = day or now_datetime().date()
+
+        query = upsert(self.session, StatDailyRollup)
+        query = query.on_conflict_do_update(
+            index_elements=["stat_type", "dimension", "dim_value", "uid", "day"],
+            set_={
+                "count": StatDailyRollup.count + query.excluded.count,
+                "updated_at": query.excluded.updated_at,
+            },
+        )
+
+        await self.session.execute(
+            query,
+            [
+                {
+                    "day": day,
+                    "stat_type": stat_type,
+                    "uid": uid,
+                    "dimension": dimension,
+                    "dim_value": dim_value,
+                    "count": delta,
+                }
+                for (stat_type, uid, dimension, dim_value), delta in rows.items()
+            ],
+        )
+
+    def _filter(
+        self,
+        query: Select[Any],
+        stat_type: str,
+        uid: int | None | Literal["no_limit"],
+        dimension: str,
+        value: int,
+        since: datetime.date | None,
+    ) -> Select[Any]:
+        query = query.filter(
+            StatDailyRollup.stat_type == stat_type,
+            StatDailyRollup.dimension == dimension,
+            StatDailyRollup.dim_value == (value if dimension else 0),
+        )
+        if uid != "no_limit":
+            query = query.filter(StatDailyRollup.uid == (uid or 0))
+        if since is not None:
+            query = query.filter(StatDailyRollup.day >= since)
+        return query
+
+    async def get_total(
+        self,
+        stat_type: str,
+        uid: int | None | Literal["no_limit"] = "no_limit",
+        dimension: str = "",
+        value: int = 0,
+        since: datetime.date | None = None,
+    ) -> int:
+        """获得统计的总量
+
+        Args:
+            stat_type (str): 统计的类别
+            uid (int | None | Literal["no_limit"], optional): 主体玩家，None 代表
+                没有主体玩家的统计，no_limit 代表全服的总量. Defaults to "no_limit".
+            dimension (str, optional): 关联的维度，如 aid、pid. Defaults to "".
+            value (int, optional): 关联维度的值. Defaults to 0.
+            since (datetime.date | None, optional): 从哪一天开始算. Defaults to None.
+
+        Returns:
+            int: 总量
+        """
+
+        query = self._filter(
+            select(func.sum(StatDailyRollup.count)),
+            stat_type,
+            uid,
+            dimension,
+            value,
+            since,
+        )
+        return (await self.session.execute(query)).scalar_one() or 0
+
+    async def get_series(
+        self,
+        stat_type: str,
+        days: int,
+        uid: int | None | Literal["no_limit"] = "no_limit",
+        dimension: str = "",
+        value: int = 0,
+        today: datetime.date | None = None,
+    ) -> list[tuple[datetime.date, int]]:
+        """获得最近若干天每天的统计值，没有数据的日子记为 0
+
+        Args:
+            stat_type (str): 统计的类别
+            days (int): 天数，包括今天
+            uid (int | None | Literal["no_limit"], optional): 主体玩家. Defaults to "no_limit".
+            dimension (str, optional): 关联的维度. Defaults to "".
+            value (int, optional): 关联维度的值. Defaults to 0.
+            today (datetime.date | None, optional): 以哪一天为今天. Defaults to None.
+
+        Returns:
+            list[tuple[datetime.date, int]]: 从早到晚排列的 (日期, 统计值)
+        """
+
+        today = today or now_datetime().date()
+        since = today - datetime.timedelta(days=days - 1)
+        query = self._filter(
+            select(StatDailyRollup.day, func.sum(StatDailyRollup.count)),
+            stat_type,
+            uid,
+            dimension,
+            value,
+            since,
+        ).group_by(StatDailyRollup.day)
+
+        data: dict[datetime.date, int] = dict(
+            (await self.session.execute(query)).tuples().all()
+        )
+        return [
+            (day, data.get(day, 0))
+            for day in (since + datetime.timedelta(days=i) for i in range(days))
+        ]
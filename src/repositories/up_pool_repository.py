@@ -5,7 +5,8 @@ from sqlalchemy.orm import InstrumentedAttribute
 
 from src.base.exceptions import ObjectNotFoundException
 from src.base.repository import DBRepository
-from src.models.models import Award, User
+from src.core.catalog import get_catalog, mark_catalog_changed
+from src.models.models import Award
 from src.models.up_pool import *
 
 
@@ -22,6 +23,9 @@ class PackRepository(DBRepository):
         """
         获得所有将主猎场设置为 pack 的小哥 ID
         """
+        if (catalog := get_catalog(self.session)) is not None:
+            return set(catalog.get_main_aids(pack))
+
         q = select(Award.data_id)
         if pack >= 0:
             q = q.filter(Award.main_pack_id == pack)
@@ -34,6 +38,9 @@ class PackRepository(DBRepository):
         """
         使用 Relationship 表关联猎场和小哥的那些小哥 ID
         """
+        if (catalog := get_catalog(self.session)) is not None:
+            return set(catalog.linked_aids.get(pack, ()))
+
         q = select(PackAwardRelationship.aid).filter(PackAwardRelationship.pack == pack)
         r = await self.session.execute(q)
         return set(r.scalars())
@@ -42,6 +49,9 @@ class PackRepository(DBRepository):
         """
         获得那些主要猎场不大于 0 的那些小哥，这些都是特殊的小哥
         """
+        if (catalog := get_catalog(self.session)) is not None:
+            return set(catalog.get_main_aids(-1))
+
         q = select(Award.data_id).filter(Award.main_pack_id < 0)
         r = await self.session.execute(q)
         return set(r.scalars())
@@ -50,6 +60,9 @@ class PackRepository(DBRepository):
         """
         获得那些没有 Relationship 表关联猎场的那些小哥
         """
+        if (catalog := get_catalog(self.session)) is not None:
+            return set(catalog.awards.keys()) - set(catalog.linked_packs.keys())
+
         q1 = select(Award.data_id)
         q2 = select(PackAwardRelationship.aid)
         r1 = await self.session.execute(q1)
@@ -60,6 +73,9 @@ class PackRepository(DBRepository):
         """
         获得一个小哥使用 Relationship 关联的猎场集合
         """
+        if (catalog := get_catalog(self.session)) is not None:
+            return set(catalog.linked_packs.get(aid, ()))
+
         q = select(PackAwardRelationship.pack).filter(PackAwardRelationship.aid == aid)
         r = await self.session.execute(q)
         return set(r.scalars())
@@ -68,6 +84,11 @@ class PackRepository(DBRepository):
         """
         获得一个小哥绑定的主猎场
         """
+        if (catalog := get_catalog(self.session)) is not None:
+            if aid not in catalog.awards:
+                raise ObjectNotFoundException("小哥")
+            return catalog.awards[aid].main_pack_id
+
         q = select(Award.main_pack_id).filter(Award.data_id == aid)
         r = await self.session.execute(q)
         return r.scalar_one()
@@ -76,6 +97,7 @@ class PackRepository(DBRepository):
         """
         设置一个小哥的主要猎场
         """
+        mark_catalog_changed(self.session)
         q = update(Award).where(Award.data_id == aid).values({Award.main_pack_id: pack})
         await self.session.execute(q)
 
@@ -83,6 +105,7 @@ class PackRepository(DBRepository):
         """
         添加一个小哥的关联猎场
         """
+        mark_catalog_changed(self.session)
         if pack not in await self.get_linked_packs(aid):
             q = insert(PackAwardRelationship).values(
                 {
@@ -97,6 +120,7 @@ class PackRepository(DBRepository):
         """
         删去一个小哥的关联猎场
         """
+        mark_catalog_changed(self.session)
         q = delete(PackAwardRelationship).where(
             PackAwardRelationship.aid == aid, PackAwardRelationship.pack == pack
         )
@@ -112,6 +136,7 @@ class UpPoolRepository(DBRepository):
             name (str): 猎场升级的名字
             cost (int): 购买这个升级需要的钱
         """
+        mark_catalog_changed(self.session)
         await self.session.execute(
             insert(UpPool).values(
                 {
@@ -130,7 +155,7 @@ class UpPoolRepository(DBRepository):
         Args:
             upid (int): 猎场升级的 ID
         """
-
+        mark_catalog_changed(self.session)
         await self.session.execute(delete(UpPool).where(UpPool.data_id == upid))
 
     async def get_upid(self, name: str) -> int | None:
@@ -142,6 +167,9 @@ class UpPoolRepository(DBRepository):
         Returns:
             (int | None): PIL，如果未找到则为 None
         """
+        if (catalog := get_catalog(self.session)) is not None:
+            return catalog.up_pool_names.get(name)
+
         res = await self.session.execute(
             select(UpPool.data_id).filter(UpPool.name == name)
         )
@@ -170,6 +198,17 @@ class UpPoolRepository(DBRepository):
         Returns:
             UpPoolInfo: 其基本信息
         """
+        if (catalog := get_catalog(self.session)) is not None:
+            if upid not in catalog.up_pools:
+                raise ObjectNotFoundException("猎场升级")
+            pool = catalog.up_pools[upid]
+            return UpPoolInfo(
+                belong_pack=pool.belong_pack,
+                name=pool.name,
+                cost=pool.cost,
+                display=pool.display,
+                enabled=pool.enabled,
+            )
 
         q = select(
             UpPool.belong_pack, UpPool.name, UpPool.cost, UpPool.display, UpPool.enabled
@@ -195,6 +234,7 @@ class UpPoolRepository(DBRepository):
         display: int | None = None,
         enabled: bool | None = None,
     ):
+        mark_catalog_changed(self.session)
         modify_dict: dict[InstrumentedAttribute[Any], Any] = {
             UpPool.belong_pack: belong_pack,
             UpPool.name: name,
@@ -220,6 +260,9 @@ class UpPoolRepository(DBRepository):
             set[int]: 小哥 ID 的集合
         """
 
+        if (catalog := get_catalog(self.session)) is not None:
+            return set(catalog.up_pool_aids.get(upid, ()))
+
         q = select(UpPoolAwardRelationship.aid).filter(
             UpPoolAwardRelationship.pool_id == upid
         )
@@ -237,6 +280,13 @@ class UpPoolRepository(DBRepository):
             set[int]: 小哥 ID 的集合
         """
 
+        if (catalog := get_catalog(self.session)) is not None:
+            return {
+                catalog.awards[aid].name
+                for aid in catalog.up_pool_aids.get(upid, ())
+                if aid in catalog.awards
+            }
+
         q = (
             select(Award.name)
             .join(UpPoolAwardRelationship, UpPoolAwardRelationship.aid == Award.data_id)
@@ -250,6 +300,7 @@ class UpPoolRepository(DBRepository):
         """
         向一个猎场升级中添加小哥
         """
+        mark_catalog_changed(self.session)
 
         q = select(UpPoolAwardRelationship.data_id).filter(
             UpPoolAwardRelationship.aid == aid,
@@ -271,6 +322,7 @@ class UpPoolRepository(DBRepository):
         """
         将一个小哥从猎场升级中去除
         """
+        mark_catalog_changed(self.session)
 
         q = delete(UpPoolAwardRelationship).where(
             UpPoolAwardRelationship.pool_id == upid,
@@ -283,14 +335,12 @@ class UpPoolRepository(DBRepository):
         """
         获取正在使用的猎场up
         """
-        query = select(User.using_up_pool).filter(User.data_id == uid)
-        return (await self.session.execute(query)).scalar_one_or_none()
+        return await self.identity_map.get_user_field(
+            self.session, uid, "using_up_pool"
+        )
 
     async def set_using(self, uid: int, upid: int | None) -> None:
-        query = (
-            update(User).where(User.data_id == uid).values({User.using_up_pool: upid})
-        )
-        await self.session.execute(query)
+        self.identity_map.set_user_fields(uid, using_up_pool=upid)
 
     async def get_own(self, uid: int, pack_id: int | None = None) -> set[int]:
         query = select(UpPoolInventory.pool_id).filter(UpPoolInventory.uid == uid)
@@ -325,6 +375,14 @@ class UpPoolRepository(DBRepository):
         """
         获得一个猎场的所有猎场升级的 ID
         """
+        if (catalog := get_catalog(self.session)) is not None:
+            return {
+                p.upid
+                for p in catalog.up_pools.values()
+                if p.belong_pack == pack
+                and (not require_enabled or (p.enabled and p.cost > 0))
+            }
+
         q = select(UpPool.data_id).filter(UpPool.belong_pack == pack)
         if require_enabled:
             q = q.filter(UpPool.enabled.is_(True), UpPool.cost > 0)
@@ -335,6 +393,9 @@ class UpPoolRepository(DBRepository):
         """
         判断一个猎场是否被挂载上来
         """
+        if (catalog := get_catalog(self.session)) is not None:
+            return catalog.up_pools[upid].enabled
+
         q = select(UpPool.enabled).filter(UpPool.data_id == upid)
         r = await self.session.execute(q)
         return r.scalar_one()
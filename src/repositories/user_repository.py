@@ -1,31 +1,77 @@
+from collections import OrderedDict
 from dataclasses import dataclass
-from sqlalchemy import insert, select, update
+from sqlalchemy import select, update
 
+from src.base.db import upsert
 from src.base.exceptions import LackException
+from src.core.reminders import mark_reminder_changed
 
 from ..base.repository import DBRepository
 from ..models.models import User
 
 
+class UidCache:
+    """
+    进程内 QQ 号到玩家 ID 的 LRU 缓存。玩家 ID 一经创建就不会改变，
+    只有转移账户时需要让缓存失效。
+    """
+
+    uids: OrderedDict[str, int]
+    max_size: int
+
+    def __init__(self, max_size: int = 4096) -> None:
+        self.uids = OrderedDict()
+        self.max_size = max_size
+
+    def get(self, qqid: str) -> int | None:
+        uid = self.uids.get(qqid)
+        if uid is not None:
+            self.uids.move_to_end(qqid)
+        return uid
+
+    def put(self, qqid: str, uid: int) -> None:
+        self.uids[qqid] = uid
+        self.uids.move_to_end(qqid)
+        while len(self.uids) > self.max_size:
+            self.uids.popitem(last=False)
+
+    def forget_uid(self, uid: int) -> None:
+        for qqid in [k for k, v in self.uids.items() if v == uid]:
+            del self.uids[qqid]
+
+    def clear(self) -> None:
+        self.uids.clear()
+
+
+uid_cache = UidCache()
+
+
+def get_uid_cache() -> UidCache:
+    return uid_cache
+
+
 class UserRepository(DBRepository):
     """
     和玩家数据有关的仓库
     """
 
-    async def assure(self, qqid: int | str) -> None:
+    async def assure(self, qqid: int | str) -> bool:
         """
         如果用户不存在，则创建一个新用户
-        """
-        query = select(User.data_id).filter(User.qq_id == str(qqid))
-        result = (await self.session.execute(query)).scalar_one_or_none()
 
-        if result is None:
-            # 创建一个新的用户
-            await self.session.execute(insert(User).values({User.qq_id: str(qqid)}))
-            await self.session.flush()
+        Returns:
+            bool: 是否创建了新用户
+        """
+        query = (
+            upsert(self.session, User)
+            .values({User.qq_id: str(qqid)})
+            .on_conflict_do_nothing(index_elements=[User.qq_id])
+        )
+        result = await self.session.execute(query)
+        return result.rowcount > 0  # type: ignore
 
     async def get_uid(self, qqid: int | str) -> int:
-        """根据用户的 qqid 获取用户的 data_id
+        """根据用户的 qqid 获取用户的 data_id，用户不存在时会创建
 
         Args:
             qqid (int | str): 用户的 qqid
@@ -33,10 +79,18 @@ class UserRepository(DBRepository):
         Returns:
             int: 用户的 data_id
         """
-        await self.assure(qqid)
+        uid = uid_cache.get(str(qqid))
+        if uid is not None:
+            return uid
+
+        created = await self.assure(qqid)
         query = select(User.data_id).filter(User.qq_id == str(qqid))
-        result = (await self.session.execute(query)).scalar_one()
-        return result
+        uid = (await self.session.execute(query)).scalar_one()
+
+        # 新创建的用户在事务提交前可能被回滚，所以只缓存已经存在的用户
+        if not created:
+            uid_cache.put(str(qqid), uid)
+        return uid
 
     async def get_qqid(self, uid: int | str) -> int:
         """根据用户的 data_id 获取用户的 qqid
@@ -47,13 +101,16 @@ class UserRepository(DBRepository):
         Returns:
             int: 用户的 qqid
         """
-        query = select(User.qq_id).filter(User.data_id == str(uid))
-        result = int((await self.session.execute(query)).scalar_one())
-        return result
+        return int(
+            await self.identity_map.get_user_field(self.session, int(uid), "qq_id")
+        )
 
     async def set_qqid(self, uid: int, qqid: str) -> None:
+        # QQ 号有唯一约束，交换两个人的 QQ 号时需要按顺序写入，所以不经过标识映射
         q = update(User).where(User.data_id == uid).values({User.qq_id: qqid})
         await self.session.execute(q)
+        self.identity_map.forget_user(uid)
+        uid_cache.forget_uid(uid)
 
     async def update_catch_time(self, uid: int, count_remain: int, last_calc: float):
         """更新玩家抓小哥的时间
@@ -63,16 +120,10 @@ class UserRepository(DBRepository):
             count_remain (int): 还有多少次抓小哥的次数
             last_calc (float): 上一次计算抓的时间
         """
-        await self.session.execute(
-            update(User)
-            .where(User.data_id == uid)
-            .values(
-                {
-                    User.slot_empty: count_remain,
-                    User.slot_last_time: last_calc,
-                }
-            )
+        self.identity_map.set_user_fields(
+            uid, slot_empty=count_remain, slot_last_time=last_calc
         )
+        mark_reminder_changed(self.session, uid, "slot_full")
 
     async def add_slot_count(self, uid: int, count: int = 1):
         """为一个用户添加一个卡槽
@@ -82,11 +133,11 @@ class UserRepository(DBRepository):
             count (int, optional): 卡槽数量. Defaults to 1.
         """
 
-        await self.session.execute(
-            update(User)
-            .where(User.data_id == uid)
-            .values({User.slot_count: User.slot_count + count})
+        slot_count = await self.identity_map.get_user_field(
+            self.session, uid, "slot_count"
         )
+        self.identity_map.set_user_fields(uid, slot_count=slot_count + count)
+        mark_reminder_changed(self.session, uid, "slot_full")
 
     async def get_sign_in_info(self, uid: int) -> tuple[float, int]:
         """获得用户上次签到时间和签到次数
@@ -97,8 +148,8 @@ class UserRepository(DBRepository):
         Returns:
             tuple[float, int]: 上次签到时间、签到次数
         """
-        query = select(User.sign_last_time, User.sign_count).filter(User.data_id == uid)
-        return (await self.session.execute(query)).tuples().one()
+        row = await self.identity_map.get_user(self.session, uid)
+        return row["sign_last_time"], row["sign_count"]
 
     async def set_sign_in_info(
         self,
@@ -114,15 +165,8 @@ class UserRepository(DBRepository):
             sign_in_count (int): 签到次数
         """
 
-        await self.session.execute(
-            update(User)
-            .where(User.data_id == uid)
-            .values(
-                {
-                    User.sign_last_time: last_sign_in_time,
-                    User.sign_count: sign_in_count,
-                }
-            )
+        self.identity_map.set_user_fields(
+            uid, sign_last_time=last_sign_in_time, sign_count=sign_in_count
         )
 
     async def name(
@@ -135,14 +179,13 @@ class UserRepository(DBRepository):
         if uid is None and qqid is None:
             raise ValueError("uid 和 qqid 至少需要指定一个")
 
-        q = select(User.special_call)
-        if uid is not None:
-            q = q.filter(User.data_id == uid)
-        if qqid is not None:
-            await self.assure(qqid)
-            q = q.filter(User.qq_id == str(qqid))
+        if uid is None:
+            assert qqid is not None
+            uid = await self.get_uid(qqid)
 
-        result = (await self.session.execute(q)).scalar_one()
+        result = await self.identity_map.get_user_field(
+            self.session, uid, "special_call"
+        )
         if result == "":
             return None
         return result
@@ -152,71 +195,48 @@ class UserRepository(DBRepository):
         设置一个玩家的特殊名字
         """
 
-        call = call or ""
-        await self.session.execute(
-            update(User).where(User.data_id == uid).values({User.special_call: call})
-        )
+        self.identity_map.set_user_fields(uid, special_call=call or "")
 
     async def get_sleep_early_data(self, uid: int) -> tuple[float, int]:
         """
         获得上一次早睡时间的时间戳
         """
-        q = select(User.sleep_last_time, User.sleep_count).filter(User.data_id == uid)
-        r = await self.session.execute(q)
-        return r.tuples().one()
+        row = await self.identity_map.get_user(self.session, uid)
+        return row["sleep_last_time"], row["sleep_count"]
 
     async def update_sleep_early_data(self, uid: int, ts: float, count: int):
         """
         设置上一次早睡时间的时间戳
         """
-        q = (
-            update(User)
-            .filter(User.data_id == uid)
-            .values({User.sleep_last_time: ts, User.sleep_count: count})
-        )
-        await self.session.execute(q)
+        self.identity_map.set_user_fields(uid, sleep_last_time=ts, sleep_count=count)
 
     async def get_getup_time(self, uid: int) -> float:
         """
         获得起床时间
         """
-        q = select(User.get_up_time).filter(User.data_id == uid)
-        r = await self.session.execute(q)
-        return r.scalar_one()
+        return await self.identity_map.get_user_field(self.session, uid, "get_up_time")
 
     async def set_getup_time(self, uid: int, ts: float):
         """
         设置起床时间
         """
-        q = update(User).where(User.data_id == uid).values({User.get_up_time: ts})
-        await self.session.execute(q)
+        self.identity_map.set_user_fields(uid, get_up_time=ts)
+        mark_reminder_changed(self.session, uid, "getup")
 
     async def get_skin_pack_data(self, uid: int) -> tuple[float, int]:
         """
         获得上次购买皮肤盲盒的时间
         """
-        q = select(
-            User.buy_skin_box_last_time,
-            User.buy_skin_box_count_in_this_week,
-        ).filter(User.data_id == uid)
-        r = await self.session.execute(q)
-        return r.tuples().one()
+        row = await self.identity_map.get_user(self.session, uid)
+        return row["buy_skin_box_last_time"], row["buy_skin_box_count_in_this_week"]
 
     async def set_skin_pack_data(self, uid: int, ts: float, count: int):
         """
         设置上次购买皮肤盲盒的时间
         """
-        q = (
-            update(User)
-            .where(User.data_id == uid)
-            .values(
-                {
-                    User.buy_skin_box_last_time: ts,
-                    User.buy_skin_box_count_in_this_week: count,
-                }
-            )
+        self.identity_map.set_user_fields(
+            uid, buy_skin_box_last_time=ts, buy_skin_box_count_in_this_week=count
         )
-        await self.session.execute(q)
 
     async def get_all_uid(self) -> set[int]:
         """
@@ -240,17 +260,11 @@ class UserCatchTimeRepository(DBRepository):
     """
 
     async def get_user_time(self, uid: int) -> UserCatchTimeItself:
-        q = select(
-            User.slot_count,
-            User.slot_empty,
-            User.slot_last_time,
-        ).where(User.data_id == uid)
-        r = await self.session.execute(q)
-        slot_count, slot_empty, slot_calctime = r.tuples().one()
+        row = await self.identity_map.get_user(self.session, uid)
         return UserCatchTimeItself(
-            slot_count=slot_count,
-            slot_empty=slot_empty,
-            last_updated_timestamp=slot_calctime,
+            slot_count=row["slot_count"],
+            slot_empty=row["slot_empty"],
+            last_updated_timestamp=row["slot_last_time"],
         )
 
 
@@ -265,9 +279,7 @@ class ChipsRepository(DBRepository):
             float: 薯片数量
         """
 
-        return (
-            await self.session.execute(select(User.chips).filter(User.data_id == uid))
-        ).scalar_one()
+        return await self.identity_map.get_user_field(self.session, uid, "chips")
 
     async def set(self, uid: int, chips: float):
         """设置用户要有多少薯片
@@ -277,9 +289,7 @@ class ChipsRepository(DBRepository):
             money (float): 薯片数量
         """
 
-        await self.session.execute(
-            update(User).where(User.data_id == uid).values({User.chips: chips})
-        )
+        self.identity_map.set_user_fields(uid, chips=chips)
 
     async def add(self, uid: int, chips: float):
         """增加用户的薯片数量
@@ -312,21 +322,10 @@ class ChipsRepository(DBRepository):
 
 class BiscuitRepository(DBRepository):
     async def get(self, uid: int) -> int:
-        q = select(User.biscuit).where(User.data_id == uid)
-        r = await self.session.execute(q)
-        return r.scalar_one()
+        return await self.identity_map.get_user_field(self.session, uid, "biscuit")
 
     async def set(self, uid: int, biscuit: int) -> None:
-        q = (
-            update(User)
-            .where(User.data_id == uid)
-            .values(
-                {
-                    User.biscuit: biscuit,
-                }
-            )
-        )
-        await self.session.execute(q)
+        self.identity_map.set_user_fields(uid, biscuit=biscuit)
 
     async def add(self, uid: int, biscuit: int) -> None:
         cu = await self.get(uid)
@@ -342,11 +341,8 @@ class BiscuitRepository(DBRepository):
 
 class UserFlagRepository(DBRepository):
     async def get(self, uid: int) -> set[str]:
-        return set(
-            (await self.session.execute(select(User.flags).filter(User.data_id == uid)))
-            .scalar_one()
-            .split(",")
-        )
+        flags = await self.identity_map.get_user_field(self.session, uid, "flags")
+        return set(flags.split(","))
 
     async def set(self, uid: int, flags: set[str]):
         """设置一个用户的 Flags
@@ -356,11 +352,7 @@ class UserFlagRepository(DBRepository):
             flags (set[str]): Flags 集合
         """
 
-        await self.session.execute(
-            update(User)
-            .where(User.data_id == uid)
-            .values({User.flags: ",".join(flags)})
-        )
+        self.identity_map.set_user_fields(uid, flags=",".join(flags))
 
     async def add(self, uid: int, flag: str):
         """为一个用户启用 Flag
@@ -386,20 +378,18 @@ class UserPackRepository(DBRepository):
         """
         获得用户现在买了几个猎场
         """
-        q = select(User.own_packs).filter(User.data_id == uid)
-        r = await self.session.execute(q)
-        return set((int(i) for i in r.scalar_one().split(",") if len(i) > 0))
+        own_packs = await self.identity_map.get_user_field(
+            self.session, uid, "own_packs"
+        )
+        return set((int(i) for i in own_packs.split(",") if len(i) > 0))
 
     async def set_own(self, uid: int, data: set[int]):
         """
         设置用户现在拥有哪些猎场
         """
-        q = (
-            update(User)
-            .where(User.data_id == uid)
-            .values({User.own_packs: ",".join((str(i) for i in data))})
+        self.identity_map.set_user_fields(
+            uid, own_packs=",".join((str(i) for i in data))
         )
-        await self.session.execute(q)
 
     async def add_own(self, uid: int, pack: int):
         """
@@ -421,12 +411,10 @@ class UserPackRepository(DBRepository):
         """
         获得用户目前在第几个猎场
         """
-        q = select(User.using_pid).filter(User.data_id == uid)
-        return (await self.session.execute(q)).scalar_one()
+        return await self.identity_map.get_user_field(self.session, uid, "using_pid")
 
     async def set_using(self, uid: int, idx: int) -> None:
         """
         设置用户目前在第几个猎场
         """
-        q = update(User).where(User.data_id == uid).values({User.using_pid: idx})
-        await self.session.execute(q)
+        self.identity_map.set_user_fields(uid, using_pid=idx)
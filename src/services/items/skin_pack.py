@@ -3,9 +3,9 @@ from loguru import logger
 from src.base.command_events import MessageContext
 from src.base.res import KagamiResourceManagers
 from src.base.res.resource import IResource
-from src.common.data.awards import get_award_info
+from src.common.data.awards import AwardInfoAssembler
 from src.common.data.items import UseItemSkinPackEvent
-from src.common.dialogue import DialogFrom, get_dialog
+from src.common.dialogue import DialogFrom, aget_dialog
 from src.common.rd import get_random
 from src.common.times import is_april_fool, is_holiday
 from src.core.unit_of_work import UnitOfWork
@@ -64,7 +64,7 @@ class ItemSkinPack(KagamiItem[UseItemSkinPackEvent]):
         biscuit_current = await uow.biscuit.get(uid)
 
         # 补充信息
-        award_info = await get_award_info(uow, data.aid, sid=None)
+        award_info = await AwardInfoAssembler(uow).one(data.aid)
         all_skins_of_award = await uow.skins.get_all_sids_of_one_award(data.aid)
         all_skins_data = [
             await uow.skins.get_info_v2(sid) for sid in all_skins_of_award
@@ -95,13 +95,13 @@ class ItemSkinPack(KagamiItem[UseItemSkinPackEvent]):
             )
         # else:
         #     dialog_from = DialogFrom.pifudian_april_fool
-        dialogs = get_dialog(dialog_from, {f"heart{data.skin_data.level}"})
+        dialogs = await aget_dialog(dialog_from, {f"heart{data.skin_data.level}"})
         view = SkinPackOpen(
             user=data.args.user,
             dialog=get_random().choice(dialogs),
-            image=KagamiResourceManagers.xiaoge_low(
+            image=await KagamiResourceManagers.xiaoge_low.aurl(
                 f"sid_{data.skin_data.sid}.png"
-            ).url,
+            ),
             level=data.skin_data.level,
             skin_award_name=data.award_info.name,
             skin_name=data.skin_data.name,
@@ -0,0 +1,132 @@
+from dataclasses import dataclass
+from typing import Iterable
+
+from src.core.unit_of_work import UnitOfWork
+from src.models.level import level_repo
+
+
+@dataclass(frozen=True)
+class LevelProgress:
+    """
+    某一个等级的小哥收集了多少种
+    """
+
+    lid: int
+    collected: int
+    total: int
+
+
+class PackProgressService:
+    """
+    统计玩家在各个猎场、各个等级的小哥收集进度。
+    一名玩家的全部进度只需要一次查询（有图鉴快照时是一次库存查询）
+    """
+
+    uow: UnitOfWork
+
+    GEDU_OF_LEVEL = (0, 29, 43, 64, 97, 220)
+    "每个等级的一种小哥值多少哥度"
+
+    PROGRESS_PARAM = 10
+    "榆木华定义的常数"
+
+    def __init__(self, uow: UnitOfWork) -> None:
+        self.uow = uow
+
+    async def get_counts(self, uid: int) -> dict[int, dict[int, LevelProgress]]:
+        """获得一名玩家在每个主猎场、每个等级收集到的小哥种数
+
+        Args:
+            uid (int): 玩家 ID
+
+        Returns:
+            dict[int, dict[int, LevelProgress]]: 主猎场到等级 ID 到收集进度
+        """
+        res: dict[int, dict[int, LevelProgress]] = {}
+        counts = await self.uow.inventories.get_collection_counts(uid)
+        for (pack, lid), (collected, total) in counts.items():
+            res.setdefault(pack, {})[lid] = LevelProgress(lid, collected, total)
+        return res
+
+    @staticmethod
+    def merge(
+        counts: dict[int, dict[int, LevelProgress]],
+        packs: Iterable[int] | None = None,
+        lid: int | None = None,
+    ) -> list[LevelProgress]:
+        """把几个猎场的收集进度按等级合并起来
+
+        Args:
+            counts (dict[int, dict[int, LevelProgress]]): `get_counts` 的结果
+            packs (Iterable[int] | None, optional): 要合并的猎场，留空时合并全部猎场
+            lid (int | None, optional): 只保留这个等级
+
+        Returns:
+            list[LevelProgress]: 每个等级的收集进度，等级从高到低排列
+        """
+        packs = counts.keys() if packs is None else set(packs)
+        merged: dict[int, tuple[int, int]] = {}
+        for pack in packs:
+            for level in counts.get(pack, {}).values():
+                if lid is not None and level.lid != lid:
+                    continue
+                collected, total = merged.get(level.lid, (0, 0))
+                merged[level.lid] = (collected + level.collected, total + level.total)
+        return [
+            LevelProgress(_lid, collected, total)
+            for _lid, (collected, total) in sorted(merged.items(), reverse=True)
+        ]
+
+    @staticmethod
+    def count_levels(
+        grouped_aids: dict[int, set[int]], stats: dict[int, int]
+    ) -> list[LevelProgress]:
+        """根据已经读出来的小哥分组和库存统计收集进度
+
+        Args:
+            grouped_aids (dict[int, set[int]]): 等级 ID 到小哥
+            stats (dict[int, int]): 小哥 ID 到抓到过的数量
+
+        Returns:
+            list[LevelProgress]: 每个等级的收集进度，等级从高到低排列
+        """
+        return [
+            LevelProgress(
+                lid,
+                len([aid for aid in aids if stats.get(aid, 0) > 0]),
+                len(aids),
+            )
+            for lid, aids in sorted(grouped_aids.items(), reverse=True)
+        ]
+
+    @classmethod
+    def progress(cls, levels: Iterable[LevelProgress]) -> float:
+        """
+        计算收集进度，越稀有的等级占的比重越小
+        """
+        denominator: float = 0
+        progress: float = 0
+
+        for level in levels:
+            weight = level_repo.get_by_id(level.lid).weight
+            if weight == 0:
+                continue
+            numerator: float = 1 / (weight ** (1 / cls.PROGRESS_PARAM))
+            denominator += numerator
+            if level.total != 0:
+                progress += numerator * (level.collected / level.total)
+            else:
+                progress += numerator
+
+        return progress / denominator if denominator != 0 else 0
+
+    @classmethod
+    def gedu(cls, levels: Iterable[LevelProgress]) -> int:
+        """
+        计算收集到的哥度
+        """
+        return sum(
+            cls.GEDU_OF_LEVEL[level.lid] * level.collected
+            for level in levels
+            if level_repo.get_by_id(level.lid).weight != 0
+        )
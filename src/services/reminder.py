@@ -0,0 +1,208 @@
+"""
+抓小哥次数满了、以及起床时间到了的提醒。
+
+提醒时间的索引见 `src.core.reminders`。这个服务只在最早的提醒到期时醒来，
+醒来时会多等一小会儿，把这段时间里一起到期的提醒攒在一起：
+同一个群里的玩家合成一条消息发出去，没有在群里说过话的玩家单独私聊。
+"""
+
+from typing import Any
+
+import nonebot
+from loguru import logger
+from nonebot_plugin_alconna import UniMessage
+
+from src.base.db import DatabaseManager
+from src.base.event.timer_service import TimerHandle, get_timer_service
+from src.base.onebot.onebot_api import send_group_msg, send_private_msg
+from src.base.onebot.onebot_tools import LAST_CONTEXT_RECORDER
+from src.common.dataclasses.user import UserTime
+from src.common.times import now_datetime
+from src.core.reminders import ReminderRow, get_reminder_index
+from src.core.unit_of_work import UnitOfWork
+from src.logic.catch_time import recalculate_time
+
+REMINDER_MESSAGES = {
+    "slot_full": "你的抓小哥次数已经满了，快来抓小哥吧！",
+    "getup": "起床时间到了，早上好！",
+}
+
+
+class ReminderService:
+    """
+    提醒服务，需要在事件循环中 `start`
+    """
+
+    coalesce: float
+    "到期以后最多再等多少秒，把一起到期的提醒合并发送"
+
+    horizon: float
+    "内存中保存接下来多少秒内到期的提醒"
+
+    def __init__(self, coalesce: float = 30, horizon: float = 3600) -> None:
+        self.coalesce = coalesce
+        self.horizon = horizon
+        self._handle: TimerHandle | None = None
+        self._wake_at: float | None = None
+        self._reload_handle: TimerHandle | None = None
+        self._db: DatabaseManager | None = None
+
+    @property
+    def db(self) -> DatabaseManager:
+        return self._db or DatabaseManager.get_single()
+
+    async def start(self, db: DatabaseManager | None = None):
+        """从数据库重建提醒索引，并开始等待最早的提醒
+
+        Args:
+            db (DatabaseManager | None, optional): 使用的数据库，默认为全局的数据库
+        """
+        self._db = db
+        index = get_reminder_index()
+        index.on_change = self._arm
+
+        async with UnitOfWork(self.db) as uow:
+            # 关机的时候周期可能被改过，启动时全部重新算一遍
+            await uow.reminders.refresh("slot_full")
+        await self.reload(with_subscriptions=True)
+
+        if self.horizon <= 0:
+            return
+        self._reload_handle = get_timer_service().call_every(
+            self.horizon / 2, self.reload, name="ReminderService.reload"
+        )
+
+    def stop(self):
+        get_reminder_index().on_change = None
+        for handle in (self._handle, self._reload_handle):
+            if handle is not None:
+                handle.cancel()
+        self._handle = self._reload_handle = None
+        self._wake_at = None
+
+    async def reload(self, with_subscriptions: bool = False):
+        """
+        读出接下来 `horizon` 秒内到期的提醒，放进内存中的索引
+        """
+        horizon = now_datetime().timestamp() + self.horizon
+        async with UnitOfWork(self.db) as uow:
+            rows = await uow.reminders.get_due_before(horizon)
+            if with_subscriptions:
+                subscriptions = await uow.reminders.get_subscriptions()
+                get_reminder_index().load(subscriptions, rows, horizon)
+            else:
+                get_reminder_index().extend(rows, horizon)
+
+    def _arm(self):
+        """
+        根据最早的提醒时间设定醒来的时间
+        """
+        due = get_reminder_index().next_due()
+        if due is None:
+            return
+
+        wake_at = due + self.coalesce
+        if (
+            self._handle is not None
+            and not self._handle.cancelled
+            and self._wake_at is not None
+            and self._wake_at <= wake_at
+        ):
+            return
+
+        if self._handle is not None:
+            self._handle.cancel()
+        self._wake_at = wake_at
+        delay = max(0, wake_at - now_datetime().timestamp())
+        self._handle = get_timer_service().call_later(
+            delay, self._fire, name="ReminderService.fire"
+        )
+
+    async def _fire(self):
+        self._handle = None
+        self._wake_at = None
+        try:
+            rows = get_reminder_index().pop_due()
+            if len(rows) > 0:
+                await self.notify(rows)
+        finally:
+            self._arm()
+
+    async def collect(self, rows: list[ReminderRow]) -> dict[str, list[int]]:
+        """检查到期的提醒是不是真的需要发送，并清除它们的提醒时间
+
+        Args:
+            rows (list[ReminderRow]): 到期的提醒
+
+        Returns:
+            dict[str, list[int]]: 每种提醒需要提醒的 QQ 号
+        """
+        now = now_datetime().timestamp()
+        res: dict[str, list[int]] = {}
+        async with UnitOfWork(self.db) as uow:
+            states = await uow.reminders.get_user_states(uid for uid, _, _ in rows)
+            interval = await uow.settings.get_interval()
+
+            for uid, kind, _ in rows:
+                if uid not in states:
+                    continue
+                qqid, empty, count, last, getup = states[uid]
+                if kind == "slot_full":
+                    time = recalculate_time(UserTime(count, empty, last, interval), now)
+                    ok = time.slot_empty >= time.slot_count
+                else:
+                    ok = getup <= now
+                if ok:
+                    res.setdefault(kind, []).append(int(qqid))
+
+            await uow.reminders.clear_due(rows)
+        return res
+
+    async def notify(self, rows: list[ReminderRow]):
+        """
+        发送提醒，同一个群的玩家合并成一条消息
+        """
+        targets = await self.collect(rows)
+        if len(targets) == 0:
+            return
+
+        try:
+            bot: Any = nonebot.get_bot()
+        except ValueError:
+            logger.warning(f"没有连接上的 Bot，{len(rows)} 条提醒没有发出去")
+            return
+
+        for kind, qqids in targets.items():
+            text = REMINDER_MESSAGES[kind]
+            groups: dict[int, list[int]] = {}
+            for qqid in qqids:
+                group = LAST_CONTEXT_RECORDER.get(qqid)
+                if group is None:
+                    try:
+                        await send_private_msg(bot, qqid, text)
+                    except Exception as e:  # pylint: disable=broad-except
+                        logger.warning(f"给 {qqid} 发送提醒失败：{e!r}")
+                else:
+                    groups.setdefault(group, []).append(qqid)
+
+            for group, members in groups.items():
+                message = UniMessage()
+                for qqid in members:
+                    message = message.at(str(qqid))
+                try:
+                    await send_group_msg(bot, group, message.text(" " + text))
+                except Exception as e:  # pylint: disable=broad-except
+                    logger.warning(f"在群 {group} 发送提醒失败：{e!r}")
+
+
+reminder_service = ReminderService()
+
+
+def get_reminder_service() -> ReminderService:
+    """
+    获得当前 App 正在使用的提醒服务
+    """
+    return reminder_service
+
+
+__all__ = ["ReminderService", "get_reminder_service", "REMINDER_MESSAGES"]
@@ -1,12 +1,55 @@
-from src.base.schedule import Schedule
+from src.base.event.timer_service import TimerHandle, get_timer_service
+from src.base.schedule import Schedule, Timing
 from src.common.times import now_datetime
 
 
 class ScheduleService:
+    """
+    管理计划任务。`Timing` 类型的任务知道自己下一次的执行时间，直接交给定时任务服务，
+    到点才会被唤醒；其他的任务只能定期检查 `should_do`
+    """
+
     schedules: list[Schedule]
+    "需要定期检查的任务"
+
+    timings: list[Timing]
+    "知道下一次执行时间的任务"
+
+    handles: list[TimerHandle]
 
     def __init__(self) -> None:
         self.schedules = []
+        self.timings = []
+        self.handles = []
+
+    def register(self, schedule: Schedule):
+        if isinstance(schedule, Timing):
+            self.timings.append(schedule)
+        else:
+            self.schedules.append(schedule)
+
+    def start(self, poll_interval: float = 0.5):
+        """开始执行计划任务，需要在事件循环中调用
+
+        Args:
+            poll_interval (float, optional): 检查 `should_do` 的间隔. Defaults to 0.5.
+        """
+        timer = get_timer_service()
+        for timing in self.timings:
+            self.handles.append(
+                timer.call_at(
+                    lambda _, t=timing: t.next, timing.do, type(timing).__name__
+                )
+            )
+        if len(self.schedules) > 0:
+            self.handles.append(
+                timer.call_every(poll_interval, self.tick, name="ScheduleService.tick")
+            )
+
+    def stop(self):
+        for handle in self.handles:
+            handle.cancel()
+        self.handles.clear()
 
     async def tick(self):
         time = now_datetime()
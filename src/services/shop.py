@@ -15,6 +15,7 @@ class ShopProductFreezed:
     description: str
     background_color: str
     image: IResource
+    image_url: str
     price: float
     is_sold_out: bool
     type: str
@@ -66,11 +67,13 @@ class ShopProduct(ABC):
         """商品的类型"""
 
     async def freeze(self, uow: UnitOfWork, uid: int) -> ShopProductFreezed:
+        image = await self.image(uow, uid)
         return ShopProductFreezed(
             title=await self.title(uow, uid),
             description=await self.description(uow, uid),
             background_color=await self.background_color(uow, uid),
-            image=await self.image(uow, uid),
+            image=image,
+            image_url=await image.aurl(),
             price=await self.price(uow, uid),
             is_sold_out=await self.is_sold_out(uow, uid),
             type=self.type,
@@ -86,7 +89,9 @@ class SkinProduct(ShopProduct):
         return "皮肤" + self.info.name
 
     async def image(self, uow: UnitOfWork, uid: int):
-        return KagamiResourceManagers.xiaoge_blurred(f"sid_{self.info.sid}.png")
+        return await KagamiResourceManagers.xiaoge_blurred.aget(
+            f"sid_{self.info.sid}.png"
+        )
 
     async def description(self, uow: UnitOfWork, uid: int):
         return f"{self.award.name}的皮肤"
@@ -1,6 +1,16 @@
+import datetime
 from typing import Literal
 
+from src.core.stat_buffer import (
+    get_stat_buffer,
+    get_staged_stats,
+    match_stat_key,
+    stage_stat,
+)
+from src.common.times import now_datetime
 from src.core.unit_of_work import UnitOfWork
+from src.repositories.stats_repository import StatKey
+from src.repositories.stats_rollup_repository import ROLLUP_DIMENSIONS
 
 
 class StatService:
@@ -15,58 +25,121 @@ class StatService:
 
     # 记录层：记录各类数据
 
+    def _add(
+        self,
+        delta: int,
+        uid: int | None,
+        stat_type: str,
+        linked_uid: int | None = None,
+        linked_aid: int | None = None,
+        linked_sid: int | None = None,
+        linked_pid: int | None = None,
+        linked_rid: int | None = None,
+        linked_upid: int | None = None,
+    ):
+        """
+        记录一条统计增量。增量会在工作单元提交后进入统计缓冲区，由缓冲区批量写入
+        """
+        stage_stat(
+            self.uow.session,
+            StatKey(
+                uid=uid,
+                stat_type=stat_type,
+                linked_uid=linked_uid,
+                linked_aid=linked_aid,
+                linked_sid=linked_sid,
+                linked_pid=linked_pid,
+                linked_rid=linked_rid,
+                linked_upid=linked_upid,
+            ),
+            delta,
+        )
+
+    async def get_sum(
+        self,
+        uid: int | None | Literal["no_limit"],
+        stat_type: str,
+        linked_uid: int | None | Literal["no_limit"] = "no_limit",
+        linked_aid: int | None | Literal["no_limit"] = "no_limit",
+        linked_sid: int | None | Literal["no_limit"] = "no_limit",
+        linked_pid: int | None | Literal["no_limit"] = "no_limit",
+        linked_rid: int | None | Literal["no_limit"] = "no_limit",
+        linked_upid: int | None | Literal["no_limit"] = "no_limit",
+    ) -> int:
+        """
+        获得统计数据之和，包括还在缓冲区、还暂存在当前工作单元中的增量
+        """
+        args = (
+            uid,
+            stat_type,
+            linked_uid,
+            linked_aid,
+            linked_sid,
+            linked_pid,
+            linked_rid,
+            linked_upid,
+        )
+        buffer = get_stat_buffer()
+        result = await buffer.stable_read(lambda: self.uow.stats.get_sum(*args)) or 0
+        result += buffer.pending_sum(*args)
+        for key, delta in get_staged_stats(self.uow.session).items():
+            if match_stat_key(key, *args):
+                result += delta
+        return result
+
     # 表层
     async def throw_baba(self, uid: int, target: int, success: bool):
-        stid = await self.uow.stats.get_id(
+        self._add(
+            1,
             uid=uid,
             stat_type="丢粑粑",
             linked_uid=target,
         )
-        await self.uow.stats.update(stid, 1)
         if success:
-            stid = await self.uow.stats.get_id(
+            self._add(
+                1,
                 uid=uid,
                 stat_type="丢粑粑成功",
                 linked_uid=target,
             )
-            await self.uow.stats.update(stid, 1)
 
     async def zhua(self, uid: int, aid: int, pid: int, count: int):
-        stid = await self.uow.stats.get_id(
+        self._add(
+            count,
             uid=uid,
             stat_type="抓到小哥",
             linked_aid=aid,
             linked_pid=pid,
         )
-        await self.uow.stats.update(stid, count)
 
     async def zhua_get_chips(self, uid: int, count: int):
-        stid = await self.uow.stats.get_id(
+        self._add(
+            count,
             uid=uid,
             stat_type="在抓小哥的时候得到薯片",
         )
-        await self.uow.stats.update(stid, count)
 
     async def zhua_command(self, uid: int):
-        stid = await self.uow.stats.get_id(
+        self._add(
+            1,
             uid=uid,
             stat_type="进行一次抓",
         )
-        await self.uow.stats.update(stid, 1)
 
     async def kz_command(self, uid: int):
-        stid = await self.uow.stats.get_id(
+        self._add(
+            1,
             uid=uid,
             stat_type="进行一次狂抓",
         )
-        await self.uow.stats.update(stid, 1)
 
     async def hc(self, uid: int, rid: int, success: bool, result: int, spent: int):
+        # 合成的统计需要返回统计数据的 ID，所以不经过缓冲区，直接写入
         _res = None if result < 0 else result
-        msg = ({False: "合成失败", True: "合成成功"})[success]
+        msg1 = ({False: "合成失败", True: "合成成功"})[success]
         stid1 = await self.uow.stats.get_id(
             uid=uid,
-            stat_type=msg,
+            stat_type=msg1,
             linked_rid=rid,
             linked_aid=_res,
         )
@@ -79,98 +152,103 @@ class StatService:
             linked_aid=_res,
         )
         await self.uow.stats.update(stid2, spent)
+        await self.uow.stat_rollups.add(
+            {
+                StatKey(uid, msg1, linked_rid=rid, linked_aid=_res): 1,
+                StatKey(uid, msg, linked_rid=rid, linked_aid=_res): spent,
+            }
+        )
         return stid1, stid2
 
     async def sleep(self, uid: int, early: bool):
-        stid = await self.uow.stats.get_id(
+        self._add(
+            1,
             uid=uid,
             stat_type="小镜晚安",
         )
-        await self.uow.stats.update(stid, 1)
         if early:
-            stid = await self.uow.stats.get_id(
+            self._add(
+                1,
                 uid=uid,
                 stat_type="早睡",
             )
-            await self.uow.stats.update(stid, 1)
 
     async def sign(self, uid: int):
-        stid = await self.uow.stats.get_id(uid=uid, stat_type="签到")
-        await self.uow.stats.update(stid, 1)
+        self._add(1, uid=uid, stat_type="签到")
 
     async def qhlc_command(self, uid: int, pid: int):
-        stid = await self.uow.stats.get_id(
+        self._add(
+            1,
             uid=uid,
             stat_type="切换猎场",
             linked_pid=pid,
         )
-        await self.uow.stats.update(stid, 1)
 
     async def check_lc_view(self, uid: int, pid: int):
-        stid = await self.uow.stats.get_id(
+        self._add(
+            1,
             uid=uid,
             stat_type="看猎场的界面",
             linked_pid=pid,
         )
-        await self.uow.stats.update(stid, 1)
 
     async def xjshop_buy(self, uid: int, spent: int):
-        stid = await self.uow.stats.get_id(
+        self._add(
+            1,
             uid=uid,
             stat_type="在小镜商店消费次数",
         )
-        await self.uow.stats.update(stid, 1)
-        stid = await self.uow.stats.get_id(
+        self._add(
+            spent,
             uid=uid,
             stat_type="在小镜商店消费薯片",
         )
-        await self.uow.stats.update(stid, spent)
 
     async def check_xjshop(self, uid: int):
-        stid = await self.uow.stats.get_id(
+        self._add(
+            1,
             uid=uid,
             stat_type="查看小镜商店",
         )
-        await self.uow.stats.update(stid, 1)
 
     async def switch_skin(self, uid: int, aid: int, sid: int | None):
-        stid = await self.uow.stats.get_id(
+        self._add(
+            1,
             uid=uid,
             stat_type="切换皮肤",
             linked_aid=aid,
             linked_sid=sid,
         )
-        await self.uow.stats.update(stid, 1)
 
     async def shi(self, uid: int):
-        stid = await self.uow.stats.get_id(
+        self._add(
+            1,
             uid=uid,
             stat_type="是",
         )
-        await self.uow.stats.update(stid, 1)
 
     async def kbs(self, uid: int):
-        stid = await self.uow.stats.get_id(
+        self._add(
+            1,
             uid=uid,
             stat_type="kbs",
         )
-        await self.uow.stats.update(stid, 1)
 
     async def display(self, uid: int | None, aid: int, sid: int | None):
-        stid = await self.uow.stats.get_id(
+        self._add(
+            1,
             uid=uid,
             stat_type="展示小哥",
             linked_aid=aid,
             linked_sid=sid,
         )
-        await self.uow.stats.update(stid, 1)
 
     async def poke(self, uid: int):
-        stid = await self.uow.stats.get_id(
+        self._add(
+            1,
             uid=uid,
             stat_type="戳小镜",
         )
-        await self.uow.stats.update(stid, 1)
 
     # 获取层：获得各类数据
     async def count_throw_baba(
@@ -179,25 +257,79 @@ class StatService:
         target: int | Literal["no_limit"] = "no_limit",
         success: bool | None = None,
     ) -> int:
+        dimension, value = ("", 0) if target == "no_limit" else ("uid", target)
         if success is None:
-            return await self.uow.stats.get_sum(
-                uid=uid,
-                stat_type="丢粑粑",
-                linked_uid=target,
-            )
+            return await self.get_total("丢粑粑", uid, dimension, value)
         if success:
-            return await self.uow.stats.get_sum(
-                uid=uid,
-                stat_type="丢粑粑成功",
-                linked_uid=target,
+            return await self.get_total("丢粑粑成功", uid, dimension, value)
+
+        return await self.get_total(
+            "丢粑粑", uid, dimension, value
+        ) - await self.get_total("丢粑粑成功", uid, dimension, value)
+
+    def _unwritten_total(
+        self,
+        stat_type: str,
+        uid: int | None | Literal["no_limit"],
+        dimension: str,
+        value: int,
+    ) -> int:
+        """
+        还在缓冲区、还暂存在当前工作单元中，没有进入按天汇总的增量之和
+        """
+        filters = {ROLLUP_DIMENSIONS[dimension]: value} if dimension else {}
+        result = get_stat_buffer().pending_sum(uid, stat_type, **filters)
+        for key, delta in get_staged_stats(self.uow.session).items():
+            if match_stat_key(key, uid, stat_type, **filters):
+                result += delta
+        return result
+
+    async def get_total(
+        self,
+        stat_type: str,
+        uid: int | None | Literal["no_limit"] = "no_limit",
+        dimension: str = "",
+        value: int = 0,
+        days: int | None = None,
+    ) -> int:
+        """
+        从按天汇总的数据中获得统计的总量，`days` 不为 None 时只统计最近几天。
+        和 `get_sum` 一样会计入还在缓冲区、还暂存在当前工作单元中的增量，
+        它们都是刚刚发生的，一定在统计的范围内。
+        """
+        since = None
+        if days is not None:
+            since = now_datetime().date() - datetime.timedelta(days=days - 1)
+        result = await get_stat_buffer().stable_read(
+            lambda: self.uow.stat_rollups.get_total(
+                stat_type, uid, dimension, value, since
             )
+        )
+        return result + self._unwritten_total(stat_type, uid, dimension, value)
 
-        return await self.uow.stats.get_sum(
-            uid=uid,
-            stat_type="丢粑粑",
-            linked_uid=target,
-        ) - await self.uow.stats.get_sum(
-            uid=uid,
-            stat_type="丢粑粑成功",
-            linked_uid=target,
+    async def get_daily_series(
+        self,
+        stat_type: str,
+        days: int,
+        uid: int | None | Literal["no_limit"] = "no_limit",
+        dimension: str = "",
+        value: int = 0,
+    ) -> list[tuple[datetime.date, int]]:
+        """
+        获得最近几天每天的统计值，没有数据的日子记为 0。
+        和 `get_total` 一样，还没有写入的增量都算在今天
+        """
+        series = await get_stat_buffer().stable_read(
+            lambda: self.uow.stat_rollups.get_series(
+                stat_type, days, uid, dimension, value
+            )
+        )
+        if len(series) == 0:
+            return series
+
+        day, count = series[-1]
+        series[-1] = (
+            day,
+            count + self._unwritten_total(stat_type, uid, dimension, value),
         )
+        return series
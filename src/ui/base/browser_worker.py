@@ -1,26 +1,85 @@
+"""
+用浏览器渲染页面。
+
+默认每次渲染都打开一次页面的链接，等待前端加载完成以后截图。
+
+开启单页模式（`spa_mode`）以后，每个浏览器只打开一次前端，之后的渲染都通过
+脚本让已经加载好的前端切换页面，不需要重新加载整个应用。这需要前端提供：
+
+```ts
+window.kagami_render = (route: string) => Promise<void>
+```
+
+其中 `route` 是页面的路径和参数，比如 `zhua?uuid=...`。前端切换到这个页面、
+加载好数据并绘制完成以后 resolve。前端没有提供这个函数时，自动退回到每次
+打开链接的模式。检查的结果按前端的构建记下来，之后启动的浏览器不再重复检查，
+重新构建前端以后才会再检查一次。
+"""
+
 import time
 from abc import abstractmethod
 from pathlib import Path
 
 from loguru import logger
-from selenium.common.exceptions import WebDriverException
+from selenium.common.exceptions import TimeoutException, WebDriverException
 from selenium.webdriver.common.by import By
 from selenium.webdriver.remote.webdriver import WebDriver
 from selenium.webdriver.support.ui import WebDriverWait
 
+from src.apis.render_ui import INDEX_PATH
 from src.base.exceptions import KagamiRenderWarning
 from src.ui.base.browser_driver import (
     BaseBrowserDriverFactory,
     ChromeFactory,
     FirefoxFactory,
 )
+from src.ui.base.render_autoscale import process_tree_rss
 from src.ui.base.render_worker import RenderWorker
 
+PAGES_PREFIX = "/kagami/pages/"
+
+SPA_RENDER_SCRIPT = """
+const [route, done] = arguments;
+const waitImages = () => Promise.all(
+    Array.from(document.images)
+        .filter((img) => !img.complete)
+        .map((img) => new Promise((resolve) => {
+            img.addEventListener("load", resolve, { once: true });
+            img.addEventListener("error", resolve, { once: true });
+        }))
+);
+const nextFrame = () => new Promise((resolve) => requestAnimationFrame(() => resolve()));
+window.kagami_render(route)
+    .then(waitImages)
+    .then(nextFrame)
+    .then(() => {
+        const box = document.getElementById("big_box");
+        if (box === null) {
+            done("页面中没有 #big_box");
+            return;
+        }
+        done([Math.ceil(box.scrollWidth), Math.ceil(box.scrollHeight)]);
+    }, (e) => done(String(e)));
+"""
+"单页模式下切换页面并等待绘制完成，返回 `#big_box` 的大小或者错误信息"
+
 
 class BrowserWorker(RenderWorker):
     _driver: WebDriver | None
     good = True
 
+    spa_mode: bool
+    "是否使用单页模式"
+
+    _spa_base: str | None
+    "单页模式下已经加载好的前端的地址"
+
+    _spa_support: dict[tuple[str, float], bool] = {}
+    "检查过的前端（地址和 `index.html` 的修改时间）是否支持单页模式，所有浏览器共用"
+
+    _window_size: tuple[int, int]
+    "当前窗口的大小，只在需要时调大"
+
     @abstractmethod
     def get_factory(self) -> BaseBrowserDriverFactory: ...
 
@@ -32,8 +91,11 @@ class BrowserWorker(RenderWorker):
     def create_driver(self) -> WebDriver:
         return self.get_factory().get()
 
-    def __init__(self) -> None:
+    def __init__(self, spa_mode: bool = False) -> None:
         self._driver = None
+        self.spa_mode = spa_mode
+        self._spa_base = None
+        self._window_size = (0, 0)
         super().__init__()
 
     def _init(self) -> None:
@@ -49,8 +111,88 @@ class BrowserWorker(RenderWorker):
             pass
         return result
 
+    def memory_usage(self) -> int | None:
+        # 驱动进程启动了浏览器，浏览器又启动了很多个进程，都算在一起
+        if self._driver is None:
+            return None
+        service = getattr(self._driver, "service", None)
+        process = getattr(service, "process", None)
+        if process is None:
+            return None
+        return process_tree_rss(process.pid)
+
+    def _load_spa(self, base: str) -> bool:
+        """
+        打开前端，返回前端是否支持单页模式
+        """
+        self.driver.get(base)
+        self._spa_base = base
+        WebDriverWait(self.driver, 30).until(
+            lambda driver: driver.execute_script("return document.readyState;")
+            == "complete"
+        )
+        try:
+            WebDriverWait(self.driver, 5).until(
+                lambda driver: driver.execute_script(
+                    "return typeof window.kagami_render === 'function';"
+                )
+            )
+        except TimeoutException:
+            logger.warning(
+                f"WebDriver {self.worker_id} 打开的前端不支持单页模式，"
+                "改为每次渲染都打开页面"
+            )
+            return False
+        self.driver.set_script_timeout(30)
+        logger.info(f"WebDriver {self.worker_id} 以单页模式加载好了前端")
+        return True
+
+    def _spa_render(self, link: str) -> bytes | None:
+        """
+        在已经加载好的前端中切换页面并截图，前端不支持单页模式时返回 None
+        """
+        base, sep, route = link.partition(PAGES_PREFIX)
+        if not sep:
+            return None
+        base += sep
+        try:
+            version = INDEX_PATH.stat().st_mtime
+        except FileNotFoundError:
+            version = 0
+        if not BrowserWorker._spa_support.get((base, version), True):
+            # 不支持单页模式的前端只检查一次
+            return None
+        if self._spa_base != base:
+            supported = self._load_spa(base)
+            BrowserWorker._spa_support[(base, version)] = supported
+            if not supported:
+                return None
+
+        timer = time.time()
+        result = self.driver.execute_async_script(SPA_RENDER_SCRIPT, route)
+        if not isinstance(result, list):
+            # 前端出错以后状态不可信，下次重新加载
+            self._spa_base = None
+            raise KagamiRenderWarning(RuntimeError(f"单页模式渲染失败：{result}"))
+        width, height = result
+        logger.debug(
+            f"WebDriver {self.worker_id} 单页模式切换到了 {route}，"
+            f"耗时 {time.time() - timer}，大小 {width} * {height}"
+        )
+
+        # 只有窗口装不下 #big_box 时才调大窗口
+        if width + 50 > self._window_size[0] or height + 50 > self._window_size[1]:
+            self._window_size = (
+                max(self._window_size[0], width + 150),
+                max(self._window_size[1], height + 150),
+            )
+            self.driver.set_window_size(*self._window_size)
+
+        return self.driver.find_element(By.ID, "big_box").screenshot_as_png
+
     def _main_render(self, link: str) -> bytes:
         # 访问相应接口
+        self._spa_base = None
         self.driver.get(link)
         logger.debug(f"WebDriver {self.worker_id} 访问了 {link}")
 
@@ -106,6 +248,7 @@ class BrowserWorker(RenderWorker):
 
         # self.driver.set_window_size(element_width + 150, element_height + 150)
         self.driver.set_window_size(10000, 10000)
+        self._window_size = (10000, 10000)
         time.sleep(0.1)
 
         document_width = self.driver.execute_script(
@@ -132,6 +275,10 @@ class BrowserWorker(RenderWorker):
 
     def _render(self, link: str) -> bytes:
         try:
+            if self.spa_mode:
+                image = self._spa_render(link)
+                if image is not None:
+                    return image
             return self._main_render(link)
         except (AssertionError, WebDriverException) as e:
             logger.warning(f"WebDriver 遇到了问题 {self}")
@@ -77,6 +77,9 @@ class RenderRpcClient:
 class RabbitMQWorker(RenderWorker):
     _client: RenderRpcClient | None
 
+    # 浏览器在另一边，这里只是一个连接
+    recyclable = False
+
     def __init__(
         self, host: str, port: int, virtual_host: str, username: str, password: str
     ) -> None:
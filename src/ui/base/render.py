@@ -3,17 +3,23 @@
 """
 
 import functools
+from pathlib import Path
 from typing import Any
+
 import nonebot
-from src.common.config import get_config
+
+from src.base.event.timer_service import get_timer_service
+from src.common.config import Config, get_config, on_config_changed
 from src.ui.base.browser_worker import (
     ChromeBrowserWorker,
     FakeRenderWorker,
     FirefoxBrowserWorker,
 )
 from src.ui.base.rabbitmq_worker import RabbitMQWorker
+from src.ui.base.render_autoscale import AutoscalePolicy
+from src.ui.base.render_cache import RenderCache
 from src.ui.base.render_worker import RenderPool
-
+from src.ui.native import NativeRenderOptions
 
 config = get_config()
 
@@ -33,15 +39,65 @@ elif config.renderer == "service":
         config.rabbitmq_password,
     )
 elif config.browser == "chrome":
-    cls = ChromeBrowserWorker
+    cls = functools.partial(ChromeBrowserWorker, spa_mode=config.render_spa_mode)
 else:
-    cls = FirefoxBrowserWorker
+    cls = functools.partial(FirefoxBrowserWorker, spa_mode=config.render_spa_mode)
 
 
+render_cache = RenderCache(
+    config.render_cache_size * 1024 * 1024,
+    config.render_cache_ttl,
+    Path(config.render_cache_dir) if config.render_cache_dir else None,
+)
+
 render_pool = RenderPool(
-    cls, config.browser_count, config.render_host, port, config.render_max_fail
+    cls,
+    config.browser_count,
+    config.render_host,
+    port,
+    config.render_max_fail,
+    render_cache,
+    config.render_deadline if config.render_deadline > 0 else None,
 )
 
+AUTOSCALE_INTERVAL = 5
+"检查是否需要调整渲染器数量的间隔，单位秒"
+
+MEMORY_CHECK_INTERVAL = 60
+"检查渲染器占用内存的间隔，单位秒"
+
+
+def apply_native_render_config(pool: RenderPool[Any], config: Config):
+    """
+    把原生渲染的配置交给渲染池，没有配置字体时不使用原生渲染
+    """
+    pool.native_pages = set(config.native_render_pages)
+    if config.native_render_font and Path(config.native_render_font).exists():
+        pool.native_options = NativeRenderOptions(
+            font=config.native_render_font,
+            bold_font=config.native_render_bold_font or None,
+        )
+    else:
+        pool.native_options = None
+
+
+apply_native_render_config(render_pool, config)
+
+
+def apply_autoscale_config(pool: RenderPool[Any], config: Config):
+    """
+    把调整渲染器数量和更换渲染器的配置交给渲染池
+    """
+    pool.autoscale_policy = AutoscalePolicy(
+        max_workers=config.browser_count_max,
+        scale_up_wait=config.browser_scale_up_wait,
+        idle_timeout=config.browser_idle_timeout,
+        max_renders=config.browser_max_renders,
+        max_memory=config.browser_max_memory * 1024 * 1024,
+    )
+
+
+apply_autoscale_config(render_pool, config)
 
 _nb_driver = nonebot.get_driver()
 
@@ -49,6 +105,33 @@ _nb_driver = nonebot.get_driver()
 @_nb_driver.on_startup
 async def start_up():
     await render_pool.fill()
+    get_timer_service().call_every(
+        AUTOSCALE_INTERVAL, render_pool.autoscale, name="autoscale_render_pool"
+    )
+    get_timer_service().call_every(
+        MEMORY_CHECK_INTERVAL,
+        render_pool.recycle_bloated,
+        name="recycle_bloated_renderers",
+    )
+
+    if render_cache.ttl > 0:
+        get_timer_service().call_every(
+            render_cache.ttl, render_cache.prune, name="prune_render_cache"
+        )
+
+
+@on_config_changed
+async def _resize_render_pool(old: Config, new: Config):
+    render_pool.max_fail = new.render_max_fail
+    render_pool.deadline = new.render_deadline if new.render_deadline > 0 else None
+    render_cache.max_bytes = new.render_cache_size * 1024 * 1024
+    render_cache.ttl = new.render_cache_ttl
+    apply_native_render_config(render_pool, new)
+    apply_autoscale_config(render_pool, new)
+    if old.frontend_dist != new.frontend_dist:
+        render_cache.clear()
+    if old.browser_count != new.browser_count:
+        await render_pool.resize(new.browser_count)
 
 
 def get_render_pool() -> RenderPool[Any]:
@@ -0,0 +1,126 @@
+"""
+渲染器数量的自动调整和渲染器的更换。
+
+晚上大家都在抓小哥的时候需要很多浏览器，其他时候一两个就够了，
+一直开着最多数量的浏览器会白白占着内存。浏览器渲染了几千次以后还会越来越占内存。
+
+- 渲染排队排得久了就增加渲染器，直到上限；
+- 多出来的渲染器闲置一段时间以后关掉，直到下限；
+- 渲染器渲染了足够多次，或者占用的内存太多时换一个新的。
+  先启动好新的再关掉旧的，换的时候能用的渲染器不会变少。
+"""
+
+import os
+from dataclasses import dataclass
+from pathlib import Path
+
+PROC = Path("/proc")
+
+
+@dataclass
+class AutoscalePolicy:
+    """
+    调整渲染器数量和更换渲染器的规则，渲染器数量的下限是渲染池的 `count`
+    """
+
+    max_workers: int
+    "渲染器数量的上限，不大于下限时不会自动增加"
+
+    scale_up_wait: float = 2
+    "排在最前面的渲染等了多少秒以后增加渲染器"
+
+    idle_timeout: float = 300
+    "多出来的渲染器闲置多少秒以后关掉"
+
+    max_renders: int = 0
+    "渲染多少次以后更换，小于等于 0 时不限制"
+
+    max_memory: int = 0
+    "占用的内存超过多少字节时更换，小于等于 0 时不检查"
+
+    def scale_delta(
+        self,
+        minimum: int,
+        total: int,
+        starting: int,
+        depth: int,
+        oldest_wait: float,
+        idle_for: list[float],
+    ) -> int:
+        """计算需要增加（正数）或者关掉（负数）多少个渲染器
+
+        Args:
+            minimum (int): 渲染器数量的下限
+            total (int): 现在的渲染器数量，包括正在启动的
+            starting (int): 正在启动的渲染器数量
+            depth (int): 正在排队的渲染数量
+            oldest_wait (float): 排在最前面的渲染等了多少秒
+            idle_for (list[float]): 每个空闲的渲染器闲置了多少秒
+        """
+        maximum = max(self.max_workers, minimum)
+        if total < minimum:
+            return minimum - total
+        if depth > 0:
+            # 正在启动的渲染器启动好以后就能接手排队的渲染，不重复增加
+            need = depth - starting
+            if total < maximum and need > 0 and oldest_wait >= self.scale_up_wait:
+                return min(maximum - total, need)
+            return 0
+        idle = sum(1 for t in idle_for if t >= self.idle_timeout)
+        return -min(idle, max(total - minimum, 0))
+
+    def should_recycle(self, render_count: int, memory: int | None = None) -> bool:
+        """
+        渲染器是否该换一个新的了，`memory` 为 None 表示不知道占用了多少内存
+        """
+        if 0 < self.max_renders <= render_count:
+            return True
+        return memory is not None and 0 < self.max_memory < memory
+
+
+def _read_ppid(pid: str) -> int | None:
+    try:
+        stat = (PROC / pid / "stat").read_text()
+    except OSError:
+        return None
+    # 第二个字段是括号括起来的进程名，里面可能有空格和括号
+    return int(stat[stat.rindex(")") + 2 :].split()[1])
+
+
+def _read_rss(pid: int) -> int:
+    try:
+        statm = (PROC / str(pid) / "statm").read_text()
+    except OSError:
+        return 0
+    return int(statm.split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+
+def process_tree_rss(pid: int) -> int | None:
+    """
+    一个进程和它的所有子孙进程一共占用的物理内存，单位字节。
+    浏览器会启动很多个进程，只看驱动进程是不够的。只支持 Linux，其他系统返回 None
+    """
+    if not PROC.is_dir():
+        return None
+    children: dict[int, list[int]] = {}
+    for entry in PROC.iterdir():
+        if not entry.name.isdigit():
+            continue
+        ppid = _read_ppid(entry.name)
+        if ppid is not None:
+            children.setdefault(ppid, []).append(int(entry.name))
+
+    total = 0
+    stack = [pid]
+    seen: set[int] = set()
+    while stack:
+        current = stack.pop()
+        if current in seen:
+            continue
+        seen.add(current)
+        total += _read_rss(current)
+        stack.extend(children.get(current, []))
+    return total
+
+
+__all__ = ["AutoscalePolicy", "process_tree_rss"]
@@ -0,0 +1,276 @@
+"""
+渲染结果的缓存。
+
+大部分页面的渲染结果只取决于页面的路径和交给前端的数据，比如帮助、更新日志、
+小哥的展示卡片，或者什么都没变的库存。对这些内容计算一个哈希：
+
+- 页面路径；
+- 序列化以后的数据，其中的资源 URL 本身就是文件内容的哈希；
+- 前端的构建版本（`index.html` 的哈希，构建时它引用的文件名会变）。
+
+哈希相同的渲染直接返回缓存的图片。缓存先查内存中按大小限制的 LRU，再查硬盘，
+同一时间相同的渲染只会真正执行一次。这次渲染放在单独的任务里，等待它的人
+被取消不会影响其他人，所有人都不等了才会取消它。头像之类的 URL 不随内容变化，
+所以缓存有过期时间。
+"""
+
+import asyncio
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from hashlib import sha256
+from pathlib import Path
+from typing import Any, Awaitable, Callable
+
+from loguru import logger
+from pydantic import BaseModel
+from pydantic_core import to_json
+
+from src.common.threading import run_io
+
+
+@dataclass
+class RenderCacheStats:
+    """
+    渲染缓存的命中情况
+    """
+
+    hits: int = 0
+    "在内存中命中的次数"
+
+    disk_hits: int = 0
+    "在硬盘中命中的次数"
+
+    misses: int = 0
+    "没有命中、真正渲染了的次数"
+
+    joined: int = 0
+    "和同时进行的相同渲染合并了的次数"
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.disk_hits + self.misses + self.joined
+        if total == 0:
+            return 0
+        return (total - self.misses) / total
+
+
+@dataclass
+class _PendingRender:
+    task: "asyncio.Task[bytes]"
+    "真正渲染的任务"
+
+    waiters: int = 0
+    "还在等待这次渲染的数量"
+
+
+def _read_fresh(fp: Path, ttl: float) -> bytes | None:
+    try:
+        if ttl > 0 and time.time() - fp.stat().st_mtime > ttl:
+            fp.unlink(missing_ok=True)
+            return None
+        return fp.read_bytes()
+    except FileNotFoundError:
+        return None
+
+
+def _write(fp: Path, data: bytes):
+    fp.parent.mkdir(parents=True, exist_ok=True)
+    tmp = fp.with_suffix(".tmp")
+    tmp.write_bytes(data)
+    tmp.replace(fp)
+
+
+def _prune(root: Path, ttl: float) -> int:
+    count = 0
+    if not root.exists():
+        return count
+    now = time.time()
+    for fp in root.glob("*.png"):
+        try:
+            if now - fp.stat().st_mtime > ttl:
+                fp.unlink()
+                count += 1
+        except FileNotFoundError:
+            pass
+    return count
+
+
+class RenderCache:
+    """
+    渲染结果的缓存
+    """
+
+    max_bytes: int
+    "内存中最多缓存多少字节的图片，小于等于 0 时不缓存"
+
+    ttl: float
+    "缓存的过期时间，单位秒，小于等于 0 时不过期"
+
+    root: Path | None
+    "硬盘缓存的目录，为 None 时只缓存在内存中"
+
+    def __init__(
+        self, max_bytes: int, ttl: float = 3600, root: Path | None = None
+    ) -> None:
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.root = root
+        self.stats = RenderCacheStats()
+        self._items: OrderedDict[str, tuple[float, bytes]] = OrderedDict()
+        self._size = 0
+        self._pending: dict[str, _PendingRender] = {}
+        self._frontend: tuple[float, str] | None = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def frontend_version(self, index: Path) -> str:
+        """
+        前端构建的版本，`index.html` 没有修改过就不重新计算
+        """
+        try:
+            mtime = index.stat().st_mtime
+        except FileNotFoundError:
+            return ""
+        if self._frontend is None or self._frontend[0] != mtime:
+            self._frontend = (mtime, sha256(index.read_bytes()).hexdigest())
+        return self._frontend[1]
+
+    def key(
+        self, path: str, data: BaseModel | dict[str, Any] | None, version: str = ""
+    ) -> str:
+        """
+        计算一次渲染的哈希
+        """
+        hasher = sha256()
+        hasher.update(path.encode())
+        hasher.update(b"\0")
+        hasher.update(version.encode())
+        hasher.update(b"\0")
+        if isinstance(data, BaseModel):
+            hasher.update(data.model_dump_json().encode())
+        elif data is not None:
+            hasher.update(to_json(data))
+        return hasher.hexdigest()
+
+    def _get_memory(self, key: str) -> bytes | None:
+        item = self._items.get(key)
+        if item is None:
+            return None
+        created, data = item
+        if self.ttl > 0 and time.time() - created > self.ttl:
+            self._drop(key)
+            return None
+        self._items.move_to_end(key)
+        return data
+
+    def _drop(self, key: str):
+        item = self._items.pop(key, None)
+        if item is not None:
+            self._size -= len(item[1])
+
+    def _put_memory(self, key: str, data: bytes, created: float | None = None):
+        if len(data) > self.max_bytes:
+            return
+        self._drop(key)
+        self._items[key] = (created if created is not None else time.time(), data)
+        self._size += len(data)
+        while self._size > self.max_bytes:
+            _, (_, old) = self._items.popitem(last=False)
+            self._size -= len(old)
+
+    async def get_or_render(
+        self, key: str, render: Callable[[], Awaitable[bytes]]
+    ) -> bytes:
+        """从缓存中获取渲染结果，没有的话调用 `render` 渲染，并放进缓存
+
+        Args:
+            key (str): 渲染的哈希，由 `key` 计算
+            render (Callable[[], Awaitable[bytes]]): 真正渲染的函数
+
+        Returns:
+            bytes: 渲染得到的图片
+        """
+        if not self.enabled:
+            return await render()
+
+        data = self._get_memory(key)
+        if data is not None:
+            self.stats.hits += 1
+            return data
+
+        pending = self._pending.get(key)
+        if pending is None:
+            pending = self._start(key, render)
+        else:
+            self.stats.joined += 1
+
+        pending.waiters += 1
+        try:
+            return await asyncio.shield(pending.task)
+        finally:
+            pending.waiters -= 1
+            if pending.waiters == 0 and not pending.task.done():
+                # 所有人都不等了（被取消了），没有必要再渲染下去
+                pending.task.cancel()
+                if self._pending.get(key) is pending:
+                    del self._pending[key]
+
+    def _start(self, key: str, render: Callable[[], Awaitable[bytes]]):
+        task = asyncio.create_task(self._load_or_render(key, render))
+        pending = _PendingRender(task)
+        self._pending[key] = pending
+
+        def _done(task: "asyncio.Task[bytes]"):
+            if self._pending.get(key) is pending:
+                del self._pending[key]
+            if not task.cancelled():
+                # 没有人等待时不要报「exception was never retrieved」
+                task.exception()
+
+        task.add_done_callback(_done)
+        return pending
+
+    async def _load_or_render(
+        self, key: str, render: Callable[[], Awaitable[bytes]]
+    ) -> bytes:
+        fp = self.root / f"{key}.png" if self.root is not None else None
+        if fp is not None:
+            data = await run_io(_read_fresh, fp, self.ttl)
+            if data is not None:
+                self.stats.disk_hits += 1
+                self._put_memory(key, data)
+                return data
+
+        self.stats.misses += 1
+        data = await render()
+        self._put_memory(key, data)
+        if fp is not None:
+            try:
+                await run_io(_write, fp, data)
+            except OSError as e:
+                logger.warning(f"渲染缓存写入硬盘失败：{e!r}")
+        return data
+
+    async def prune(self) -> int:
+        """
+        删除硬盘中过期的缓存，返回删除的数量
+        """
+        if self.root is None or self.ttl <= 0:
+            return 0
+        return await run_io(_prune, self.root, self.ttl)
+
+    def clear(self):
+        """
+        清空内存中的缓存
+        """
+        self._items.clear()
+        self._size = 0
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+
+__all__ = ["RenderCache", "RenderCacheStats"]
@@ -0,0 +1,219 @@
+"""
+渲染器的调度。
+
+渲染器池里只有几个浏览器，所有要渲染的页面都在这里排队：
+
+- 按优先级分成几条队列。抓小哥这种一张卡片的页面很快，排在十几屏长的库存前面；
+- 同一优先级内按群公平排队（开始时间公平排队）。每个请求按所在的群拿到一个
+  虚拟时间戳，一个群一口气发了十次库存，别的群的请求也只需要等一次，不用等十次；
+- 排队的请求被取消（比如超过了期限）以后不会再占用渲染器；
+- 按页面的路径统计排队的长度、排队的时间和渲染的时间。
+
+渲染器空闲时放在 `idle` 中，不需要为了检查状态把它们全部取出来再放回去。
+"""
+
+import asyncio
+import heapq
+import itertools
+import time
+from dataclasses import dataclass, field
+from enum import IntEnum
+from typing import Generic, Hashable, TypeVar
+
+
+class RenderPriority(IntEnum):
+    """
+    渲染的优先级，数字越小越先渲染
+    """
+
+    HIGH = 0
+    "很快就能画完的小页面，比如抓小哥的结果"
+
+    NORMAL = 1
+
+    LOW = 2
+    "很大的页面，比如库存和图鉴，以及管理员和后台的渲染"
+
+
+DEFAULT_RENDER_PRIORITIES: dict[str, RenderPriority] = {
+    "zhua": RenderPriority.HIGH,
+    "catch": RenderPriority.HIGH,
+    "recipe": RenderPriority.HIGH,
+    "skin_pack": RenderPriority.HIGH,
+    "skin_shop_buy": RenderPriority.HIGH,
+    "xjshop/bought": RenderPriority.HIGH,
+    "storage": RenderPriority.LOW,
+    "liechang": RenderPriority.LOW,
+    "recipe_archive": RenderPriority.LOW,
+}
+"各个页面默认的优先级，没有写在这里的页面是 `NORMAL`"
+
+
+@dataclass
+class RenderPathStats:
+    """
+    一个页面的渲染统计
+    """
+
+    count: int = 0
+    "渲染的次数"
+
+    failed: int = 0
+    "渲染失败的次数"
+
+    timeouts: int = 0
+    "超过期限的次数"
+
+    waiting: int = 0
+    "现在正在排队的数量"
+
+    wait_total: float = 0
+    "排队等待渲染器的总时间，单位秒"
+
+    wait_max: float = 0
+    "排队等待渲染器的最长时间"
+
+    render_total: float = 0
+    "渲染的总时间"
+
+    render_max: float = 0
+    "渲染的最长时间"
+
+    def add_wait(self, wait: float):
+        self.wait_total += wait
+        self.wait_max = max(self.wait_max, wait)
+
+    def add_render(self, duration: float):
+        self.render_total += duration
+        self.render_max = max(self.render_max, duration)
+
+
+T = TypeVar("T")
+
+
+@dataclass(order=True)
+class _Ticket(Generic[T]):
+    priority: int
+    tag: float
+    seq: int
+    future: "asyncio.Future[T]" = field(compare=False)
+    created: float = field(compare=False, default_factory=time.perf_counter)
+
+
+class RenderScheduler(Generic[T]):
+    """
+    按优先级和群公平地分配渲染器
+    """
+
+    idle: list[T]
+    "空闲的渲染器"
+
+    stats: dict[str, RenderPathStats]
+    "每个页面的统计"
+
+    def __init__(self) -> None:
+        self.idle = []
+        self.stats = {}
+        self._waiting: list[_Ticket[T]] = []
+        self._seq = itertools.count()
+        self._vtime = 0.0
+        self._finish: dict[Hashable, float] = {}
+
+    def stats_of(self, path: str) -> RenderPathStats:
+        return self.stats.setdefault(path, RenderPathStats())
+
+    @property
+    def depth(self) -> int:
+        """正在排队的请求数量"""
+        return sum(not ticket.future.done() for ticket in self._waiting)
+
+    @property
+    def oldest_wait(self) -> float:
+        """排得最久的请求等了多少秒"""
+        now = time.perf_counter()
+        return max(
+            (now - t.created for t in self._waiting if not t.future.done()),
+            default=0.0,
+        )
+
+    def _stamp(self, group: Hashable) -> float:
+        tag = max(self._finish.get(group, 0.0), self._vtime)
+        self._finish[group] = tag + 1
+        return tag
+
+    def _advance(self, tag: float):
+        self._vtime = max(self._vtime, tag)
+        if len(self._finish) > 1024:
+            # 落后于虚拟时间的群和从来没有来过的群是一样的，不用记着
+            self._finish = {g: t for g, t in self._finish.items() if t > self._vtime}
+
+    async def acquire(
+        self,
+        priority: int = RenderPriority.NORMAL,
+        group: Hashable = None,
+        path: str = "",
+    ) -> T:
+        """等待并取得一个渲染器，用完以后需要 `release`
+
+        Args:
+            priority (int, optional): 优先级，数字越小越先拿到
+            group (Hashable, optional): 请求来自哪个群，同一优先级内各个群轮流拿到
+            path (str, optional): 页面的路径，用于统计
+
+        Returns:
+            T: 渲染器
+        """
+        stats = self.stats_of(path)
+        tag = self._stamp(group)
+        if self.idle:
+            # 有空闲的渲染器时一定没有人在排队，见 `release`
+            self._advance(tag)
+            return self.idle.pop()
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiting, _Ticket(priority, tag, next(self._seq), future))
+        stats.waiting += 1
+        begin = time.perf_counter()
+        try:
+            worker = await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # 已经分到了渲染器，但是在拿到之前被取消了，交给下一个人
+                self.release(future.result())
+            raise
+        finally:
+            stats.waiting -= 1
+            stats.add_wait(time.perf_counter() - begin)
+        return worker
+
+    def release(self, worker: T):
+        """
+        归还渲染器，有人在排队时直接交给排在最前面的人
+        """
+        while self._waiting:
+            ticket = heapq.heappop(self._waiting)
+            if ticket.future.done():
+                # 已经被取消了
+                continue
+            self._advance(ticket.tag)
+            ticket.future.set_result(worker)
+            return
+        self.idle.append(worker)
+
+    def take(self, worker: T) -> bool:
+        """
+        把一个空闲的渲染器拿出来，不在空闲的渲染器中时返回 False
+        """
+        try:
+            self.idle.remove(worker)
+        except ValueError:
+            return False
+        return True
+
+
+__all__ = [
+    "DEFAULT_RENDER_PRIORITIES",
+    "RenderPathStats",
+    "RenderPriority",
+    "RenderScheduler",
+]
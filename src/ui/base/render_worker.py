@@ -1,4 +1,5 @@
 import asyncio
+import functools
 import time
 from abc import ABC, abstractmethod
 from concurrent.futures import ThreadPoolExecutor
@@ -7,8 +8,23 @@ from typing import Any, Callable, Generic, TypeVar
 from loguru import logger
 from pydantic import BaseModel
 
-from src.apis.render_ui import backend_register_data
-from src.base.exceptions import KagamiRenderException, KagamiRenderWarning
+from src.apis.render_ui import INDEX_PATH, backend_register_data
+from src.base.event.admission import current_group
+from src.base.exceptions import (
+    KagamiRenderException,
+    KagamiRenderWarning,
+    RenderTimeoutException,
+)
+from src.base.res.resource import prefetch_resources
+from src.ui.base.render_autoscale import AutoscalePolicy
+from src.ui.base.render_cache import RenderCache
+from src.ui.base.render_scheduler import (
+    DEFAULT_RENDER_PRIORITIES,
+    RenderPathStats,
+    RenderPriority,
+    RenderScheduler,
+)
+from src.ui.native import NativeRenderOptions, NativeRenderer, get_native_renderer
 
 TEMP = {"work_id": 0}
 
@@ -51,6 +67,12 @@ class RenderWorker(ABC):
 
     尝试退出当前会话，例如，关闭浏览器等。该方法应该尽可能避免抛出错误。
     例如，浏览器已经关闭时，不应该抛出错误，而是跳过关闭流程。
+
+    ## 可以继承
+
+    ### `memory_usage` 方法
+
+    当前工作者占用了多少内存，用于在占用太多时换一个新的。不知道时返回 None
     """
 
     worker_id: str
@@ -58,11 +80,22 @@ class RenderWorker(ABC):
     started: bool
     exited: bool
 
+    render_count: int
+    "渲染了多少次"
+
+    last_used: float
+    "上一次渲染结束（或者启动好）的时间"
+
+    recyclable: bool = True
+    "渲染了很多次以后是否需要换一个新的"
+
     def __init__(self) -> None:
         self.worker_id = get_next_work_id()
         self.last_render_begin = 0
         self.started = False
         self.exited = False
+        self.render_count = 0
+        self.last_used = time.time()
 
     @abstractmethod
     def _render(self, link: str) -> bytes: ...
@@ -70,10 +103,17 @@ class RenderWorker(ABC):
     def render(self, link: str) -> bytes:
         self.last_render_begin = time.time()
         logger.info(f"渲染器开始渲染 Worker={self} Link={link}")
-        result = self._render(link)
+        try:
+            result = self._render(link)
+        finally:
+            self.render_count += 1
+            self.last_used = time.time()
         logger.info(f"渲染器渲染结束 Worker={self} Link={link}")
         return result
 
+    def memory_usage(self) -> int | None:
+        return None
+
     @abstractmethod
     def _ok(self) -> bool: ...
 
@@ -91,6 +131,7 @@ class RenderWorker(ABC):
             logger.info(f"渲染器启动成功 Worker={self}")
         finally:
             self.started = True
+            self.last_used = time.time()
 
     @abstractmethod
     def _quit(self): ...
@@ -121,33 +162,75 @@ T = TypeVar("T", bound=RenderWorker)
 
 class RenderPool(Generic[T]):
     """
-    渲染器池
+    渲染器池。
+
+    空闲的渲染器由 `RenderScheduler` 管理，请求按优先级和群排队。
+    渲染器的状态在后台逐个检查（见 `clean`），渲染时不再检查。
+    渲染器的数量在 `count` 和 `autoscale_policy` 的上限之间自动调整（见 `autoscale`）。
     """
 
     executor: ThreadPoolExecutor
 
     starting: set[RenderWorker]
     working: set[RenderWorker]
-    worker_pool: asyncio.Queue[RenderWorker]
+    checking: set[RenderWorker]
+    scheduler: RenderScheduler[T]
     cls: Callable[[], T]
     count: int
     host: str
     port: int
     max_fail: int
 
+    deadline: float | None
+    "一次渲染默认最多花多少秒，为 None 时不限制"
+
+    priorities: dict[str, RenderPriority]
+    "各个页面默认的优先级"
+
+    autoscale_policy: AutoscalePolicy | None
+    "调整渲染器数量和更换渲染器的规则，为 None 时数量固定为 `count`，也不更换"
+
+    recycling: set[RenderWorker]
+    "正在等新的渲染器启动、准备换掉的渲染器"
+
+    retiring: set[RenderWorker]
+    "已经被换掉了，但是还在渲染的渲染器，渲染完以后关掉"
+
     def __init__(
-        self, cls: Callable[[], T], count: int, host: str, port: int, max_fail: int
+        self,
+        cls: Callable[[], T],
+        count: int,
+        host: str,
+        port: int,
+        max_fail: int,
+        cache: RenderCache | None = None,
+        deadline: float | None = None,
+        autoscale_policy: AutoscalePolicy | None = None,
     ) -> None:
+        self.cache = cache
+        self.native_pages: set[str] = set()
+        self.native_options: NativeRenderOptions | None = None
         self.executor = ThreadPoolExecutor()
-        self.worker_pool = asyncio.Queue()
+        self.scheduler = RenderScheduler()
         self.cls = cls
         self.count = count
         self.host = host
         self.port = port
         self.max_fail = max_fail
+        self.deadline = deadline
+        self.priorities = dict(DEFAULT_RENDER_PRIORITIES)
+        self.autoscale_policy = autoscale_policy
 
         self.working = set()
         self.starting = set()
+        self.checking = set()
+        self.recycling = set()
+        self.retiring = set()
+
+    @property
+    def stats(self) -> dict[str, RenderPathStats]:
+        """每个页面的渲染统计"""
+        return self.scheduler.stats
 
     async def put(self, cls: Callable[[], T] | None = None) -> None:
         if cls is None:
@@ -160,9 +243,11 @@ class RenderPool(Generic[T]):
         loop = asyncio.get_event_loop()
         worker = cls()
         self.starting.add(worker)
-        await loop.run_in_executor(self.executor, worker.init)
-        self.starting.remove(worker)
-        await self.worker_pool.put(worker)
+        try:
+            await loop.run_in_executor(self.executor, worker.init)
+        finally:
+            self.starting.discard(worker)
+        self.scheduler.release(worker)
 
     async def _worker_quit(self, worker: RenderWorker) -> None:
         loop = asyncio.get_event_loop()
@@ -175,6 +260,14 @@ class RenderPool(Generic[T]):
     async def leave(self, worker: RenderWorker) -> None:
         asyncio.create_task(self._worker_quit(worker))
 
+    def _replace(self, worker: RenderWorker):
+        """
+        关闭一个渲染器，并推入一个新的，保证数量不减少
+        """
+        asyncio.create_task(self._worker_initializer(self.cls))
+        if not worker.exited:
+            asyncio.create_task(self._worker_quit(worker))
+
     async def fill(self) -> None:
         """
         装载 Worker，如果数量超了，则不管
@@ -182,90 +275,314 @@ class RenderPool(Generic[T]):
         for _ in range(self.count):
             await self.put()
 
-    async def clean(self) -> None:
+    async def resize(self, count: int) -> None:
         """
-        清理异常的渲染器，并重新打开
+        调整渲染器的数量，多出来的渲染器只从闲置的渲染器中关闭
         """
+        count = max(count, 0)
+        delta = count - self.count
+        self.count = count
+
+        for _ in range(delta):
+            await self.put()
 
-        tmp: list[RenderWorker] = []
-        while not self.worker_pool.empty():
-            # 将所有 worker 临时取出
-            worker = await self.worker_pool.get()
-            tmp.append(worker)
+        for _ in range(-delta):
+            if not self.scheduler.idle:
+                break
+            await self.leave(self.scheduler.idle.pop())
 
-        for worker in tmp:
-            if not worker.ok:
-                logger.warning(f"有渲染器工作不正常 Worker={worker}")
-                if not worker.exited:
-                    await self.leave(worker)
-                await self.put()
+    async def clean(self) -> None:
+        """
+        清理异常的渲染器，并重新打开。
+
+        一次只拿出一个空闲的渲染器检查，其他渲染器照常工作。
+        """
+        loop = asyncio.get_event_loop()
+        for worker in list(self.scheduler.idle):
+            if not self.scheduler.take(worker):
+                # 检查到它之前已经被拿去渲染了
+                continue
+            self.checking.add(worker)
+            try:
+                ok = await loop.run_in_executor(self.executor, lambda: worker.ok)
+            except Exception as e:  # pylint: disable=broad-except
+                logger.opt(exception=e).warning(f"检查渲染器状态失败 Worker={worker}")
+                ok = False
+            finally:
+                self.checking.discard(worker)
+            if worker in self.retiring:
+                self.retiring.remove(worker)
+                await self.leave(worker)
+            elif ok:
+                self.scheduler.release(worker)
             else:
-                # 将正常的渲染器放回
-                await self.worker_pool.put(worker)
+                logger.warning(f"有渲染器工作不正常 Worker={worker}")
+                self._replace(worker)
+
+    def _retire(self, worker_id: str) -> RenderWorker | None:
+        """
+        把指定的渲染器从池中拿走，之后它不会再被用来渲染
+        """
+        for worker in [*self.recycling, *self.retiring]:
+            if worker.worker_id == worker_id:
+                self.recycling.discard(worker)
+                self.retiring.discard(worker)
+        for worker in list(self.scheduler.idle):
+            if worker.worker_id == worker_id and self.scheduler.take(worker):
+                return worker
+        for worker in list(self.working):
+            if worker.worker_id == worker_id:
+                # 正在渲染的渲染器渲染完以后不会再放回去，见 `_after_render`
+                self.working.remove(worker)
+                return worker
+        return None
 
     async def reload(self, worker_id: str | None = None) -> None:
         """
         关闭渲染器并重载
         """
-
-        tmp: list[RenderWorker] = []
-        while not self.worker_pool.empty():
-            worker = await self.worker_pool.get()
-            tmp.append(worker)
-
         if worker_id is None:
             logger.info("渲染器 RELOAD 调用，将关闭所有渲染器")
-            for worker in tmp:
-                await self._worker_quit(worker)
-                await self.put()
-            for worker in self.working:
+            workers = [*self.scheduler.idle, *self.working]
+            self.scheduler.idle.clear()
+            self.working.clear()
+            for worker in workers:
                 await self._worker_quit(worker)
                 await self.put()
-            self.working.clear()
-        else:
-            logger.info(f"渲染器 RELOAD 调用，将关闭指定渲染器 ID={worker_id}")
-            for worker in tmp:
-                if worker.worker_id != worker_id:
-                    await self.worker_pool.put(worker)
-                else:
-                    await self._worker_quit(worker)
-                    await self.put()
-                    return
-            for worker in self.working:
-                if worker.worker_id == worker_id:
-                    await self._worker_quit(worker)
-                    await self.put()
-                    self.working.remove(worker)
-                    return
+            return
+
+        logger.info(f"渲染器 RELOAD 调用，将关闭指定渲染器 ID={worker_id}")
+        worker = self._retire(worker_id)
+        if worker is not None:
+            await self._worker_quit(worker)
+            await self.put()
 
     async def kill(self, worker_id: str):
         """
-        关闭渲染器并重载
+        关闭渲染器，不再补充新的。自动调整数量时，少于下限的部分会在之后补上
         """
+        logger.info(f"渲染器 KILL 调用，将关闭指定渲染器 ID={worker_id}")
+        worker = self._retire(worker_id)
+        if worker is not None:
+            await self._worker_quit(worker)
 
-        tmp: list[RenderWorker] = []
-        while not self.worker_pool.empty():
-            worker = await self.worker_pool.get()
-            tmp.append(worker)
+    def _recycle(self, worker: T):
+        """
+        换掉一个渲染器。先启动新的，启动好以后再关掉旧的，旧的在这之前照常工作
+        """
+        if worker in self.recycling or worker in self.retiring:
+            return
+        self.recycling.add(worker)
+        asyncio.create_task(self._prewarm_and_retire(worker))
 
-        logger.info(f"渲染器 KILL 调用，将关闭指定渲染器 ID={worker_id}")
-        for worker in tmp:
-            if worker.worker_id != worker_id:
-                await self.worker_pool.put(worker)
-            else:
-                await self._worker_quit(worker)
-                return
-        for worker in self.working:
-            if worker.worker_id == worker_id:
-                await self._worker_quit(worker)
-                self.working.remove(worker)
-                return
+    async def _prewarm_and_retire(self, worker: T):
+        logger.info(f"渲染器用得太久了，启动一个新的来换掉它 Worker={worker}")
+        try:
+            await self._worker_initializer(self.cls)
+        except Exception as e:  # pylint: disable=broad-except
+            logger.opt(exception=e).warning(
+                f"新的渲染器启动失败，暂时继续使用旧的 Worker={worker}"
+            )
+            self.recycling.discard(worker)
+            return
+        if worker not in self.recycling:
+            # 等待的时候已经被关掉了
+            return
+        self.recycling.remove(worker)
+        if self.scheduler.take(worker):
+            await self._worker_quit(worker)
+        elif worker in self.working or worker in self.checking:
+            self.retiring.add(worker)
+
+    def _worker_total(self) -> int:
+        """
+        渲染器的数量，不包括准备换掉的渲染器，包括正在启动的
+        """
+        return (
+            len(self.scheduler.idle)
+            + len(self.working)
+            + len(self.checking)
+            + len(self.starting)
+            - len(self.recycling)
+            - len(self.retiring)
+        )
+
+    async def autoscale(self) -> None:
+        """
+        按排队的情况增加渲染器，或者关掉闲置太久的渲染器，定期调用
+        """
+        policy = self.autoscale_policy
+        if policy is None:
+            return
+        now = time.time()
+        idle = sorted(self.scheduler.idle, key=lambda w: w.last_used)
+        delta = policy.scale_delta(
+            minimum=self.count,
+            total=self._worker_total(),
+            starting=len(self.starting),
+            depth=self.scheduler.depth,
+            oldest_wait=self.scheduler.oldest_wait,
+            idle_for=[now - worker.last_used for worker in idle],
+        )
+        if delta > 0:
+            logger.info(f"渲染排队太久了，增加 {delta} 个渲染器")
+            for _ in range(delta):
+                await self.put()
+        for worker in idle[: max(-delta, 0)]:
+            # 最久没用过的先关
+            if worker not in self.recycling and self.scheduler.take(worker):
+                logger.info(f"关掉闲置的渲染器 Worker={worker}")
+                await self.leave(worker)
+
+    async def recycle_bloated(self) -> None:
+        """
+        换掉占用内存太多的空闲渲染器，定期调用
+        """
+        policy = self.autoscale_policy
+        if policy is None or policy.max_memory <= 0:
+            return
+        loop = asyncio.get_event_loop()
+        for worker in list(self.scheduler.idle):
+            if not worker.recyclable or worker in self.recycling:
+                continue
+            memory = await loop.run_in_executor(self.executor, worker.memory_usage)
+            if policy.should_recycle(worker.render_count, memory):
+                logger.info(
+                    f"渲染器占用了 {(memory or 0) / 1024 / 1024:.0f}MB 内存 "
+                    f"Worker={worker}"
+                )
+                self._recycle(worker)
 
     async def render(
-        self, path: str, data: BaseModel | dict[str, Any] | None | str = None
+        self,
+        path: str,
+        data: BaseModel | dict[str, Any] | None | str = None,
+        cache: bool = True,
+        priority: RenderPriority | None = None,
+        deadline: float | None = None,
     ) -> bytes:
-        await self.clean()
+        """渲染一个页面
+
+        Args:
+            path (str): 前端页面的路径
+            data (BaseModel | dict[str, Any] | None | str, optional): 交给前端的数据，
+                是字符串时表示已经注册好了的数据的 ID
+            cache (bool, optional): 是否使用渲染缓存，渲染结果不只取决于数据时需要关掉
+            priority (RenderPriority | None, optional): 排队的优先级，默认按页面决定
+            deadline (float | None, optional): 最多花多少秒，默认使用 `deadline`，
+                超过以后放弃渲染，抛出 `RenderTimeoutException`
+
+        Returns:
+            bytes: 渲染得到的图片
+        """
+        if priority is None:
+            priority = self.priorities.get(path, RenderPriority.NORMAL)
+        if deadline is None:
+            deadline = self.deadline
+        group = current_group.get()
 
+        async def _do_render() -> bytes:
+            return await self._render_within(path, data, priority, group, deadline)
+
+        if data is not None and not isinstance(data, str):
+            await prefetch_resources(data)
+        if self.cache is None or not cache or isinstance(data, str):
+            return await _do_render()
+
+        key = self.cache.key(path, data, self.cache.frontend_version(INDEX_PATH))
+        return await self.cache.get_or_render(key, _do_render)
+
+    async def _render_within(
+        self,
+        path: str,
+        data: BaseModel | dict[str, Any] | None | str,
+        priority: RenderPriority,
+        group: int | None,
+        deadline: float | None,
+    ) -> bytes:
+        """
+        在期限内渲染，期限放在缓存里面，同时等待相同渲染的人会收到同样的结果
+        """
+        stats = self.scheduler.stats_of(path)
+        stats.count += 1
+        try:
+            async with asyncio.timeout(deadline):
+                return await self._render_any(path, data, priority, group)
+        except TimeoutError as e:
+            stats.timeouts += 1
+            logger.warning(f"渲染 {path} 超过了 {deadline} 秒的期限，放弃渲染")
+            raise RenderTimeoutException(path) from e
+        except Exception:
+            stats.failed += 1
+            raise
+
+    def _native_for(
+        self, path: str, data: BaseModel | dict[str, Any] | None | str
+    ) -> NativeRenderer | None:
+        if self.native_options is None or path not in self.native_pages:
+            return None
+        if data is None or isinstance(data, str):
+            return None
+        return get_native_renderer(path)
+
+    async def _render_any(
+        self,
+        path: str,
+        data: BaseModel | dict[str, Any] | None | str = None,
+        priority: RenderPriority = RenderPriority.NORMAL,
+        group: int | None = None,
+    ) -> bytes:
+        """
+        有原生渲染函数时先用它渲染，失败了再交给浏览器
+        """
+        native = self._native_for(path, data)
+        if native is not None and self.native_options is not None:
+            begin = time.perf_counter()
+            try:
+                img = await native(data, self.native_options)
+                duration = time.perf_counter() - begin
+                self.scheduler.stats_of(path).add_render(duration)
+                logger.debug(f"原生渲染了 {path}，用时 {duration * 1000:.1f}ms")
+                return img
+            except Exception as e:  # pylint: disable=broad-except
+                logger.opt(exception=e).warning(f"原生渲染 {path} 失败，改用浏览器")
+        return await self._render(path, data, priority, group)
+
+    def _after_render(self, worker: T, future: "asyncio.Future[bytes]"):
+        """
+        渲染器渲染完以后调用。请求可能已经因为超过期限被取消了，
+        渲染器仍然要等它真正渲染完才能交给下一个人
+        """
+        if worker not in self.working:
+            # 渲染的时候被关掉了
+            return
+        self.working.remove(worker)
+        if future.cancelled() or isinstance(future.exception(), KagamiRenderWarning):
+            self.recycling.discard(worker)
+            self.retiring.discard(worker)
+            self._replace(worker)
+            return
+        if worker in self.retiring:
+            # 新的渲染器已经启动好了
+            self.retiring.remove(worker)
+            asyncio.create_task(self._worker_quit(worker))
+            return
+        self.scheduler.release(worker)
+        policy = self.autoscale_policy
+        if (
+            policy is not None
+            and worker.recyclable
+            and policy.should_recycle(worker.render_count)
+        ):
+            self._recycle(worker)
+
+    async def _render(
+        self,
+        path: str,
+        data: BaseModel | dict[str, Any] | None | str = None,
+        priority: RenderPriority = RenderPriority.NORMAL,
+        group: int | None = None,
+    ) -> bytes:
         query = ""
         if data is not None:
             if not isinstance(data, str):
@@ -276,13 +593,19 @@ class RenderPool(Generic[T]):
             logger.debug(f"已经将数据暂存到 {uuid} 了")
         link = f"http://{self.host}:{self.port}/kagami/pages/{path}{query}"
 
+        stats = self.scheduler.stats_of(path)
+        loop = asyncio.get_event_loop()
         fail = 0
         while True:
-            worker = await self.worker_pool.get()
+            worker = await self.scheduler.acquire(priority, group, path)
             self.working.add(worker)
+            begin = time.perf_counter()
+            future = loop.run_in_executor(self.executor, worker.render, link)
+            future.add_done_callback(functools.partial(self._after_render, worker))
             try:
-                img = await self.worker_render(worker, link)
-                await self.worker_pool.put(worker)
+                # 被取消时不能打断正在渲染的线程，渲染器由 `_after_render` 回收
+                img = await asyncio.shield(future)
+                stats.add_render(time.perf_counter() - begin)
                 return img
             except KagamiRenderWarning as e:
                 logger.warning(
@@ -290,11 +613,6 @@ class RenderPool(Generic[T]):
                 )
                 logger.exception(e.exception)
                 fail += 1
-                # 推入一个新的 Worker，保证数量不减少
-                await self.put()
-                await self.leave(worker)
-            finally:
-                self.working.remove(worker)
 
             if fail > self.max_fail and self.max_fail > 0:
                 raise KagamiRenderException(worker.worker_id)
@@ -302,12 +620,5 @@ class RenderPool(Generic[T]):
     async def get_worker_list(
         self,
     ) -> tuple[list[RenderWorker], list[RenderWorker], list[RenderWorker]]:
-        # 傻方法之：全部拿出来
-        idle: list[RenderWorker] = []
-        while not self.worker_pool.empty():
-            worker = await self.worker_pool.get()
-            idle.append(worker)
-        for worker in idle:
-            await self.worker_pool.put(worker)
-
+        idle: list[RenderWorker] = [*self.scheduler.idle, *self.checking]
         return idle, list(self.working), list(self.starting)
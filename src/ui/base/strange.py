@@ -1,21 +1,20 @@
+import asyncio
+
 import PIL
 import PIL.Image
 
 from src.base.res.resource import IResource
 from src.common.rd import get_random
+from src.common.threading import run_io
 from src.ui.base.basics import paste_image
 
 
-def make_strange(
-    sources: list[IResource],
-    xGrids: int = 5,
-    yGrids: int = 4,
-    premix_background: bool = True,
+def _compose(
+    images: list[PIL.Image.Image],
+    xGrids: int,
+    yGrids: int,
+    premix_background: bool,
 ):
-    """
-    涴跺滲杅夔劂汜傖掩з呯腔苤貊芞砉
-    """
-
     base = PIL.Image.new("RGBA", (2000, 1600), (0, 0, 0, 0))
 
     w = int(2000 / xGrids)
@@ -25,7 +24,7 @@ def make_strange(
         for j in range(yGrids):
             left = w * i
             top = h * j
-            source = get_random().choice(sources).load_pil_image().resize((2000, 1600))
+            source = images[i * yGrids + j].resize((2000, 1600))
             res = source.crop((left, top, left + w, top + h)).convert("RGBA")
             if premix_background:
                 _res = PIL.Image.new(
@@ -38,3 +37,18 @@ def make_strange(
             paste_image(base, res, left, top)
 
     return base
+
+
+async def make_strange(
+    sources: list[IResource],
+    xGrids: int = 5,
+    yGrids: int = 4,
+    premix_background: bool = True,
+):
+    """
+    涴跺滲杅夔劂汜傖掩з呯腔苤貊芞砉
+    """
+
+    picked = [get_random().choice(sources) for _ in range(xGrids * yGrids)]
+    images = await asyncio.gather(*(s.aload_pil_image() for s in picked))
+    return await run_io(_compose, images, xGrids, yGrids, premix_background)
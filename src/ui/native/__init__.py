@@ -0,0 +1,29 @@
+"""
+不经过浏览器、直接用 PIL 画出来的页面。
+
+有些页面渲染得非常频繁（比如抓小哥），为它们打开网页、等待加载再截图太慢了。
+这里按页面的路径登记对应的原生渲染函数，渲染池会优先使用它们，
+失败时再交给浏览器渲染。
+
+原生渲染函数在事件循环中整理数据（比如找到小哥的图片），
+然后把绘制的工作交给处理图片的进程池。
+"""
+
+from src.ui.native.base import (
+    NativeRenderOptions,
+    NativeRenderer,
+    get_native_renderer,
+    native_render_paths,
+    native_renderer,
+)
+
+# 登记各个页面的渲染函数
+from src.ui.native import zhua as _zhua  # noqa: F401
+
+__all__ = [
+    "NativeRenderOptions",
+    "NativeRenderer",
+    "get_native_renderer",
+    "native_render_paths",
+    "native_renderer",
+]
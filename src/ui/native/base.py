@@ -0,0 +1,60 @@
+"""
+原生渲染函数的登记
+"""
+
+from typing import Any, Awaitable, Callable
+
+from pydantic import BaseModel
+
+NativeRenderer = Callable[[Any, "NativeRenderOptions"], Awaitable[bytes]]
+"原生渲染函数，输入交给前端的数据和渲染的选项，返回图片"
+
+
+class NativeRenderOptions(BaseModel):
+    """
+    原生渲染的选项
+    """
+
+    font: str | None = None
+    "字体文件的路径，为 None 时使用 PIL 自带的字体（不支持中文，只用于测试）"
+
+    bold_font: str | None = None
+    "粗体字体文件的路径，为 None 时使用 `font`"
+
+
+_renderers: dict[str, NativeRenderer] = {}
+
+
+def native_renderer(path: str):
+    """
+    登记一个页面的原生渲染函数
+    """
+
+    def deco(func: NativeRenderer) -> NativeRenderer:
+        _renderers[path] = func
+        return func
+
+    return deco
+
+
+def get_native_renderer(path: str) -> NativeRenderer | None:
+    """
+    获得一个页面的原生渲染函数，没有时返回 None
+    """
+    return _renderers.get(path)
+
+
+def native_render_paths() -> list[str]:
+    """
+    有原生渲染函数的页面
+    """
+    return list(_renderers.keys())
+
+
+__all__ = [
+    "NativeRenderOptions",
+    "NativeRenderer",
+    "get_native_renderer",
+    "native_render_paths",
+    "native_renderer",
+]
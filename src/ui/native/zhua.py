@@ -0,0 +1,256 @@
+"""
+抓小哥结果的原生渲染
+"""
+
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Any
+
+import PIL.Image
+import PIL.ImageDraw
+import PIL.ImageFont
+
+from src.common.threading import run_image
+from src.ui.base.basics import paste_image
+from src.ui.base.tools import hex_to_rgb, image_to_bytes, mix_color
+from src.ui.native.base import NativeRenderOptions, native_renderer
+from src.ui.types.zhua import ZhuaData
+
+WIDTH = 720
+PADDING = 24
+HEADER_HEIGHT = 132
+CARD_HEIGHT = 164
+CARD_GAP = 16
+THUMBNAIL_SIZE = (175, 140)
+
+BACKGROUND = (239, 236, 232)
+CARD = (255, 255, 255)
+TEXT = (54, 50, 48)
+SUBTEXT = (128, 122, 118)
+NEW_BADGE = (229, 125, 119)
+
+
+@dataclass
+class ZhuaCard:
+    """
+    一种抓到的小哥，所有字段都可以被 pickle，用于交给进程池
+    """
+
+    name: str
+    level_name: str
+    color: str
+    count: int
+    is_new: bool
+    description: str
+    thumbnail: str
+
+
+@dataclass
+class ZhuaSpec:
+    """
+    画一次抓小哥结果需要的全部信息
+    """
+
+    user_name: str
+    field_from: int
+    get_chip: int
+    own_chip: int
+    remain_time: int
+    max_time: int
+    need_time: str
+    cards: list[ZhuaCard] = field(default_factory=list[ZhuaCard])
+
+
+@lru_cache(maxsize=32)
+def _font(path: str | None, size: int) -> PIL.ImageFont.FreeTypeFont:
+    if path is None:
+        return PIL.ImageFont.load_default(size)  # type: ignore
+    return PIL.ImageFont.truetype(path, size)
+
+
+@lru_cache(maxsize=8192)
+def _char_width(font: PIL.ImageFont.FreeTypeFont, char: str) -> float:
+    return font.getlength(char)
+
+
+def _wrap(
+    text: str, font: PIL.ImageFont.FreeTypeFont, width: float, max_lines: int
+) -> list[str]:
+    """
+    按像素宽度逐字换行，中文没有空格，所以不按单词断开。
+    宽度按单个字符累加，不考虑字距调整，免得每加一个字都重新测量整行
+    """
+    ellipsis = _char_width(font, "…")
+    lines: list[str] = []
+    line: list[str] = []
+    widths: list[float] = []
+    total = 0.0
+    for char in text.replace("\n", ""):
+        w = _char_width(font, char)
+        if total + w <= width:
+            line.append(char)
+            widths.append(w)
+            total += w
+            continue
+        if len(lines) + 1 == max_lines:
+            # 最后一行放不下了，截断并加上省略号
+            while line and total + ellipsis > width:
+                line.pop()
+                total -= widths.pop()
+            lines.append("".join(line) + "…")
+            return lines
+        lines.append("".join(line))
+        line, widths, total = [char], [w], w
+    if line:
+        lines.append("".join(line))
+    return lines
+
+
+def _draw_header(
+    draw: PIL.ImageDraw.ImageDraw, spec: ZhuaSpec, options: NativeRenderOptions
+):
+    bold = options.bold_font or options.font
+    x, y = PADDING, PADDING
+    draw.rounded_rectangle(
+        (x, y, WIDTH - PADDING, y + HEADER_HEIGHT - CARD_GAP), 16, fill=CARD
+    )
+    draw.text((x + 24, y + 16), spec.user_name, font=_font(bold, 32), fill=TEXT)
+    draw.text(
+        (x + 24, y + 60),
+        f"在 {spec.field_from} 号猎场抓到了 {len(spec.cards)} 种小哥，"
+        f"获得 {spec.get_chip} 薯片，现在有 {spec.own_chip} 薯片",
+        font=_font(options.font, 20),
+        fill=SUBTEXT,
+    )
+    draw.text(
+        (x + 24, y + 88),
+        f"剩余次数 {spec.remain_time}/{spec.max_time}，{spec.need_time}后回复下一次",
+        font=_font(options.font, 20),
+        fill=SUBTEXT,
+    )
+
+
+def _draw_card(
+    image: PIL.Image.Image,
+    draw: PIL.ImageDraw.ImageDraw,
+    card: ZhuaCard,
+    top: int,
+    options: NativeRenderOptions,
+):
+    bold = options.bold_font or options.font
+    color = hex_to_rgb(card.color)
+    left, right = PADDING, WIDTH - PADDING
+    draw.rounded_rectangle((left, top, right, top + CARD_HEIGHT), 16, fill=CARD)
+    draw.rounded_rectangle((left, top, left + 12, top + CARD_HEIGHT), 6, fill=color)
+
+    # 小哥的图片放在淡一点的等级颜色上
+    tx, ty = left + 24, top + (CARD_HEIGHT - THUMBNAIL_SIZE[1]) // 2
+    draw.rectangle(
+        (tx, ty, tx + THUMBNAIL_SIZE[0], ty + THUMBNAIL_SIZE[1]),
+        fill=mix_color(color, CARD, 0.7),
+    )
+    with PIL.Image.open(card.thumbnail) as raw:
+        thumbnail = raw.convert("RGBA")
+    thumbnail.thumbnail(THUMBNAIL_SIZE)
+    paste_image(
+        image,
+        thumbnail,
+        tx + (THUMBNAIL_SIZE[0] - thumbnail.width) // 2,
+        ty + (THUMBNAIL_SIZE[1] - thumbnail.height) // 2,
+    )
+
+    text_left = tx + THUMBNAIL_SIZE[0] + 20
+    text_width = right - 24 - text_left
+    count = f"×{card.count}"
+    count_font = _font(bold, 30)
+    count_width = count_font.getlength(count)
+    draw.text((right - 24 - count_width, top + 16), count, font=count_font, fill=TEXT)
+
+    name_font = _font(bold, 30)
+    name = _wrap(card.name, name_font, text_width - count_width - 16, 1)[0]
+    draw.text((text_left, top + 16), name, font=name_font, fill=TEXT)
+
+    level_font = _font(options.font, 20)
+    # 等级的颜色都比较浅，压暗一点作为文字颜色
+    draw.text(
+        (text_left, top + 56),
+        card.level_name,
+        font=level_font,
+        fill=mix_color(color, TEXT, 0.5),
+    )
+    if card.is_new:
+        badge_left = text_left + level_font.getlength(card.level_name) + 12
+        draw.rounded_rectangle(
+            (badge_left, top + 56, badge_left + 52, top + 80), 8, fill=NEW_BADGE
+        )
+        draw.text(
+            (badge_left + 26, top + 68),
+            "NEW",
+            font=_font(bold, 16),
+            fill=CARD,
+            anchor="mm",
+        )
+
+    desc_font = _font(options.font, 18)
+    for i, line in enumerate(_wrap(card.description, desc_font, text_width, 3)):
+        draw.text((text_left, top + 88 + i * 24), line, font=desc_font, fill=SUBTEXT)
+
+
+def draw_zhua(spec: ZhuaSpec, options: NativeRenderOptions) -> bytes:
+    """
+    画出抓小哥的结果。在进程池中执行，所以只依赖输入的参数和文件
+    """
+    height = (
+        PADDING * 2
+        + HEADER_HEIGHT
+        + len(spec.cards) * (CARD_HEIGHT + CARD_GAP)
+        - CARD_GAP
+    )
+    image = PIL.Image.new("RGBA", (WIDTH, height), BACKGROUND)
+    draw = PIL.ImageDraw.Draw(image)
+    _draw_header(draw, spec, options)
+    top = PADDING + HEADER_HEIGHT
+    for card in spec.cards:
+        _draw_card(image, draw, card, top, options)
+        top += CARD_HEIGHT + CARD_GAP
+    return image_to_bytes(image.convert("RGB"))
+
+
+async def make_zhua_spec(data: ZhuaData) -> ZhuaSpec:
+    """
+    整理抓小哥的数据，并在线程池中准备好小哥的小图
+    """
+    cards = [
+        ZhuaCard(
+            name=catch.info.display_name,
+            level_name=catch.info.level.display_name,
+            color=catch.info.color,
+            count=catch.count,
+            is_new=catch.is_new,
+            description=catch.info.description,
+            thumbnail=str((await catch.info.aget_thumbnail()).path),
+        )
+        for catch in data.catchs
+    ]
+    return ZhuaSpec(
+        user_name=data.user.name,
+        field_from=data.meta.field_from,
+        get_chip=data.meta.get_chip,
+        own_chip=data.meta.own_chip,
+        remain_time=data.meta.remain_time,
+        max_time=data.meta.max_time,
+        need_time=data.meta.need_time,
+        cards=cards,
+    )
+
+
+@native_renderer("zhua")
+async def render_zhua(
+    data: ZhuaData | dict[str, Any], options: NativeRenderOptions
+) -> bytes:
+    if not isinstance(data, ZhuaData):
+        data = ZhuaData.model_validate(data)
+    return await run_image(draw_zhua, await make_zhua_spec(data), options)
+
+
+__all__ = ["ZhuaCard", "ZhuaSpec", "draw_zhua", "make_zhua_spec", "render_zhua"]
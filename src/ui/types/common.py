@@ -9,7 +9,6 @@ from src.base.res import KagamiResourceManagers
 from src.base.res.resource import IResource
 from src.common.times import now_datetime
 
-
 LEVEL_COLOR_MAP = {
     0: "#9E9D95",
     1: "#C6C1BF",
@@ -43,6 +42,8 @@ class AwardInfo(BaseModel):
     sorting: int = 0
     skin_name: str = ""
     _img_resource: IResource | None = None
+    _url_raw: str | None = None
+    _url: str | None = None
     pid: int = -1  # 猎场 ID，目前仅在 zhuajd 中使用到了
 
     @computed_field
@@ -94,13 +95,37 @@ class AwardInfo(BaseModel):
     @computed_field
     @property
     def image_url_raw(self) -> str:
+        if self._url_raw is not None:
+            return self._url_raw
         return self.image_resource.url
 
     @computed_field
     @property
     def image_url(self) -> str:
+        if self._url is not None:
+            return self._url
         return self.image_resource_small.url
 
+    async def aget_thumbnail(self) -> IResource:
+        """
+        在线程池中获得压缩过的小图
+        """
+        if self._img_resource is not None:
+            return self._img_resource
+        name = "blank_placeholder.png" if self.aid <= 0 else self.image_name
+        return await KagamiResourceManagers.xiaoge_low.aget(name)
+
+    async def aprefetch(self):
+        """
+        在线程池中准备好小哥的图片（包括压缩过的小图），渲染前调用
+        """
+        if self._img_resource is not None:
+            self._url_raw = self._url = await self._img_resource.aurl()
+            return
+        name = "blank_placeholder.png" if self.aid <= 0 else self.image_name
+        self._url_raw = await KagamiResourceManagers.xiaoge.aurl(name)
+        self._url = await (await self.aget_thumbnail()).aurl()
+
     @computed_field
     @property
     def display_name(self) -> str:
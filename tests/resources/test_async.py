@@ -0,0 +1,65 @@
+import tempfile
+from pathlib import Path
+from unittest import IsolatedAsyncioTestCase
+
+import PIL.Image
+from pydantic import BaseModel
+
+from src.base.localstorage import LocalStorage
+from src.base.res.middleware.image import ResizeMiddleware, ToRGBAMiddleware
+from src.base.res.resource import LocalResource, prefetch_resources
+from src.base.res.strategy import FileStorageStrategy, ShadowStorageStrategy
+from src.base.res.urls import ResourceURLRegisterator
+from src.common.threading import shutdown_executors
+
+
+class Counter(BaseModel):
+    value: int = 0
+
+
+class TestAsyncResources(IsolatedAsyncioTestCase):
+    def setUp(self):
+        self._dir = tempfile.TemporaryDirectory()
+        self.tdir = Path(self._dir.name)
+        PIL.Image.new("RGB", (64, 64), "red").save(self.tdir / "a.png")
+
+    def tearDown(self):
+        self._dir.cleanup()
+
+    @classmethod
+    def tearDownClass(cls):
+        shutdown_executors()
+
+    async def test_shadow_matches_sync(self):
+        main = FileStorageStrategy(self.tdir)
+        chain = [ResizeMiddleware(16, 16), ToRGBAMiddleware()]
+        sync = ShadowStorageStrategy(main, FileStorageStrategy(self.tdir / "s"), chain)
+        asy = ShadowStorageStrategy(main, FileStorageStrategy(self.tdir / "a"), chain)
+
+        expected = sync("a.png")
+        res = await asy.aget("a.png")
+        self.assertEqual(res.path.name, expected.path.name)
+        self.assertEqual(res.path.read_bytes(), expected.path.read_bytes())
+
+        with self.assertRaises(FileNotFoundError):
+            await asy.aget("b.png")
+
+    async def test_aurl_matches_url(self):
+        registrator = ResourceURLRegisterator()
+        fp = self.tdir / "a.png"
+        self.assertEqual(await registrator.aregister(fp), registrator.register(fp))
+
+        res = LocalResource(local_path=fp)
+        self.assertEqual(await res.aurl(), res.url)
+        await prefetch_resources({"items": [res, res]})
+
+    async def test_local_storage_context(self):
+        ls = LocalStorage(self.tdir / "ls.json", lazy=True)
+        async with ls.context("counter", Counter) as data:
+            data.value += 1
+        async with ls.context("counter", Counter) as data:
+            data.value += 1
+        self.assertEqual(
+            LocalStorage(self.tdir / "ls.json").get_item("counter", Counter).value, 2
+        )
+        self.assertFalse(ls.lock.locked())
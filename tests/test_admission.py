@@ -0,0 +1,62 @@
+import asyncio
+import time
+from unittest import IsolatedAsyncioTestCase
+
+from src.base.event.admission import AdmissionController, Priority
+
+
+class TestAdmission(IsolatedAsyncioTestCase):
+    async def test_group_cap_sheds_low_priority(self):
+        controller = AdmissionController(
+            max_in_flight_per_group=1, wait_timeout=0.05, lag_interval=0
+        )
+        self.assertTrue(await controller.admit(Priority.COMMAND, 1))
+
+        self.assertFalse(await controller.admit(Priority.LOW, 1))
+        self.assertFalse(await controller.admit(Priority.COMMAND, 1))
+        # 别的群不受影响
+        self.assertTrue(await controller.admit(Priority.LOW, 2))
+
+        stats = controller.get_stats()
+        self.assertEqual(stats.dropped, {"low": 1, "command": 1})
+        self.assertEqual(stats.deferred, 1)
+        self.assertEqual(stats.group_in_flight, {1: 1, 2: 1})
+
+        await controller.release(1)
+        await controller.release(2)
+        self.assertEqual(controller.get_stats().in_flight, 0)
+        self.assertEqual(controller.get_stats().group_in_flight, {})
+
+    async def test_command_waits_for_room(self):
+        controller = AdmissionController(
+            max_in_flight=1, wait_timeout=1, lag_interval=0
+        )
+        order: list[str] = []
+
+        async def work(name: str):
+            order.append(f"{name} start")
+            await asyncio.sleep(0.02)
+            order.append(f"{name} end")
+
+        results = await asyncio.gather(
+            controller.run(Priority.COMMAND, 1, lambda: work("a")),
+            controller.run(Priority.COMMAND, 2, lambda: work("b")),
+        )
+        self.assertEqual(results, [True, True])
+        self.assertEqual(order, ["a start", "a end", "b start", "b end"])
+        self.assertEqual(controller.get_stats().deferred, 1)
+
+    async def test_lag_sheds_low_priority(self):
+        controller = AdmissionController(lag_threshold=0.01, lag_interval=0.01)
+        self.assertTrue(await controller.admit(Priority.LOW, 1))
+        await controller.release(1)
+
+        # 阻塞事件循环，让延迟升高
+        await asyncio.sleep(0)
+        time.sleep(0.1)
+        await asyncio.sleep(0.02)
+
+        self.assertGreater(controller.get_stats().peak_lag, 0.05)
+        self.assertFalse(await controller.admit(Priority.LOW, 1))
+        self.assertTrue(await controller.admit(Priority.COMMAND, 1))
+        await controller.close()
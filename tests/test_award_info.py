@@ -0,0 +1,79 @@
+from unittest import IsolatedAsyncioTestCase
+
+from sqlalchemy import event, insert
+
+from src.base.db import DatabaseManager
+from src.common.data.awards import AwardInfoAssembler
+from src.core.catalog import clear_catalog_snapshot, refresh_catalog_snapshot
+from src.core.unit_of_work import UnitOfWork
+from src.models.base import Base
+from src.models.models import Award, Skin, SkinRecord, User
+
+import src.models.item  # noqa: F401
+import src.models.stats  # noqa: F401
+import src.models.up_pool  # noqa: F401
+
+
+class TestAwardInfoAssembler(IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.db = DatabaseManager("sqlite+aiosqlite:///:memory:")
+        async with self.db.sql_engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+            await conn.execute(insert(User).values({User.qq_id: "1"}))
+            await conn.execute(
+                insert(Award),
+                [
+                    {"name": f"小哥{i}", "level_id": 1, "main_pack_id": 1}
+                    for i in range(10)
+                ],
+            )
+            await conn.execute(
+                insert(Skin),
+                [
+                    {"name": "皮肤1", "aid": 1, "description": "一号"},
+                    {"name": "皮肤2", "aid": 2, "description": "二号"},
+                ],
+            )
+            await conn.execute(
+                insert(SkinRecord),
+                [
+                    {"user_id": 1, "skin_id": 1, "selected": 1},
+                    {"user_id": 1, "skin_id": 2, "selected": 0},
+                ],
+            )
+
+        self.statements: list[str] = []
+
+        def _record(conn, cursor, statement, *args):
+            self.statements.append(statement)
+
+        event.listen(self.db.sql_engine.sync_engine, "before_cursor_execute", _record)
+
+    async def asyncTearDown(self):
+        clear_catalog_snapshot()
+        await self.db.sql_engine.dispose()
+
+    async def test_matches_single_lookup(self):
+        aids = list(range(1, 11))
+        async with UnitOfWork(self.db) as uow:
+            assembler = AwardInfoAssembler(uow)
+            infos = await assembler.for_user(1, aids + [100])
+            self.assertEqual(sorted(infos), aids)
+            for aid in aids:
+                self.assertEqual(infos[aid], await assembler.one(aid, 1))
+            self.assertEqual(infos[1].skin_name, "皮肤1")
+            self.assertIsNone(infos[2].sid)
+
+    async def test_constant_queries(self):
+        aids = list(range(1, 11))
+        async with UnitOfWork(self.db) as uow:
+            self.statements.clear()
+            await AwardInfoAssembler(uow).for_user(1, aids)
+            self.assertEqual(len(self.statements), 3)
+
+        await refresh_catalog_snapshot(self.db)
+        async with UnitOfWork(self.db) as uow:
+            self.statements.clear()
+            await AwardInfoAssembler(uow).for_user(1, aids)
+            # 小哥和皮肤的信息都来自图鉴快照，只需要查询挂载的皮肤
+            self.assertEqual(len(self.statements), 1)
@@ -0,0 +1,62 @@
+import asyncio
+from unittest import IsolatedAsyncioTestCase
+
+from src.base.event.background import BackgroundRunner
+
+
+class TestBackgroundRunner(IsolatedAsyncioTestCase):
+    async def test_bounded(self):
+        runner = BackgroundRunner(max_workers=2, max_queue=2)
+        running = 0
+        peak = 0
+        done: list[int] = []
+
+        def job(i: int):
+            async def _():
+                nonlocal running, peak
+                running += 1
+                peak = max(peak, running)
+                await asyncio.sleep(0.01)
+                running -= 1
+                done.append(i)
+
+            return _
+
+        for i in range(8):
+            await runner.submit(int, f"job{i}", job(i))
+
+        self.assertTrue(await runner.drain(1))
+        self.assertEqual(sorted(done), list(range(8)))
+        self.assertEqual(peak, 2)
+
+        stats = runner.get_stats()
+        self.assertEqual(stats.completed, 8)
+        self.assertLessEqual(stats.peak_depth["int"], 2)
+        self.assertEqual(stats.depth, {})
+
+        # 关闭以后不再接受新的处理函数
+        await runner.submit(int, "late", job(100))
+        await asyncio.sleep(0.02)
+        self.assertNotIn(100, done)
+
+    async def test_retry(self):
+        runner = BackgroundRunner(retries=2, retry_delay=0.001)
+        attempts: list[str] = []
+
+        async def flaky():
+            attempts.append("flaky")
+            if len(attempts) < 2:
+                raise RuntimeError("第一次总是失败")
+
+        async def broken():
+            attempts.append("broken")
+            raise RuntimeError("总是失败")
+
+        await runner.submit(str, "flaky", flaky)
+        await runner.submit(bytes, "broken", broken)
+        self.assertTrue(await runner.drain(1))
+
+        self.assertEqual(attempts.count("flaky"), 2)
+        self.assertEqual(attempts.count("broken"), 3)
+        stats = runner.get_stats()
+        self.assertEqual((stats.completed, stats.failed, stats.retried), (1, 1, 3))
@@ -0,0 +1,114 @@
+from unittest import IsolatedAsyncioTestCase
+
+from sqlalchemy import event, insert
+
+from src.base.db import DatabaseManager
+from src.core.catalog import (
+    clear_catalog_snapshot,
+    get_catalog_snapshot,
+    get_catalog_version,
+    refresh_catalog_snapshot,
+)
+from src.core.unit_of_work import UnitOfWork
+from src.models.base import Base
+from src.models.models import Award, AwardAltName, Global, Skin
+from src.models.up_pool import UpPool, UpPoolAwardRelationship
+
+import src.models.item  # noqa: F401
+import src.models.stats  # noqa: F401
+
+
+class TestCatalogSnapshot(IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.db = DatabaseManager("sqlite+aiosqlite:///:memory:")
+        async with self.db.sql_engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+            await conn.execute(insert(Global).values({Global.opened_pack: 3}))
+            await conn.execute(
+                insert(Award),
+                [
+                    {"name": "Alpha", "level_id": 1, "main_pack_id": 1, "sorting": 0},
+                    {"name": "贝塔", "level_id": 2, "main_pack_id": 1, "sorting": 0},
+                    {"name": "伽马", "level_id": 2, "main_pack_id": -1, "sorting": 0},
+                ],
+            )
+            await conn.execute(
+                insert(AwardAltName).values(
+                    {AwardAltName.name: "a", AwardAltName.award_id: 1}
+                )
+            )
+            await conn.execute(
+                insert(Skin).values({Skin.name: "皮肤", Skin.aid: 2, Skin.level: 1})
+            )
+            await conn.execute(
+                insert(UpPool).values({UpPool.name: "升级", UpPool.belong_pack: 1})
+            )
+            await conn.execute(
+                insert(UpPoolAwardRelationship).values(
+                    {UpPoolAwardRelationship.pool_id: 1, UpPoolAwardRelationship.aid: 3}
+                )
+            )
+
+        self.statements: list[str] = []
+
+        def _record(conn, cursor, statement, *args):
+            self.statements.append(statement)
+
+        event.listen(self.db.sql_engine.sync_engine, "before_cursor_execute", _record)
+
+    async def asyncTearDown(self):
+        clear_catalog_snapshot()
+        await self.db.sql_engine.dispose()
+
+    async def test_reads_from_snapshot(self):
+        await refresh_catalog_snapshot(self.db)
+        self.statements.clear()
+
+        async with UnitOfWork(self.db) as uow:
+            self.assertEqual(await uow.awards.get_aid("alpha"), 1)
+            self.assertEqual(await uow.awards.get_aid("A"), 1)
+            self.assertIsNone(await uow.awards.get_aid("不存在"))
+            self.assertEqual(await uow.awards.get_aids(pack=1), [2, 1])
+            self.assertEqual(
+                await uow.awards.group_by_level([1, 2, 3]), {1: {1}, 2: {2, 3}}
+            )
+            self.assertEqual((await uow.awards.get_info(2)).name, "贝塔")
+            self.assertEqual(await uow.pack.get_main_aids_of_pack(1), {1, 2})
+            self.assertEqual(await uow.pack.get_main_aids_of_pack(-1), {3})
+            self.assertEqual(await uow.pack.get_main_pack(3), -1)
+            self.assertEqual(await uow.up_pool.get_aids(1), {3})
+            self.assertEqual(await uow.up_pool.get_upid("升级"), 1)
+            self.assertEqual(await uow.skins.get_sid("皮肤"), 1)
+            self.assertEqual((await uow.skins.get_info_v2(1)).aid, 2)
+            self.assertEqual(await uow.skins.get_all_sid_grouped_with_level(), {1: {1}})
+            self.assertEqual(await uow.settings.get_pack_count(), 3)
+
+        self.assertEqual(self.statements, [])
+
+    async def test_changes_rebuild_snapshot(self):
+        await refresh_catalog_snapshot(self.db)
+        version = get_catalog_version()
+
+        async with UnitOfWork(self.db) as uow:
+            await uow.awards.modify(1, name="Alpha2", lid=3)
+            # 修改过图鉴的会话要读到自己的改动
+            self.assertEqual(await uow.awards.get_aid("alpha2"), 1)
+            self.assertEqual(await uow.awards.get_lid(1), 3)
+
+        snapshot = get_catalog_snapshot()
+        assert snapshot is not None
+        self.assertEqual(snapshot.version, get_catalog_version())
+        self.assertGreater(snapshot.version, version)
+        self.assertEqual(snapshot.awards[1].name, "Alpha2")
+        self.assertIsNone(snapshot.get_aid("alpha"))
+
+    async def test_rollback_keeps_snapshot(self):
+        await refresh_catalog_snapshot(self.db)
+        snapshot = get_catalog_snapshot()
+
+        with self.assertRaises(ValueError):
+            async with UnitOfWork(self.db) as uow:
+                await uow.awards.modify(1, name="Alpha2")
+                raise ValueError()
+
+        self.assertIs(get_catalog_snapshot(), snapshot)
@@ -0,0 +1,96 @@
+from unittest import TestCase
+
+import numpy as np
+
+from src.base.exceptions import NoAwardException
+from src.logic.catch import CatchContext, roll_awards
+from src.logic.sampler import AwardSampler, SamplerCache
+
+
+def make_sampler(
+    aids: dict[int, set[int]] | None = None,
+    up_aids: dict[int, set[int]] | None = None,
+) -> AwardSampler:
+    aids = aids if aids is not None else {1: {10, 11}, 2: {20}}
+    up_aids = up_aids or {}
+    levels = {aid: lid for lid, _aids in (aids | up_aids).items() for aid in _aids}
+    return AwardSampler(aids, up_aids, levels)
+
+
+def make_context(**kwargs) -> CatchContext:
+    data = dict(
+        uid=1,
+        pid=1,
+        flags=set(),
+        sampler=make_sampler(),
+        shi_aid=None,
+        award_levels={10: 1, 11: 1, 20: 2},
+        stats={},
+        baibianxiaoge_sids=[],
+    )
+    data.update(kwargs)
+    return CatchContext(**data)
+
+
+class TestAwardSampler(TestCase):
+    def test_sample_count(self):
+        result = make_sampler().sample(100000, np.random.default_rng(0))
+        self.assertEqual(sum(result.values()), 100000)
+        self.assertTrue(set(result) <= {10, 11, 20})
+
+    def test_sample_zero(self):
+        self.assertEqual(make_sampler().sample(0, np.random.default_rng(0)), {})
+
+    def test_sample_up_pool_only_in_its_level(self):
+        sampler = make_sampler({2: {20, 21}}, {2: {21}})
+        result = sampler.sample(10000, np.random.default_rng(1))
+        self.assertGreater(result[21], result[20])
+
+    def test_sample_up_pool_level_without_up(self):
+        sampler = make_sampler({1: {10}, 2: {20}}, {3: {30}})
+        result = sampler.sample(1000, np.random.default_rng(2))
+        self.assertNotIn(30, result)
+
+
+class TestSamplerCache(TestCase):
+    def test_version_change_drops_old(self):
+        cache = SamplerCache()
+        cache.put((1, None, 0), make_sampler())
+        cache.put((2, None, 0), make_sampler())
+        self.assertIsNotNone(cache.get((1, None, 0)))
+        cache.put((1, None, 1), make_sampler())
+        self.assertIsNone(cache.get((1, None, 0)))
+        self.assertIsNone(cache.get((2, None, 0)))
+        self.assertIsNotNone(cache.get((1, None, 1)))
+
+    def test_max_size(self):
+        cache = SamplerCache(max_size=2)
+        for pid in range(3):
+            cache.put((pid, None, 0), make_sampler())
+        self.assertIsNone(cache.get((0, None, 0)))
+        self.assertEqual(len(cache.samplers), 2)
+
+
+class TestRollAwards(TestCase):
+    def test_roll_count(self):
+        picked = roll_awards(make_context(), 30, np.random.default_rng(0))
+        self.assertEqual(sum(picked.values()), 30)
+
+    def test_roll_shi_flag_consumed_once(self):
+        ctx = make_context(flags={"是", "合成"}, shi_aid=99)
+        picked = roll_awards(ctx, 5, np.random.default_rng(0))
+        self.assertEqual(picked[99], 1)
+        self.assertEqual(sum(picked.values()), 5)
+        self.assertEqual(ctx.flags, {"合成"})
+
+    def test_roll_shi_flag_without_award(self):
+        ctx = make_context(flags={"是"})
+        picked = roll_awards(ctx, 3, np.random.default_rng(0))
+        self.assertEqual(sum(picked.values()), 3)
+        self.assertNotIn("是", ctx.flags)
+
+    def test_roll_empty_pool(self):
+        with self.assertRaises(NoAwardException):
+            roll_awards(
+                make_context(sampler=make_sampler({})), 1, np.random.default_rng(0)
+            )
@@ -0,0 +1,57 @@
+from unittest import IsolatedAsyncioTestCase
+
+from pydantic import ValidationError
+
+import src.common.config as config_module
+from src.common.config import Config, get_config, on_config_changed, reload_config
+
+
+class TestConfig(IsolatedAsyncioTestCase):
+    def setUp(self):
+        self._old = config_module._config
+        self._old_listeners = dict(config_module._listeners)
+        config_module._config = Config()
+        config_module._listeners.clear()
+
+    def tearDown(self):
+        config_module._config = self._old
+        config_module._listeners.clear()
+        config_module._listeners.update(self._old_listeners)
+
+    def test_frozen_snapshot(self):
+        config = Config.model_validate({"admin_groups": [1, 2, 2], "my_name": ["镜"]})
+        self.assertEqual(config.admin_groups, frozenset({1, 2}))
+        self.assertEqual(config.my_name, ("镜",))
+        with self.assertRaises(ValidationError):
+            config.admin_id = 1  # type: ignore
+        self.assertIs(get_config(), get_config())
+
+    async def test_reload_notifies_listeners(self):
+        calls: list[tuple[int, int]] = []
+
+        @on_config_changed
+        async def _(old: Config, new: Config):
+            calls.append((old.browser_count, new.browser_count))
+
+        self.assertEqual(await reload_config(Config()), [])
+        self.assertEqual(calls, [])
+
+        new = Config(browser_count=3, limited_group=frozenset({10}))
+        changed = await reload_config(new)
+        self.assertEqual(set(changed), {"browser_count", "limited_group"})
+        self.assertEqual(calls, [(1, 3)])
+        self.assertIs(get_config(), new)
+
+    async def test_failing_listener_does_not_block(self):
+        calls: list[str] = []
+
+        @on_config_changed
+        def first(old: Config, new: Config):
+            raise RuntimeError()
+
+        @on_config_changed
+        def second(old: Config, new: Config):
+            calls.append("second")
+
+        await reload_config(Config(admin_id=1))
+        self.assertEqual(calls, ["second"])
@@ -1,4 +1,5 @@
 import asyncio
+from abc import ABC
 from unittest import IsolatedAsyncioTestCase
 
 from src.base.event.event_dispatcher import EventDispatcher
@@ -99,3 +100,84 @@ class TestEventManager(IsolatedAsyncioTestCase):
         await dispatcher.emit(10)
         await dispatcher.emit(5)
         self.assertSetEqual(result_set, {10010, 10005, 20005})
+
+    async def test_resolved_types(self):
+        dispatcher = EventDispatcher()
+        received: list[str] = []
+
+        class Base(ABC): ...
+
+        class Virtual: ...
+
+        @dispatcher.listen(int)
+        async def _(data: int):
+            received.append(f"int {data}")
+
+        await dispatcher.emit(True)
+
+        # 新的监听器类型会让缓存的类型表失效
+        @dispatcher.listen(Base)
+        async def _(data: Base):
+            received.append("base")
+
+        await dispatcher.emit(Virtual())
+        Base.register(Virtual)
+        await dispatcher.emit(Virtual())
+        await dispatcher.emit(False)
+        self.assertListEqual(received, ["int True", "base", "int False"])
+
+        dispatcher.clear()
+        await dispatcher.emit(1)
+        self.assertListEqual(received, ["int True", "base", "int False"])
+
+    async def test_concurrent(self):
+        dispatcher = EventDispatcher()
+        events: list[str] = []
+
+        @dispatcher.listen(int, priority=1)
+        async def _(data: int):
+            events.append("a start")
+            await asyncio.sleep(0.02)
+            events.append("a end")
+
+        @dispatcher.listen(int, priority=1)
+        async def _(data: int):
+            events.append("b start")
+            await asyncio.sleep(0.01)
+            events.append("b end")
+            if data == 1:
+                raise KagamiStopIteration()
+
+        @dispatcher.listen(int)
+        async def _(data: int):
+            events.append("c")
+
+        await dispatcher.emit(0, concurrent=True)
+        self.assertListEqual(events, ["a start", "b start", "b end", "a end", "c"])
+
+        events.clear()
+        await dispatcher.emit(1, concurrent=True)
+        self.assertListEqual(events, ["a start", "b start", "b end", "a end"])
+
+    async def test_timings(self):
+        dispatcher = EventDispatcher()
+
+        @dispatcher.listen(int, priority=1)
+        async def _(data: int):
+            await asyncio.sleep(0.01)
+            if data == 1:
+                raise KagamiStopIteration()
+
+        @dispatcher.listen(int)
+        async def _(data: int):
+            pass
+
+        await dispatcher.emit(0)
+        await dispatcher.emit(1)
+
+        # 每个监听器的耗时都有记录
+        self.assertEqual(len(dispatcher.timings), 2)
+        self.assertEqual(sorted(t.calls for t in dispatcher.timings.values()), [1, 2])
+        self.assertTrue(
+            all(t.max >= 0.01 for t in dispatcher.timings.values() if t.calls == 2)
+        )
@@ -0,0 +1,80 @@
+from unittest import IsolatedAsyncioTestCase
+
+from sqlalchemy import insert, select
+
+from src.base.db import DatabaseManager
+from src.core.unit_of_work import UnitOfWork
+from src.models.base import Base
+from src.models.models import Award, Inventory, Skin, User
+
+import src.models.item  # noqa: F401
+import src.models.stats  # noqa: F401
+import src.models.up_pool  # noqa: F401
+
+
+class TestGiveMany(IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.db = DatabaseManager("sqlite+aiosqlite:///:memory:")
+        async with self.db.sql_engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+            await conn.execute(insert(User).values({User.qq_id: "1"}))
+            for i in range(3):
+                await conn.execute(
+                    insert(Award).values(
+                        {
+                            Award.name: f"小哥{i}",
+                            Award.level_id: 1,
+                            Award.main_pack_id: 1,
+                        }
+                    )
+                )
+            for i in range(2):
+                await conn.execute(
+                    insert(Skin).values({Skin.name: f"皮肤{i}", Skin.aid: 1})
+                )
+        self.uid = 1
+
+    async def asyncTearDown(self):
+        await self.db.sql_engine.dispose()
+
+    async def test_inventory(self):
+        async with UnitOfWork(self.db) as uow:
+            await uow.inventories.give(self.uid, 1, 5)
+
+        async with UnitOfWork(self.db) as uow:
+            result = await uow.inventories.give_many(self.uid, {1: -2, 2: 3})
+            self.assertEqual(result, {1: (3, 2), 2: (3, 0)})
+
+            # 已经读过的格子在内存中修改
+            result = await uow.inventories.give_many(self.uid, {2: 1, 3: 1})
+            self.assertEqual(result, {2: (4, 0), 3: (1, 0)})
+
+        async with UnitOfWork(self.db) as uow:
+            q = select(Inventory.award_id, Inventory.storage, Inventory.used)
+            rows = (await uow.session.execute(q)).tuples().all()
+            self.assertEqual(sorted(rows), [(1, 3, 2), (2, 4, 0), (3, 1, 0)])
+
+    async def test_items(self):
+        async with UnitOfWork(self.db) as uow:
+            self.assertEqual(await uow.items.get(self.uid, "a"), (0, 0))
+            self.assertEqual(
+                await uow.items.give_many(self.uid, {"a": 2, "b": 1}), {"a": 2, "b": 1}
+            )
+            self.assertEqual(await uow.items.give(self.uid, "a", 3), 5)
+            self.assertEqual(await uow.items.use(self.uid, "a", 1), 4)
+
+        async with UnitOfWork(self.db) as uow:
+            self.assertEqual(
+                await uow.items.get_dict(self.uid), {"a": (4, 5), "b": (1, 1)}
+            )
+
+    async def test_skins(self):
+        async with UnitOfWork(self.db) as uow:
+            self.assertFalse(await uow.skin_inventory.give(self.uid, 1))
+            self.assertEqual(
+                await uow.skin_inventory.give_many(self.uid, [1, 2, 2]),
+                {1: True, 2: False},
+            )
+            self.assertEqual(
+                sorted(await uow.skin_inventory.get_list(self.uid)), [1, 2]
+            )
@@ -0,0 +1,97 @@
+from typing import Any
+from unittest import IsolatedAsyncioTestCase
+
+from arclet.alconna import Alconna, Arg, Arparma
+from arclet.alconna.exceptions import ArgumentMissing
+from nonebot_plugin_alconna import UniMessage
+
+from src.base.command_events import MessageContext
+from src.common.command_deco import (
+    GuardCost,
+    guard,
+    match_alconna,
+    match_literal,
+    match_prefix,
+)
+from tests.test_routing import FakeContext
+
+
+class TestGuards(IsolatedAsyncioTestCase):
+    async def test_cheapest_first(self):
+        checked: list[str] = []
+
+        async def in_db(ctx: MessageContext):
+            checked.append("db")
+            return True
+
+        def in_config(ctx: MessageContext):
+            checked.append("config")
+            return True
+
+        called: list[str] = []
+
+        # 装饰器的顺序和开销的顺序正好相反
+        @guard(in_db, GuardCost.DB)
+        @guard(in_config, GuardCost.CONFIG)
+        @match_literal("kc")
+        async def handler(ctx: MessageContext):
+            called.append(ctx.text)
+
+        await handler(FakeContext(UniMessage.text("随便聊聊")))
+        self.assertEqual(checked, [])
+        self.assertEqual(called, [])
+
+        await handler(FakeContext(UniMessage.text("kc")))
+        self.assertEqual(checked, ["config", "db"])
+        self.assertEqual(called, ["kc"])
+
+    async def test_deferred_error(self):
+        checked: list[str] = []
+
+        def in_config(ctx: MessageContext):
+            checked.append("config")
+            return False
+
+        @guard(in_config, GuardCost.CONFIG)
+        @match_alconna(Alconna("kz", Arg("count", int)))
+        async def handler(ctx: MessageContext, res: Arparma[Any]): ...
+
+        # 参数错误要等其他检查都通过以后才报出来
+        await handler(FakeContext(UniMessage.text("kz")))
+        self.assertEqual(checked, ["config"])
+
+        @guard(lambda _: True, GuardCost.CONFIG)
+        @match_alconna(Alconna("kz", Arg("count", int)))
+        async def handler2(ctx: MessageContext, res: Arparma[Any]): ...
+
+        with self.assertRaises(ArgumentMissing):
+            await handler2(FakeContext(UniMessage.text("kz")))
+
+    async def test_memo(self):
+        rule = Alconna("kz", Arg("count", int))
+        results: list[Arparma[Any]] = []
+
+        @match_alconna(rule)
+        async def a(ctx: MessageContext, res: Arparma[Any]):
+            results.append(res)
+
+        @match_alconna(rule)
+        async def b(ctx: MessageContext, res: Arparma[Any]):
+            results.append(res)
+
+        ctx = FakeContext(UniMessage.text("kz 3"))
+        await a(ctx)
+        await b(ctx)
+        self.assertIs(results[0], results[1])
+        self.assertEqual(results[0].query[int]("count"), 3)
+
+    async def test_prefix(self):
+        called: list[str] = []
+
+        @match_prefix("::广播")
+        async def handler(ctx: MessageContext):
+            called.append(ctx.text)
+
+        await handler(FakeContext(UniMessage.text("::广播 你好").at("1")))
+        await handler(FakeContext(UniMessage.at("1").text("::广播")))
+        self.assertEqual(called, ["::广播 你好"])
@@ -0,0 +1,80 @@
+from unittest import IsolatedAsyncioTestCase
+
+from sqlalchemy import event, insert, select
+
+from src.base.db import DatabaseManager
+from src.core.unit_of_work import UnitOfWork
+from src.models.base import Base
+from src.models.models import Award, Inventory, User
+
+import src.models.item  # noqa: F401
+import src.models.stats  # noqa: F401
+import src.models.up_pool  # noqa: F401
+
+
+class TestIdentityMap(IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.db = DatabaseManager("sqlite+aiosqlite:///:memory:")
+        async with self.db.sql_engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+            await conn.execute(insert(User).values({User.qq_id: "1"}))
+            await conn.execute(
+                insert(Award).values(
+                    {Award.name: "测试小哥", Award.level_id: 3, Award.main_pack_id: 1}
+                )
+            )
+
+        self.statements: list[str] = []
+
+        def _record(conn, cursor, statement, *args):
+            self.statements.append(statement.split()[0].upper())
+
+        event.listen(self.db.sql_engine.sync_engine, "before_cursor_execute", _record)
+
+    async def asyncTearDown(self):
+        await self.db.sql_engine.dispose()
+
+    async def test_user_writes_are_coalesced(self):
+        async with UnitOfWork(self.db) as uow:
+            uid = await uow.users.get_uid(1)
+            self.statements.clear()
+
+            for _ in range(5):
+                chips = await uow.chips.get(uid)
+                await uow.chips.set(uid, chips + 10)
+            await uow.users.set_getup_time(uid, 123.0)
+            await uow.biscuit.set(uid, 7)
+
+            self.assertEqual(await uow.chips.get(uid), 50)
+            self.assertEqual(self.statements.count("SELECT"), 1)
+            self.assertEqual(self.statements.count("UPDATE"), 0)
+
+        self.assertEqual(self.statements.count("UPDATE"), 1)
+
+        async with UnitOfWork(self.db) as uow:
+            self.assertEqual(await uow.chips.get(uid), 50)
+            self.assertEqual(await uow.users.get_getup_time(uid), 123.0)
+            self.assertEqual(await uow.biscuit.get(uid), 7)
+
+    async def test_inventory(self):
+        async with UnitOfWork(self.db) as uow:
+            uid = await uow.users.get_uid(1)
+            await uow.inventories.give(uid, 1, 3)
+            await uow.inventories.give(uid, 1, -1)
+            self.assertEqual(await uow.inventories.get_inventory_dict(uid), {1: (2, 1)})
+            self.assertEqual(await uow.awards.group_by_level({1}), {3: {1}})
+
+        async with UnitOfWork(self.db) as uow:
+            q = select(Inventory.storage, Inventory.used)
+            self.assertEqual((await uow.session.execute(q)).tuples().all(), [(2, 1)])
+            self.assertEqual(await uow.inventories.get_inventory(uid, 1), (2, 1))
+
+    async def test_rollback_discards_changes(self):
+        with self.assertRaises(ValueError):
+            async with UnitOfWork(self.db) as uow:
+                uid = await uow.users.get_uid(1)
+                await uow.chips.set(uid, 100)
+                raise ValueError()
+
+        async with UnitOfWork(self.db) as uow:
+            self.assertEqual(await uow.chips.get(uid), 0)
@@ -0,0 +1,96 @@
+import asyncio
+from unittest import IsolatedAsyncioTestCase
+
+from src.base.exceptions import LockTimeoutException
+from src.base.lock_manager import AsyncioLockManager
+
+
+class TestLockManager(IsolatedAsyncioTestCase):
+    async def test_idle_locks_are_evicted(self):
+        manager = AsyncioLockManager()
+        async with manager.lock("1", name="a"):
+            self.assertTrue(manager.is_locked("1"))
+            self.assertEqual(len(manager), 1)
+        self.assertEqual(len(manager), 0)
+        self.assertEqual(manager.stats["a"].acquired, 1)
+
+    async def test_waiter_keeps_lock_alive(self):
+        manager = AsyncioLockManager()
+        order: list[str] = []
+
+        async def work(tag: str):
+            async with manager.lock("1", name="w"):
+                order.append(tag)
+                await asyncio.sleep(0.01)
+
+        await asyncio.gather(work("a"), work("b"), work("c"))
+        self.assertEqual(order, ["a", "b", "c"])
+        self.assertEqual(len(manager), 0)
+        self.assertEqual(manager.stats["w"].contended, 2)
+
+    async def test_multiple_keys_no_deadlock(self):
+        manager = AsyncioLockManager(default_timeout=1)
+
+        async def transfer(a: str, b: str):
+            for _ in range(20):
+                async with manager.lock(a, b):
+                    await asyncio.sleep(0)
+
+        await asyncio.gather(transfer("1", "2"), transfer("2", "1"))
+        self.assertEqual(len(manager), 0)
+
+    async def test_timeout(self):
+        manager = AsyncioLockManager()
+        held = manager.lock("1", "2")
+        await held.acquire()
+
+        with self.assertRaises(LockTimeoutException):
+            await manager.lock("2", "3", timeout=0.01, name="t").acquire()
+        self.assertEqual(manager.stats["t"].timeouts, 1)
+        # 超时的一方不会留下锁
+        self.assertFalse(manager.is_locked("3"))
+
+        held.release()
+        self.assertEqual(len(manager), 0)
+
+    async def test_partial_acquire_keeps_first_key_for_waiters(self):
+        manager = AsyncioLockManager()
+        held_b = manager.lock("b")
+        await held_b.acquire()
+
+        # 拿到了 a，在等 b 的时候超时；此时 c 正排队等 a
+        pair = asyncio.create_task(manager.lock("a", "b", timeout=0.05).acquire())
+        await asyncio.sleep(0)
+        c = manager.lock("a")
+        c_task = asyncio.create_task(c.acquire())
+        with self.assertRaises(LockTimeoutException):
+            await pair
+        await c_task
+
+        # c 持有 a 时，d 不能拿到 a
+        self.assertTrue(manager.is_locked("a"))
+        d = asyncio.create_task(manager.lock("a").acquire())
+        await asyncio.sleep(0.01)
+        self.assertFalse(d.done())
+        c.release()
+        await d
+        self.assertTrue(manager.is_locked("a"))
+
+    async def test_cancel_partial_acquire(self):
+        manager = AsyncioLockManager()
+        held_b = manager.lock("b")
+        await held_b.acquire()
+
+        pair = asyncio.create_task(manager.lock("a", "b").acquire())
+        await asyncio.sleep(0)
+        c = manager.lock("a")
+        c_task = asyncio.create_task(c.acquire())
+        await asyncio.sleep(0)
+        pair.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await pair
+        await c_task
+        self.assertTrue(manager.is_locked("a"))
+        c.release()
+        held_b.release()
+        self.assertEqual(len(manager), 0)
@@ -0,0 +1,80 @@
+import io
+from unittest import IsolatedAsyncioTestCase, TestCase
+
+import PIL.Image
+
+from src.ui.native import NativeRenderOptions, get_native_renderer
+from src.ui.native.zhua import (
+    CARD_GAP,
+    CARD_HEIGHT,
+    HEADER_HEIGHT,
+    PADDING,
+    WIDTH,
+    ZhuaCard,
+    ZhuaSpec,
+    _font,
+    _wrap,
+    draw_zhua,
+    make_zhua_spec,
+)
+from src.ui.types.common import AwardInfo, GetAward, LevelData, UserData
+from src.ui.types.zhua import ZhuaData, ZhuaMeta
+
+
+class TestDrawZhua(TestCase):
+    def test_draw_without_browser(self):
+        card = ZhuaCard(
+            name="Xiaoge",
+            level_name="Level 1",
+            color="#C6C1BF",
+            count=3,
+            is_new=True,
+            description="A very long description " * 10,
+            thumbnail="./res/blank_placeholder.png",
+        )
+        spec = ZhuaSpec(
+            user_name="user",
+            field_from=1,
+            get_chip=10,
+            own_chip=100,
+            remain_time=1,
+            max_time=3,
+            need_time="10min",
+            cards=[card, card],
+        )
+        data = draw_zhua(spec, NativeRenderOptions())
+        image = PIL.Image.open(io.BytesIO(data))
+        self.assertEqual(
+            image.size,
+            (WIDTH, PADDING * 2 + HEADER_HEIGHT + 2 * CARD_HEIGHT + CARD_GAP),
+        )
+
+    def test_wrap(self):
+        font = _font(None, 18)
+        lines = _wrap("abcdefghij" * 20, font, 100, 2)
+        self.assertEqual(len(lines), 2)
+        self.assertTrue(lines[-1].endswith("…"))
+        self.assertEqual(_wrap("abc", font, 100, 2), ["abc"])
+
+
+class TestZhuaSpec(IsolatedAsyncioTestCase):
+    async def test_spec_from_data(self):
+        self.assertIsNotNone(get_native_renderer("zhua"))
+        info = AwardInfo(aid=0, name="小哥", level=LevelData(display_name="一星"))
+        info._img_resource = info.image_resource  # 不生成压缩过的小图
+        data = ZhuaData(
+            user=UserData(name="玩家"),
+            meta=ZhuaMeta(
+                field_from=1,
+                get_chip=1,
+                own_chip=2,
+                remain_time=0,
+                max_time=3,
+                need_time="1分钟",
+            ),
+            catchs=[GetAward(info=info, count=2, is_new=False)],
+        )
+        spec = await make_zhua_spec(data)
+        self.assertEqual(spec.user_name, "玩家")
+        self.assertEqual(spec.cards[0].count, 2)
+        self.assertTrue(spec.cards[0].thumbnail.endswith("blank_placeholder.png"))
@@ -0,0 +1,86 @@
+from unittest import IsolatedAsyncioTestCase
+
+from sqlalchemy import insert
+
+from src.base.db import DatabaseManager
+from src.core.catalog import clear_catalog_snapshot, refresh_catalog_snapshot
+from src.core.unit_of_work import UnitOfWork
+from src.models.base import Base
+from src.models.models import Award, Inventory, User
+from src.services.pack_progress import LevelProgress, PackProgressService
+
+import src.models.item  # noqa: F401
+import src.models.stats  # noqa: F401
+import src.models.up_pool  # noqa: F401
+
+
+class TestPackProgress(IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.db = DatabaseManager("sqlite+aiosqlite:///:memory:")
+        async with self.db.sql_engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+            await conn.execute(insert(User).values({User.qq_id: "1"}))
+            await conn.execute(
+                insert(Award),
+                [
+                    {"name": "a", "level_id": 1, "main_pack_id": 1},
+                    {"name": "b", "level_id": 1, "main_pack_id": 1},
+                    {"name": "c", "level_id": 3, "main_pack_id": 1},
+                    {"name": "d", "level_id": 2, "main_pack_id": 2},
+                    {"name": "e", "level_id": 0, "main_pack_id": 0},
+                ],
+            )
+            await conn.execute(
+                insert(Inventory),
+                [
+                    {"user_id": 1, "award_id": 1, "storage": 2, "used": 0},
+                    {"user_id": 1, "award_id": 2, "storage": 0, "used": 0},
+                    {"user_id": 1, "award_id": 4, "storage": 0, "used": 3},
+                ],
+            )
+
+    async def asyncTearDown(self):
+        clear_catalog_snapshot()
+        await self.db.sql_engine.dispose()
+
+    async def _counts(self):
+        async with UnitOfWork(self.db) as uow:
+            # 还没有写入数据库的改动也要算进去
+            await uow.inventories.give(1, 3, 1)
+            return await PackProgressService(uow).get_counts(1)
+
+    async def test_counts(self):
+        expected = {
+            0: {0: LevelProgress(0, 0, 1)},
+            1: {1: LevelProgress(1, 1, 2), 3: LevelProgress(3, 1, 1)},
+            2: {2: LevelProgress(2, 1, 1)},
+        }
+        self.assertEqual(await self._counts(), expected)
+
+    async def test_counts_from_catalog(self):
+        await refresh_catalog_snapshot(self.db)
+        counts = await self._counts()
+        self.assertEqual(counts[1][1], LevelProgress(1, 1, 2))
+        self.assertEqual(counts[1][3], LevelProgress(3, 1, 1))
+
+    def test_merge_and_score(self):
+        counts = {
+            0: {0: LevelProgress(0, 0, 1)},
+            1: {1: LevelProgress(1, 1, 2), 3: LevelProgress(3, 1, 1)},
+            2: {1: LevelProgress(1, 0, 1)},
+        }
+        levels = PackProgressService.merge(counts, (1, 0))
+        self.assertEqual(
+            levels,
+            [LevelProgress(3, 1, 1), LevelProgress(1, 1, 2), LevelProgress(0, 0, 1)],
+        )
+        self.assertEqual(
+            PackProgressService.merge(counts, lid=1), [LevelProgress(1, 1, 3)]
+        )
+
+        # 三星和一星各占一部分权重，零星不计入
+        w3, w1 = 1 / 8**0.1, 1 / 65**0.1
+        self.assertAlmostEqual(
+            PackProgressService.progress(levels), (w3 + w1 * 0.5) / (w3 + w1)
+        )
+        self.assertEqual(PackProgressService.gedu(levels), 29 + 64)
@@ -0,0 +1,148 @@
+from unittest import IsolatedAsyncioTestCase, TestCase
+
+from src.base.db import DatabaseManager
+from src.common.times import now_datetime
+from src.core.reminders import ReminderChanges, ReminderIndex, get_reminder_index
+from src.core.unit_of_work import UnitOfWork
+from src.models.base import Base
+from src.services.reminder import ReminderService
+
+import src.models.item  # noqa: F401
+import src.models.models  # noqa: F401
+import src.models.stats  # noqa: F401
+import src.models.up_pool  # noqa: F401
+
+
+class TestReminderIndex(TestCase):
+    def test_pop_due_in_order(self):
+        index = ReminderIndex()
+        index.load(
+            [(1, "slot_full"), (2, "slot_full"), (3, "getup")],
+            [(1, "slot_full", 30), (2, "slot_full", 10), (3, "getup", 20)],
+            100,
+        )
+        self.assertEqual(index.next_due(), 10)
+        self.assertEqual(index.pop_due(25), [(2, "slot_full", 10), (3, "getup", 20)])
+        self.assertEqual(index.next_due(), 30)
+
+    def test_apply_moves_and_drops(self):
+        index = ReminderIndex()
+        index.load(
+            [(1, "slot_full"), (2, "slot_full")],
+            [(1, "slot_full", 10), (2, "slot_full", 20)],
+            100,
+        )
+        changes = ReminderChanges(uids={"slot_full": {1, 2}})
+        # 玩家 1 的时间推迟到了范围以外，玩家 2 取消了订阅
+        index.apply(changes, [(1, "slot_full", 500)])
+
+        self.assertIsNone(index.next_due())
+        self.assertTrue(index.is_subscribed(1, "slot_full"))
+        self.assertFalse(index.is_subscribed(2, "slot_full"))
+
+    def test_on_change(self):
+        index = ReminderIndex()
+        calls: list[float | None] = []
+        index.on_change = lambda: calls.append(index.next_due())
+        index.load([(1, "getup")], [(1, "getup", 50)], 100)
+        index.apply(ReminderChanges(uids={"getup": {1}}), [(1, "getup", 40)])
+        self.assertEqual(calls, [50, 40])
+
+
+class TestReminders(IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.db = DatabaseManager("sqlite+aiosqlite:///:memory:")
+        async with self.db.sql_engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+
+        self.index = get_reminder_index()
+        self.index.on_change = None
+        self.now = now_datetime().timestamp()
+        self.index.load([], [], self.now + 3600)
+
+        async with UnitOfWork(self.db) as uow:
+            await uow.settings.set_interval(100)
+            self.uid = await uow.users.get_uid(1000)
+            await uow.users.update_catch_time(self.uid, 0, self.now)
+
+    async def asyncTearDown(self):
+        self.index.load([], [], 0)
+        await self.db.sql_engine.dispose()
+
+    async def test_subscribe_computes_due(self):
+        async with UnitOfWork(self.db) as uow:
+            await uow.reminders.subscribe(self.uid, "slot_full")
+
+        self.assertTrue(self.index.is_subscribed(self.uid, "slot_full"))
+        due = self.index.next_due()
+        self.assertIsNotNone(due)
+        assert due is not None
+        self.assertAlmostEqual(due, self.now + 100, delta=1)
+
+    async def test_catch_moves_due(self):
+        async with UnitOfWork(self.db) as uow:
+            await uow.reminders.subscribe(self.uid, "slot_full")
+            await uow.users.add_slot_count(self.uid, 2)
+
+        due = self.index.next_due()
+        assert due is not None
+        self.assertAlmostEqual(due, self.now + 300, delta=1)
+
+        async with UnitOfWork(self.db) as uow:
+            await uow.users.update_catch_time(self.uid, 3, self.now)
+        # 已经满了，不需要再提醒
+        self.assertIsNone(self.index.next_due())
+
+    async def test_interval_change_refreshes_all(self):
+        async with UnitOfWork(self.db) as uow:
+            await uow.reminders.subscribe(self.uid, "slot_full")
+        async with UnitOfWork(self.db) as uow:
+            await uow.settings.set_interval(200)
+
+        due = self.index.next_due()
+        assert due is not None
+        self.assertAlmostEqual(due, self.now + 200, delta=1)
+
+    async def test_unsubscribe(self):
+        async with UnitOfWork(self.db) as uow:
+            await uow.reminders.subscribe(self.uid, "getup")
+            await uow.users.set_getup_time(self.uid, self.now + 60)
+        self.assertIsNotNone(self.index.next_due())
+
+        async with UnitOfWork(self.db) as uow:
+            await uow.reminders.unsubscribe(self.uid, "getup")
+        self.assertIsNone(self.index.next_due())
+        self.assertFalse(self.index.is_subscribed(self.uid, "getup"))
+
+    async def test_collect_checks_and_clears(self):
+        async with UnitOfWork(self.db) as uow:
+            await uow.reminders.subscribe(self.uid, "slot_full")
+            await uow.reminders.subscribe(self.uid, "getup")
+            await uow.users.set_getup_time(self.uid, self.now - 10)
+            await uow.users.update_catch_time(self.uid, 1, self.now - 1000)
+
+        service = ReminderService()
+        service._db = self.db
+        rows = [(self.uid, "slot_full", self.now), (self.uid, "getup", self.now)]
+        self.assertEqual(
+            await service.collect(rows), {"slot_full": [1000], "getup": [1000]}
+        )
+
+        async with UnitOfWork(self.db) as uow:
+            self.assertEqual(await uow.reminders.get_due_before(self.now + 3600), [])
+
+    async def test_service_start_loads_index(self):
+        async with UnitOfWork(self.db) as uow:
+            await uow.reminders.subscribe(self.uid, "slot_full")
+        self.index.load([], [], 0)
+
+        service = ReminderService(coalesce=0, horizon=3600)
+        await service.start(self.db)
+        try:
+            self.assertTrue(self.index.is_subscribed(self.uid, "slot_full"))
+            due = self.index.next_due()
+            assert due is not None
+            self.assertAlmostEqual(due, self.now + 100, delta=1)
+            self.assertIsNotNone(service._handle)
+        finally:
+            service.stop()
@@ -0,0 +1,67 @@
+import os
+import sys
+from unittest import TestCase, skipUnless
+
+from src.ui.base.render_autoscale import AutoscalePolicy, process_tree_rss
+
+
+class TestAutoscalePolicy(TestCase):
+    def setUp(self):
+        self.policy = AutoscalePolicy(
+            max_workers=4, scale_up_wait=2, idle_timeout=300, max_renders=100
+        )
+
+    def delta(self, **kwargs: object) -> int:
+        args: dict[str, object] = {
+            "minimum": 1,
+            "total": 1,
+            "starting": 0,
+            "depth": 0,
+            "oldest_wait": 0,
+            "idle_for": [],
+        }
+        args.update(kwargs)
+        return self.policy.scale_delta(**args)  # type: ignore
+
+    def test_fill_to_minimum(self):
+        self.assertEqual(self.delta(minimum=2, total=0), 2)
+
+    def test_scale_up_only_after_waiting(self):
+        self.assertEqual(self.delta(depth=3, oldest_wait=0.5), 0)
+        self.assertEqual(self.delta(depth=2, oldest_wait=3), 2)
+
+    def test_scale_up_capped(self):
+        self.assertEqual(self.delta(total=3, depth=10, oldest_wait=3), 1)
+        self.assertEqual(self.delta(total=4, depth=10, oldest_wait=3), 0)
+
+    def test_starting_workers_count_as_capacity(self):
+        self.assertEqual(self.delta(total=2, starting=1, depth=1, oldest_wait=3), 0)
+        self.assertEqual(self.delta(total=2, starting=1, depth=3, oldest_wait=3), 2)
+
+    def test_fixed_size_never_scales(self):
+        policy = AutoscalePolicy(max_workers=0)
+        self.assertEqual(
+            policy.scale_delta(2, 2, 0, depth=5, oldest_wait=60, idle_for=[]), 0
+        )
+
+    def test_scale_down_idle_extras(self):
+        self.assertEqual(self.delta(total=3, idle_for=[400, 500, 10]), -2)
+        self.assertEqual(self.delta(minimum=3, total=3, idle_for=[400, 500]), 0)
+        self.assertEqual(self.delta(total=3, idle_for=[400], depth=1), 0)
+
+    def test_should_recycle(self):
+        self.assertFalse(self.policy.should_recycle(99))
+        self.assertTrue(self.policy.should_recycle(100))
+        policy = AutoscalePolicy(max_workers=1, max_memory=1000)
+        self.assertFalse(policy.should_recycle(10**6))
+        self.assertFalse(policy.should_recycle(0, None))
+        self.assertFalse(policy.should_recycle(0, 1000))
+        self.assertTrue(policy.should_recycle(0, 1001))
+
+
+class TestProcessTreeRss(TestCase):
+    @skipUnless(sys.platform == "linux", "只支持 Linux")
+    def test_current_process(self):
+        rss = process_tree_rss(os.getpid())
+        assert rss is not None
+        self.assertGreater(rss, 1024 * 1024)
@@ -0,0 +1,102 @@
+import asyncio
+import tempfile
+from pathlib import Path
+from unittest import IsolatedAsyncioTestCase
+
+from pydantic import BaseModel
+
+from src.ui.base.render_cache import RenderCache
+
+
+class Page(BaseModel):
+    title: str
+    count: int = 0
+
+
+class TestRenderCache(IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.calls = 0
+
+    async def render(self) -> bytes:
+        self.calls += 1
+        await asyncio.sleep(0.01)
+        return b"png" * 10
+
+    def test_key_is_stable(self):
+        cache = RenderCache(1024)
+        self.assertEqual(
+            cache.key("help", Page(title="a")),
+            cache.key("help", {"title": "a", "count": 0}),
+        )
+        self.assertNotEqual(
+            cache.key("help", Page(title="a")), cache.key("help", Page(title="b"))
+        )
+        self.assertNotEqual(
+            cache.key("help", None, "v1"), cache.key("help", None, "v2")
+        )
+
+    async def test_single_flight_and_hits(self):
+        cache = RenderCache(1024)
+        key = cache.key("help", Page(title="a"))
+        results = await asyncio.gather(
+            *(cache.get_or_render(key, self.render) for _ in range(5))
+        )
+        self.assertEqual(self.calls, 1)
+        self.assertTrue(all(r == results[0] for r in results))
+        self.assertEqual(cache.stats.joined, 4)
+
+        await cache.get_or_render(key, self.render)
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(cache.stats.hits, 1)
+
+    async def test_lru_and_disk(self):
+        with tempfile.TemporaryDirectory() as d:
+            cache = RenderCache(40, root=Path(d))
+            await cache.get_or_render("a", self.render)
+            await cache.get_or_render("b", self.render)
+            # 内存只放得下一张，a 被挤出去了，但还能从硬盘读到
+            self.assertEqual(len(cache), 1)
+            await cache.get_or_render("a", self.render)
+            self.assertEqual(self.calls, 2)
+            self.assertEqual(cache.stats.disk_hits, 1)
+
+    async def test_failure_is_not_cached(self):
+        cache = RenderCache(1024)
+
+        async def broken() -> bytes:
+            raise RuntimeError()
+
+        with self.assertRaises(RuntimeError):
+            await cache.get_or_render("a", broken)
+        self.assertEqual(await cache.get_or_render("a", self.render), b"png" * 10)
+
+    async def test_owner_cancelled_while_joined(self):
+        cache = RenderCache(1024)
+        owner = asyncio.create_task(cache.get_or_render("a", self.render))
+        await asyncio.sleep(0)
+        joiner = asyncio.create_task(cache.get_or_render("a", self.render))
+        await asyncio.sleep(0)
+        owner.cancel()
+        self.assertEqual(await joiner, b"png" * 10)
+        self.assertTrue(owner.cancelled())
+        self.assertEqual(self.calls, 1)
+
+    async def test_cancel_when_nobody_waits(self):
+        cache = RenderCache(1024)
+        started = asyncio.Event()
+        cancelled = asyncio.Event()
+
+        async def slow() -> bytes:
+            started.set()
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+            return b""
+
+        task = asyncio.create_task(cache.get_or_render("a", slow))
+        await started.wait()
+        task.cancel()
+        await asyncio.wait_for(cancelled.wait(), 1)
+        self.assertEqual(await cache.get_or_render("a", self.render), b"png" * 10)
@@ -0,0 +1,89 @@
+import asyncio
+from unittest import IsolatedAsyncioTestCase
+
+from src.ui.base.render_scheduler import RenderPriority, RenderScheduler
+
+
+class TestRenderScheduler(IsolatedAsyncioTestCase):
+    async def _queue(
+        self,
+        scheduler: RenderScheduler[str],
+        requests: list[tuple[RenderPriority, int, str]],
+    ) -> tuple[list[str], list["asyncio.Task[None]"]]:
+        """排好队，每个请求拿到渲染器以后记下顺序，然后马上归还"""
+        order: list[str] = []
+
+        async def wait(priority: RenderPriority, group: int, tag: str):
+            worker = await scheduler.acquire(priority, group, tag)
+            order.append(tag)
+            await asyncio.sleep(0)
+            scheduler.release(worker)
+
+        tasks = [asyncio.create_task(wait(*r)) for r in requests]
+        await asyncio.sleep(0)
+        return order, tasks
+
+    async def test_idle_worker_is_taken_directly(self):
+        scheduler: RenderScheduler[str] = RenderScheduler()
+        scheduler.release("w")
+        self.assertEqual(await scheduler.acquire(path="zhua"), "w")
+        self.assertEqual(scheduler.idle, [])
+        scheduler.release("w")
+        self.assertEqual(scheduler.idle, ["w"])
+
+    async def test_priority_before_arrival(self):
+        scheduler: RenderScheduler[str] = RenderScheduler()
+        order, tasks = await self._queue(
+            scheduler,
+            [
+                (RenderPriority.LOW, 1, "storage"),
+                (RenderPriority.NORMAL, 1, "help"),
+                (RenderPriority.HIGH, 1, "zhua"),
+            ],
+        )
+        self.assertEqual(scheduler.depth, 3)
+        scheduler.release("w")
+        await asyncio.gather(*tasks)
+        self.assertEqual(order, ["zhua", "help", "storage"])
+        self.assertEqual(scheduler.depth, 0)
+        self.assertEqual(scheduler.idle, ["w"])
+
+    async def test_groups_take_turns(self):
+        scheduler: RenderScheduler[str] = RenderScheduler()
+        order, tasks = await self._queue(
+            scheduler,
+            [(RenderPriority.NORMAL, 1, f"a{i}") for i in range(3)]
+            + [(RenderPriority.NORMAL, 2, "b0")],
+        )
+        scheduler.release("w")
+        await asyncio.gather(*tasks)
+        self.assertEqual(order, ["a0", "b0", "a1", "a2"])
+
+    async def test_cancelled_waiter_is_skipped(self):
+        scheduler: RenderScheduler[str] = RenderScheduler()
+        order, tasks = await self._queue(
+            scheduler,
+            [(RenderPriority.HIGH, 1, "gone"), (RenderPriority.LOW, 2, "stay")],
+        )
+        tasks[0].cancel()
+        await asyncio.sleep(0)
+        scheduler.release("w")
+        await tasks[1]
+        self.assertEqual(order, ["stay"])
+        self.assertEqual(scheduler.idle, ["w"])
+        self.assertEqual(scheduler.stats["gone"].waiting, 0)
+
+    async def test_timeout_while_waiting(self):
+        scheduler: RenderScheduler[str] = RenderScheduler()
+        with self.assertRaises(TimeoutError):
+            async with asyncio.timeout(0.01):
+                await scheduler.acquire(path="storage")
+        scheduler.release("w")
+        self.assertEqual(scheduler.idle, ["w"])
+        self.assertGreater(scheduler.stats["storage"].wait_max, 0)
+
+    async def test_take_idle_worker(self):
+        scheduler: RenderScheduler[str] = RenderScheduler()
+        scheduler.release("w")
+        self.assertTrue(scheduler.take("w"))
+        self.assertFalse(scheduler.take("w"))
@@ -0,0 +1,134 @@
+import re
+from typing import Any
+from unittest import IsolatedAsyncioTestCase, TestCase
+
+from arclet.alconna import Alconna, Arg, Arparma
+from nonebot_plugin_alconna import Segment, UniMessage
+
+from src.base.command_events import MessageContext
+from src.base.event.event_dispatcher import EventDispatcher
+from src.base.event.routing import regex_heads
+from src.base.exceptions import KagamiStopIteration
+from src.common.command_deco import match_alconna, match_literal, match_regex
+
+
+class FakeContext(MessageContext):
+    def __init__(self, message: UniMessage[Any]) -> None:
+        self._message = message
+
+    @property
+    def sender_id(self) -> int:
+        return 1
+
+    async def send(self, message: UniMessage[Any] | str) -> Any: ...
+
+    async def reply(
+        self, message: UniMessage[Any] | str, ref: bool = False, at: bool = True
+    ) -> Any: ...
+
+    async def get_sender_name(self) -> str:
+        return "测试玩家"
+
+    @property
+    def message(self) -> UniMessage[Segment]:
+        return self._message
+
+
+class TestRegexHeads(TestCase):
+    def test_heads(self):
+        self.assertEqual(regex_heads("^(mygd|我有多少哥度)$"), {"mygd", "我有多少哥度"})
+        self.assertEqual(regex_heads("(?i)KC"), {"kc"})
+        self.assertEqual(regex_heads("a+b"), {"a"})
+        self.assertEqual(regex_heads("(ab)?c"), {"abc", "c"})
+        self.assertIsNone(regex_heads(r"[\s\S]*金[\s\S]*"))
+        self.assertIsNone(regex_heads(r"\d+"))
+        self.assertIsNone(regex_heads("a?"))
+
+    def test_heads_cover_matches(self):
+        cases = {
+            r"^(抓小哥|zhua) ?(更新|gx|upd|update)( \d*)?$": [
+                "zhua gx",
+                "抓小哥更新 3",
+                "zhuaupdate",
+            ],
+            "^(关于 ?小?镜 ?([bB]ot)?|kagami ?about)$": ["关于镜", "kagami about"],
+            "(抓小?哥?|zhua)? ?(kc|库存)": ["kc", " kc", "抓哥库存"],
+            "^(小[鹅lL]|x[le])?(猎场|lc)$": ["lc", "小L猎场", "xelc"],
+        }
+        for pattern, texts in cases.items():
+            heads = regex_heads(pattern)
+            assert heads is not None
+            for text in texts:
+                self.assertIsNotNone(re.fullmatch(pattern, text))
+                self.assertTrue(
+                    any(text.lower().startswith(h) for h in heads), (pattern, text)
+                )
+
+
+class TestRouting(IsolatedAsyncioTestCase):
+    async def test_routing_keeps_order(self):
+        dispatcher = EventDispatcher()
+        called: list[str] = []
+
+        @dispatcher.listen(MessageContext)
+        @match_regex("^(kc|库存)$")
+        async def _(ctx: MessageContext, res: re.Match[str]):
+            called.append("regex")
+
+        @dispatcher.listen(MessageContext, priority=1)
+        @match_literal("kc")
+        async def _(ctx: MessageContext):
+            called.append("literal")
+
+        @dispatcher.listen(MessageContext)
+        @match_alconna(Alconna(["::"], "re:(所有|全部)皮肤"))
+        async def _(ctx: MessageContext, res: Arparma[Any]):
+            called.append("alconna")
+
+        @dispatcher.listen(MessageContext)
+        @match_alconna(Alconna("kz", Arg("count", int)))
+        async def _(ctx: MessageContext, res: Arparma[Any]):
+            called.append("kz")
+
+        @dispatcher.listen(MessageContext)
+        async def _(ctx: MessageContext):
+            called.append("all")
+
+        await dispatcher.emit(FakeContext(UniMessage.text("kc")))
+        self.assertEqual(called, ["literal", "regex", "all"])
+
+        called.clear()
+        await dispatcher.emit(FakeContext(UniMessage.text("  ::全部皮肤")))
+        await dispatcher.emit(FakeContext(UniMessage.text("kz 3")))
+        self.assertEqual(called, ["alconna", "all", "kz", "all"])
+
+        called.clear()
+        await dispatcher.emit(FakeContext(UniMessage.text("随便聊聊")))
+        await dispatcher.emit(FakeContext(UniMessage.at("1") + "kc"))
+        self.assertEqual(called, ["all", "all"])
+
+        # 新的监听器会让路由索引重建
+        @dispatcher.listen(MessageContext, priority=2)
+        @match_literal("随便聊聊")
+        async def _(ctx: MessageContext):
+            called.append("chat")
+            raise KagamiStopIteration()
+
+        called.clear()
+        await dispatcher.emit(FakeContext(UniMessage.text("随便聊聊")))
+        self.assertEqual(called, ["chat"])
+
+    async def test_is_routed(self):
+        dispatcher = EventDispatcher()
+
+        @dispatcher.listen(MessageContext)
+        @match_regex("^(kc|库存)$")
+        async def _(ctx: MessageContext, res: re.Match[str]): ...
+
+        @dispatcher.listen(MessageContext)
+        async def _(ctx: MessageContext): ...
+
+        self.assertTrue(dispatcher.is_routed(FakeContext(UniMessage.text("kc"))))
+        self.assertFalse(dispatcher.is_routed(FakeContext(UniMessage.text("是"))))
+        self.assertFalse(dispatcher.is_routed(FakeContext(UniMessage.at("1") + "kc")))
+        self.assertFalse(dispatcher.is_routed(object()))
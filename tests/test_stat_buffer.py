@@ -0,0 +1,118 @@
+import asyncio
+import datetime
+from unittest import IsolatedAsyncioTestCase
+
+from src.base.db import DatabaseManager
+from src.core.stat_buffer import StatBuffer
+from src.models.base import Base
+from src.repositories.stats_repository import StatKey, StatsRepository
+from src.repositories.stats_rollup_repository import StatRollupRepository
+
+import src.models.item  # noqa: F401
+import src.models.models  # noqa: F401
+import src.models.stats  # noqa: F401
+import src.models.up_pool  # noqa: F401
+
+
+class TestStatBuffer(IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.db = DatabaseManager("sqlite+aiosqlite:///:memory:")
+        async with self.db.sql_engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+
+    async def asyncTearDown(self):
+        await self.db.sql_engine.dispose()
+
+    async def get_sum(self, stat_type: str, **kwargs) -> int:
+        session = self.db.get_session()
+        try:
+            return (
+                await StatsRepository(session).get_sum(None, stat_type, **kwargs) or 0
+            )
+        finally:
+            await session.close()
+
+    async def test_coalesce_and_flush(self):
+        buffer = StatBuffer()
+        for _ in range(10):
+            buffer.add(StatKey(None, "戳小镜"), 1)
+        buffer.add(StatKey(None, "看猎场的界面", linked_pid=1), 2)
+        buffer.add(StatKey(None, "看猎场的界面", linked_pid=2), 3)
+
+        self.assertEqual(len(buffer.pending), 3)
+        self.assertEqual(buffer.pending_sum(None, "戳小镜"), 10)
+        self.assertEqual(buffer.pending_sum(None, "看猎场的界面"), 5)
+        self.assertEqual(buffer.pending_sum(None, "看猎场的界面", linked_pid=2), 3)
+        self.assertEqual(await self.get_sum("戳小镜"), 0)
+
+        self.assertEqual(await buffer.flush(self.db), 3)
+        self.assertEqual(buffer.pending_sum(None, "戳小镜"), 0)
+        self.assertEqual(await self.get_sum("戳小镜"), 10)
+        self.assertEqual(await self.get_sum("看猎场的界面", linked_pid=1), 2)
+
+    async def test_flush_updates_existing_rows(self):
+        buffer = StatBuffer()
+        buffer.add(StatKey(None, "戳小镜"), 1)
+        await buffer.flush(self.db)
+        buffer.add(StatKey(None, "戳小镜"), 4)
+        buffer.add(StatKey(None, "签到"), 1)
+        await buffer.flush(self.db)
+
+        self.assertEqual(await self.get_sum("戳小镜"), 5)
+        self.assertEqual(await self.get_sum("签到"), 1)
+
+        session = self.db.get_session()
+        try:
+            ids = await StatsRepository(session).get_all_id(None, "戳小镜")
+        finally:
+            await session.close()
+        self.assertEqual(len(ids), 1)
+
+    async def test_flush_empty(self):
+        self.assertEqual(await StatBuffer().flush(self.db), 0)
+
+    async def test_rollup_uses_event_day(self):
+        buffer = StatBuffer()
+        day1 = datetime.date(2025, 3, 9)
+        day2 = datetime.date(2025, 3, 10)
+        # 同一个键在零点前后各发生了一次，到第二天才写入
+        buffer.add(StatKey(None, "戳小镜"), 2, day1)
+        buffer.add(StatKey(None, "戳小镜"), 3, day2)
+        self.assertEqual(await buffer.flush(self.db), 1)
+        self.assertEqual(await self.get_sum("戳小镜"), 5)
+
+        session = self.db.get_session()
+        try:
+            rollups = StatRollupRepository(session)
+            self.assertEqual(await rollups.get_total("戳小镜", since=day2), 3)
+            self.assertEqual(await rollups.get_total("戳小镜"), 5)
+        finally:
+            await session.close()
+
+    async def test_read_during_slow_commit(self):
+        buffer = StatBuffer()
+        buffer.add(StatKey(None, "戳小镜"), 5)
+        committed = asyncio.Event()
+        db = self.db
+
+        class SlowCommitDB:
+            def get_session(self):
+                session = db.get_session()
+                commit = session.commit
+
+                async def slow_commit():
+                    # 其他会话已经能看到写入的数据，但提交还没有返回
+                    await commit()
+                    committed.set()
+                    await asyncio.sleep(0.05)
+
+                session.commit = slow_commit  # type: ignore
+                return session
+
+        flush = asyncio.create_task(buffer.flush(SlowCommitDB()))  # type: ignore
+        await committed.wait()
+        self.assertFalse(flush.done())
+        total = await buffer.stable_read(lambda: self.get_sum("戳小镜"))
+        total += buffer.pending_sum(None, "戳小镜")
+        self.assertEqual(total, 5)
+        self.assertEqual(await flush, 1)
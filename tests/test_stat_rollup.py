@@ -0,0 +1,76 @@
+import datetime
+from unittest import IsolatedAsyncioTestCase, TestCase
+
+from src.base.db import DatabaseManager
+from src.models.base import Base
+from src.repositories.stats_repository import StatKey
+from src.repositories.stats_rollup_repository import (
+    StatRollupRepository,
+    expand_rollup,
+)
+
+import src.models.item  # noqa: F401
+import src.models.models  # noqa: F401
+import src.models.stats  # noqa: F401
+import src.models.up_pool  # noqa: F401
+
+
+class TestExpandRollup(TestCase):
+    def test_expand(self):
+        rows = expand_rollup(
+            {
+                StatKey(None, "抓到小哥", linked_aid=3, linked_pid=1): 2,
+                StatKey(None, "抓到小哥", linked_aid=4, linked_pid=1): 5,
+            }
+        )
+        self.assertEqual(rows[("抓到小哥", 0, "", 0)], 7)
+        self.assertEqual(rows[("抓到小哥", 0, "pid", 1)], 7)
+        self.assertEqual(rows[("抓到小哥", 0, "aid", 3)], 2)
+        self.assertEqual(rows[("抓到小哥", 0, "aid", 4)], 5)
+        self.assertEqual(len(rows), 4)
+
+
+class TestStatRollupRepository(IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.db = DatabaseManager("sqlite+aiosqlite:///:memory:")
+        async with self.db.sql_engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        self.session = self.db.get_session()
+        self.repo = StatRollupRepository(self.session)
+
+    async def asyncTearDown(self):
+        await self.session.close()
+        await self.db.sql_engine.dispose()
+
+    async def test_totals_and_series(self):
+        today = datetime.date(2025, 3, 10)
+        yesterday = today - datetime.timedelta(days=1)
+        key = StatKey(None, "展示小哥", linked_aid=5)
+
+        await self.repo.add({key: 1}, yesterday)
+        await self.repo.add({key: 2}, today)
+        await self.repo.add({key: 3}, today)
+        await self.session.commit()
+
+        self.assertEqual(await self.repo.get_total("展示小哥"), 6)
+        self.assertEqual(await self.repo.get_total("展示小哥", None, "aid", 5), 6)
+        self.assertEqual(await self.repo.get_total("展示小哥", None, "aid", 6), 0)
+        self.assertEqual(await self.repo.get_total("展示小哥", since=today), 5)
+        self.assertEqual(
+            await self.repo.get_series("展示小哥", 3, today=today),
+            [(today - datetime.timedelta(days=2), 0), (yesterday, 1), (today, 5)],
+        )
+
+    async def test_total_of_player(self):
+        await self.repo.add(
+            {
+                StatKey(1, "丢粑粑", linked_uid=2): 3,
+                StatKey(1, "丢粑粑", linked_uid=3): 7,
+                StatKey(2, "丢粑粑", linked_uid=3): 5,
+            }
+        )
+        await self.session.commit()
+
+        self.assertEqual(await self.repo.get_total("丢粑粑", uid=1), 10)
+        self.assertEqual(await self.repo.get_total("丢粑粑", 1, "uid", 3), 7)
+        self.assertEqual(await self.repo.get_total("丢粑粑", "no_limit", "uid", 3), 12)
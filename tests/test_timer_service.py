@@ -0,0 +1,97 @@
+import asyncio
+import datetime
+from unittest import IsolatedAsyncioTestCase, TestCase
+
+from src.base.event.timer_service import TimerService, daily
+
+
+class TestDaily(TestCase):
+    def test_daily(self):
+        next_time = daily(4)
+        now = datetime.datetime(2024, 1, 1, 3, 59)
+        self.assertEqual(next_time(now), datetime.datetime(2024, 1, 1, 4))
+        now = datetime.datetime(2024, 1, 1, 4)
+        self.assertEqual(next_time(now), datetime.datetime(2024, 1, 2, 4))
+
+
+class TestTimerService(IsolatedAsyncioTestCase):
+    async def asyncTearDown(self):
+        await self.timer.close()
+
+    async def asyncSetUp(self):
+        self.timer = TimerService()
+
+    async def test_order_and_cancel(self):
+        fired: list[str] = []
+
+        def job(name: str):
+            async def _():
+                fired.append(name)
+
+            return _
+
+        self.timer.call_later(0.03, job("c"), "c")
+        self.timer.call_later(0.01, job("a"), "a")
+        cancelled = self.timer.call_later(0.02, job("x"), "x")
+        self.timer.call_later(0.02, job("b"), "b")
+        cancelled.cancel()
+
+        self.assertEqual([j.name for j in self.timer.jobs()], ["a", "b", "c"])
+
+        await asyncio.sleep(0.06)
+        self.assertEqual(fired, ["a", "b", "c"])
+        self.assertEqual(len(self.timer), 0)
+
+    async def test_interval(self):
+        count = 0
+
+        async def tick():
+            nonlocal count
+            count += 1
+
+        handle = self.timer.call_every(0.05, tick, skip_first=False)
+        await asyncio.sleep(0.175)
+        self.assertEqual(count, 4)
+
+        # 周期从计划的时间算起，不会越来越晚
+        loop = asyncio.get_running_loop()
+        self.assertLess(handle.deadline - loop.time(), 0.05 + 1e-6)
+
+        handle.cancel()
+        await asyncio.sleep(0.05)
+        self.assertEqual(count, 4)
+        self.assertTrue(handle.cleared)
+
+    async def test_slow_interval_skips(self):
+        count = 0
+
+        async def slow():
+            nonlocal count
+            count += 1
+            await asyncio.sleep(0.05)
+
+        self.timer.call_every(0.01, slow, skip_first=False)
+        await asyncio.sleep(0.075)
+        # 上一次还没有执行完时，这一次会被跳过
+        self.assertEqual(count, 2)
+        self.assertEqual(self.timer.jobs()[0].runs, 1)
+
+    async def test_cron(self):
+        fired: list[int] = []
+
+        def next_time(now: datetime.datetime):
+            return now + datetime.timedelta(seconds=0.05)
+
+        async def job():
+            fired.append(1)
+            if len(fired) == 2:
+                raise RuntimeError("出错了也不影响下一次")
+
+        self.timer.call_at(next_time, job)
+        await asyncio.sleep(0.175)
+        self.assertEqual(len(fired), 3)
+
+        # 下一次执行时间没有往后推的任务会被取消
+        self.timer.call_at(lambda now: now, job)
+        await asyncio.sleep(0.01)
+        self.assertEqual(len(self.timer), 1)
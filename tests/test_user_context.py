@@ -0,0 +1,113 @@
+from typing import Any
+from unittest import IsolatedAsyncioTestCase
+
+from nonebot_plugin_alconna import Segment, UniMessage
+from sqlalchemy import event, select
+
+from src.base.command_events import MessageContext
+from src.base.db import DatabaseManager
+from src.common.data.user import get_user_context
+from src.core.unit_of_work import UnitOfWork
+from src.models.base import Base
+from src.models.models import User
+from src.repositories.user_repository import get_uid_cache
+
+import src.models.item  # noqa: F401
+import src.models.stats  # noqa: F401
+import src.models.up_pool  # noqa: F401
+
+
+class FakeContext(MessageContext):
+    def __init__(self, sender_id: int) -> None:
+        self._sender_id = sender_id
+        self.name_calls = 0
+
+    @property
+    def sender_id(self) -> int:
+        return self._sender_id
+
+    async def send(self, message: UniMessage[Any] | str) -> Any: ...
+
+    async def reply(
+        self, message: UniMessage[Any] | str, ref: bool = False, at: bool = True
+    ) -> Any: ...
+
+    async def get_sender_name(self) -> str:
+        self.name_calls += 1
+        return "测试玩家"
+
+    @property
+    def message(self) -> UniMessage[Segment]:
+        return UniMessage()
+
+
+class TestUserContext(IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        get_uid_cache().clear()
+        self.db = DatabaseManager("sqlite+aiosqlite:///:memory:")
+        async with self.db.sql_engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+
+        self.statements: list[str] = []
+
+        def _record(conn, cursor, statement, *args):
+            self.statements.append(statement.split()[0].upper())
+
+        event.listen(self.db.sql_engine.sync_engine, "before_cursor_execute", _record)
+
+    async def asyncTearDown(self):
+        get_uid_cache().clear()
+        await self.db.sql_engine.dispose()
+
+    async def test_get_uid_is_cached(self):
+        async with UnitOfWork(self.db) as uow:
+            uid = await uow.users.get_uid(1)
+            self.assertEqual(await uow.users.get_uid(1), uid)
+
+        async with UnitOfWork(self.db) as uow:
+            self.assertEqual(await uow.users.get_uid(1), uid)
+            self.statements.clear()
+            self.assertEqual(await uow.users.get_uid(1), uid)
+            self.assertEqual(self.statements, [])
+
+            count = (await uow.session.execute(select(User.data_id))).all()
+            self.assertEqual(len(count), 1)
+
+    async def test_rolled_back_user_is_not_cached(self):
+        with self.assertRaises(ValueError):
+            async with UnitOfWork(self.db) as uow:
+                await uow.users.get_uid(1)
+                raise ValueError()
+
+        self.assertIsNone(get_uid_cache().get("1"))
+
+    async def test_set_qqid_forgets_cache(self):
+        async with UnitOfWork(self.db) as uow:
+            uid = await uow.users.get_uid(1)
+        async with UnitOfWork(self.db) as uow:
+            await uow.users.get_uid(1)
+            await uow.users.set_qqid(uid, "2")
+        async with UnitOfWork(self.db) as uow:
+            self.assertEqual(await uow.users.get_uid(2), uid)
+            self.assertNotEqual(await uow.users.get_uid(1), uid)
+
+    async def test_user_context_resolved_once(self):
+        ctx = FakeContext(1)
+        async with UnitOfWork(self.db) as uow:
+            uid = await uow.users.get_uid(1)
+            await uow.users.set_name(uid, "小测")
+
+        async with UnitOfWork(self.db) as uow:
+            user = await get_user_context(ctx, uow)
+        self.assertEqual(user.uid, uid)
+        self.assertEqual(user.special_name, "小测")
+        self.assertTrue(user.awake)
+
+        self.statements.clear()
+        self.assertIs(await get_user_context(ctx), user)
+        self.assertEqual(self.statements, [])
+
+        data = await user.to_user_data()
+        await user.get_display_name()
+        self.assertEqual(data.name, "测试玩家")
+        self.assertEqual(ctx.name_calls, 1)